@@ -21,6 +21,7 @@ if config.config_file_name is not None:
 from backend.database import Base
 from backend.models import (
     Usuario, 
+    TokenRevogado,
     TipoUsuario,
     Empresa, 
     Prospeccao, 
@@ -30,6 +31,7 @@ from backend.models import (
     Notificacao, 
     TipoNotificacao,
     Mensagem,
+    ResumoConversa,
     StatusUsuario,
     GrupoChat,
     MembroGrupo,
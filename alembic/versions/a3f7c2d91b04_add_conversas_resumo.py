@@ -0,0 +1,84 @@
+"""Add conversas_resumo table
+
+Revision ID: a3f7c2d91b04
+Revises: c9a12b34d567
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'a3f7c2d91b04'
+down_revision: Union[str, None] = 'c9a12b34d567'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Cópia congelada do backfill de backend/utils/conversas.py como estava nesta
+# revisão: a migração não pode mudar se o código do app mudar depois
+TAMANHO_TRECHO = 200
+
+SQL_BACKFILL = """
+    INSERT INTO conversas_resumo (
+        usuario_id, outro_usuario_id, ultima_mensagem_id, ultima_mensagem,
+        ultima_mensagem_tipo, ultima_mensagem_minha, data_ultima_mensagem, nao_lidas
+    )
+    SELECT usuario_id, outro_usuario_id, id, LEFT(conteudo, :tamanho_trecho),
+           tipo, remetente_id = usuario_id, data_envio, nao_lidas
+    FROM (
+        SELECT lados.usuario_id, lados.outro_usuario_id, m.id, m.conteudo, m.tipo,
+               m.remetente_id, m.data_envio,
+               ROW_NUMBER() OVER (
+                   PARTITION BY lados.usuario_id, lados.outro_usuario_id
+                   ORDER BY m.data_envio DESC, m.id DESC
+               ) AS posicao,
+               COUNT(*) FILTER (
+                   WHERE m.destinatario_id = lados.usuario_id AND NOT m.lida
+               ) OVER (PARTITION BY lados.usuario_id, lados.outro_usuario_id) AS nao_lidas
+        FROM mensagens m
+        JOIN (
+            SELECT id, remetente_id AS usuario_id, destinatario_id AS outro_usuario_id FROM mensagens
+            UNION ALL
+            SELECT id, destinatario_id, remetente_id FROM mensagens WHERE remetente_id <> destinatario_id
+        ) lados ON lados.id = m.id
+        WHERE NOT m.deletada
+    ) ultimas
+    WHERE posicao = 1
+"""
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+
+    connection.execute(sa.text("""
+        CREATE TABLE IF NOT EXISTS conversas_resumo (
+            id SERIAL PRIMARY KEY,
+            usuario_id INTEGER NOT NULL REFERENCES usuarios(id),
+            outro_usuario_id INTEGER NOT NULL REFERENCES usuarios(id),
+            ultima_mensagem_id INTEGER REFERENCES mensagens(id) ON DELETE SET NULL,
+            ultima_mensagem TEXT,
+            ultima_mensagem_tipo VARCHAR(20),
+            ultima_mensagem_minha BOOLEAN NOT NULL DEFAULT FALSE,
+            data_ultima_mensagem TIMESTAMP,
+            nao_lidas INTEGER NOT NULL DEFAULT 0,
+            CONSTRAINT uq_conversas_resumo_usuario_outro UNIQUE (usuario_id, outro_usuario_id)
+        )
+    """))
+    connection.execute(sa.text("""
+        CREATE INDEX IF NOT EXISTS ix_conversas_resumo_id ON conversas_resumo (id)
+    """))
+    connection.execute(sa.text("""
+        CREATE INDEX IF NOT EXISTS ix_conversas_resumo_usuario_data
+        ON conversas_resumo (usuario_id, data_ultima_mensagem)
+    """))
+
+    connection.execute(sa.text("DELETE FROM conversas_resumo"))
+    connection.execute(sa.text(SQL_BACKFILL), {"tamanho_trecho": TAMANHO_TRECHO})
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    connection.execute(sa.text("DROP TABLE IF EXISTS conversas_resumo CASCADE"))
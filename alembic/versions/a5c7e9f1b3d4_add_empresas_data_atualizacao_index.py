@@ -0,0 +1,49 @@
+"""Add data_atualizacao index for incremental reads of empresas
+
+Revision ID: a5c7e9f1b3d4
+Revises: f4b6d8e0a2c3
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'a5c7e9f1b3d4'
+down_revision: Union[str, None] = 'f4b6d8e0a2c3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _criar_indice(connection, nome: str, sql: str) -> None:
+    """
+    CREATE INDEX CONCURRENTLY que falha ou é cancelado deixa o índice
+    INVALID, e o IF NOT EXISTS o pularia em toda nova execução (o planner
+    nunca o usa): o que sobrou de um build interrompido é apagado antes.
+    """
+    invalido = connection.execute(sa.text("""
+        SELECT NOT i.indisvalid FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = :nome AND pg_table_is_visible(c.oid)
+    """), {"nome": nome}).scalar()
+    if invalido:
+        print(f"Dropping invalid index {nome} left by an interrupted build")
+        connection.execute(sa.text(f"DROP INDEX CONCURRENTLY IF EXISTS {nome}"))
+    connection.execute(sa.text(sql))
+
+
+def upgrade() -> None:
+    # Cada worker lê as empresas alteradas a cada poucos segundos para o
+    # índice de sugestões (backend/utils/sugestoes_empresas.py)
+    with op.get_context().autocommit_block():
+        _criar_indice(
+            op.get_bind(), "ix_empresas_data_atualizacao",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_empresas_data_atualizacao ON empresas (data_atualizacao)"
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.get_bind().execute(sa.text("DROP INDEX CONCURRENTLY IF EXISTS ix_empresas_data_atualizacao"))
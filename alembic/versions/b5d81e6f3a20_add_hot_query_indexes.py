@@ -0,0 +1,87 @@
+"""Add composite and partial indexes for hot queries
+
+Revision ID: b5d81e6f3a20
+Revises: a3f7c2d91b04
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'b5d81e6f3a20'
+down_revision: Union[str, None] = 'a3f7c2d91b04'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (nome, tabela, definição)
+INDICES = [
+    # Conversa entre dois usuários ordenada por data (obter_conversa, /novas)
+    ('ix_mensagens_remetente_destinatario_data', 'mensagens',
+     '(remetente_id, destinatario_id, data_envio)'),
+    # Contagem de não lidas (total e por remetente)
+    ('ix_mensagens_nao_lidas', 'mensagens',
+     '(destinatario_id, remetente_id) WHERE lida = false AND deletada = false'),
+    ('ix_notificacoes_destino_lida_data', 'notificacoes',
+     '(usuario_destino_id, lida, data_criacao)'),
+    ('ix_company_pipeline_consultor_stage_ativo', 'company_pipeline',
+     '(consultor_id, stage_id, ativo)'),
+    # Kanban do admin: empresas ativas por estágio
+    ('ix_company_pipeline_stage_ativos', 'company_pipeline',
+     '(stage_id) WHERE ativo = true'),
+    ('ix_atribuicoes_empresas_consultor_ativa', 'atribuicoes_empresas',
+     '(consultor_id, ativa)'),
+    ('ix_prospeccoes_consultor_data', 'prospeccoes',
+     '(consultor_id, data_criacao)'),
+    # Última prospecção de cada empresa na listagem de empresas
+    ('ix_prospeccoes_empresa_data', 'prospeccoes',
+     '(empresa_id, data_criacao)'),
+    ('ix_activities_usuario_criado', 'activities',
+     '(usuario_id, criado_em)'),
+    ('ix_respostas_pergunta_valor', 'respostas',
+     '(pergunta_id, valor_numerico)'),
+]
+
+
+def _criar_indice(connection, nome: str, sql: str) -> None:
+    """
+    CREATE INDEX CONCURRENTLY que falha ou é cancelado deixa o índice
+    INVALID, e o IF NOT EXISTS o pularia em toda nova execução (o planner
+    nunca o usa): o que sobrou de um build interrompido é apagado antes.
+    """
+    invalido = connection.execute(sa.text("""
+        SELECT NOT i.indisvalid FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = :nome AND pg_table_is_visible(c.oid)
+    """), {"nome": nome}).scalar()
+    if invalido:
+        print(f"Dropping invalid index {nome} left by an interrupted build")
+        connection.execute(sa.text(f"DROP INDEX CONCURRENTLY IF EXISTS {nome}"))
+    connection.execute(sa.text(sql))
+
+
+def upgrade() -> None:
+    # CONCURRENTLY não bloqueia escritas nas tabelas grandes, mas não pode
+    # rodar dentro de uma transação
+    with op.get_context().autocommit_block():
+        connection = op.get_bind()
+        tabelas = set(sa.inspect(connection).get_table_names())
+
+        for nome, tabela, definicao in INDICES:
+            if tabela not in tabelas:
+                print(f"Table {tabela} does not exist, skipping index {nome}")
+                continue
+            _criar_indice(connection, nome, f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {nome} ON {tabela} {definicao}")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        connection = op.get_bind()
+        for nome, _, _ in INDICES:
+            try:
+                connection.execute(sa.text(f"DROP INDEX CONCURRENTLY IF EXISTS {nome}"))
+            except Exception:
+                pass
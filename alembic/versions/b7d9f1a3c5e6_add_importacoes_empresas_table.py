@@ -0,0 +1,44 @@
+"""Add importacoes_empresas table (progress of background spreadsheet imports)
+
+Revision ID: b7d9f1a3c5e6
+Revises: a5c7e9f1b3d4
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'b7d9f1a3c5e6'
+down_revision: Union[str, None] = 'a5c7e9f1b3d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    connection.execute(sa.text("""
+        CREATE TABLE IF NOT EXISTS importacoes_empresas (
+            id SERIAL PRIMARY KEY,
+            arquivo VARCHAR(500),
+            usuario_id INTEGER,
+            status VARCHAR(20) NOT NULL DEFAULT 'pendente',
+            atualizar_existentes BOOLEAN NOT NULL DEFAULT FALSE,
+            linhas_lidas BIGINT NOT NULL DEFAULT 0,
+            total_estimado BIGINT,
+            criadas BIGINT NOT NULL DEFAULT 0,
+            atualizadas BIGINT NOT NULL DEFAULT 0,
+            ignoradas BIGINT NOT NULL DEFAULT 0,
+            erro TEXT,
+            iniciado_em TIMESTAMP,
+            atualizado_em TIMESTAMP,
+            concluido_em TIMESTAMP
+        )
+    """))
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    connection.execute(sa.text("DROP TABLE IF EXISTS importacoes_empresas"))
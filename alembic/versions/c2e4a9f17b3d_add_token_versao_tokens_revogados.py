@@ -0,0 +1,43 @@
+"""Add usuarios.token_versao and tokens_revogados table
+
+Revision ID: c2e4a9f17b3d
+Revises: b5d81e6f3a20
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'c2e4a9f17b3d'
+down_revision: Union[str, None] = 'b5d81e6f3a20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+
+    connection.execute(sa.text("""
+        ALTER TABLE usuarios
+        ADD COLUMN IF NOT EXISTS token_versao INTEGER NOT NULL DEFAULT 0
+    """))
+
+    connection.execute(sa.text("""
+        CREATE TABLE IF NOT EXISTS tokens_revogados (
+            jti VARCHAR(32) PRIMARY KEY,
+            usuario_id INTEGER REFERENCES usuarios(id) ON DELETE CASCADE,
+            expira_em TIMESTAMP NOT NULL
+        )
+    """))
+    connection.execute(sa.text("""
+        CREATE INDEX IF NOT EXISTS ix_tokens_revogados_expira_em ON tokens_revogados (expira_em)
+    """))
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    connection.execute(sa.text("DROP TABLE IF EXISTS tokens_revogados CASCADE"))
+    connection.execute(sa.text("ALTER TABLE usuarios DROP COLUMN IF EXISTS token_versao"))
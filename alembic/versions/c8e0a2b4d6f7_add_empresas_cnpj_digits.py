@@ -0,0 +1,110 @@
+"""Add normalized cnpj_digits and cnpj_raiz columns to empresas
+
+Revision ID: c8e0a2b4d6f7
+Revises: b7d9f1a3c5e6
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'c8e0a2b4d6f7'
+down_revision: Union[str, None] = 'b7d9f1a3c5e6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Mesmas expressões de backend/models/empresas.py: só os dígitos, com 12 ou
+# 13 completados até 14 (CNPJ que perdeu os zeros numa célula numérica).
+DIGITOS = "regexp_replace(cnpj, '[^0-9]', '', 'g')"
+COLUNAS = [
+    ('cnpj_digits', f"""varchar(14) COLLATE "C" GENERATED ALWAYS AS (
+        CASE WHEN length({DIGITOS}) IN (12, 13) THEN lpad({DIGITOS}, 14, '0') ELSE nullif({DIGITOS}, '') END
+    ) STORED"""),
+    ('cnpj_raiz', f"""varchar(8) COLLATE "C" GENERATED ALWAYS AS (
+        CASE WHEN length({DIGITOS}) BETWEEN 12 AND 14 THEN left(lpad({DIGITOS}, 14, '0'), 8) END
+    ) STORED"""),
+]
+
+# Não únicos: bancos antigos podem ter o mesmo CNPJ gravado com pontuações
+# diferentes (ver python -m backend.utils.duplicados_cnpj)
+INDICES = [
+    ('ix_empresas_cnpj_digits', 'btree', 'cnpj_digits'),
+    ('ix_empresas_cnpj_raiz', 'btree', 'cnpj_raiz'),
+]
+
+# Substitui o índice de expressão da busca por CNPJ (f4b6d8e0a2c3)
+INDICE_TRGM = ('ix_empresas_busca_cnpj_digits_trgm', 'gin', 'cnpj_digits gin_trgm_ops')
+INDICE_TRGM_ANTERIOR = ('ix_empresas_busca_cnpj_trgm', 'gin', f"{DIGITOS} gin_trgm_ops")
+
+
+def _tem_pg_trgm(connection) -> bool:
+    return bool(connection.execute(sa.text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).scalar())
+
+
+def _criar_indice(connection, nome: str, sql: str) -> None:
+    """
+    CREATE INDEX CONCURRENTLY que falha ou é cancelado deixa o índice
+    INVALID, e o IF NOT EXISTS o pularia em toda nova execução (o planner
+    nunca o usa): o que sobrou de um build interrompido é apagado antes.
+    """
+    invalido = connection.execute(sa.text("""
+        SELECT NOT i.indisvalid FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = :nome AND pg_table_is_visible(c.oid)
+    """), {"nome": nome}).scalar()
+    if invalido:
+        print(f"Dropping invalid index {nome} left by an interrupted build")
+        connection.execute(sa.text(f"DROP INDEX CONCURRENTLY IF EXISTS {nome}"))
+    connection.execute(sa.text(sql))
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        connection = op.get_bind()
+        # Reescreve a tabela calculando as colunas das empresas existentes
+        # (lock exclusivo enquanto isso); num banco vazio o create_all já
+        # criou as colunas pelos models
+        connection.execute(sa.text(
+            "ALTER TABLE empresas " + ", ".join(
+                f"ADD COLUMN IF NOT EXISTS {nome} {definicao}" for nome, definicao in COLUNAS
+            )
+        ))
+
+        indices = INDICES + ([INDICE_TRGM] if _tem_pg_trgm(connection) else [])
+        for nome, metodo, definicao in indices:
+            _criar_indice(
+                connection, nome,
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {nome} ON empresas USING {metodo} ({definicao})"
+            )
+        connection.execute(sa.text(f"DROP INDEX CONCURRENTLY IF EXISTS {INDICE_TRGM_ANTERIOR[0]}"))
+
+        duplicados = connection.execute(sa.text("""
+            SELECT count(*), coalesce(sum(quantidade), 0) FROM (
+                SELECT count(*) AS quantidade FROM empresas
+                WHERE cnpj_digits IS NOT NULL GROUP BY cnpj_digits HAVING count(*) > 1
+            ) grupos
+        """)).one()
+        if duplicados[0]:
+            print(
+                f"{duplicados[0]} CNPJs shared by {duplicados[1]} companies; "
+                "list them with python -m backend.utils.duplicados_cnpj"
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        connection = op.get_bind()
+        if _tem_pg_trgm(connection):
+            nome, metodo, definicao = INDICE_TRGM_ANTERIOR
+            _criar_indice(
+                connection, nome,
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {nome} ON empresas USING {metodo} ({definicao})"
+            )
+        for nome, _, _ in INDICES + [INDICE_TRGM]:
+            connection.execute(sa.text(f"DROP INDEX CONCURRENTLY IF EXISTS {nome}"))
+        for nome, _ in COLUNAS:
+            connection.execute(sa.text(f"ALTER TABLE empresas DROP COLUMN IF EXISTS {nome}"))
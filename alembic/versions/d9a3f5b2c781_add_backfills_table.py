@@ -0,0 +1,37 @@
+"""Add backfills table (progress of resumable data backfills)
+
+Revision ID: d9a3f5b2c781
+Revises: c2e4a9f17b3d
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'd9a3f5b2c781'
+down_revision: Union[str, None] = 'c2e4a9f17b3d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    connection.execute(sa.text("""
+        CREATE TABLE IF NOT EXISTS backfills (
+            nome VARCHAR(100) PRIMARY KEY,
+            versao INTEGER NOT NULL,
+            ultimo_id BIGINT NOT NULL DEFAULT 0,
+            linhas BIGINT NOT NULL DEFAULT 0,
+            iniciado_em TIMESTAMP,
+            atualizado_em TIMESTAMP,
+            concluido_em TIMESTAMP
+        )
+    """))
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    connection.execute(sa.text("DROP TABLE IF EXISTS backfills"))
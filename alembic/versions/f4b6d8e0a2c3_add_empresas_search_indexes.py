@@ -0,0 +1,94 @@
+"""Add unaccented search columns and pg_trgm indexes for company search
+
+Revision ID: f4b6d8e0a2c3
+Revises: e3c5a7b9d1f2
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'f4b6d8e0a2c3'
+down_revision: Union[str, None] = 'e3c5a7b9d1f2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# unaccent() é STABLE e não pode ir num índice nem numa coluna gerada; o
+# wrapper com o dicionário fixo é IMMUTABLE.
+F_UNACCENT = """
+    CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+    AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$
+"""
+
+# Colunas mantidas pelo Postgres em todo INSERT/UPDATE. Guardar o texto já
+# sem acento evita chamar f_unaccent por linha na busca (o recheck dos
+# índices GIN e a ordenação leem a coluna). COLLATE "C" deixa o btree de
+# nome_busca atender a faixa de prefixo com parâmetros.
+COLUNAS = [
+    ('nome_busca', """text COLLATE "C" GENERATED ALWAYS AS (
+        rtrim(lower(f_unaccent(empresa)) || ' ' || coalesce(lower(f_unaccent(sigla)), ''))
+    ) STORED"""),
+    ('municipio_busca', 'text GENERATED ALWAYS AS (lower(f_unaccent(municipio))) STORED'),
+]
+
+INDICES = [
+    ('ix_empresas_busca_nome', 'btree', 'nome_busca, id'),
+    ('ix_empresas_busca_nome_trgm', 'gin', 'nome_busca gin_trgm_ops'),
+    ('ix_empresas_busca_municipio_trgm', 'gin', 'municipio_busca gin_trgm_ops'),
+    ('ix_empresas_busca_cnpj_trgm', 'gin', "regexp_replace(cnpj, '[^0-9]', '', 'g') gin_trgm_ops"),
+]
+
+
+def _criar_indice(connection, nome: str, sql: str) -> None:
+    """
+    CREATE INDEX CONCURRENTLY que falha ou é cancelado deixa o índice
+    INVALID, e o IF NOT EXISTS o pularia em toda nova execução (o planner
+    nunca o usa): o que sobrou de um build interrompido é apagado antes.
+    """
+    invalido = connection.execute(sa.text("""
+        SELECT NOT i.indisvalid FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = :nome AND pg_table_is_visible(c.oid)
+    """), {"nome": nome}).scalar()
+    if invalido:
+        print(f"Dropping invalid index {nome} left by an interrupted build")
+        connection.execute(sa.text(f"DROP INDEX CONCURRENTLY IF EXISTS {nome}"))
+    connection.execute(sa.text(sql))
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        connection = op.get_bind()
+        try:
+            connection.execute(sa.text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            connection.execute(sa.text("CREATE EXTENSION IF NOT EXISTS unaccent"))
+            connection.execute(sa.text(F_UNACCENT))
+        except Exception as e:
+            # Sem as extensões a /api/empresas/busca cai no ILIKE sem índice
+            print(f"pg_trgm/unaccent unavailable, skipping search columns: {e}")
+            return
+
+        # Reescreve a tabela (lock exclusivo enquanto calcula as colunas)
+        for nome, definicao in COLUNAS:
+            connection.execute(sa.text(f"ALTER TABLE empresas ADD COLUMN IF NOT EXISTS {nome} {definicao}"))
+
+        for nome, metodo, definicao in INDICES:
+            _criar_indice(
+                connection, nome,
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {nome} ON empresas USING {metodo} ({definicao})"
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        connection = op.get_bind()
+        for nome, _, _ in INDICES:
+            connection.execute(sa.text(f"DROP INDEX CONCURRENTLY IF EXISTS {nome}"))
+        for nome, _ in COLUNAS:
+            connection.execute(sa.text(f"ALTER TABLE empresas DROP COLUMN IF EXISTS {nome}"))
+        connection.execute(sa.text("DROP FUNCTION IF EXISTS f_unaccent(text)"))
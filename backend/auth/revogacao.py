@@ -0,0 +1,99 @@
+"""
+Registro de revogação de tokens, mantido em memória em cada worker.
+
+Um token é recusado quando:
+- o seu jti está em tokens_revogados (logout, refresh já usado);
+- a claim "ver" é diferente de usuarios.token_versao (troca de senha,
+  email ou tipo, exclusão do usuário).
+
+Os jtis revogados e as versões dos usuários ficam em memória; mudanças
+chegam pelo barramento de eventos e o estado é recarregado do banco a cada
+REVOGACAO_RECARGA_SEGUNDOS, caso algum evento tenha sido perdido.
+"""
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from backend.database import SessionLocal
+from backend.eventos import barramento
+from backend.models import TokenRevogado, Usuario
+
+RECARGA_SEGUNDOS = float(os.getenv("REVOGACAO_RECARGA_SEGUNDOS", "300"))
+
+_SEM_VERSAO = object()
+
+
+class RegistroRevogacao:
+    def __init__(self):
+        self.jtis: Dict[str, float] = {}
+        self.versoes: Dict[int, Optional[int]] = {}
+        self.lock = threading.Lock()
+        self.carregado_em: Optional[float] = None
+
+    def _recarregar_se_necessario(self):
+        if self.carregado_em is not None and time.monotonic() - self.carregado_em < RECARGA_SEGUNDOS:
+            return
+        db = SessionLocal()
+        try:
+            revogados = db.query(TokenRevogado.jti, TokenRevogado.expira_em).filter(
+                TokenRevogado.expira_em > datetime.utcnow()
+            ).all()
+        finally:
+            db.close()
+        with self.lock:
+            self.jtis = {jti: expira_em.timestamp() for jti, expira_em in revogados}
+            self.versoes = {}
+            self.carregado_em = time.monotonic()
+
+    def esta_revogado(self, jti: str) -> bool:
+        self._recarregar_se_necessario()
+        return jti in self.jtis
+
+    def versao_atual(self, usuario_id: int) -> Optional[int]:
+        """Versão dos tokens do usuário, ou None se ele não existe mais"""
+        self._recarregar_se_necessario()
+        versao = self.versoes.get(usuario_id, _SEM_VERSAO)
+        if versao is not _SEM_VERSAO:
+            return versao
+
+        db = SessionLocal()
+        try:
+            versao = db.query(Usuario.token_versao).filter(Usuario.id == usuario_id).scalar()
+        finally:
+            db.close()
+        with self.lock:
+            self.versoes[usuario_id] = versao
+        return versao
+
+    def revogar(self, db: Session, jti: str, expira_em: datetime, usuario_id: Optional[int] = None):
+        """Grava a revogação (o commit fica com quem chamou) e avisa os workers"""
+        db.execute(
+            insert(TokenRevogado)
+            .values(jti=jti, usuario_id=usuario_id, expira_em=expira_em)
+            .on_conflict_do_nothing(index_elements=[TokenRevogado.jti])
+        )
+        db.query(TokenRevogado).filter(
+            TokenRevogado.expira_em < datetime.utcnow()
+        ).delete(synchronize_session=False)
+        self._adicionar({"jti": jti, "expira_em": expira_em.timestamp()})
+        barramento.publicar("tokens", {"jti": jti, "expira_em": expira_em.timestamp()})
+
+    def esquecer_versao(self, usuario_id: int):
+        with self.lock:
+            self.versoes.pop(usuario_id, None)
+
+    def _adicionar(self, evento: dict):
+        with self.lock:
+            self.jtis[evento["jti"]] = evento["expira_em"]
+            agora = time.time()
+            if len(self.jtis) > 1000:
+                self.jtis = {jti: expira for jti, expira in self.jtis.items() if expira > agora}
+
+
+registro_revogacao = RegistroRevogacao()
+barramento.assinar("tokens", registro_revogacao._adicionar)
@@ -1,14 +1,21 @@
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
 from backend.database import get_db
-from backend.models import Usuario
+from backend.eventos import barramento
+from backend.models import Usuario, TipoUsuario
+from backend.auth.revogacao import registro_revogacao
+from backend.auth.senhas import (
+    pwd_context, verificar_senha, obter_hash_senha, verificar_senha_async, obter_hash_senha_async
+)
+from backend.utils.cache import CacheTTL
 import os
 import secrets
+import uuid
 
 SECRET_KEY = os.getenv("SESSION_SECRET")
 
@@ -18,16 +25,18 @@ if not SECRET_KEY:
     print("✅ Chave temporária gerada (configure SESSION_SECRET para produção)")
 
 ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 480
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "15"))
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "7"))
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
 
-def verificar_senha(senha_plana: str, senha_hash: str) -> bool:
-    return pwd_context.verify(senha_plana, senha_hash)
-
-def obter_hash_senha(senha: str) -> str:
-    return pwd_context.hash(senha)
+# Usuários autenticados por "sub" do token, para não consultar o banco a cada
+# requisição (polling do chat e das notificações)
+cache_usuarios = CacheTTL(
+    tamanho_maximo=int(os.getenv("USUARIOS_CACHE_TAMANHO", "1000")),
+    ttl_segundos=float(os.getenv("USUARIOS_CACHE_TTL", "60")),
+    nome="usuarios"
+)
 
 def criar_token_acesso(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -35,10 +44,103 @@ def criar_token_acesso(data: dict, expires_delta: Optional[timedelta] = None):
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    to_encode.setdefault("typ", "access")
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def criar_tokens_usuario(usuario: Usuario) -> dict:
+    """
+    Par de tokens do usuário. O access token carrega id, tipo e versão, de
+    modo que obter_identidade não precisa consultar o banco; o refresh token
+    só serve para POST /api/auth/refresh.
+    """
+    tipo = usuario.tipo.value if isinstance(usuario.tipo, TipoUsuario) else usuario.tipo
+    claims = {"sub": usuario.email, "id": usuario.id, "ver": usuario.token_versao or 0}
+    return {
+        "access_token": criar_token_acesso({**claims, "tipo": tipo}),
+        "refresh_token": criar_token_acesso(
+            {**claims, "typ": "refresh"},
+            expires_delta=timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+        ),
+        "token_type": "bearer"
+    }
+
+def decodificar_token(token: str, tipo_esperado: str = "access") -> Optional[dict]:
+    """Valida assinatura, expiração, tipo e revogação; retorna as claims ou None"""
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    
+    if payload.get("sub") is None or payload.get("typ", "access") != tipo_esperado:
+        return None
+    if payload.get("jti") and registro_revogacao.esta_revogado(payload["jti"]):
+        return None
+    # Tokens antigos (só com "sub") não têm id/versão e expiram sozinhos
+    if "id" in payload and registro_revogacao.versao_atual(payload["id"]) != payload.get("ver"):
+        return None
+    return payload
+
+def revogar_token(db: Session, payload: dict):
+    """Revoga um token já decodificado (logout, refresh usado)"""
+    if not payload.get("jti"):
+        return
+    registro_revogacao.revogar(
+        db,
+        payload["jti"],
+        datetime.utcfromtimestamp(payload["exp"]),
+        payload.get("id")
+    )
+
+def revogar_tokens_usuario(usuario: Usuario):
+    """
+    Invalida todos os tokens já emitidos para o usuário. O commit fica com
+    quem chamou, seguido de invalidar_cache_usuario.
+    """
+    usuario.token_versao = (usuario.token_versao or 0) + 1
+
+def obter_usuario_por_token(token: str, db: Session) -> Optional[Usuario]:
+    """Decodifica o JWT e retorna o usuário correspondente, ou None se inválido"""
+    payload = decodificar_token(token)
+    if payload is None:
+        return None
+    email: str = payload["sub"]
+    
+    copia = cache_usuarios.obter(email)
+    if copia is not None:
+        # merge sem load: anexa à sessão sem SELECT, mantendo lazy loads funcionando
+        return db.merge(copia, load=False)
+    
+    usuario = db.query(Usuario).filter(Usuario.email == email).first()
+    if usuario is not None:
+        cache_usuarios.definir(email, _copiar_usuario(usuario))
+    return usuario
+
+def _copiar_usuario(usuario: Usuario) -> Usuario:
+    """Cópia desanexada com apenas as colunas, segura para compartilhar entre sessões"""
+    copia = Usuario(**{
+        atributo.key: getattr(usuario, atributo.key)
+        for atributo in inspect(Usuario).column_attrs
+    })
+    make_transient_to_detached(copia)
+    return copia
+
+def invalidar_cache_usuario(usuario_id: int):
+    """
+    Remove o usuário do cache deste worker e avisa os demais workers.
+    Chamar depois do commit de qualquer alteração/exclusão de usuário.
+    """
+    _remover_do_cache({"usuario_id": usuario_id})
+    barramento.publicar("usuarios", {"usuario_id": usuario_id})
+
+def _remover_do_cache(evento: dict):
+    usuario_id = evento.get("usuario_id")
+    cache_usuarios.remover_se(lambda copia: copia.id == usuario_id)
+    registro_revogacao.esquecer_versao(usuario_id)
+
+barramento.assinar("usuarios", _remover_do_cache)
+
 def obter_usuario_atual(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
@@ -48,16 +150,7 @@ def obter_usuario_atual(
         detail="Não foi possível validar as credenciais",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        token = credentials.credentials
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-    
-    usuario = db.query(Usuario).filter(Usuario.email == email).first()
+    usuario = obter_usuario_por_token(credentials.credentials, db)
     if usuario is None:
         raise credentials_exception
     return usuario
@@ -65,10 +158,61 @@ def obter_usuario_atual(
 def obter_usuario_admin(
     usuario_atual: Usuario = Depends(obter_usuario_atual)
 ) -> Usuario:
-    from backend.models.usuarios import TipoUsuario
     if usuario_atual.tipo != TipoUsuario.admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Acesso negado. Apenas administradores podem acessar este recurso."
         )
     return usuario_atual
+
+class Identidade:
+    """
+    Usuário autenticado montado a partir das claims do access token, sem
+    consulta ao banco. Para endpoints que só precisam de id e tipo.
+    """
+    __slots__ = ("id", "email", "tipo")
+    
+    def __init__(self, id: int, email: str, tipo: TipoUsuario):
+        self.id = id
+        self.email = email
+        self.tipo = tipo
+    
+    @property
+    def admin(self) -> bool:
+        return self.tipo == TipoUsuario.admin
+
+def obter_identidade_por_token(token: str, db: Session) -> Optional[Identidade]:
+    payload = decodificar_token(token)
+    if payload is None:
+        return None
+    if "id" in payload and "tipo" in payload:
+        return Identidade(payload["id"], payload["sub"], TipoUsuario(payload["tipo"]))
+    
+    # Tokens emitidos antes das claims de id/tipo
+    usuario = obter_usuario_por_token(token, db)
+    if usuario is None:
+        return None
+    return Identidade(usuario.id, usuario.email, TipoUsuario(usuario.tipo))
+
+def obter_identidade(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db)
+) -> Identidade:
+    identidade = obter_identidade_por_token(credentials.credentials, db)
+    if identidade is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Não foi possível validar as credenciais",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return identidade
+
+def obter_identidade_admin(
+    identidade: Identidade = Depends(obter_identidade)
+) -> Identidade:
+    if not identidade.admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Acesso negado. Apenas administradores podem acessar este recurso."
+        )
+    return identidade
@@ -0,0 +1,68 @@
+"""
+Hash e verificação de senhas (bcrypt) fora do event loop.
+
+Todo trabalho de bcrypt passa por um executor dedicado e limitado
+(SENHAS_THREADS threads, SENHAS_FILA_MAXIMA tarefas em espera), de modo que
+um pico de logins não ocupa o threadpool dos endpoints nem o event loop.
+O bcrypt libera o GIL durante o hash, então as threads usam núcleos de
+verdade.
+
+O custo vem de BCRYPT_ROUNDS. Hashes gravados com outro custo são refeitos
+no próximo login bem-sucedido (verificar_senha_async devolve o novo hash).
+Para escolher o custo: python -m backend.benchmarks.bcrypt_custo
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional, Tuple
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+SENHAS_THREADS = int(os.getenv("SENHAS_THREADS", str(os.cpu_count() or 1)))
+SENHAS_FILA_MAXIMA = int(os.getenv("SENHAS_FILA_MAXIMA", "64"))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+executor_senhas = ThreadPoolExecutor(max_workers=SENHAS_THREADS, thread_name_prefix="senhas")
+_vagas = threading.BoundedSemaphore(SENHAS_THREADS + SENHAS_FILA_MAXIMA)
+
+
+def _enviar(funcao: Callable, *args) -> Future:
+    """Agenda no executor; com a fila cheia recusa em vez de acumular espera"""
+    if not _vagas.acquire(blocking=False):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Servidor ocupado, tente novamente em alguns segundos",
+            headers={"Retry-After": "2"},
+        )
+    futuro = executor_senhas.submit(funcao, *args)
+    futuro.add_done_callback(lambda _: _vagas.release())
+    return futuro
+
+
+def verificar_senha(senha_plana: str, senha_hash: str) -> bool:
+    return _enviar(pwd_context.verify, senha_plana, senha_hash).result()
+
+
+def obter_hash_senha(senha: str) -> str:
+    return _enviar(pwd_context.hash, senha).result()
+
+
+async def verificar_senha_async(senha_plana: str, senha_hash: Optional[str]) -> Tuple[bool, Optional[str]]:
+    """
+    Retorna (senha_valida, novo_hash). novo_hash só vem preenchido quando o
+    hash atual usa um custo diferente de BCRYPT_ROUNDS e deve ser regravado.
+    Sem hash (usuário inexistente) faz uma verificação fictícia, para que o
+    tempo de resposta não revele quais emails existem.
+    """
+    if not senha_hash:
+        await asyncio.wrap_future(_enviar(pwd_context.dummy_verify))
+        return False, None
+    return await asyncio.wrap_future(_enviar(pwd_context.verify_and_update, senha_plana, senha_hash))
+
+
+async def obter_hash_senha_async(senha: str) -> str:
+    return await asyncio.wrap_future(_enviar(pwd_context.hash, senha))
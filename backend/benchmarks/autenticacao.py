@@ -0,0 +1,122 @@
+"""
+Benchmark da autenticação por requisição: consulta ao banco a cada
+requisição (implementação antiga), obter_usuario_atual com cache e
+obter_identidade (claims do JWT, sem banco).
+
+Monta uma aplicação mínima com um endpoint por variante, cria um usuário de
+teste (bench-auth@example.com), mede latência e consultas por requisição e
+apaga o usuário no final.
+
+Uso:
+    DATABASE_URL=postgresql://... python -m backend.benchmarks.autenticacao --requisicoes 2000
+"""
+import argparse
+import statistics
+import time
+
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from fastapi.testclient import TestClient
+from jose import jwt
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from backend.auth.security import (
+    ALGORITHM, SECRET_KEY, Identidade, cache_usuarios, criar_tokens_usuario,
+    obter_identidade, obter_usuario_atual, security
+)
+from backend.database import SessionLocal, engine, get_db
+from backend.models import Usuario
+
+EMAIL = "bench-auth@example.com"
+
+
+def obter_usuario_antigo(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db)
+) -> Usuario:
+    """Cópia da implementação anterior: decodifica o token e consulta o usuário"""
+    payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
+    usuario = db.query(Usuario).filter(Usuario.email == payload.get("sub")).first()
+    if usuario is None:
+        raise HTTPException(status_code=401)
+    return usuario
+
+
+def criar_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/antigo")
+    def antigo(usuario: Usuario = Depends(obter_usuario_antigo)):
+        return {"id": usuario.id}
+
+    @app.get("/cache")
+    def cache(usuario: Usuario = Depends(obter_usuario_atual)):
+        return {"id": usuario.id}
+
+    @app.get("/claims")
+    def claims(usuario: Identidade = Depends(obter_identidade)):
+        return {"id": usuario.id}
+
+    return app
+
+
+def medir(cliente: TestClient, rota: str, headers: dict, requisicoes: int) -> dict:
+    consultas = []
+
+    def contar(conn, cursor, statement, parameters, context, executemany):
+        consultas.append(statement)
+
+    for _ in range(50):
+        cliente.get(rota, headers=headers)
+
+    event.listen(engine, "before_cursor_execute", contar)
+    tempos = []
+    try:
+        for _ in range(requisicoes):
+            inicio = time.perf_counter()
+            resposta = cliente.get(rota, headers=headers)
+            tempos.append((time.perf_counter() - inicio) * 1000)
+            assert resposta.status_code == 200, resposta.text
+    finally:
+        event.remove(engine, "before_cursor_execute", contar)
+
+    tempos.sort()
+    return {
+        "mediana_ms": statistics.median(tempos),
+        "p95_ms": tempos[int(len(tempos) * 0.95) - 1],
+        "consultas_por_req": len(consultas) / requisicoes
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requisicoes", type=int, default=2000)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    usuario = db.query(Usuario).filter(Usuario.email == EMAIL).first()
+    if usuario is None:
+        usuario = Usuario(nome="Bench Auth", email=EMAIL, senha_hash="x", tipo="consultor")
+        db.add(usuario)
+        db.commit()
+    headers = {"Authorization": f"Bearer {criar_tokens_usuario(usuario)['access_token']}"}
+
+    try:
+        with TestClient(criar_app()) as cliente:
+            print(f"{'variante':<10} {'mediana':>10} {'p95':>10} {'consultas/req':>15}")
+            for rota in ("/antigo", "/cache", "/claims"):
+                cache_usuarios.limpar()
+                resultado = medir(cliente, rota, headers, args.requisicoes)
+                print(
+                    f"{rota[1:]:<10} {resultado['mediana_ms']:>8.3f}ms {resultado['p95_ms']:>8.3f}ms "
+                    f"{resultado['consultas_por_req']:>15.3f}"
+                )
+    finally:
+        db.delete(usuario)
+        db.commit()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
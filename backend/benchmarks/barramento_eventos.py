@@ -0,0 +1,90 @@
+"""
+Benchmark do barramento de eventos (backend/eventos.py).
+
+Mede a latência publicação -> entrega e a vazão de eventos.
+Os eventos são publicados a partir de threads, como acontece nos
+endpoints sync que rodam no threadpool.
+
+Uso:
+    python -m backend.benchmarks.barramento_eventos --backend memoria
+    DATABASE_URL=postgresql://... python -m backend.benchmarks.barramento_eventos --backend postgres --eventos 5000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.eventos import BarramentoEventos
+
+
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))
+    return ordenados[indice]
+
+
+async def executar(nome_backend: str, total_eventos: int, threads: int, tamanho_payload: int):
+    barramento = BarramentoEventos()
+    barramento.configurar(nome_backend)
+
+    latencias = []
+    concluido = asyncio.Event()
+
+    def ao_receber(dados):
+        latencias.append(time.perf_counter() - dados["t"])
+        if len(latencias) >= total_eventos:
+            concluido.set()
+
+    barramento.assinar("benchmark", ao_receber)
+    await barramento.iniciar()
+
+    conteudo = "x" * tamanho_payload
+    loop = asyncio.get_running_loop()
+
+    def publicar_lote(quantidade):
+        for _ in range(quantidade):
+            barramento.publicar("benchmark", {"t": time.perf_counter(), "conteudo": conteudo})
+
+    por_thread = total_eventos // threads
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        tarefas = [
+            loop.run_in_executor(executor, publicar_lote, por_thread + (1 if i < total_eventos % threads else 0))
+            for i in range(threads)
+        ]
+        await asyncio.gather(*tarefas)
+        try:
+            await asyncio.wait_for(concluido.wait(), timeout=60)
+        except asyncio.TimeoutError:
+            print(f"⚠️ Timeout: apenas {len(latencias)} de {total_eventos} eventos entregues")
+    duracao = time.perf_counter() - inicio
+
+    await barramento.parar()
+
+    latencias_ms = [l * 1000 for l in latencias]
+    print(f"Backend: {nome_backend}")
+    print(f"Eventos entregues: {len(latencias)}/{total_eventos} em {duracao:.2f}s")
+    print(f"Vazão: {len(latencias) / duracao:.0f} eventos/s ({threads} threads publicando)")
+    if latencias_ms:
+        print(f"Latência média: {statistics.mean(latencias_ms):.2f} ms")
+        print(f"Latência p50: {percentil(latencias_ms, 50):.2f} ms")
+        print(f"Latência p95: {percentil(latencias_ms, 95):.2f} ms")
+        print(f"Latência p99: {percentil(latencias_ms, 99):.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do barramento de eventos")
+    parser.add_argument("--backend", choices=["memoria", "postgres"], default="memoria")
+    parser.add_argument("--eventos", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--payload", type=int, default=200, help="Tamanho do conteúdo de cada evento em bytes")
+    args = parser.parse_args()
+
+    asyncio.run(executar(args.backend, args.eventos, args.threads, args.payload))
+
+
+if __name__ == "__main__":
+    main()
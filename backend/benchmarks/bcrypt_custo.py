@@ -0,0 +1,66 @@
+"""
+Benchmark do custo do bcrypt: tempo por verificação e logins/s por núcleo em
+cada valor de BCRYPT_ROUNDS, e a vazão do executor de senhas com
+SENHAS_THREADS threads. Não usa o banco.
+
+Regra prática: escolher o maior custo em que um pico de logins (usuários
+simultâneos / workers) ainda cabe na capacidade medida, com a verificação
+individual abaixo de ~250 ms.
+
+Uso:
+    python -m backend.benchmarks.bcrypt_custo --rounds 10 11 12 13 --verificacoes 20
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from passlib.context import CryptContext
+
+from backend.auth.senhas import BCRYPT_ROUNDS, SENHAS_THREADS
+
+SENHA = "senha-de-benchmark"
+
+
+def medir(rounds: int, verificacoes: int, threads: int) -> dict:
+    contexto = CryptContext(schemes=["bcrypt"], bcrypt__rounds=rounds)
+    senha_hash = contexto.hash(SENHA)
+
+    inicio = time.perf_counter()
+    for _ in range(verificacoes):
+        contexto.verify(SENHA, senha_hash)
+    serial = (time.perf_counter() - inicio) / verificacoes
+
+    total = verificacoes * threads
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        inicio = time.perf_counter()
+        list(executor.map(lambda _: contexto.verify(SENHA, senha_hash), range(total)))
+        paralelo = time.perf_counter() - inicio
+
+    return {
+        "ms_por_verificacao": serial * 1000,
+        "logins_por_nucleo": 1 / serial,
+        "logins_executor": total / paralelo
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, nargs="+", default=[10, 11, 12, 13])
+    parser.add_argument("--verificacoes", type=int, default=20)
+    parser.add_argument("--threads", type=int, default=SENHAS_THREADS)
+    args = parser.parse_args()
+
+    print(f"núcleos: {os.cpu_count()}  SENHAS_THREADS: {args.threads}  BCRYPT_ROUNDS atual: {BCRYPT_ROUNDS}")
+    print(f"{'rounds':>6} {'ms/verificação':>15} {'logins/s/núcleo':>16} {'logins/s executor':>18}")
+    for rounds in args.rounds:
+        resultado = medir(rounds, args.verificacoes, args.threads)
+        marcador = "  <- atual" if rounds == BCRYPT_ROUNDS else ""
+        print(
+            f"{rounds:>6} {resultado['ms_por_verificacao']:>15.1f} {resultado['logins_por_nucleo']:>16.1f} "
+            f"{resultado['logins_executor']:>18.1f}{marcador}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Latência da busca de empresas (/api/empresas/busca) numa tabela grande.
+
+Dentro de uma transação desfeita no final, insere --linhas empresas
+sintéticas (padrão 500000) com nomes acentuados, siglas, CNPJs com e sem
+pontuação e municípios, roda ANALYZE e executa a mesma consulta do endpoint
+(as camadas de backend/utils/busca_empresas) para uma lista de termos:
+prefixos, palavras no meio do nome, variantes sem acento, erros de
+digitação, pedaços de CNPJ e filtro por município. Cada termo roda
+--repeticoes vezes; o relatório mostra mediana e p95 por termo e o p95
+geral, que precisa ficar abaixo de --p95-ms (padrão 50). Também confere
+que "sao jorge" encontra "São Jorge" e que as camadas que rodaram usam os
+índices de busca. Sai com código 1 se algo falhar.
+
+Precisa das extensões pg_trgm e unaccent (migração f4b6d8e0a2c3) e das
+colunas de CNPJ normalizado (migração c8e0a2b4d6f7).
+
+Uso:
+    DATABASE_URL=postgresql://... python -m backend.benchmarks.busca_empresas
+    DATABASE_URL=postgresql://... python -m backend.benchmarks.busca_empresas --linhas 100000 --p95-ms 30
+"""
+import argparse
+import statistics
+import sys
+import time
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from backend.database import engine
+from backend.utils.busca_empresas import consultas_busca
+
+PREFIXOS = [
+    "Indústria", "Comércio", "Construtora", "Transportes", "Metalúrgica", "Agropecuária", "Distribuidora",
+    "Serviços", "Tecnologia", "Alimentos", "Têxtil", "Farmacêutica", "Logística", "Engenharia", "Química",
+]
+NOMES = [
+    "São Jorge", "Paraná", "Araújo", "Gonçalves", "Conceição", "Irmãos Silva", "Boa Vista", "Ribeirão",
+    "Pinheiro", "Santa Luzia", "Nova Esperança", "Guaíba", "Itaú", "Mogi", "Petrópolis", "Vitória",
+    "Jundiaí", "Três Rios", "Maringá", "Cascavel", "Piracicaba", "Florianópolis", "Uberlândia", "Anápolis",
+]
+SUFIXOS = ["Ltda", "S.A.", "EIRELI", "ME", "EPP"]
+MUNICIPIOS = [
+    "São Paulo", "Campinas", "Ribeirão Preto", "São José dos Campos", "Sorocaba", "Santos", "Jundiaí",
+    "Piracicaba", "Bauru", "São Carlos", "Franca", "Guarulhos", "Osasco", "Santo André", "Mauá",
+]
+
+# (termo, município)
+TERMOS = [
+    ("construtora", None),
+    ("sao jorge", None),
+    ("araujo", None),
+    ("metalurgica parana", None),
+    ("contrutora gonçalves", None),
+    ("ribeirao", None),
+    ("Quimica Itau", None),
+    ("petropolis", None),
+    ("petropolos", None),
+    ("tecnologia", "ribeirao preto"),
+    ("alimentos", "sao carlos"),
+    ("12345", None),
+    ("00012.345/0001", None),
+]
+
+
+def popular(db: Session, linhas: int):
+    db.execute(text("""
+        INSERT INTO empresas (empresa, sigla, cnpj, municipio, estado, data_cadastro, data_atualizacao)
+        SELECT
+            p.v[1 + g % cardinality(p.v)] || ' ' || n.v[1 + (g / 7) % cardinality(n.v)] || ' '
+                || initcap(translate(substr(md5(g::text), 1, 6), '0123456789', 'aeioubrstl')) || ' '
+                || s.v[1 + (g / 3) % cardinality(s.v)],
+            upper(translate(substr(md5(g::text), 7, 4), '0123456789', 'ABCDEFGHIJ')),
+            CASE WHEN g % 2 = 0
+                THEN lpad(g::text, 8, '0') || '0001' || lpad((g % 97)::text, 2, '0')
+                ELSE regexp_replace(lpad(g::text, 8, '0') || '0001' || lpad((g % 97)::text, 2, '0'),
+                                    '(\\d{2})(\\d{3})(\\d{3})(\\d{4})(\\d{2})', '\\1.\\2.\\3/\\4-\\5')
+            END,
+            m.v[1 + (g / 11) % cardinality(m.v)],
+            'SP', now(), now()
+        FROM generate_series(1, :linhas) g,
+             (SELECT CAST(:prefixos AS text[]) AS v) p,
+             (SELECT CAST(:nomes AS text[]) AS v) n,
+             (SELECT CAST(:sufixos AS text[]) AS v) s,
+             (SELECT CAST(:municipios AS text[]) AS v) m
+    """), {"linhas": linhas, "prefixos": PREFIXOS, "nomes": NOMES, "sufixos": SUFIXOS, "municipios": MUNICIPIOS})
+    db.execute(text("ANALYZE empresas"))
+    # Sem isso as buscas varrem a lista pendente dos GIN (fastupdate), que
+    # em produção o autovacuum já teria incorporado ao índice
+    db.execute(text("""
+        SELECT gin_clean_pending_list(indexrelid) FROM pg_index
+        WHERE indrelid = 'empresas'::regclass
+          AND indexrelid IN (SELECT oid FROM pg_class WHERE relam = (SELECT oid FROM pg_am WHERE amname = 'gin'))
+    """))
+
+
+def _indices(db: Session, query) -> set:
+    compilada = query.compile(dialect=db.bind.dialect)
+    plano = db.connection().exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compilada}", compilada.params).scalar()[0]["Plan"]
+    pilha, indices = [plano], set()
+    while pilha:
+        no = pilha.pop()
+        if "Index Name" in no:
+            indices.add(no["Index Name"])
+        pilha.extend(no.get("Plans", []))
+    return indices
+
+
+def buscar(db: Session, termo: str, municipio, limite: int):
+    """Mesmo laço do endpoint: (linhas, consultas que rodaram)"""
+    linhas, rodadas = [], []
+    for query in consultas_busca(termo, municipio, limite, True):
+        rodadas.append(query)
+        linhas += db.execute(query).all()[:limite - len(linhas)]
+        if len(linhas) >= limite:
+            break
+    return linhas, rodadas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--linhas", type=int, default=500000)
+    parser.add_argument("--repeticoes", type=int, default=20)
+    parser.add_argument("--limite", type=int, default=20)
+    parser.add_argument("--p95-ms", type=float, default=50)
+    args = parser.parse_args()
+
+    conexao = engine.connect()
+    transacao = conexao.begin()
+    db = Session(bind=conexao)
+    falhas = []
+    try:
+        if not db.execute(text("SELECT to_regprocedure('f_unaccent(text)') IS NOT NULL")).scalar():
+            print("❌ f_unaccent não existe: pg_trgm/unaccent não instalados (migração f4b6d8e0a2c3)")
+            sys.exit(1)
+        inicio = time.perf_counter()
+        popular(db, args.linhas)
+        print(f"{args.linhas} empresas inseridas em {time.perf_counter() - inicio:.0f} s")
+
+        achados, _ = buscar(db, "sao jorge", None, args.limite)
+        if not achados or not all("São Jorge" in linha.empresa for linha in achados):
+            falhas.append("'sao jorge' não encontrou 'São Jorge' nos primeiros resultados")
+
+        todas = []
+        print(f"{'termo':<32} {'município':<16} {'linhas':>6} {'mediana ms':>11} {'p95 ms':>8}  índices")
+        for termo, municipio in TERMOS:
+            resultado, rodadas = buscar(db, termo, municipio, args.limite)
+            indices = set().union(*(_indices(db, query) for query in rodadas))
+            if not any(indice.startswith(("ix_empresas_busca_", "ix_empresas_cnpj_")) for indice in indices):
+                falhas.append(f"'{termo}' não usa os índices de busca")
+            tempos = []
+            for _ in range(args.repeticoes):
+                comeco = time.perf_counter()
+                resultado, _ = buscar(db, termo, municipio, args.limite)
+                tempos.append((time.perf_counter() - comeco) * 1000)
+            tempos.sort()
+            todas += tempos
+            p95 = tempos[max(int(len(tempos) * 0.95) - 1, 0)]
+            print(
+                f"{termo:<32} {municipio or '-':<16} {len(resultado):>6} {statistics.median(tempos):>11.1f} "
+                f"{p95:>8.1f}  {', '.join(sorted(indices))}"
+            )
+
+        todas.sort()
+        p95 = todas[int(len(todas) * 0.95) - 1]
+        print(f"p95 geral: {p95:.1f} ms (limite {args.p95_ms:.0f} ms)")
+        if p95 > args.p95_ms:
+            falhas.append(f"p95 de {p95:.1f} ms acima de {args.p95_ms:.0f} ms")
+    finally:
+        db.close()
+        transacao.rollback()
+        conexao.close()
+
+    for falha in falhas:
+        print(f"❌ {falha}")
+    if falhas:
+        sys.exit(1)
+    print("✅ Busca de empresas dentro do limite")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Teste de carga: caminho síncrono (endpoint def + SessionLocal, roda no
+threadpool do Starlette, limitado a 40 threads) contra o caminho async
+(endpoint async + sessão asyncpg).
+
+Sobe um uvicorn local (em outro processo, para não disputar o GIL com o
+gerador de carga) com dois endpoints que seguram a conexão por
+--espera segundos (SELECT pg_sleep) e dispara --concorrencia requisições
+simultâneas contra cada um. Os dois usam pools do mesmo tamanho (--pool),
+maior que o threadpool, para que o limite observado seja o do modelo de
+execução e não o do pool. Mostra vazão, latência e o pico de requisições
+segurando uma conexão ao mesmo tempo.
+
+Uso:
+    DATABASE_URL=postgresql://... python -m backend.benchmarks.carga_async --concorrencia 200 --pool 80
+"""
+import argparse
+import asyncio
+import multiprocessing
+import socket
+import statistics
+import threading
+import time
+
+import httpx
+import uvicorn
+from fastapi import Depends, FastAPI
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.database import DATABASE_URL, _configuracao_async
+
+PORTA = 8765
+
+
+class Contador:
+    """Requisições com conexão do pool em uso ao mesmo tempo (atual e pico)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.atual = 0
+        self.pico = 0
+
+    def entrar(self):
+        with self.lock:
+            self.atual += 1
+            self.pico = max(self.pico, self.atual)
+
+    def sair(self):
+        with self.lock:
+            self.atual -= 1
+
+
+def criar_app(pool: int, espera: float) -> FastAPI:
+    contadores = {"sync": Contador(), "async": Contador()}
+    engine_sync = create_engine(DATABASE_URL, pool_size=pool, max_overflow=0)
+    SessaoSync = sessionmaker(bind=engine_sync)
+    url_async, connect_args = _configuracao_async(DATABASE_URL)
+    engine_async = create_async_engine(url_async, pool_size=pool, max_overflow=0, connect_args=connect_args)
+    SessaoAsync = async_sessionmaker(engine_async)
+
+    def obter_sessao_sync():
+        db = SessaoSync()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def obter_sessao_async():
+        async with SessaoAsync() as db:
+            yield db
+
+    app = FastAPI()
+
+    @app.get("/sync")
+    def rota_sync(db=Depends(obter_sessao_sync)):
+        db.connection()
+        contadores["sync"].entrar()
+        try:
+            db.execute(text("SELECT pg_sleep(:s)"), {"s": espera})
+        finally:
+            contadores["sync"].sair()
+        return {"ok": True}
+
+    @app.get("/async")
+    async def rota_async(db=Depends(obter_sessao_async)):
+        await db.connection()
+        contadores["async"].entrar()
+        try:
+            await db.execute(text("SELECT pg_sleep(:s)"), {"s": espera})
+        finally:
+            contadores["async"].sair()
+        return {"ok": True}
+
+    @app.get("/pico/{rota}")
+    def pico(rota: str):
+        return {"pico": contadores[rota].pico}
+
+    @app.post("/liberar-sync")
+    def liberar_sync():
+        # Fecha as conexões do pool síncrono antes de abrir as do async
+        engine_sync.dispose()
+        return {"ok": True}
+
+    return app
+
+
+def servir(pool: int, espera: float):
+    uvicorn.run(
+        criar_app(pool, espera),
+        host="127.0.0.1", port=PORTA, log_level="warning", backlog=4096,
+        # Conexões ociosas fechadas pelo servidor no meio da rajada viram erro no cliente
+        timeout_keep_alive=120
+    )
+
+
+def aguardar_porta():
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", PORTA), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+
+
+async def disparar(rota: str, concorrencia: int, total: int) -> dict:
+    limites = httpx.Limits(max_connections=concorrencia, max_keepalive_connections=concorrencia)
+    latencias = []
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{PORTA}", limits=limites, timeout=120) as cliente:
+        fila = asyncio.Queue()
+        for _ in range(total):
+            fila.put_nowait(None)
+
+        async def trabalhador():
+            while not fila.empty():
+                fila.get_nowait()
+                inicio = time.perf_counter()
+                resposta = await cliente.get(rota)
+                resposta.raise_for_status()
+                latencias.append(time.perf_counter() - inicio)
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(trabalhador() for _ in range(concorrencia)))
+        duracao = time.perf_counter() - inicio
+
+    latencias.sort()
+    return {
+        "req_s": total / duracao,
+        "mediana_ms": statistics.median(latencias) * 1000,
+        "p95_ms": latencias[int(len(latencias) * 0.95) - 1] * 1000
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concorrencia", type=int, default=200)
+    parser.add_argument("--requisicoes", type=int, default=1000)
+    parser.add_argument("--pool", type=int, default=80)
+    parser.add_argument("--espera", type=float, default=0.5, help="segundos de pg_sleep por requisição")
+    args = parser.parse_args()
+
+    servidor = multiprocessing.Process(target=servir, args=(args.pool, args.espera), daemon=True)
+    servidor.start()
+    aguardar_porta()
+
+    try:
+        print(
+            f"concorrência {args.concorrencia}, {args.requisicoes} requisições, "
+            f"pool {args.pool}, pg_sleep {args.espera}s"
+        )
+        print(f"{'caminho':<8} {'req/s':>8} {'mediana':>10} {'p95':>10} {'pico no banco':>14}")
+        for rota in ("sync", "async"):
+            # Aquecimento: abre as conexões do pool antes de medir
+            asyncio.run(disparar(f"/{rota}", args.concorrencia, args.concorrencia))
+            resultado = asyncio.run(disparar(f"/{rota}", args.concorrencia, args.requisicoes))
+            pico = httpx.get(f"http://127.0.0.1:{PORTA}/pico/{rota}").json()["pico"]
+            print(
+                f"{rota:<8} {resultado['req_s']:>8.1f} {resultado['mediana_ms']:>8.0f}ms "
+                f"{resultado['p95_ms']:>8.0f}ms {pico:>14}"
+            )
+            httpx.post(f"http://127.0.0.1:{PORTA}/liberar-sync")
+    finally:
+        servidor.terminate()
+        servidor.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Benchmark de GET /api/mensagens/conversas: algoritmo antigo (carrega todas
+as mensagens do usuário e conta não lidas por conversa) contra a tabela
+conversas_resumo.
+
+Cria usuários e mensagens de teste (e-mails bench-conversa-*), reconstrói
+conversas_resumo para eles, mede as duas versões e apaga tudo no final.
+
+Uso:
+    DATABASE_URL=postgresql://... python -m backend.benchmarks.conversas --pares 50 --mensagens 200
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, event, or_, text
+from sqlalchemy.orm import joinedload
+
+from backend.database import SessionLocal, engine
+from backend.models import Mensagem, ResumoConversa, Usuario
+from backend.routers.mensagens import consulta_conversas
+from backend.utils.conversas import reconstruir_resumos
+
+PREFIXO_EMAIL = "bench-conversa-"
+
+
+def listar_conversas_antigo(db, usuario):
+    """Cópia da implementação anterior, sem presença, apenas para comparação"""
+    todas_mensagens = db.query(Mensagem).options(
+        joinedload(Mensagem.remetente),
+        joinedload(Mensagem.destinatario)
+    ).filter(
+        and_(
+            Mensagem.deletada == False,
+            or_(Mensagem.remetente_id == usuario.id, Mensagem.destinatario_id == usuario.id)
+        )
+    ).order_by(Mensagem.data_envio.desc()).all()
+
+    conversas = {}
+    for msg in todas_mensagens:
+        outro_usuario_id = msg.destinatario_id if msg.remetente_id == usuario.id else msg.remetente_id
+        if outro_usuario_id not in conversas:
+            nao_lidas = db.query(Mensagem).filter(
+                and_(
+                    Mensagem.remetente_id == outro_usuario_id,
+                    Mensagem.destinatario_id == usuario.id,
+                    Mensagem.lida == False,
+                    Mensagem.deletada == False
+                )
+            ).count()
+            conversas[outro_usuario_id] = (msg.conteudo, nao_lidas)
+    return conversas
+
+
+def popular(db, pares: int, mensagens_por_par: int):
+    usuarios = [
+        Usuario(nome=f"Bench {i}", email=f"{PREFIXO_EMAIL}{i}@example.com", senha_hash="x")
+        for i in range(pares + 1)
+    ]
+    db.add_all(usuarios)
+    db.flush()
+
+    principal, outros = usuarios[0], usuarios[1:]
+    inicio = datetime.utcnow() - timedelta(days=365)
+    linhas = []
+    for outro in outros:
+        for n in range(mensagens_por_par):
+            enviada = random.random() < 0.5
+            linhas.append({
+                "remetente_id": principal.id if enviada else outro.id,
+                "destinatario_id": outro.id if enviada else principal.id,
+                "conteudo": f"Mensagem {n} " + "x" * random.randint(10, 300),
+                "tipo": "texto",
+                "status": "enviada",
+                "data_envio": inicio + timedelta(minutes=random.randint(0, 500000)),
+                "lida": random.random() < 0.9,
+                "editada": False,
+                "deletada": random.random() < 0.02,
+                "reacoes": {}
+            })
+    db.bulk_insert_mappings(Mensagem, linhas)
+    db.commit()
+    for usuario in usuarios:
+        reconstruir_resumos(db, usuario.id)
+    return principal
+
+
+def limpar(db):
+    ids = [u.id for u in db.query(Usuario.id).filter(Usuario.email.like(f"{PREFIXO_EMAIL}%"))]
+    if not ids:
+        return
+    db.query(ResumoConversa).filter(ResumoConversa.usuario_id.in_(ids)).delete(synchronize_session=False)
+    db.query(Mensagem).filter(
+        or_(Mensagem.remetente_id.in_(ids), Mensagem.destinatario_id.in_(ids))
+    ).delete(synchronize_session=False)
+    db.execute(text("DELETE FROM status_usuarios WHERE usuario_id = ANY(:ids)"), {"ids": ids})
+    db.query(Usuario).filter(Usuario.id.in_(ids)).delete(synchronize_session=False)
+    db.commit()
+
+
+def medir(db, nome, funcao, repeticoes):
+    consultas = []
+
+    def contar(*args):
+        consultas.append(1)
+
+    tempos = []
+    for _ in range(repeticoes):
+        db.expire_all()
+        consultas.clear()
+        event.listen(engine, "before_cursor_execute", contar)
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+        event.remove(engine, "before_cursor_execute", contar)
+
+    print(f"{nome:<10} {len(resultado):>6} conversas  {statistics.median(tempos):>8.2f} ms (mediana)  "
+          f"{min(tempos):>8.2f} ms (mín)  {len(consultas):>5} consultas")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da listagem de conversas")
+    parser.add_argument("--pares", type=int, default=50, help="Número de pessoas com quem o usuário conversa")
+    parser.add_argument("--mensagens", type=int, default=200, help="Mensagens por conversa")
+    parser.add_argument("--repeticoes", type=int, default=10)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        limpar(db)
+        print(f"Populando {args.pares} conversas x {args.mensagens} mensagens...")
+        principal = popular(db, args.pares, args.mensagens)
+
+        medir(db, "antes", lambda: listar_conversas_antigo(db, principal), args.repeticoes)
+        medir(db, "depois", lambda: db.execute(consulta_conversas(principal.id)).all(), args.repeticoes)
+    finally:
+        db.rollback()
+        limpar(db)
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Exportação da carteira de empresas (/api/empresas/exportar) numa tabela grande.
+
+Insere --linhas empresas sintéticas (padrão 500000, no mesmo formato da
+busca_empresas) com o município MUNICIPIO_MARCADOR, sobe o app num uvicorn
+na porta PORTA (o TestClient junta o corpo inteiro antes de devolver),
+chama o endpoint filtrando por esse município e mede:
+
+- CSV: tempo até o primeiro lote de dados, tempo total e quanto o RSS do
+  servidor cresceu enquanto o corpo era lido em streaming;
+- XLSX: tempo total e tamanho do arquivo (montado no pool de processos).
+
+Sai com código 1 se o CSV não trouxer todas as linhas, se o RSS crescer
+mais que --rss-mb (padrão 100) ou se o primeiro lote demorar mais que
+--primeiro-lote-ms (padrão 2000). As empresas inseridas são apagadas no
+final (por isso as linhas são gravadas e não desfeitas: o endpoint lê por
+outra conexão).
+
+Uso:
+    DATABASE_URL=postgresql://... python -m backend.benchmarks.exportacao_empresas
+    DATABASE_URL=postgresql://... python -m backend.benchmarks.exportacao_empresas --linhas 100000 --sem-xlsx
+"""
+import argparse
+import os
+import re
+import secrets
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+from sqlalchemy import text
+
+from backend.benchmarks.busca_empresas import NOMES, PREFIXOS, SUFIXOS
+from backend.database import SessionLocal, engine
+from backend.models import Usuario
+from backend.utils.exportar_empresas import EXPORTACAO_LOTE
+
+MUNICIPIO_MARCADOR = "Benchmark Exportação"
+PORTA = 8767
+
+
+def _rss_mb(pid: int) -> float:
+    status = open(f"/proc/{pid}/status").read()
+    return int(re.search(r"VmRSS:\s+(\d+)", status).group(1)) / 1024
+
+
+def aguardar_porta(processo: subprocess.Popen):
+    while True:
+        if processo.poll() is not None:
+            raise RuntimeError("uvicorn encerrou antes de abrir a porta")
+        try:
+            socket.create_connection(("127.0.0.1", PORTA), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+
+
+def popular(linhas: int):
+    with engine.begin() as conn:
+        conn.execute(text("""
+            INSERT INTO empresas (empresa, sigla, cnpj, municipio, estado, carteira, observacao,
+                                  data_cadastro, data_atualizacao)
+            SELECT
+                p.v[1 + g % cardinality(p.v)] || ' ' || n.v[1 + (g / 7) % cardinality(n.v)] || ' ' || g
+                    || ' ' || s.v[1 + (g / 3) % cardinality(s.v)],
+                upper(substr(md5(g::text), 1, 4)),
+                '96' || lpad(g::text, 6, '0') || '0001' || lpad((g % 97)::text, 2, '0'),
+                :municipio, 'SP', 'Carteira ' || g % 10, 'Observação; com "aspas" e ponto e vírgula',
+                now(), now()
+            FROM generate_series(1, :linhas) g,
+                 (SELECT CAST(:prefixos AS text[]) AS v) p,
+                 (SELECT CAST(:nomes AS text[]) AS v) n,
+                 (SELECT CAST(:sufixos AS text[]) AS v) s
+        """), {"linhas": linhas, "municipio": MUNICIPIO_MARCADOR, "prefixos": PREFIXOS, "nomes": NOMES,
+               "sufixos": SUFIXOS})
+        conn.execute(text("ANALYZE empresas"))
+
+
+def limpar():
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM empresas WHERE municipio = :municipio"), {"municipio": MUNICIPIO_MARCADOR})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--linhas", type=int, default=500000)
+    parser.add_argument("--rss-mb", type=float, default=100)
+    parser.add_argument("--primeiro-lote-ms", type=float, default=2000)
+    parser.add_argument("--sem-xlsx", action="store_true")
+    args = parser.parse_args()
+
+    if engine is None:
+        print("❌ DATABASE_URL não configurada")
+        sys.exit(1)
+
+    # O uvicorn precisa validar o token gerado aqui
+    os.environ.setdefault("SESSION_SECRET", secrets.token_hex(32))
+    from backend.auth.security import criar_tokens_usuario
+
+    db = SessionLocal()
+    admin = db.query(Usuario).filter(Usuario.tipo == "admin").first()
+    db.close()
+    if admin is None:
+        print("❌ Nenhum usuário admin no banco")
+        sys.exit(1)
+    cabecalhos = {"Authorization": f"Bearer {criar_tokens_usuario(admin)['access_token']}"}
+    params = {"municipio": MUNICIPIO_MARCADOR}
+
+    falhas = []
+    inicio = time.perf_counter()
+    popular(args.linhas)
+    print(f"{args.linhas} empresas inseridas em {time.perf_counter() - inicio:.0f} s")
+    processo = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(PORTA)],
+        env={**os.environ, "SUGESTOES_INDICE": "false"},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    try:
+        aguardar_porta(processo)
+        with httpx.Client(base_url=f"http://127.0.0.1:{PORTA}", headers=cabecalhos, timeout=600) as cliente:
+            rss_antes = _rss_mb(processo.pid)
+            rss_pico = rss_antes
+            primeiro_lote = None
+            linhas = -1  # cabeçalho
+            tamanho = 0
+            comeco = time.perf_counter()
+            with cliente.stream("GET", "/api/empresas/exportar", params={**params, "formato": "csv"}) as resposta:
+                if resposta.status_code != 200:
+                    falhas.append(f"CSV respondeu {resposta.status_code}")
+                for bloco in resposta.iter_bytes():
+                    linhas += bloco.count(b"\n")
+                    tamanho += len(bloco)
+                    if primeiro_lote is None and linhas > 0:
+                        primeiro_lote = (time.perf_counter() - comeco) * 1000
+                    rss_pico = max(rss_pico, _rss_mb(processo.pid))
+            total = time.perf_counter() - comeco
+            print(
+                f"CSV:  {linhas} linhas, {tamanho / 1e6:.0f} MB em {total:.1f} s, primeiro lote em "
+                f"{primeiro_lote or 0:.0f} ms, RSS do servidor +{rss_pico - rss_antes:.0f} MB "
+                f"(lotes de {EXPORTACAO_LOTE})"
+            )
+            if linhas != args.linhas:
+                falhas.append(f"CSV com {linhas} linhas, esperava {args.linhas}")
+            if rss_pico - rss_antes > args.rss_mb:
+                falhas.append(f"RSS cresceu {rss_pico - rss_antes:.0f} MB, acima de {args.rss_mb:g} MB")
+            if primeiro_lote is None or primeiro_lote > args.primeiro_lote_ms:
+                falhas.append(f"primeiro lote em {primeiro_lote or 0:.0f} ms, acima de {args.primeiro_lote_ms:g} ms")
+
+            if not args.sem_xlsx:
+                comeco = time.perf_counter()
+                resposta = cliente.get("/api/empresas/exportar", params={**params, "formato": "xlsx"})
+                if resposta.status_code != 200:
+                    falhas.append(f"XLSX respondeu {resposta.status_code}")
+                print(f"XLSX: {len(resposta.content) / 1e6:.0f} MB em {time.perf_counter() - comeco:.1f} s")
+    finally:
+        processo.terminate()
+        processo.wait()
+        limpar()
+
+    for falha in falhas:
+        print(f"❌ {falha}")
+    if falhas:
+        sys.exit(1)
+    print("✅ Exportação dentro do limite")
+
+
+if __name__ == "__main__":
+    main()
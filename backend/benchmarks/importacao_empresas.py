@@ -0,0 +1,116 @@
+"""
+Tempo e memória da importação de planilha de empresas
+(backend/utils/importar_empresas.py, a mesma do upload e do load_empresas).
+
+Gera uma planilha com --linhas empresas sintéticas (padrão 80000, o tamanho
+da carteira) com CNPJs em formatos variados, inclusive numéricos e
+repetidos, e importa duas vezes:
+
+1. sem atualizar, como o upload: todas as empresas são criadas;
+2. atualizando, como o load_empresas: todas são atualizadas.
+
+Mostra linhas/s e quanto o RSS do processo cresceu em cada passada. Sai com código 1 se
+alguma passada levar mais de --maximo-s segundos (padrão 60) ou se as
+contagens não baterem. As empresas criadas (CNPJ com raiz 97xxxxxx) são
+apagadas no final.
+
+Uso:
+    DATABASE_URL=postgresql://... python -m backend.benchmarks.importacao_empresas
+    DATABASE_URL=postgresql://... python -m backend.benchmarks.importacao_empresas --linhas 200000 --lote 2000
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+
+from sqlalchemy import text
+
+from backend.benchmarks.busca_empresas import MUNICIPIOS, NOMES, PREFIXOS, SUFIXOS
+from backend.database import engine
+from backend.utils.importar_empresas import importar_planilha_empresas
+
+REPETIDAS_A_CADA = 50
+
+
+def gerar_planilha(caminho: str, linhas: int):
+    from openpyxl import Workbook
+
+    # Workbook normal, não write_only: grava os textos na tabela de strings
+    # compartilhadas, como o Excel, e não inline
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["Empresa", "CNPJ", "", "Sigla", "Porte", "ER", "Carteira", "Endereço", "Bairro", "", "Município",
+               "Estado", "País", "Área", "CNAE", "Descrição CNAE", "Tipo", "", "Funcionários", "Observação"])
+    for g in range(1, linhas + 1):
+        digitos = f"97{g:06d}0001{g % 97:02d}"
+        if g % 3 == 0:
+            cnpj = int(digitos)
+        elif g % 3 == 1:
+            cnpj = f"{digitos[:2]}.{digitos[2:5]}.{digitos[5:8]}/{digitos[8:12]}-{digitos[12:]}"
+        else:
+            cnpj = digitos
+        ws.append([
+            f"{PREFIXOS[g % len(PREFIXOS)]} {NOMES[(g // 7) % len(NOMES)]} {g} {SUFIXOS[(g // 3) % len(SUFIXOS)]}",
+            cnpj, None, f"S{g % 1000}", "Médio", "ER Campinas", f"Carteira {g % 10}", f"Rua {g}", "Centro", None,
+            MUNICIPIOS[(g // 11) % len(MUNICIPIOS)], "SP", "Brasil", "Indústria", "2511-0/00", "Fabricação",
+            "Privada", None, g % 500, None
+        ])
+        if g % REPETIDAS_A_CADA == 0:
+            ws.append([f"Repetida {g}", digitos] + [None] * 18)
+    wb.save(caminho)
+
+
+def _rss_mb() -> float:
+    status = open("/proc/self/status").read()
+    return int(re.search(r"VmRSS:\s+(\d+)", status).group(1)) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--linhas", type=int, default=80000)
+    parser.add_argument("--lote", type=int)
+    parser.add_argument("--maximo-s", type=float, default=60)
+    args = parser.parse_args()
+
+    if engine is None:
+        print("❌ DATABASE_URL não configurada")
+        sys.exit(1)
+
+    repetidas = args.linhas // REPETIDAS_A_CADA
+    caminho = os.path.join(tempfile.mkdtemp(), "empresas.xlsx")
+    inicio = time.perf_counter()
+    gerar_planilha(caminho, args.linhas)
+    print(f"Planilha com {args.linhas + repetidas} linhas ({os.path.getsize(caminho) / 1e6:.1f} MB) "
+          f"gerada em {time.perf_counter() - inicio:.0f} s")
+
+    falhas = []
+    try:
+        for atualizar, esperado in ((False, "criadas"), (True, "atualizadas")):
+            rss_antes = _rss_mb()
+            resultado = importar_planilha_empresas(caminho, atualizar=atualizar, lote=args.lote)
+            print(
+                f"{'Atualizando' if atualizar else 'Criando':<12} {resultado['criadas']} criadas, "
+                f"{resultado['atualizadas']} atualizadas, {resultado['ignoradas']} ignoradas em "
+                f"{resultado['segundos']} s ({resultado['linhas_lidas'] / max(resultado['segundos'], 0.1):.0f} linhas/s), "
+                f"RSS +{_rss_mb() - rss_antes:.0f} MB"
+            )
+            if resultado[esperado] != args.linhas or resultado["ignoradas"] != repetidas:
+                falhas.append(f"esperava {args.linhas} {esperado} e {repetidas} ignoradas")
+            if resultado["segundos"] > args.maximo_s:
+                falhas.append(f"{resultado['segundos']} s acima de {args.maximo_s:g} s")
+    finally:
+        os.remove(caminho)
+        with engine.begin() as conn:
+            conn.execute(text("DELETE FROM empresas WHERE cnpj_digits LIKE '97______0001%'"))
+
+    for falha in falhas:
+        print(f"❌ {falha}")
+    if falhas:
+        sys.exit(1)
+    print("✅ Importação dentro do limite")
+
+
+if __name__ == "__main__":
+    main()
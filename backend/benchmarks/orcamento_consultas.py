@@ -0,0 +1,80 @@
+"""
+Orçamento de consultas SQL por rota (detector de N+1).
+
+Cria --volume formulários, envios com respostas e estágios do pipeline,
+chama as rotas mais usadas pelo TestClient e lê o número de consultas do
+header Server-Timing (backend/utils/contador_consultas.py). Uma rota com
+N+1 passa do orçamento assim que o volume cresce. Sai com código 1 se
+alguma rota estourar, para rodar em CI; os dados ficam numa transação
+desfeita no final.
+
+Dados e orçamentos ficam em tests/apoio/consultas.py, os mesmos do pytest
+(tests/test_orcamento_consultas.py, pulado sem DATABASE_URL), então uma
+regressão falha os testes.
+
+Para ver quais consultas se repetem numa rota que estourou, rode de novo
+com CONSULTAS_DEBUG=true.
+
+Uso:
+    DATABASE_URL=postgresql://... python -m backend.benchmarks.orcamento_consultas
+    DATABASE_URL=postgresql://... python -m backend.benchmarks.orcamento_consultas --volume 50
+"""
+import argparse
+import sys
+import time
+
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from backend.auth.security import criar_tokens_usuario
+from backend.models import Usuario
+from backend.utils.contador_consultas import consultas_da_resposta
+from tests.apoio.banco import transacao_desfeita
+from tests.apoio.consultas import ORCAMENTOS, popular, sessoes_na_conexao
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--volume", type=int, default=20, help="formulários, envios e estágios criados")
+    args = parser.parse_args()
+
+    import main as aplicacao
+
+    falhas = 0
+    with transacao_desfeita() as conexao, sessoes_na_conexao(aplicacao.app, conexao):
+        db = Session(bind=conexao)
+        try:
+            ids = popular(db, args.volume)
+            admin = db.query(Usuario).filter(Usuario.tipo == "admin").first()
+            if not admin:
+                print("❌ Nenhum usuário admin no banco")
+                sys.exit(1)
+            headers = {"Authorization": f"Bearer {criar_tokens_usuario(admin)['access_token']}"}
+
+            print(f"volume {args.volume}")
+            print(f"{'rota':<56} {'consultas':>9} {'orçamento':>9} {'ms':>8}")
+            with TestClient(aplicacao.app) as cliente:
+                for modelo, maximo in ORCAMENTOS.items():
+                    rota = modelo.format(**ids)
+                    # A primeira chamada carrega usuário e lista de revogação nos caches
+                    cliente.get(rota, headers=headers)
+                    inicio = time.perf_counter()
+                    resposta = cliente.get(rota, headers=headers)
+                    duracao = (time.perf_counter() - inicio) * 1000
+                    resposta.raise_for_status()
+                    total = consultas_da_resposta(resposta)
+                    estourou = total > maximo
+                    falhas += estourou
+                    marcador = "  <- estourou" if estourou else ""
+                    print(f"{rota:<56} {total:>9} {maximo:>9} {duracao:>8.1f}{marcador}")
+        finally:
+            db.close()
+
+    if falhas:
+        print(f"❌ {falhas} rota(s) acima do orçamento de consultas")
+        sys.exit(1)
+    print("✅ Todas as rotas dentro do orçamento")
+
+
+if __name__ == "__main__":
+    main()
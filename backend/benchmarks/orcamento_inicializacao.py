@@ -0,0 +1,62 @@
+"""
+Orçamento de inicialização do worker: tempo de `import main` e memória.
+
+Importa o app --repeticoes vezes, cada uma num processo novo (cache de
+bytecode já quente, como num worker do gunicorn), e compara o menor tempo
+de import (ruído da máquina só soma tempo; uma regressão aparece em todas
+as execuções) e o maior RSS com o orçamento. Também confere que as
+bibliotecas usadas só em caminhos raros (PDF, Excel, upload, consulta de
+CNPJ) continuam fora do boot: elas são importadas dentro das funções que as
+usam, e um import de módulo esquecido num router volta a carregá-las em todo
+worker. Sai com código 1 se algo estourar. A medição e o orçamento ficam em
+tests/apoio/inicializacao.py, os mesmos do pytest
+(tests/test_orcamento_inicializacao.py).
+
+Os números dependem da máquina: ajuste --import-ms e --rss-mb (ou
+ORCAMENTO_IMPORT_MS e ORCAMENTO_RSS_MB) para o ambiente do CI. Não conecta
+ao banco; DATABASE_URL só precisa estar definida para os engines serem
+criados como em produção.
+
+Uso:
+    DATABASE_URL=postgresql://... python -m backend.benchmarks.orcamento_inicializacao
+    DATABASE_URL=postgresql://... python -m backend.benchmarks.orcamento_inicializacao --import-ms 1500 --rss-mb 100
+"""
+import argparse
+import sys
+
+from tests.apoio.inicializacao import ORCAMENTO_IMPORT_MS, ORCAMENTO_RSS_MB, medir
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--import-ms", type=float, default=ORCAMENTO_IMPORT_MS)
+    parser.add_argument("--rss-mb", type=float, default=ORCAMENTO_RSS_MB)
+    args = parser.parse_args()
+
+    # A primeira execução compila o bytecode que faltar e não entra na conta
+    medir()
+    medicoes = [medir() for _ in range(args.repeticoes)]
+    tempo = min(m["import_ms"] for m in medicoes)
+    rss = max(m["rss_mb"] for m in medicoes)
+    carregados = sorted({modulo for m in medicoes for modulo in m["carregados"]})
+
+    print(f"import main: {tempo:.0f} ms na execução mais rápida (orçamento {args.import_ms:.0f} ms)")
+    print(f"RSS após o import: {rss:.1f} MB (orçamento {args.rss_mb:.0f} MB)")
+
+    falhas = []
+    if tempo > args.import_ms:
+        falhas.append(f"import main levou {tempo:.0f} ms")
+    if rss > args.rss_mb:
+        falhas.append(f"RSS de {rss:.1f} MB")
+    if carregados:
+        falhas.append(f"importados no boot: {', '.join(carregados)}")
+    for falha in falhas:
+        print(f"❌ {falha}")
+    if falhas:
+        sys.exit(1)
+    print("✅ Inicialização dentro do orçamento")
+
+
+if __name__ == "__main__":
+    main()
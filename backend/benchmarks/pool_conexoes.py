@@ -0,0 +1,182 @@
+"""
+Vazão por tamanho de pool e número de workers.
+
+Para cada combinação de --workers e --pools sobe o app real com gunicorn
+(gunicorn.conf.py, DB_POOL_SIZE=pool, DB_MAX_OVERFLOW=0), dispara carga
+por --duracao segundos com --concorrencia conexões divididas entre
+--clientes processos e mostra requisições/s, latência e o tempo médio de
+espera por uma conexão do pool (db_pool_espera_segundos do /metrics).
+Conexões abertas no pior caso: workers x pool x 2 engines; combinações
+acima do max_connections do Postgres são puladas.
+
+Uso:
+    DATABASE_URL=postgresql://... python -m backend.benchmarks.pool_conexoes
+    DATABASE_URL=postgresql://... python -m backend.benchmarks.pool_conexoes --workers 2,4,8 --pools 2,5,10 \\
+        --rota "/api/dashboard/stats"
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import secrets
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+from prometheus_client.parser import text_string_to_metric_families
+from sqlalchemy import text
+
+PORTA = 8766
+
+
+def aguardar_porta(processo: subprocess.Popen):
+    while True:
+        if processo.poll() is not None:
+            raise RuntimeError("gunicorn encerrou antes de abrir a porta")
+        try:
+            socket.create_connection(("127.0.0.1", PORTA), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+
+
+async def _carregar(rota: str, headers: dict, concorrencia: int, duracao: float) -> tuple:
+    limites = httpx.Limits(max_connections=concorrencia, max_keepalive_connections=concorrencia)
+    latencias = []
+    erros = 0
+    fim = time.perf_counter() + duracao
+    async with httpx.AsyncClient(
+        base_url=f"http://127.0.0.1:{PORTA}", headers=headers, limits=limites, timeout=60
+    ) as cliente:
+        async def trabalhador():
+            nonlocal erros
+            while time.perf_counter() < fim:
+                inicio = time.perf_counter()
+                try:
+                    resposta = await cliente.get(rota)
+                    if resposta.status_code >= 400:
+                        erros += 1
+                        continue
+                except httpx.HTTPError:
+                    erros += 1
+                    continue
+                latencias.append(time.perf_counter() - inicio)
+
+        await asyncio.gather(*(trabalhador() for _ in range(concorrencia)))
+    return latencias, erros
+
+
+def cliente(argumentos: tuple) -> tuple:
+    return asyncio.run(_carregar(*argumentos))
+
+
+def espera_pool() -> float:
+    """Espera média por conexão do pool (ms), somando os dois engines"""
+    resposta = httpx.get(f"http://127.0.0.1:{PORTA}/metrics", timeout=30)
+    soma = contagem = 0.0
+    for familia in text_string_to_metric_families(resposta.text):
+        if familia.name != "db_pool_espera_segundos":
+            continue
+        for amostra in familia.samples:
+            if amostra.name.endswith("_sum"):
+                soma += amostra.value
+            elif amostra.name.endswith("_count"):
+                contagem += amostra.value
+    return soma / contagem * 1000 if contagem else 0.0
+
+
+def medir(workers: int, pool: int, args, headers: dict, ambiente: dict) -> dict:
+    diretorio_metricas = tempfile.mkdtemp(prefix="nucleo-pool-")
+    processo = subprocess.Popen(
+        [
+            sys.executable, "-m", "gunicorn", "main:app", "--config", "gunicorn.conf.py",
+            "--bind", f"127.0.0.1:{PORTA}", "--workers", str(workers),
+            "--worker-class", "uvicorn.workers.UvicornWorker", "--timeout", "120"
+        ],
+        env={
+            **ambiente,
+            "DB_POOL_SIZE": str(pool),
+            "DB_MAX_OVERFLOW": "0",
+            "PROMETHEUS_MULTIPROC_DIR": diretorio_metricas
+        },
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    try:
+        aguardar_porta(processo)
+        # Aquece conexões do pool e caches de autenticação de todos os workers
+        cliente((args.rota, headers, args.concorrencia, 2))
+
+        por_cliente = max(1, args.concorrencia // args.clientes)
+        with multiprocessing.get_context("spawn").Pool(args.clientes) as clientes:
+            resultados = clientes.map(cliente, [(args.rota, headers, por_cliente, args.duracao)] * args.clientes)
+        latencias = sorted(latencia for parcial, _ in resultados for latencia in parcial)
+        erros = sum(erro for _, erro in resultados)
+        espera = espera_pool()
+    finally:
+        processo.terminate()
+        processo.wait()
+        shutil.rmtree(diretorio_metricas, ignore_errors=True)
+
+    if not latencias:
+        return {"req_s": 0, "mediana_ms": 0, "p95_ms": 0, "erros": erros, "espera_ms": espera}
+    return {
+        "req_s": len(latencias) / args.duracao,
+        "mediana_ms": latencias[len(latencias) // 2] * 1000,
+        "p95_ms": latencias[int(len(latencias) * 0.95) - 1] * 1000,
+        "erros": erros,
+        "espera_ms": espera
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="2,4,8", help="números de workers, separados por vírgula")
+    parser.add_argument("--pools", default="2,5,10", help="valores de DB_POOL_SIZE, separados por vírgula")
+    parser.add_argument("--rota", default="/api/empresas/?page=1&page_size=20")
+    parser.add_argument("--concorrencia", type=int, default=64)
+    parser.add_argument("--duracao", type=float, default=10)
+    parser.add_argument("--clientes", type=int, default=2, help="processos gerando carga")
+    args = parser.parse_args()
+
+    # Todos os workers precisam validar o mesmo token
+    ambiente = dict(os.environ)
+    ambiente.setdefault("SESSION_SECRET", secrets.token_hex(32))
+    os.environ["SESSION_SECRET"] = ambiente["SESSION_SECRET"]
+
+    from backend.auth.security import criar_tokens_usuario
+    from backend.database import SessionLocal
+    from backend.models import Usuario
+
+    db = SessionLocal()
+    try:
+        admin = db.query(Usuario).filter(Usuario.tipo == "admin").first()
+        if not admin:
+            print("❌ Nenhum usuário admin no banco")
+            sys.exit(1)
+        headers = {"Authorization": f"Bearer {criar_tokens_usuario(admin)['access_token']}"}
+        maximo_conexoes = int(db.execute(text("SHOW max_connections")).scalar())
+    finally:
+        db.close()
+
+    print(f"rota {args.rota}, concorrência {args.concorrencia}, {args.duracao:.0f} s por combinação")
+    print(f"{'workers':>7} {'pool':>5} {'req/s':>9} {'mediana ms':>11} {'p95 ms':>9} {'espera ms':>10} {'erros':>6}")
+    for workers in (int(valor) for valor in args.workers.split(",")):
+        for pool in (int(valor) for valor in args.pools.split(",")):
+            # Reserva algumas conexões para o restante (psql, migrações, este script)
+            if workers * pool * 2 > maximo_conexoes - 10:
+                print(f"{workers:>7} {pool:>5}  pulado: {workers * pool * 2} conexões > max_connections {maximo_conexoes}")
+                continue
+            resultado = medir(workers, pool, args, headers, ambiente)
+            print(
+                f"{workers:>7} {pool:>5} {resultado['req_s']:>9.0f} {resultado['mediana_ms']:>11.1f} "
+                f"{resultado['p95_ms']:>9.1f} {resultado['espera_ms']:>10.2f} {resultado['erros']:>6}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Latência e memória do índice de sugestões de empresas (/api/empresas/sugestoes).
+
+Monta o IndiceSugestoes (backend/utils/sugestoes_empresas.py) com
+--empresas linhas sintéticas geradas em memória, no mesmo formato da
+busca_empresas, e mede:
+
+- o tempo da carga completa e quanto o RSS do processo cresceu;
+- a latência de sugerir() para prefixos de nome, palavras no meio do nome,
+  termos sem acento, siglas e pedaços de CNPJ (--repeticoes cada);
+- a latência de aplicar() e remover(), que seguram o lock do índice.
+
+Sai com código 1 se o p95 das sugestões passar de --p95-ms (padrão 5) ou se
+"sao jor" não trouxer "São Jorge". Não acessa o banco.
+
+Uso:
+    python -m backend.benchmarks.sugestoes_empresas
+    python -m backend.benchmarks.sugestoes_empresas --empresas 200000 --p95-ms 2
+"""
+import argparse
+import hashlib
+import re
+import statistics
+import sys
+import time
+
+from backend.benchmarks.busca_empresas import MUNICIPIOS, NOMES, PREFIXOS, SUFIXOS
+from backend.utils.sugestoes_empresas import IndiceSugestoes
+
+TERMOS = [
+    "co", "constr", "construtora sao", "sao jor", "jorge", "araujo", "petro", "ribeirão", "Metalurgica Parana",
+    "quimica it", "abcd", "0001234", "00012.345", "zzzz",
+]
+
+
+def _rss_mb() -> float:
+    status = open("/proc/self/status").read()
+    return int(re.search(r"VmRSS:\s+(\d+)", status).group(1)) / 1024
+
+
+def linhas_sinteticas(quantidade: int):
+    for g in range(1, quantidade + 1):
+        hash_ = hashlib.md5(str(g).encode()).hexdigest()
+        cnpj = f"{g:08d}0001{g % 97:02d}"
+        if g % 2:
+            cnpj = f"{cnpj[:2]}.{cnpj[2:5]}.{cnpj[5:8]}/{cnpj[8:12]}-{cnpj[12:]}"
+        yield (
+            g,
+            f"{PREFIXOS[g % len(PREFIXOS)]} {NOMES[(g // 7) % len(NOMES)]} "
+            f"{hash_[:6].translate(str.maketrans('0123456789', 'aeioubrstl')).capitalize()} {SUFIXOS[(g // 3) % len(SUFIXOS)]}",
+            hash_[6:10].translate(str.maketrans("0123456789abcdef", "ABCDEFGHIJKLMNOP")),
+            cnpj,
+            MUNICIPIOS[(g // 11) % len(MUNICIPIOS)],
+            "SP",
+        )
+
+
+def _p95(tempos):
+    tempos = sorted(tempos)
+    return tempos[max(int(len(tempos) * 0.95) - 1, 0)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--empresas", type=int, default=100000)
+    parser.add_argument("--repeticoes", type=int, default=200)
+    parser.add_argument("--limite", type=int, default=10)
+    parser.add_argument("--p95-ms", type=float, default=5)
+    args = parser.parse_args()
+
+    linhas = list(linhas_sinteticas(args.empresas))
+    indice = IndiceSugestoes()
+    rss_antes = _rss_mb()
+    inicio = time.perf_counter()
+    indice.construir(linhas)
+    print(
+        f"Carga: {args.empresas} empresas em {(time.perf_counter() - inicio) * 1000:.0f} ms, "
+        f"+{_rss_mb() - rss_antes:.0f} MB de RSS, "
+        f"{len(indice.inicios) + len(indice.palavras) + len(indice.cnpjs)} chaves"
+    )
+
+    falhas = []
+    if not any("São Jorge" in item["empresa"] for item in indice.sugerir("sao jor", args.limite)):
+        falhas.append("'sao jor' não trouxe 'São Jorge'")
+
+    todas = []
+    print(f"{'termo':<24} {'itens':>5} {'mediana ms':>11} {'p95 ms':>8}")
+    for termo in TERMOS:
+        tempos = []
+        for _ in range(args.repeticoes):
+            comeco = time.perf_counter()
+            resultado = indice.sugerir(termo, args.limite)
+            tempos.append((time.perf_counter() - comeco) * 1000)
+        todas += tempos
+        print(f"{termo:<24} {len(resultado):>5} {statistics.median(tempos):>11.3f} {_p95(tempos):>8.3f}")
+
+    tempos_escrita = []
+    for linha in linhas[:200]:
+        alterada = (linha[0], linha[1] + " Renomeada", *linha[2:])
+        comeco = time.perf_counter()
+        indice.aplicar(alterada)
+        indice.remover(linha[0])
+        tempos_escrita.append((time.perf_counter() - comeco) * 1000)
+    print(f"aplicar + remover: mediana {statistics.median(tempos_escrita):.3f} ms, p95 {_p95(tempos_escrita):.3f} ms")
+
+    p95 = _p95(todas)
+    print(f"p95 geral: {p95:.3f} ms (limite {args.p95_ms:g} ms)")
+    if p95 > args.p95_ms:
+        falhas.append(f"p95 de {p95:.3f} ms acima de {args.p95_ms:g} ms")
+    for falha in falhas:
+        print(f"❌ {falha}")
+    if falhas:
+        sys.exit(1)
+    print("✅ Sugestões dentro do limite")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Verificação dos índices das consultas mais frequentes (migração b5d81e6f3a20).
+
+Popula um volume realista de dados dentro de uma transação, roda ANALYZE,
+executa EXPLAIN nas consultas dos routers e confere se cada uma usa o
+índice esperado em vez de Seq Scan. No final a transação é desfeita.
+Sai com código 1 se alguma consulta não usar o índice. Dados, consultas e a
+conferência do plano ficam em tests/apoio/indices.py, os mesmos do pytest
+(tests/test_verificar_indices.py, pulado sem Postgres).
+
+Uso:
+    DATABASE_URL=postgresql://... python -m backend.benchmarks.verificar_indices
+    DATABASE_URL=postgresql://... python -m backend.benchmarks.verificar_indices --linhas 100000
+"""
+import argparse
+import sys
+
+from sqlalchemy.orm import Session
+
+from tests.apoio.banco import transacao_desfeita
+from tests.apoio.indices import consultas, popular, verificar
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Confere se as consultas frequentes usam índices")
+    parser.add_argument("--linhas", type=int, default=50000, help="Linhas geradas por tabela")
+    args = parser.parse_args()
+
+    with transacao_desfeita() as conexao:
+        db = Session(bind=conexao)
+        try:
+            print(f"Populando {args.linhas} linhas por tabela (será desfeito no final)...")
+            popular(db, args.linhas)
+            resultados = [verificar(db, *item) for item in consultas(db)]
+        finally:
+            db.close()
+
+    falhas = resultados.count(False)
+    print(f"\n{len(resultados) - falhas}/{len(resultados)} consultas usando índice")
+    sys.exit(1 if falhas else 0)
+
+
+if __name__ == "__main__":
+    main()
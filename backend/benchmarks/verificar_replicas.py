@@ -0,0 +1,123 @@
+"""
+Verificação do roteamento de leituras para as réplicas.
+
+Com DATABASE_REPLICA_URLS apontando para réplicas do DATABASE_URL, sobe o
+app pelo TestClient e confere que:
+- as rotas de leitura (get_read_db/get_read_async_db) consultam a réplica;
+- depois de uma escrita, o mesmo cliente lê do primário até a janela
+  REPLICA_JANELA_ESCRITA passar;
+- sem réplica disponível as leituras continuam funcionando pelo primário.
+Sai com código 1 se alguma verificação falhar. A empresa criada para a
+escrita é apagada no final.
+
+Para testar localmente com duas instâncias do Postgres (réplica por
+streaming a partir do primário em /tmp/pgdata):
+    pg_basebackup -h /tmp/pgdata -U postgres -D /tmp/pgreplica -R -X stream
+    pg_ctl -D /tmp/pgreplica -o "-p 5433 -k /tmp/pgreplica" start
+
+Uso:
+    DATABASE_URL=postgresql://... DATABASE_REPLICA_URLS=postgresql://... \\
+        python -m backend.benchmarks.verificar_replicas
+"""
+import os
+import sys
+import time
+
+# Janela curta para a verificação não demorar; o valor é lido no import do app
+os.environ.setdefault("REPLICA_JANELA_ESCRITA", "2")
+os.environ.setdefault("REPLICA_INTERVALO", "0.5")
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from backend.auth.security import criar_tokens_usuario
+from backend.database import REPLICA_JANELA_ESCRITA, SessionLocal, replicas
+from backend.models import Usuario
+
+ROTAS_LEITURA = [
+    "/api/empresas/?page=1&page_size=20",
+    "/api/dashboard/stats",
+    "/api/pipeline/stats",
+    "/api/cronograma/eventos",
+    "/api/cronograma/timeline",
+]
+
+
+class ContadorReplica:
+    def __init__(self):
+        self.total = 0
+        for replica in replicas:
+            for engine in (replica.engine, replica.async_engine.sync_engine):
+                event.listen(engine, "before_cursor_execute", self._contar)
+
+    def _contar(self, *args):
+        self.total += 1
+
+
+def ler(cliente, headers, contador) -> int:
+    antes = contador.total
+    for rota in ROTAS_LEITURA:
+        cliente.get(rota, headers=headers).raise_for_status()
+    return contador.total - antes
+
+
+def main():
+    if not replicas:
+        print("❌ DATABASE_REPLICA_URLS não configurada")
+        sys.exit(1)
+
+    import main as aplicacao
+
+    db = SessionLocal()
+    try:
+        admin = db.query(Usuario).filter(Usuario.tipo == "admin").first()
+    finally:
+        db.close()
+    if not admin:
+        print("❌ Nenhum usuário admin no banco")
+        sys.exit(1)
+    headers = {"Authorization": f"Bearer {criar_tokens_usuario(admin)['access_token']}"}
+
+    contador = ContadorReplica()
+    falhas = []
+    with TestClient(aplicacao.app) as cliente:
+        limite = time.monotonic() + 10
+        while not all(replica.disponivel for replica in replicas) and time.monotonic() < limite:
+            time.sleep(0.2)
+        for replica in replicas:
+            print(f"{replica.nome}: disponível={replica.disponivel} atraso={replica.atraso}")
+
+        if ler(cliente, headers, contador) == 0:
+            falhas.append("leituras não chegaram à réplica")
+
+        resposta = cliente.post("/api/empresas/", headers=headers, json={"empresa": "Verificacao replicas"})
+        resposta.raise_for_status()
+        try:
+            # Descontando as medições de atraso do monitor, que também passam pela réplica
+            if ler(cliente, headers, contador) > len(replicas) * 2:
+                falhas.append("leitura logo após a escrita foi para a réplica")
+            time.sleep(REPLICA_JANELA_ESCRITA + 0.5)
+            if ler(cliente, headers, contador) == 0:
+                falhas.append("leituras não voltaram à réplica depois da janela de escrita")
+
+            # Monitor parado no loop do app e réplicas fora, como se todas estivessem atrasadas
+            cliente.portal.call(aplicacao.monitor_replicas.parar)
+            for replica in replicas:
+                replica.disponivel = False
+            try:
+                if ler(cliente, headers, contador):
+                    falhas.append("leitura foi para réplica indisponível")
+            except Exception as e:
+                falhas.append(f"leitura sem réplica disponível falhou: {e}")
+        finally:
+            cliente.delete(f"/api/empresas/{resposta.json()['id']}", headers=headers)
+
+    for falha in falhas:
+        print(f"❌ {falha}")
+    if falhas:
+        sys.exit(1)
+    print("✅ Leituras roteadas para as réplicas, com leitura da própria escrita e fallback para o primário")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,155 @@
+from fastapi import Request
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from typing import List, Optional
+import itertools
 import os
+import time
+import uuid
+from backend.metricas import AsyncAdaptedQueuePoolMedido, QueuePoolMedido
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+# Limite das consultas feitas em requisições, em ms (0 desliga), aplicado por
+# transação em backend/utils/consultas_lentas.py, junto com os limites por
+# papel. Não vai nos parâmetros da conexão: CLIs de manutenção (preparar_banco,
+# reconstrução de resumos, backfills) rodam sem limite.
+STATEMENT_TIMEOUT_MS = int(os.getenv("STATEMENT_TIMEOUT_MS", "30000"))
+
+# Pool por engine e por worker: cada worker do gunicorn abre até
+# DB_POOL_SIZE + DB_MAX_OVERFLOW conexões no engine síncrono e outras tantas
+# no async. Pre-ping fica desligado: ele custa um SELECT 1 (uma ida e volta ao
+# banco) em todo checkout, ou seja, em toda requisição. Sem ele uma conexão
+# morta (restart do Postgres) falha uma vez e o SQLAlchemy, ao reconhecer o
+# erro de desconexão, invalida o pool inteiro; o recycle descarta as conexões
+# antes de timeouts de ociosidade. Ligue DB_POOL_PRE_PING=true atrás de
+# proxies ou firewalls que derrubam conexões ociosas sem avisar.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "false") == "true"
+# Atrás do PgBouncer em transaction pooling: sem prepared statements nomeados
+# reaproveitados e sem parâmetros de inicialização (timezone e
+# statement_timeout vão por transação, em backend/utils/consultas_lentas.py).
+# DB_NULLPOOL deixa o pool só para o PgBouncer.
+DB_PGBOUNCER = os.getenv("DB_PGBOUNCER") == "true"
+DB_NULLPOOL = os.getenv("DB_NULLPOOL") == "true"
+
+# Réplicas de leitura (opcional), separadas por vírgula. Rotas que usam
+# get_read_db/get_read_async_db leem de uma réplica com atraso abaixo de
+# REPLICA_ATRASO_MAXIMO segundos (medido por backend/utils/replicas.py); sem
+# réplica disponível, ou até REPLICA_JANELA_ESCRITA segundos depois de uma
+# escrita do mesmo cliente (cookie COOKIE_ESCRITA), leem do primário.
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+REPLICA_ATRASO_MAXIMO = float(os.getenv("REPLICA_ATRASO_MAXIMO", "5"))
+REPLICA_JANELA_ESCRITA = float(os.getenv("REPLICA_JANELA_ESCRITA", "10"))
+COOKIE_ESCRITA = "nucleo_escrita"
 
 Base = declarative_base()
 
+def _configuracao_async(database_url: str):
+    """
+    URL e connect_args equivalentes para o driver asyncpg. Parâmetros do
+    libpq que o asyncpg não conhece (sslmode, connect_timeout) são traduzidos.
+    """
+    url = make_url(database_url)
+    if url.drivername in ("postgres", "postgresql", "postgresql+psycopg2"):
+        url = url.set(drivername="postgresql+asyncpg")
+    
+    query = dict(url.query)
+    connect_args = {
+        "timeout": int(query.pop("connect_timeout", 10)),
+        "server_settings": {"timezone": "utc"}
+    }
+    if "sslmode" in query:
+        connect_args["ssl"] = query.pop("sslmode")
+    if DB_PGBOUNCER:
+        # Outro cliente pode receber a mesma conexão do servidor: nada de
+        # cache de statements nem nomes sequenciais que colidem
+        query["prepared_statement_cache_size"] = "0"
+        connect_args["statement_cache_size"] = 0
+        connect_args["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid.uuid4()}__"
+        del connect_args["server_settings"]
+    return url.set(query=query), connect_args
+
+def _configuracao_pool(poolclass) -> dict:
+    if DB_NULLPOOL:
+        return {"poolclass": NullPool}
+    return {
+        "poolclass": poolclass,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING
+    }
+
 if DATABASE_URL:
     print(f"🔗 Conectando ao banco de dados...")
     
     # Configurações para melhor compatibilidade com Railway/Postgres
-    engine = create_engine(
-        DATABASE_URL,
-        pool_pre_ping=True,
-        pool_recycle=300,
-        connect_args={
-            "connect_timeout": 10,
-            "options": "-c timezone=utc"
-        }
-    )
+    # Pools medidos: o tempo de espera por conexão vai para o /metrics
+    connect_args = {"connect_timeout": 10}
+    if not DB_PGBOUNCER:
+        connect_args["options"] = "-c timezone=utc"
+    if make_url(DATABASE_URL).get_backend_name() == "postgresql":
+        engine = create_engine(DATABASE_URL, connect_args=connect_args, **_configuracao_pool(QueuePoolMedido))
+    else:
+        engine = create_engine(DATABASE_URL, pool_pre_ping=DB_POOL_PRE_PING, pool_recycle=DB_POOL_RECYCLE, connect_args=connect_args)
     
     SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    
+    # Engine async (asyncpg) para os routers de maior tráfego, que não
+    # ocupam threads do threadpool enquanto esperam o banco. Scripts em
+    # backend/utils continuam usando SessionLocal.
+    async_engine = None
+    AsyncSessionLocal = None
+    if engine.dialect.name == "postgresql":
+        url_async, connect_args_async = _configuracao_async(DATABASE_URL)
+        async_engine = create_async_engine(
+            url_async,
+            connect_args=connect_args_async,
+            **_configuracao_pool(AsyncAdaptedQueuePoolMedido)
+        )
+        AsyncSessionLocal = async_sessionmaker(
+            async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+        )
     print("✅ Configuração do banco de dados concluída")
 else:
     print("⚠️ DATABASE_URL não configurada - usando configuração lazy")
     engine = None
     SessionLocal = None
+    async_engine = None
+    AsyncSessionLocal = None
+
+class Replica:
+    """Engines de uma réplica; `disponivel` e `atraso` são atualizados pelo monitor de réplicas"""
+    
+    def __init__(self, nome: str, url: str):
+        self.nome = nome
+        self.engine = create_engine(url, connect_args=connect_args, **_configuracao_pool(QueuePoolMedido))
+        self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        url_async, connect_args_async = _configuracao_async(url)
+        self.async_engine = create_async_engine(
+            url_async, connect_args=connect_args_async, **_configuracao_pool(AsyncAdaptedQueuePoolMedido)
+        )
+        self.AsyncSessionLocal = async_sessionmaker(
+            self.async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+        )
+        # Só recebe leituras depois da primeira medição de atraso
+        self.disponivel = False
+        self.atraso: Optional[float] = None
+
+replicas: List[Replica] = []
+if AsyncSessionLocal is not None:
+    replicas = [Replica(f"replica{i}", url) for i, url in enumerate(DATABASE_REPLICA_URLS)]
+    if replicas:
+        print(f"📚 {len(replicas)} réplica(s) de leitura configurada(s)")
+_proxima_replica = itertools.count()
 
 def get_db():
     if SessionLocal is None:
@@ -36,3 +159,52 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    if AsyncSessionLocal is None:
+        raise RuntimeError("Async database not configured - DATABASE_URL must point to PostgreSQL")
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def escrita_recente(request: Request) -> bool:
+    """O cliente escreveu há menos de REPLICA_JANELA_ESCRITA segundos (ler o que escreveu)"""
+    try:
+        return time.time() - float(request.cookies.get(COOKIE_ESCRITA, "0")) < REPLICA_JANELA_ESCRITA
+    except ValueError:
+        return False
+
+def escolher_replica(request: Request) -> Optional[Replica]:
+    if not replicas or escrita_recente(request):
+        return None
+    disponiveis = [replica for replica in replicas if replica.disponivel]
+    if not disponiveis:
+        return None
+    return disponiveis[next(_proxima_replica) % len(disponiveis)]
+
+def get_read_db(request: Request):
+    """Sessão para rotas só de leitura: réplica quando possível, senão o primário"""
+    replica = escolher_replica(request)
+    if replica is None:
+        yield from get_db()
+        return
+    db = replica.SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+def fabrica_leitura_async(request: Request) -> async_sessionmaker:
+    """
+    Fábrica de sessões async de leitura (réplica ou primário). Para respostas
+    em streaming, que abrem a sessão dentro do gerador: a sessão de uma
+    dependência com yield é fechada antes do corpo ser enviado.
+    """
+    replica = escolher_replica(request)
+    fabrica = replica.AsyncSessionLocal if replica is not None else AsyncSessionLocal
+    if fabrica is None:
+        raise RuntimeError("Async database not configured - DATABASE_URL must point to PostgreSQL")
+    return fabrica
+
+async def get_read_async_db(request: Request):
+    async with fabrica_leitura_async(request)() as db:
+        yield db
@@ -0,0 +1,270 @@
+"""
+Barramento de eventos entre workers.
+
+Cada worker do gunicorn mantém uma única conexão LISTEN no Postgres e
+repassa os eventos recebidos para os assinantes locais (WebSocket do chat,
+notificações, pipeline). A publicação usa NOTIFY, de modo que um evento
+publicado em qualquer worker/réplica chega a todos os outros.
+
+Para testes e desenvolvimento sem Postgres existe o backend em memória,
+que entrega os eventos apenas dentro do próprio processo.
+"""
+import asyncio
+import json
+import os
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import text
+
+from backend.database import DATABASE_URL, async_engine, engine
+
+CANAL_POSTGRES = "nucleo_eventos"
+# O Postgres limita o payload do NOTIFY a 8000 bytes
+LIMITE_PAYLOAD = 7900
+TAMANHO_MAXIMO_TEXTO = 200
+
+
+_DESCARTAR = object()
+
+
+def _reduzir(dados):
+    """Remove campos grandes de um payload, mantendo ids e valores curtos"""
+    if isinstance(dados, dict):
+        reduzido = {}
+        for chave, valor in dados.items():
+            valor = _reduzir(valor)
+            if valor is not _DESCARTAR:
+                reduzido[chave] = valor
+        return reduzido
+    if isinstance(dados, list):
+        if all(isinstance(item, (int, float, bool)) or item is None for item in dados):
+            return dados
+        return _DESCARTAR
+    if isinstance(dados, str) and len(dados) > TAMANHO_MAXIMO_TEXTO:
+        return _DESCARTAR
+    return dados
+
+
+class BackendMemoria:
+    """Entrega os eventos apenas para os assinantes deste processo"""
+
+    nome = "memoria"
+
+    def __init__(self, entregar: Callable[[str], None]):
+        self.entregar = entregar
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def iniciar(self):
+        self.loop = asyncio.get_running_loop()
+
+    async def parar(self):
+        self.loop = None
+
+    def publicar(self, mensagem: str):
+        if self.loop is None or self.loop.is_closed():
+            self.entregar(mensagem)
+            return
+        self.loop.call_soon_threadsafe(self.entregar, mensagem)
+
+    async def publicar_async(self, mensagem: str):
+        self.publicar(mensagem)
+
+
+class BackendPostgres:
+    """Publica via NOTIFY e escuta via LISTEN em uma conexão dedicada por worker"""
+
+    nome = "postgres"
+
+    def __init__(self, entregar: Callable[[str], None], database_url: str):
+        self.entregar = entregar
+        self.database_url = database_url
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.conexao = None
+        self.ativo = False
+
+    async def iniciar(self):
+        self.loop = asyncio.get_running_loop()
+        self.ativo = True
+        await self._conectar()
+
+    async def _conectar(self):
+        import psycopg2
+        import psycopg2.extensions
+
+        tentativa = 0
+        while self.ativo:
+            try:
+                conexao = await self.loop.run_in_executor(
+                    None, lambda: psycopg2.connect(self.database_url, connect_timeout=10)
+                )
+                conexao.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                with conexao.cursor() as cursor:
+                    cursor.execute(f"LISTEN {CANAL_POSTGRES};")
+                self.conexao = conexao
+                self.loop.add_reader(conexao.fileno(), self._ler)
+                print(f"✅ Barramento de eventos escutando canal '{CANAL_POSTGRES}'")
+                return
+            except Exception as e:
+                tentativa += 1
+                espera = min(30, 2 ** tentativa)
+                print(f"⚠️ Erro ao conectar LISTEN ({e}), nova tentativa em {espera}s")
+                await asyncio.sleep(espera)
+
+    def _ler(self):
+        try:
+            self.conexao.poll()
+        except Exception as e:
+            print(f"⚠️ Conexão LISTEN perdida: {e}")
+            self._descartar_conexao()
+            if self.ativo:
+                self.loop.create_task(self._conectar())
+            return
+
+        while self.conexao.notifies:
+            notificacao = self.conexao.notifies.pop(0)
+            self.entregar(notificacao.payload)
+
+    def _descartar_conexao(self):
+        if self.conexao is None:
+            return
+        try:
+            self.loop.remove_reader(self.conexao.fileno())
+        except Exception:
+            pass
+        try:
+            self.conexao.close()
+        except Exception:
+            pass
+        self.conexao = None
+
+    async def parar(self):
+        self.ativo = False
+        self._descartar_conexao()
+
+    def publicar(self, mensagem: str):
+        with engine.connect() as conn:
+            conn.execute(
+                text("SELECT pg_notify(:canal, :payload)"),
+                {"canal": CANAL_POSTGRES, "payload": mensagem}
+            )
+            conn.commit()
+
+    async def publicar_async(self, mensagem: str):
+        if async_engine is None:
+            await asyncio.get_running_loop().run_in_executor(None, self.publicar, mensagem)
+            return
+        async with async_engine.connect() as conn:
+            await conn.execute(
+                text("SELECT pg_notify(:canal, :payload)"),
+                {"canal": CANAL_POSTGRES, "payload": mensagem}
+            )
+            await conn.commit()
+
+
+class BarramentoEventos:
+    """
+    Pub/sub de eventos de domínio. Assinantes se registram por canal
+    ("chat", "notificacoes", "pipeline"...) e recebem o dict publicado.
+    Callbacks podem ser funções comuns ou corrotinas; ambos rodam no
+    event loop do worker.
+    """
+
+    def __init__(self):
+        self.assinantes: Dict[str, List[Callable]] = {}
+        self.backend = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.origem = uuid.uuid4().hex[:12]
+
+    def configurar(self, nome_backend: Optional[str] = None):
+        if nome_backend is None:
+            nome_backend = os.getenv("EVENTOS_BACKEND")
+        if nome_backend is None:
+            usa_postgres = DATABASE_URL is not None and DATABASE_URL.startswith(("postgres://", "postgresql"))
+            nome_backend = "postgres" if usa_postgres else "memoria"
+
+        if nome_backend == "postgres":
+            self.backend = BackendPostgres(self._entregar, DATABASE_URL)
+        else:
+            self.backend = BackendMemoria(self._entregar)
+        return self.backend
+
+    def assinar(self, canal: str, callback: Callable):
+        self.assinantes.setdefault(canal, []).append(callback)
+
+    def cancelar_assinatura(self, canal: str, callback: Callable):
+        if callback in self.assinantes.get(canal, []):
+            self.assinantes[canal].remove(callback)
+
+    def publicar(self, canal: str, dados: dict):
+        """
+        Publica um evento. Pode ser chamado de endpoints sync (threadpool)
+        ou de scripts; em endpoints async prefira publicar_async. Payloads acima do limite do NOTIFY são reduzidos
+        aos campos curtos e marcados com "truncado": True.
+        """
+        mensagem = self._montar_mensagem(canal, dados)
+        try:
+            self.backend.publicar(mensagem)
+        except Exception as e:
+            print(f"⚠️ Erro ao publicar evento no canal '{canal}': {e}")
+
+    async def publicar_async(self, canal: str, dados: dict):
+        """Igual a publicar, sem bloquear o event loop (endpoints com sessão async)"""
+        mensagem = self._montar_mensagem(canal, dados)
+        try:
+            await self.backend.publicar_async(mensagem)
+        except Exception as e:
+            print(f"⚠️ Erro ao publicar evento no canal '{canal}': {e}")
+
+    def _montar_mensagem(self, canal: str, dados: dict) -> str:
+        if self.backend is None:
+            self.configurar()
+
+        evento = {
+            "canal": canal,
+            "origem": self.origem,
+            "enviado_em": time.time(),
+            "dados": jsonable_encoder(dados),
+        }
+        mensagem = json.dumps(evento, ensure_ascii=False)
+        if len(mensagem.encode("utf-8")) > LIMITE_PAYLOAD:
+            evento["dados"] = _reduzir(evento["dados"])
+            evento["truncado"] = True
+            mensagem = json.dumps(evento, ensure_ascii=False)
+        return mensagem
+
+    def _entregar(self, mensagem: str):
+        try:
+            evento = json.loads(mensagem)
+        except ValueError:
+            return
+
+        dados = evento.get("dados") or {}
+        if evento.get("truncado") and isinstance(dados, dict):
+            dados["truncado"] = True
+
+        for callback in list(self.assinantes.get(evento.get("canal"), [])):
+            try:
+                resultado = callback(dados)
+                if asyncio.iscoroutine(resultado):
+                    if self.loop is not None and not self.loop.is_closed():
+                        asyncio.ensure_future(resultado, loop=self.loop)
+                    else:
+                        resultado.close()
+            except Exception as e:
+                print(f"⚠️ Erro em assinante do canal '{evento.get('canal')}': {e}")
+
+    async def iniciar(self):
+        if self.backend is None:
+            self.configurar()
+        self.loop = asyncio.get_running_loop()
+        await self.backend.iniciar()
+
+    async def parar(self):
+        if self.backend is not None:
+            await self.backend.parar()
+
+
+barramento = BarramentoEventos()
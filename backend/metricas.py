@@ -0,0 +1,196 @@
+"""
+Métricas Prometheus da aplicação, servidas em /metrics sem tocar no banco.
+
+- Requisições por rota (template da rota, não o path, para não explodir a
+  cardinalidade), status e latência; requisições em andamento.
+- Pool do SQLAlchemy (sync e async): conexões em uso, overflow, tamanho e
+  tempo de espera por uma conexão (pools medidos em database.py).
+- Réplicas de leitura: atraso e disponibilidade (backend/utils/replicas.py).
+- Threadpool do Starlette: threads em uso e capacidade.
+- Caches CacheTTL criados com `nome`: acertos, falhas e itens.
+
+Com gunicorn cada worker é um processo: com PROMETHEUS_MULTIPROC_DIR
+definido (gunicorn.conf.py define e limpa o diretório) as métricas de todos
+os workers são somadas no /metrics de qualquer um deles. Sem a variável
+(uvicorn direto, desenvolvimento) vale o registro do próprio processo.
+
+Pool, threadpool e caches são amostrados a cada METRICAS_INTERVALO
+segundos (padrão 5) por uma task em cada worker.
+"""
+import asyncio
+import os
+import time
+from typing import Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+)
+from prometheus_client import multiprocess
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from backend.utils.cache import caches_registrados
+
+METRICAS_INTERVALO = float(os.getenv("METRICAS_INTERVALO", "5"))
+MULTIPROCESSO = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+REQUISICOES = Counter(
+    "http_requisicoes_total", "Requisições HTTP atendidas", ["metodo", "rota", "status"]
+)
+LATENCIA = Histogram(
+    "http_requisicao_duracao_segundos", "Tempo de resposta por rota", ["metodo", "rota"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+EM_ANDAMENTO = Gauge(
+    "http_requisicoes_em_andamento", "Requisições sendo processadas", multiprocess_mode="livesum"
+)
+
+POOL_EM_USO = Gauge(
+    "db_pool_conexoes_em_uso", "Conexões retiradas do pool", ["engine"], multiprocess_mode="livesum"
+)
+POOL_OVERFLOW = Gauge(
+    "db_pool_overflow", "Conexões abertas além de pool_size", ["engine"], multiprocess_mode="livesum"
+)
+POOL_TAMANHO = Gauge(
+    "db_pool_tamanho", "pool_size configurado", ["engine"], multiprocess_mode="livesum"
+)
+POOL_ESPERA = Histogram(
+    "db_pool_espera_segundos", "Tempo para obter uma conexão do pool", ["engine"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+
+REPLICA_ATRASO = Gauge(
+    "db_replica_atraso_segundos", "Atraso de replicação medido", ["replica"], multiprocess_mode="livemax"
+)
+REPLICA_DISPONIVEL = Gauge(
+    "db_replica_disponivel", "1 se a réplica está recebendo leituras", ["replica"], multiprocess_mode="livemin"
+)
+
+THREADPOOL_EM_USO = Gauge(
+    "threadpool_threads_em_uso", "Threads do threadpool do Starlette ocupadas", multiprocess_mode="livesum"
+)
+THREADPOOL_CAPACIDADE = Gauge(
+    "threadpool_threads_capacidade", "Limite de threads do threadpool do Starlette", multiprocess_mode="livesum"
+)
+
+CACHE_ACERTOS = Gauge("cache_acertos", "Acertos acumulados do cache", ["cache"], multiprocess_mode="livesum")
+CACHE_FALHAS = Gauge("cache_falhas", "Falhas acumuladas do cache", ["cache"], multiprocess_mode="livesum")
+CACHE_ITENS = Gauge("cache_itens", "Itens no cache", ["cache"], multiprocess_mode="livesum")
+
+
+class QueuePoolMedido(QueuePool):
+    """QueuePool que registra quanto cada checkout esperou por uma conexão"""
+    engine_metricas = "sync"
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            POOL_ESPERA.labels(self.engine_metricas).observe(time.perf_counter() - inicio)
+
+
+class AsyncAdaptedQueuePoolMedido(AsyncAdaptedQueuePool):
+    engine_metricas = "async"
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            POOL_ESPERA.labels(self.engine_metricas).observe(time.perf_counter() - inicio)
+
+
+def nome_rota(scope: dict) -> str:
+    rota = scope.get("route")
+    if rota is not None and getattr(rota, "path", None):
+        return rota.path
+    if scope.get("path", "").startswith("/static/"):
+        return "/static"
+    return "nao_encontrada"
+
+
+class MiddlewareMetricas:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        inicio = time.perf_counter()
+
+        async def enviar(mensagem):
+            nonlocal status
+            if mensagem["type"] == "http.response.start":
+                status = mensagem["status"]
+            await send(mensagem)
+
+        EM_ANDAMENTO.inc()
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            EM_ANDAMENTO.dec()
+            rota = nome_rota(scope)
+            REQUISICOES.labels(scope["method"], rota, str(status)).inc()
+            LATENCIA.labels(scope["method"], rota).observe(time.perf_counter() - inicio)
+
+
+def _amostrar_pool(nome: str, engine):
+    if engine is None or not isinstance(engine.pool, QueuePool):
+        return
+    POOL_EM_USO.labels(nome).set(engine.pool.checkedout())
+    POOL_OVERFLOW.labels(nome).set(max(engine.pool.overflow(), 0))
+    POOL_TAMANHO.labels(nome).set(engine.pool.size())
+
+
+def amostrar():
+    """Atualiza os gauges de pool, threadpool e caches deste worker"""
+    import anyio.to_thread
+    from backend.database import async_engine, engine
+
+    _amostrar_pool("sync", engine)
+    _amostrar_pool("async", async_engine.sync_engine if async_engine is not None else None)
+
+    limitador = anyio.to_thread.current_default_thread_limiter()
+    THREADPOOL_EM_USO.set(limitador.borrowed_tokens)
+    THREADPOOL_CAPACIDADE.set(limitador.total_tokens)
+
+    for nome, cache in caches_registrados.items():
+        CACHE_ACERTOS.labels(nome).set(cache.acertos)
+        CACHE_FALHAS.labels(nome).set(cache.falhas)
+        CACHE_ITENS.labels(nome).set(len(cache.itens))
+
+
+class AmostradorMetricas:
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+
+    async def iniciar(self):
+        self.task = asyncio.create_task(self._executar())
+
+    async def parar(self):
+        if self.task:
+            self.task.cancel()
+            self.task = None
+
+    async def _executar(self):
+        while True:
+            try:
+                amostrar()
+            except Exception as e:
+                print(f"⚠️ Erro ao amostrar métricas: {e}")
+            await asyncio.sleep(METRICAS_INTERVALO)
+
+
+amostrador_metricas = AmostradorMetricas()
+
+
+def gerar_metricas() -> bytes:
+    amostrar()
+    if MULTIPROCESSO:
+        registro = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registro)
+        return generate_latest(registro)
+    return generate_latest(REGISTRY)
@@ -1,10 +1,12 @@
-from backend.models.usuarios import Usuario, TipoUsuario
+from backend.models.usuarios import Usuario, TipoUsuario, TokenRevogado
 from backend.models.empresas import Empresa
 from backend.models.prospeccoes import Prospeccao, ProspeccaoHistorico
 from backend.models.agendamentos import Agendamento, StatusAgendamento
 from backend.models.atribuicoes import AtribuicaoEmpresa
 from backend.models.notificacoes import Notificacao, TipoNotificacao
-from backend.models.mensagens import Mensagem, StatusUsuario, GrupoChat, MembroGrupo, MensagemGrupo, LeituraGrupo
+from backend.models.mensagens import Mensagem, ResumoConversa, StatusUsuario, GrupoChat, MembroGrupo, MensagemGrupo, LeituraGrupo
 from backend.models.cronograma import CronogramaProjeto, CronogramaAtividade, CronogramaEvento, StatusProjeto, StatusAtividade, CategoriaEvento, PeriodoEvento
 from backend.models.pipeline import Stage, CompanyPipeline, CompanyStageHistory, Note, Attachment, Activity
 from backend.models.formularios import Formulario, Pergunta, OpcaoResposta, FormularioEnvio, Resposta
+from backend.models.backfills import ExecucaoBackfill
+from backend.models.importacoes import ImportacaoEmpresas
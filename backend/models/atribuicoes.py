@@ -1,10 +1,13 @@
-from sqlalchemy import Column, Integer, ForeignKey, DateTime, Boolean
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, Boolean, Index
 from sqlalchemy.orm import relationship
 from backend.database import Base
 from datetime import datetime
 
 class AtribuicaoEmpresa(Base):
     __tablename__ = "atribuicoes_empresas"
+    __table_args__ = (
+        Index("ix_atribuicoes_empresas_consultor_ativa", "consultor_id", "ativa"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     consultor_id = Column(Integer, ForeignKey("usuarios.id"), nullable=False)
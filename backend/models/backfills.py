@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime
+from backend.database import Base
+
+
+class ExecucaoBackfill(Base):
+    """Progresso de cada backfill registrado em backend/utils/backfills.py"""
+    __tablename__ = "backfills"
+
+    nome = Column(String(100), primary_key=True)
+    versao = Column(Integer, nullable=False)
+    ultimo_id = Column(BigInteger, nullable=False, default=0)
+    linhas = Column(BigInteger, nullable=False, default=0)
+    iniciado_em = Column(DateTime)
+    atualizado_em = Column(DateTime)
+    concluido_em = Column(DateTime)
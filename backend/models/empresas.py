@@ -1,14 +1,33 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text
+from sqlalchemy import Column, Computed, Integer, String, DateTime, Text, Index
 from sqlalchemy.orm import relationship
 from backend.database import Base
 from datetime import datetime
 
+# Dígitos do CNPJ como a coluna gerada cnpj_digits (migração c8e0a2b4d6f7):
+# 12 ou 13 dígitos são CNPJs que perderam os zeros à esquerda numa célula
+# numérica e são completados até 14. Deve bater com digitos_cnpj em
+# backend/utils/importar_empresas.py.
+_DIGITOS = "regexp_replace(cnpj, '[^0-9]', '', 'g')"
+CNPJ_DIGITOS_SQL = f"CASE WHEN length({_DIGITOS}) IN (12, 13) THEN lpad({_DIGITOS}, 14, '0') ELSE nullif({_DIGITOS}, '') END"
+CNPJ_RAIZ_SQL = f"CASE WHEN length({_DIGITOS}) BETWEEN 12 AND 14 THEN left(lpad({_DIGITOS}, 14, '0'), 8) END"
+
 class Empresa(Base):
     __tablename__ = "empresas"
+    __table_args__ = (
+        # Ordem da listagem por cursor: WHERE (empresa, id) > (:empresa, :id)
+        Index("ix_empresas_empresa_id", "empresa", "id"),
+        # Leitura incremental do índice de sugestões: WHERE data_atualizacao > :marca
+        Index("ix_empresas_data_atualizacao", "data_atualizacao"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     empresa = Column(String, nullable=False, index=True)
     cnpj = Column(String(50), unique=True, index=True)
+    # Mantidas pelo Postgres em todo INSERT/UPDATE. As buscas por CNPJ usam
+    # estas colunas, então a pontuação gravada em cnpj não importa; a raiz
+    # (8 primeiros dígitos) agrupa matriz e filiais.
+    cnpj_digits = Column(String(14, collation="C"), Computed(CNPJ_DIGITOS_SQL, persisted=True), index=True)
+    cnpj_raiz = Column(String(8, collation="C"), Computed(CNPJ_RAIZ_SQL, persisted=True), index=True)
     sigla = Column(String(50))
     porte = Column(String(50))
     er = Column(String(50))
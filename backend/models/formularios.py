@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, JSON, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from backend.database import Base
@@ -77,6 +77,9 @@ class FormularioEnvio(Base):
 
 class Resposta(Base):
     __tablename__ = "respostas"
+    __table_args__ = (
+        Index("ix_respostas_pergunta_valor", "pergunta_id", "valor_numerico"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     envio_id = Column(Integer, ForeignKey("formulario_envios.id", ondelete="CASCADE"), nullable=False)
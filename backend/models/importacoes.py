@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Boolean, Text
+from backend.database import Base
+
+
+class ImportacaoEmpresas(Base):
+    """Progresso de cada importação de planilha de empresas (backend/utils/importar_empresas.py)"""
+    __tablename__ = "importacoes_empresas"
+
+    id = Column(Integer, primary_key=True)
+    arquivo = Column(String(500))
+    usuario_id = Column(Integer)
+    status = Column(String(20), nullable=False, default="pendente")
+    atualizar_existentes = Column(Boolean, nullable=False, default=False)
+    linhas_lidas = Column(BigInteger, nullable=False, default=0)
+    total_estimado = Column(BigInteger)
+    criadas = Column(BigInteger, nullable=False, default=0)
+    atualizadas = Column(BigInteger, nullable=False, default=0)
+    ignoradas = Column(BigInteger, nullable=False, default=0)
+    erro = Column(Text)
+    iniciado_em = Column(DateTime)
+    atualizado_em = Column(DateTime)
+    concluido_em = Column(DateTime)
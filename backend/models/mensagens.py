@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, Enum, JSON
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, Enum, JSON, Index, UniqueConstraint, text
 from sqlalchemy.orm import relationship
 from backend.database import Base
 from datetime import datetime
@@ -18,6 +18,13 @@ class StatusMensagem(str, enum.Enum):
 
 class Mensagem(Base):
     __tablename__ = "mensagens"
+    __table_args__ = (
+        Index("ix_mensagens_remetente_destinatario_data", "remetente_id", "destinatario_id", "data_envio"),
+        Index(
+            "ix_mensagens_nao_lidas", "destinatario_id", "remetente_id",
+            postgresql_where=text("lida = false AND deletada = false")
+        ),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     remetente_id = Column(Integer, ForeignKey("usuarios.id"), nullable=False)
@@ -42,6 +49,30 @@ class Mensagem(Base):
     destinatario = relationship("Usuario", foreign_keys=[destinatario_id])
     resposta_para = relationship("Mensagem", remote_side=[id], backref="respostas")
 
+class ResumoConversa(Base):
+    """
+    Resumo de uma conversa do ponto de vista de usuario_id: última mensagem
+    não apagada trocada com outro_usuario_id e quantas mensagens dele ainda
+    não foram lidas. Mantido por backend.utils.conversas.
+    """
+    __tablename__ = "conversas_resumo"
+    __table_args__ = (
+        UniqueConstraint("usuario_id", "outro_usuario_id", name="uq_conversas_resumo_usuario_outro"),
+        Index("ix_conversas_resumo_usuario_data", "usuario_id", "data_ultima_mensagem"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    usuario_id = Column(Integer, ForeignKey("usuarios.id"), nullable=False)
+    outro_usuario_id = Column(Integer, ForeignKey("usuarios.id"), nullable=False)
+    ultima_mensagem_id = Column(Integer, ForeignKey("mensagens.id", ondelete="SET NULL"), nullable=True)
+    ultima_mensagem = Column(Text, nullable=True)
+    ultima_mensagem_tipo = Column(String(20), default="texto", nullable=True)
+    ultima_mensagem_minha = Column(Boolean, default=False, nullable=False)
+    data_ultima_mensagem = Column(DateTime, nullable=True)
+    nao_lidas = Column(Integer, default=0, nullable=False)
+    
+    outro_usuario = relationship("Usuario", foreign_keys=[outro_usuario_id])
+
 class StatusUsuario(Base):
     __tablename__ = "status_usuarios"
     
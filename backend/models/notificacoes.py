@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, Boolean, Enum
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, Boolean, Enum, Index
 from sqlalchemy.orm import relationship
 from backend.database import Base
 from datetime import datetime
@@ -13,6 +13,9 @@ class TipoNotificacao(str, enum.Enum):
 
 class Notificacao(Base):
     __tablename__ = "notificacoes"
+    __table_args__ = (
+        Index("ix_notificacoes_destino_lida_data", "usuario_destino_id", "lida", "data_criacao"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     tipo = Column(Enum(TipoNotificacao), nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Boolean, Float
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Boolean, Float, Index, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from backend.database import Base
@@ -22,6 +22,10 @@ class Stage(Base):
 class CompanyPipeline(Base):
     """Empresas no pipeline com estágio atual"""
     __tablename__ = "company_pipeline"
+    __table_args__ = (
+        Index("ix_company_pipeline_consultor_stage_ativo", "consultor_id", "stage_id", "ativo"),
+        Index("ix_company_pipeline_stage_ativos", "stage_id", postgresql_where=text("ativo = true")),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     empresa_id = Column(Integer, ForeignKey("empresas.id"), nullable=False)
@@ -116,6 +120,9 @@ class Attachment(Base):
 class Activity(Base):
     """Log de atividades do sistema"""
     __tablename__ = "activities"
+    __table_args__ = (
+        Index("ix_activities_usuario_criado", "usuario_id", "criado_em"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     usuario_id = Column(Integer, ForeignKey("usuarios.id"))
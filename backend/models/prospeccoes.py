@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Date, Time, Text, Boolean, event
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Date, Time, Text, Boolean, Index, event
 from sqlalchemy.orm import relationship
 from backend.database import Base
 from datetime import datetime
@@ -12,6 +12,10 @@ def gerar_codigo_prospeccao():
 
 class Prospeccao(Base):
     __tablename__ = "prospeccoes"
+    __table_args__ = (
+        Index("ix_prospeccoes_consultor_data", "consultor_id", "data_criacao"),
+        Index("ix_prospeccoes_empresa_data", "empresa_id", "data_criacao"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     codigo = Column(String(50), unique=True, index=True, nullable=False, default=gerar_codigo_prospeccao)
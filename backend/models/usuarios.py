@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Enum, Date, Text
+from sqlalchemy import Column, Integer, String, Enum, Date, DateTime, Text, ForeignKey
 from sqlalchemy.orm import relationship
 from backend.database import Base
 import enum
@@ -22,8 +22,19 @@ class Usuario(Base):
     placa_carro = Column(String(20), nullable=True, index=True)
     informacoes_basicas = Column(Text, nullable=True)
     foto_url = Column(String(500), nullable=True)
+    # Incrementado para invalidar todos os tokens emitidos (troca de senha, email ou tipo)
+    token_versao = Column(Integer, default=0, nullable=False, server_default="0")
     
     empresas_atribuidas = relationship("AtribuicaoEmpresa", back_populates="consultor")
     prospeccoes = relationship("Prospeccao", foreign_keys="Prospeccao.consultor_id")
     cronograma_projetos = relationship("CronogramaProjeto", back_populates="consultor", foreign_keys="CronogramaProjeto.consultor_id")
     eventos_cronograma = relationship("CronogramaEvento", back_populates="consultor", foreign_keys="CronogramaEvento.consultor_id")
+
+
+class TokenRevogado(Base):
+    """Tokens (jti) revogados antes de expirar, p.ex. no logout"""
+    __tablename__ = "tokens_revogados"
+
+    jti = Column(String(32), primary_key=True)
+    usuario_id = Column(Integer, ForeignKey("usuarios.id", ondelete="CASCADE"), nullable=True)
+    expira_em = Column(DateTime, nullable=False, index=True)
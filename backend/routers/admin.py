@@ -1,10 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse
 from sqlalchemy.orm import Session
 from typing import List
-from backend.database import get_db
+from backend.database import STATEMENT_TIMEOUT_MS, get_db
 from backend.models import Usuario, TipoUsuario
 from backend.schemas.usuarios import UsuarioCriar, UsuarioResposta, UsuarioAtualizar
-from backend.auth.security import obter_usuario_admin, obter_hash_senha
+from backend.auth.security import (
+    obter_usuario_admin, obter_hash_senha, obter_hash_senha_async, invalidar_cache_usuario,
+    cache_usuarios, revogar_tokens_usuario
+)
+from backend.utils.usuarios import inserir_usuario
+from backend.utils.perfilador import LENTAS_JANELA_SEGUNDOS, ler_perfil, listar_perfis, requisicoes_lentas
+from backend.utils.backfills import estado_backfills
+from backend.utils.duplicados_cnpj import duplicados_cnpj
+from backend.utils.consultas_lentas import (
+    CONSULTAS_LENTAS_EXPLAIN, CONSULTAS_LENTAS_MS, TEMPOS_LIMITE_PAPEIS, registro_consultas_lentas
+)
+import os
 
 router = APIRouter(prefix="/api/admin", tags=["Administração"])
 
@@ -17,28 +30,18 @@ def listar_usuarios(
     return usuarios
 
 @router.post("/usuarios", response_model=UsuarioResposta)
-def criar_usuario(
+async def criar_usuario(
     usuario: UsuarioCriar,
     db: Session = Depends(get_db),
     admin: Usuario = Depends(obter_usuario_admin)
 ):
-    db_usuario = db.query(Usuario).filter(Usuario.email == usuario.email).first()
-    if db_usuario:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Email já cadastrado"
-        )
-    
     novo_usuario = Usuario(
         nome=usuario.nome,
         email=usuario.email,
-        senha_hash=obter_hash_senha(usuario.senha),
+        senha_hash=await obter_hash_senha_async(usuario.senha),
         tipo=usuario.tipo if usuario.tipo else TipoUsuario.consultor
     )
-    db.add(novo_usuario)
-    db.commit()
-    db.refresh(novo_usuario)
-    return novo_usuario
+    return await run_in_threadpool(inserir_usuario, db, novo_usuario)
 
 @router.delete("/usuarios/{usuario_id}")
 def deletar_usuario(
@@ -61,6 +64,7 @@ def deletar_usuario(
     
     db.delete(usuario)
     db.commit()
+    invalidar_cache_usuario(usuario_id)
     return {"message": "Usuário deletado com sucesso"}
 
 @router.put("/usuarios/{usuario_id}/tipo")
@@ -84,7 +88,9 @@ def atualizar_tipo_usuario(
         )
     
     usuario.tipo = tipo
+    revogar_tokens_usuario(usuario)
     db.commit()
+    invalidar_cache_usuario(usuario_id)
     db.refresh(usuario)
     return usuario
 
@@ -110,6 +116,12 @@ def atualizar_usuario(
                 detail="Email já cadastrado"
             )
     
+    credenciais_alteradas = (
+        (usuario_data.email is not None and usuario_data.email != usuario.email)
+        or bool(usuario_data.senha)
+        or (usuario_data.tipo is not None and usuario_data.tipo != usuario.tipo)
+    )
+    
     if usuario_data.nome is not None:
         usuario.nome = usuario_data.nome
     if usuario_data.email is not None:
@@ -118,7 +130,79 @@ def atualizar_usuario(
         usuario.senha_hash = obter_hash_senha(usuario_data.senha)
     if usuario_data.tipo is not None:
         usuario.tipo = usuario_data.tipo
+    if credenciais_alteradas:
+        revogar_tokens_usuario(usuario)
     
     db.commit()
+    invalidar_cache_usuario(usuario_id)
     db.refresh(usuario)
     return usuario
+
+@router.get("/cache/usuarios")
+def estatisticas_cache_usuarios(
+    admin: Usuario = Depends(obter_usuario_admin)
+):
+    """Taxa de acerto do cache de usuários autenticados deste worker"""
+    return cache_usuarios.estatisticas()
+
+@router.get("/requisicoes-lentas")
+def listar_requisicoes_lentas(
+    admin: Usuario = Depends(obter_usuario_admin)
+):
+    """Requisições mais lentas por rota na janela recente, neste worker"""
+    return {
+        "pid": os.getpid(),
+        "janela_segundos": LENTAS_JANELA_SEGUNDOS,
+        "rotas": requisicoes_lentas.listar()
+    }
+
+@router.get("/consultas-lentas")
+def listar_consultas_lentas(
+    admin: Usuario = Depends(obter_usuario_admin)
+):
+    """Consultas SQL acima do limite e canceladas por statement_timeout, neste worker"""
+    return {
+        "pid": os.getpid(),
+        "limite_ms": CONSULTAS_LENTAS_MS,
+        "explain": CONSULTAS_LENTAS_EXPLAIN,
+        "statement_timeout_ms": {"padrao": STATEMENT_TIMEOUT_MS, **TEMPOS_LIMITE_PAPEIS},
+        "consultas": registro_consultas_lentas.listar()
+    }
+
+@router.get("/perfis")
+def listar_perfis_requisicoes(
+    admin: Usuario = Depends(obter_usuario_admin)
+):
+    """Perfis gravados com o header X-Perfil: 1, do mais recente ao mais antigo"""
+    return listar_perfis()
+
+@router.get("/perfis/{perfil_id}", response_class=PlainTextResponse)
+def baixar_perfil(
+    perfil_id: str,
+    admin: Usuario = Depends(obter_usuario_admin)
+):
+    """Perfil em collapsed stacks: abrir em speedscope.app ou passar para flamegraph.pl"""
+    conteudo = ler_perfil(perfil_id)
+    if conteudo is None:
+        raise HTTPException(status_code=404, detail="Perfil não encontrado")
+    return PlainTextResponse(
+        conteudo,
+        headers={"Content-Disposition": f"attachment; filename=perfil-{perfil_id}.txt"}
+    )
+
+@router.get("/backfills")
+def listar_backfills(
+    db: Session = Depends(get_db),
+    admin: Usuario = Depends(obter_usuario_admin)
+):
+    """Progresso dos backfills registrados (python -m backend.utils.backfills)"""
+    return estado_backfills(db.connection())
+
+@router.get("/empresas/cnpj-duplicados")
+def listar_cnpj_duplicados(
+    limite: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    admin: Usuario = Depends(obter_usuario_admin)
+):
+    """Empresas com o mesmo CNPJ gravado com grafias diferentes (python -m backend.utils.duplicados_cnpj)"""
+    return duplicados_cnpj(db.connection(), limite)
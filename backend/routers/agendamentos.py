@@ -4,9 +4,9 @@ from sqlalchemy import and_, or_
 from typing import List
 from datetime import datetime, date
 from backend.database import get_db
-from backend.models import Agendamento, Prospeccao, Usuario, StatusAgendamento
+from backend.models import Agendamento, Prospeccao, StatusAgendamento
 from backend.schemas.agendamentos import AgendamentoCriar, AgendamentoResposta, AgendamentoAtualizar
-from backend.auth.security import obter_usuario_atual
+from backend.auth.security import Identidade, obter_identidade
 
 router = APIRouter(prefix="/api/agendamentos", tags=["Agendamentos"])
 
@@ -14,7 +14,7 @@ router = APIRouter(prefix="/api/agendamentos", tags=["Agendamentos"])
 def criar_agendamento(
     agendamento: AgendamentoCriar,
     db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    usuario: Identidade = Depends(obter_identidade)
 ):
     prospeccao = db.query(Prospeccao).filter(Prospeccao.id == agendamento.prospeccao_id).first()
     if not prospeccao:
@@ -41,7 +41,7 @@ def listar_agendamentos(
     limit: int = 100,
     empresa_id: int = None,
     db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    usuario: Identidade = Depends(obter_identidade)
 ):
     query = db.query(Agendamento).join(Prospeccao)
     
@@ -57,7 +57,7 @@ def listar_agendamentos(
 @router.get("/alertas")
 def obter_alertas(
     db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    usuario: Identidade = Depends(obter_identidade)
 ):
     hoje = datetime.now().date()
     hoje_inicio = datetime.combine(hoje, datetime.min.time())
@@ -90,7 +90,7 @@ def atualizar_agendamento(
     agendamento_id: int,
     agendamento_atualizado: AgendamentoAtualizar,
     db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    usuario: Identidade = Depends(obter_identidade)
 ):
     agendamento = db.query(Agendamento).join(Prospeccao).filter(Agendamento.id == agendamento_id).first()
     if not agendamento:
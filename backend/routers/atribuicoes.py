@@ -3,7 +3,7 @@ from sqlalchemy.orm import Session, joinedload
 from backend.database import get_db
 from backend.models import AtribuicaoEmpresa, Usuario, Empresa
 from backend.schemas.atribuicoes import AtribuicaoEmpresaCreate, AtribuicaoEmpresaResponse, AtribuicaoEmpresaUpdate
-from backend.auth.security import obter_usuario_atual
+from backend.auth.security import Identidade, obter_identidade
 from typing import List
 from datetime import datetime
 
@@ -13,7 +13,7 @@ router = APIRouter(prefix="/api/atribuicoes", tags=["atribuicoes"])
 def atribuir_empresa(
     atribuicao: AtribuicaoEmpresaCreate,
     db: Session = Depends(get_db),
-    current_user: Usuario = Depends(obter_usuario_atual)
+    current_user: Identidade = Depends(obter_identidade)
 ):
     if current_user.tipo != "admin":
         raise HTTPException(status_code=403, detail="Apenas administradores podem atribuir empresas")
@@ -49,7 +49,7 @@ def atribuir_empresa(
 def listar_empresas_consultor(
     consultor_id: int,
     db: Session = Depends(get_db),
-    current_user: Usuario = Depends(obter_usuario_atual)
+    current_user: Identidade = Depends(obter_identidade)
 ):
     if current_user.tipo != "admin" and current_user.id != consultor_id:
         raise HTTPException(status_code=403, detail="Sem permissão para visualizar estas atribuições")
@@ -68,7 +68,7 @@ def atualizar_atribuicao(
     atribuicao_id: int,
     atribuicao_update: AtribuicaoEmpresaUpdate,
     db: Session = Depends(get_db),
-    current_user: Usuario = Depends(obter_usuario_atual)
+    current_user: Identidade = Depends(obter_identidade)
 ):
     if current_user.tipo != "admin":
         raise HTTPException(status_code=403, detail="Apenas administradores podem atualizar atribuições")
@@ -94,7 +94,7 @@ def atualizar_atribuicao(
 def remover_atribuicao(
     atribuicao_id: int,
     db: Session = Depends(get_db),
-    current_user: Usuario = Depends(obter_usuario_atual)
+    current_user: Identidade = Depends(obter_identidade)
 ):
     if current_user.tipo != "admin":
         raise HTTPException(status_code=403, detail="Apenas administradores podem remover atribuições")
@@ -114,7 +114,7 @@ def atribuir_empresas_lote(
     consultor_id: int,
     empresa_ids: List[int],
     db: Session = Depends(get_db),
-    current_user: Usuario = Depends(obter_usuario_atual)
+    current_user: Identidade = Depends(obter_identidade)
 ):
     if current_user.tipo != "admin":
         raise HTTPException(status_code=403, detail="Apenas administradores podem atribuir empresas")
@@ -1,50 +1,95 @@
+from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from sqlalchemy.orm import Session
 from backend.database import get_db
 from backend.models import Usuario, TipoUsuario
-from backend.schemas.usuarios import UsuarioCriar, UsuarioLogin, Token, UsuarioResposta
-from backend.auth.security import verificar_senha, obter_hash_senha, criar_token_acesso, obter_usuario_admin
+from backend.schemas.usuarios import UsuarioCriar, UsuarioLogin, Token, UsuarioResposta, TokenRenovar, TokenPar, Logout
+from backend.utils.usuarios import inserir_usuario
+from backend.auth.security import (
+    verificar_senha_async, obter_hash_senha_async, criar_tokens_usuario, obter_usuario_admin,
+    decodificar_token, revogar_token
+)
 
 router = APIRouter(prefix="/api/auth", tags=["Autenticação"])
 
+def _gravar(db: Session, objeto):
+    db.commit()
+    db.refresh(objeto)
+
+# Endpoints com bcrypt são async: o hash roda no executor de senhas
+# (backend/auth/senhas.py) e só o acesso ao banco usa o threadpool
+
 @router.post("/registro", response_model=UsuarioResposta)
-def registrar_usuario(
+async def registrar_usuario(
     usuario: UsuarioCriar,
     db: Session = Depends(get_db),
     admin: Usuario = Depends(obter_usuario_admin)
 ):
-    db_usuario = db.query(Usuario).filter(Usuario.email == usuario.email).first()
-    if db_usuario:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Email já cadastrado"
-        )
-    
-    senha_hash = obter_hash_senha(usuario.senha)
     novo_usuario = Usuario(
         nome=usuario.nome,
         email=usuario.email,
-        senha_hash=senha_hash,
+        senha_hash=await obter_hash_senha_async(usuario.senha),
         tipo=usuario.tipo if usuario.tipo else TipoUsuario.consultor
     )
-    db.add(novo_usuario)
-    db.commit()
-    db.refresh(novo_usuario)
-    return novo_usuario
+    return await run_in_threadpool(inserir_usuario, db, novo_usuario)
 
 @router.post("/login", response_model=Token)
-def login(credenciais: UsuarioLogin, db: Session = Depends(get_db)):
-    usuario = db.query(Usuario).filter(Usuario.email == credenciais.email).first()
-    if not usuario or not verificar_senha(credenciais.senha, usuario.senha_hash):
+async def login(credenciais: UsuarioLogin, db: Session = Depends(get_db)):
+    usuario = await run_in_threadpool(
+        lambda: db.query(Usuario).filter(Usuario.email == credenciais.email).first()
+    )
+    senha_valida, novo_hash = await verificar_senha_async(
+        credenciais.senha, usuario.senha_hash if usuario else None
+    )
+    if not senha_valida:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Email ou senha incorretos",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    access_token = criar_token_acesso(data={"sub": usuario.email})
+    if novo_hash:
+        # Hash gravado com outro BCRYPT_ROUNDS: regrava com o custo atual
+        usuario.senha_hash = novo_hash
+        await run_in_threadpool(_gravar, db, usuario)
+    
     return {
-        "access_token": access_token,
-        "token_type": "bearer",
+        **criar_tokens_usuario(usuario),
         "usuario": usuario
     }
+
+@router.post("/refresh", response_model=TokenPar)
+def renovar_token(dados: TokenRenovar, db: Session = Depends(get_db)):
+    """Troca um refresh token válido por um novo par (o refresh usado é revogado)"""
+    payload = decodificar_token(dados.refresh_token, tipo_esperado="refresh")
+    usuario = db.query(Usuario).filter(Usuario.id == payload["id"]).first() if payload else None
+    if not usuario:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Sessão expirada, faça login novamente",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    revogar_token(db, payload)
+    db.commit()
+    return criar_tokens_usuario(usuario)
+
+@router.post("/logout")
+def logout(
+    dados: Optional[Logout] = None,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(HTTPBearer(auto_error=False)),
+    db: Session = Depends(get_db)
+):
+    """Revoga o access token enviado no header e, se informado, o refresh token"""
+    if credentials:
+        payload = decodificar_token(credentials.credentials)
+        if payload:
+            revogar_token(db, payload)
+    if dados and dados.refresh_token:
+        payload = decodificar_token(dados.refresh_token, tipo_esperado="refresh")
+        if payload:
+            revogar_token(db, payload)
+    db.commit()
+    return {"message": "Logout realizado com sucesso"}
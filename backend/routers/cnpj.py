@@ -1,12 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.encoders import jsonable_encoder
 from sqlalchemy.orm import Session
-import httpx
 import re
 from typing import Optional
 from backend.database import get_db
-from backend.models import Empresa, Usuario
-from backend.auth.security import obter_usuario_atual
+from backend.models import Empresa
+from backend.auth.security import Identidade, obter_identidade
+from backend.utils.importar_empresas import digitos_cnpj
 from pydantic import BaseModel
 
 router = APIRouter(prefix="/api/cnpj", tags=["CNPJ"])
@@ -33,9 +33,14 @@ class EmpresaCNPJ(BaseModel):
 def limpar_cnpj(cnpj: str) -> str:
     return re.sub(r'[^0-9]', '', cnpj)
 
+def _cliente_http():
+    # httpx (e httpcore/certifi) só é importado na primeira consulta externa
+    import httpx
+    return httpx.AsyncClient(timeout=10.0)
+
 async def buscar_receitaws(cnpj: str) -> Optional[dict]:
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
+        async with _cliente_http() as client:
             response = await client.get(f"https://www.receitaws.com.br/v1/cnpj/{cnpj}")
             if response.status_code == 200:
                 data = response.json()
@@ -66,7 +71,7 @@ async def buscar_receitaws(cnpj: str) -> Optional[dict]:
 
 async def buscar_brasilapi(cnpj: str) -> Optional[dict]:
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
+        async with _cliente_http() as client:
             response = await client.get(f"https://brasilapi.com.br/api/cnpj/v1/{cnpj}")
             if response.status_code == 200:
                 data = response.json()
@@ -96,7 +101,7 @@ async def buscar_brasilapi(cnpj: str) -> Optional[dict]:
 
 async def buscar_cnpja(cnpj: str) -> Optional[dict]:
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
+        async with _cliente_http() as client:
             response = await client.get(f"https://publica.cnpj.ws/cnpj/{cnpj}")
             if response.status_code == 200:
                 data = response.json()
@@ -135,7 +140,7 @@ async def buscar_cnpja(cnpj: str) -> Optional[dict]:
 @router.get("/buscar/{cnpj}")
 async def buscar_empresa_cnpj(
     cnpj: str,
-    usuario: Usuario = Depends(obter_usuario_atual)
+    usuario: Identidade = Depends(obter_identidade)
 ):
     cnpj_limpo = limpar_cnpj(cnpj)
     
@@ -159,14 +164,15 @@ async def buscar_empresa_cnpj(
     return resultado
 
 @router.post("/salvar")
-async def salvar_empresa_cnpj(
+def salvar_empresa_cnpj(
     empresa_data: EmpresaCNPJ,
     db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    usuario: Identidade = Depends(obter_identidade)
 ):
     cnpj_limpo = limpar_cnpj(empresa_data.cnpj)
     
-    empresa_existente = db.query(Empresa).filter(Empresa.cnpj == cnpj_limpo).first()
+    digitos = digitos_cnpj(cnpj_limpo)
+    empresa_existente = digitos and db.query(Empresa.id).filter(Empresa.cnpj_digits == digitos).first()
     if empresa_existente:
         raise HTTPException(
             status_code=400,
@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import func
 from typing import List
@@ -6,8 +7,12 @@ from backend.database import get_db
 from backend.models import Usuario, Prospeccao
 from backend.schemas.usuarios import ConsultorPerfil, UsuarioAtualizar, UsuarioCriar
 from backend.schemas.prospeccoes import ProspeccaoResposta
-from backend.auth.security import obter_usuario_atual, obter_usuario_admin, obter_hash_senha
+from backend.auth.security import (
+    obter_usuario_atual, obter_usuario_admin, obter_hash_senha, obter_hash_senha_async, invalidar_cache_usuario,
+    revogar_tokens_usuario, criar_tokens_usuario
+)
 from backend.models.usuarios import TipoUsuario
+from backend.utils.usuarios import inserir_usuario
 
 router = APIRouter(prefix="/api/consultores", tags=["Consultores"])
 
@@ -138,18 +143,30 @@ def atualizar_meu_perfil(
             detail="Usuário não encontrado"
         )
     
-    for key, value in dados.model_dump(exclude_unset=True).items():
+    alteracoes = dados.model_dump(exclude_unset=True)
+    credenciais_alteradas = bool(alteracoes.get("senha")) or (
+        alteracoes.get("email") is not None and alteracoes["email"] != consultor.email
+    )
+    
+    for key, value in alteracoes.items():
         if key == "senha" and value:
             setattr(consultor, "senha_hash", obter_hash_senha(value))
         elif key == "tipo":
             continue
         else:
             setattr(consultor, key, value)
+    if credenciais_alteradas:
+        revogar_tokens_usuario(consultor)
     
     db.commit()
+    invalidar_cache_usuario(usuario.id)
     db.refresh(consultor)
     
+    # Os tokens atuais deixaram de valer: o próprio usuário recebe um novo par
+    tokens = criar_tokens_usuario(consultor) if credenciais_alteradas else {}
+    
     return {
+        **tokens,
         "id": consultor.id,
         "nome": consultor.nome,
         "email": consultor.email,
@@ -177,13 +194,23 @@ def atualizar_consultor(
             detail="Consultor não encontrado"
         )
     
-    for key, value in dados.model_dump(exclude_unset=True).items():
+    alteracoes = dados.model_dump(exclude_unset=True)
+    credenciais_alteradas = (
+        bool(alteracoes.get("senha"))
+        or (alteracoes.get("email") is not None and alteracoes["email"] != consultor.email)
+        or (alteracoes.get("tipo") is not None and alteracoes["tipo"] != consultor.tipo)
+    )
+    
+    for key, value in alteracoes.items():
         if key == "senha" and value:
             setattr(consultor, "senha_hash", obter_hash_senha(value))
         else:
             setattr(consultor, key, value)
+    if credenciais_alteradas:
+        revogar_tokens_usuario(consultor)
     
     db.commit()
+    invalidar_cache_usuario(consultor_id)
     db.refresh(consultor)
     
     return {
@@ -200,28 +227,17 @@ def atualizar_consultor(
     }
 
 @router.post("/")
-def criar_consultor(
+async def criar_consultor(
     dados: UsuarioCriar,
     db: Session = Depends(get_db),
     usuario: Usuario = Depends(obter_usuario_admin)
 ):
-    usuario_existente = db.query(Usuario).filter(Usuario.email == dados.email).first()
-    if usuario_existente:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Email já cadastrado"
-        )
-    
-    novo_consultor = Usuario(
+    novo_consultor = await run_in_threadpool(inserir_usuario, db, Usuario(
         nome=dados.nome,
         email=dados.email,
-        senha_hash=obter_hash_senha(dados.senha),
+        senha_hash=await obter_hash_senha_async(dados.senha),
         tipo=TipoUsuario.consultor
-    )
-    
-    db.add(novo_consultor)
-    db.commit()
-    db.refresh(novo_consultor)
+    ))
     
     return {
         "id": novo_consultor.id,
@@ -259,5 +275,6 @@ def excluir_consultor(
     
     db.delete(consultor)
     db.commit()
+    invalidar_cache_usuario(consultor_id)
     
     return {"message": "Consultor excluído com sucesso"}
@@ -3,7 +3,7 @@ from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import and_, or_
 from typing import List, Optional
 from datetime import date, datetime
-from backend.database import get_db
+from backend.database import get_db, get_read_db
 from backend.models import CronogramaProjeto, CronogramaAtividade, CronogramaEvento, Usuario, Empresa, CategoriaEvento, PeriodoEvento
 from backend.schemas.cronograma import (
     CronogramaProjetoCriar, CronogramaProjetoResposta, CronogramaProjetoAtualizar,
@@ -11,7 +11,7 @@ from backend.schemas.cronograma import (
     CronogramaEventoCriar, CronogramaEventoResposta, CronogramaEventoAtualizar,
     EventoCalendario, TimelineItem
 )
-from backend.auth.security import obter_usuario_atual
+from backend.auth.security import Identidade, obter_identidade
 
 CATEGORIA_CORES = {
     "C": {"nome": "Consultoria", "cor": "#22c55e"},
@@ -36,7 +36,7 @@ def listar_projetos(
     page: int = Query(1, ge=1),
     page_size: int = Query(50, ge=1, le=200),
     db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    usuario: Identidade = Depends(obter_identidade)
 ):
     query = db.query(CronogramaProjeto)
     
@@ -66,7 +66,7 @@ def listar_projetos(
 def obter_projeto(
     projeto_id: int,
     db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    usuario: Identidade = Depends(obter_identidade)
 ):
     projeto = db.query(CronogramaProjeto).filter(CronogramaProjeto.id == projeto_id).first()
     
@@ -83,7 +83,7 @@ def obter_projeto(
 def criar_projeto(
     projeto: CronogramaProjetoCriar,
     db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    usuario: Identidade = Depends(obter_identidade)
 ):
     novo_projeto = CronogramaProjeto(**projeto.model_dump())
     
@@ -99,7 +99,7 @@ def atualizar_projeto(
     projeto_id: int,
     dados: CronogramaProjetoAtualizar,
     db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    usuario: Identidade = Depends(obter_identidade)
 ):
     projeto = db.query(CronogramaProjeto).filter(CronogramaProjeto.id == projeto_id).first()
     
@@ -124,7 +124,7 @@ def atualizar_projeto(
 def deletar_projeto(
     projeto_id: int,
     db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    usuario: Identidade = Depends(obter_identidade)
 ):
     projeto = db.query(CronogramaProjeto).filter(CronogramaProjeto.id == projeto_id).first()
     
@@ -146,7 +146,7 @@ def listar_atividades(
     responsavel_id: Optional[int] = None,
     status: Optional[str] = None,
     db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    usuario: Identidade = Depends(obter_identidade)
 ):
     query = db.query(CronogramaAtividade)
     
@@ -168,7 +168,7 @@ def listar_atividades(
 def criar_atividade(
     atividade: CronogramaAtividadeCriar,
     db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    usuario: Identidade = Depends(obter_identidade)
 ):
     projeto = db.query(CronogramaProjeto).filter(CronogramaProjeto.id == atividade.projeto_id).first()
     if not projeto:
@@ -191,7 +191,7 @@ def atualizar_atividade(
     atividade_id: int,
     dados: CronogramaAtividadeAtualizar,
     db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    usuario: Identidade = Depends(obter_identidade)
 ):
     atividade = db.query(CronogramaAtividade).filter(CronogramaAtividade.id == atividade_id).first()
     
@@ -216,7 +216,7 @@ def atualizar_atividade(
 def deletar_atividade(
     atividade_id: int,
     db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    usuario: Identidade = Depends(obter_identidade)
 ):
     atividade = db.query(CronogramaAtividade).filter(CronogramaAtividade.id == atividade_id).first()
     
@@ -238,8 +238,8 @@ def obter_timeline(
     empresa_id: Optional[int] = None,
     data_inicio: Optional[date] = None,
     data_fim: Optional[date] = None,
-    db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    db: Session = Depends(get_read_db),
+    usuario: Identidade = Depends(obter_identidade)
 ):
     query = db.query(CronogramaProjeto).options(
         joinedload(CronogramaProjeto.empresa),
@@ -291,8 +291,8 @@ def listar_eventos(
     data_inicio: Optional[date] = None,
     data_fim: Optional[date] = None,
     categoria: Optional[str] = None,
-    db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    db: Session = Depends(get_read_db),
+    usuario: Identidade = Depends(obter_identidade)
 ):
     query = db.query(CronogramaEvento).options(
         joinedload(CronogramaEvento.consultor)
@@ -341,7 +341,7 @@ def listar_eventos(
 def obter_evento(
     evento_id: int,
     db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    usuario: Identidade = Depends(obter_identidade)
 ):
     evento = db.query(CronogramaEvento).options(
         joinedload(CronogramaEvento.consultor)
@@ -360,7 +360,7 @@ def obter_evento(
 def criar_evento(
     evento: CronogramaEventoCriar,
     db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    usuario: Identidade = Depends(obter_identidade)
 ):
     consultor = db.query(Usuario).filter(Usuario.id == evento.consultor_id).first()
     if not consultor:
@@ -383,7 +383,7 @@ def atualizar_evento(
     evento_id: int,
     dados: CronogramaEventoAtualizar,
     db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    usuario: Identidade = Depends(obter_identidade)
 ):
     evento = db.query(CronogramaEvento).filter(CronogramaEvento.id == evento_id).first()
     
@@ -416,7 +416,7 @@ def atualizar_evento(
 def deletar_evento(
     evento_id: int,
     db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    usuario: Identidade = Depends(obter_identidade)
 ):
     evento = db.query(CronogramaEvento).filter(CronogramaEvento.id == evento_id).first()
     
@@ -434,7 +434,7 @@ def deletar_evento(
 
 @router.get("/categorias")
 def listar_categorias(
-    usuario: Usuario = Depends(obter_usuario_atual)
+    usuario: Identidade = Depends(obter_identidade)
 ):
     return [
         {"codigo": k, "nome": v["nome"], "cor": v["cor"]}
@@ -1,91 +1,90 @@
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
-from backend.database import get_db
-from backend.models import Empresa, Prospeccao, Agendamento, Usuario, StatusAgendamento
-from backend.auth.security import obter_usuario_atual
+from backend.database import get_read_async_db
+from backend.models import Empresa, Prospeccao, Agendamento, AtribuicaoEmpresa, Usuario, StatusAgendamento
+from backend.auth.security import Identidade, obter_identidade
 
 router = APIRouter(prefix="/api/dashboard", tags=["Dashboard"])
 
 @router.get("/stats")
-def obter_estatisticas(
-    db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+async def obter_estatisticas(
+    db: AsyncSession = Depends(get_read_async_db),
+    usuario: Identidade = Depends(obter_identidade)
 ):
     hoje = datetime.now().date()
     hoje_inicio = datetime.combine(hoje, datetime.min.time())
     hoje_fim = datetime.combine(hoje, datetime.max.time())
     
     if usuario.tipo == "admin":
-        total_empresas = db.query(func.count(Empresa.id)).scalar()
-        total_prospeccoes = db.query(func.count(Prospeccao.id)).scalar()
+        total_empresas = await db.scalar(select(func.count(Empresa.id)))
+        total_prospeccoes = await db.scalar(select(func.count(Prospeccao.id)))
         
-        prospeccoes_query = db.query(Prospeccao)
-        agendamentos_query = db.query(Agendamento)
-        empresas_query = db.query(Empresa)
+        agendamentos_query = select(Agendamento)
     else:
-        from backend.models import AtribuicaoEmpresa
-        empresas_atribuidas_ids = db.query(AtribuicaoEmpresa.empresa_id).filter(
-            AtribuicaoEmpresa.consultor_id == usuario.id
-        ).all()
-        empresas_ids = [emp[0] for emp in empresas_atribuidas_ids]
+        empresas_ids = (await db.execute(
+            select(AtribuicaoEmpresa.empresa_id).where(AtribuicaoEmpresa.consultor_id == usuario.id)
+        )).scalars().all()
         
         total_empresas = len(empresas_ids)
-        total_prospeccoes = db.query(func.count(Prospeccao.id)).filter(
-            Prospeccao.consultor_id == usuario.id
-        ).scalar()
+        total_prospeccoes = await db.scalar(
+            select(func.count(Prospeccao.id)).where(Prospeccao.consultor_id == usuario.id)
+        )
         
-        prospeccoes_query = db.query(Prospeccao).filter(Prospeccao.consultor_id == usuario.id)
-        agendamentos_query = db.query(Agendamento).join(Prospeccao).filter(
+        agendamentos_query = select(Agendamento).join(Prospeccao).where(
             Prospeccao.consultor_id == usuario.id
         )
-        empresas_query = db.query(Empresa).filter(Empresa.id.in_(empresas_ids)) if empresas_ids else None
     
     prospeccoes_por_resultado = {}
-    if prospeccoes_query:
-        resultados = db.query(
-            Prospeccao.resultado,
-            func.count(Prospeccao.id)
-        ).filter(Prospeccao.resultado.isnot(None))
-        
-        if usuario.tipo != "admin":
-            resultados = resultados.filter(Prospeccao.consultor_id == usuario.id)
-        
-        resultados = resultados.group_by(Prospeccao.resultado).all()
-        
-        for resultado, count in resultados:
-            prospeccoes_por_resultado[resultado] = count
+    resultados = select(
+        Prospeccao.resultado,
+        func.count(Prospeccao.id)
+    ).where(Prospeccao.resultado.isnot(None))
+    
+    if usuario.tipo != "admin":
+        resultados = resultados.where(Prospeccao.consultor_id == usuario.id)
     
-    agendamentos_pendentes = agendamentos_query.filter(
+    for resultado, count in (await db.execute(resultados.group_by(Prospeccao.resultado))).all():
+        prospeccoes_por_resultado[resultado] = count
+    
+    agendamentos_pendentes = agendamentos_query.where(
         Agendamento.status == StatusAgendamento.pendente
     )
     
-    vencidos = agendamentos_pendentes.filter(Agendamento.data_agendada < hoje_inicio).all()
-    hoje_agendamentos = agendamentos_pendentes.filter(
-        Agendamento.data_agendada >= hoje_inicio,
-        Agendamento.data_agendada <= hoje_fim
-    ).all()
-    futuros = agendamentos_pendentes.filter(Agendamento.data_agendada > hoje_fim).all()
+    vencidos = (await db.execute(
+        agendamentos_pendentes.where(Agendamento.data_agendada < hoje_inicio)
+    )).scalars().all()
+    hoje_agendamentos = (await db.execute(
+        agendamentos_pendentes.where(
+            Agendamento.data_agendada >= hoje_inicio,
+            Agendamento.data_agendada <= hoje_fim
+        )
+    )).scalars().all()
+    futuros = (await db.execute(
+        agendamentos_pendentes.where(Agendamento.data_agendada > hoje_fim)
+    )).scalars().all()
     
     total_agendamentos = len(vencidos) + len(hoje_agendamentos) + len(futuros)
     
     empresas_por_consultor = {}
     if usuario.tipo == "admin":
-        from backend.models import AtribuicaoEmpresa
-        consultores_stats = db.query(
-            Usuario.nome,
-            func.count(AtribuicaoEmpresa.empresa_id)
-        ).join(
-            AtribuicaoEmpresa, Usuario.id == AtribuicaoEmpresa.consultor_id
-        ).filter(
-            Usuario.tipo == "consultor"
-        ).group_by(Usuario.id, Usuario.nome).all()
+        consultores_stats = (await db.execute(
+            select(
+                Usuario.nome,
+                func.count(AtribuicaoEmpresa.empresa_id)
+            ).join(
+                AtribuicaoEmpresa, Usuario.id == AtribuicaoEmpresa.consultor_id
+            ).where(
+                Usuario.tipo == "consultor"
+            ).group_by(Usuario.id, Usuario.nome)
+        )).all()
         
         for nome, count in consultores_stats:
             empresas_por_consultor[nome] = count
     else:
-        empresas_por_consultor[usuario.nome] = total_empresas
+        nome = await db.scalar(select(Usuario.nome).where(Usuario.id == usuario.id))
+        empresas_por_consultor[nome] = total_empresas
     
     empresas_por_consultor = dict(sorted(empresas_por_consultor.items(), key=lambda x: x[1], reverse=True))
     
@@ -1,24 +1,47 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, UploadFile, File
+from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, select, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List, Optional
-from backend.database import get_db
-from backend.models import Empresa, Usuario
-from backend.schemas.empresas import EmpresaCriar, EmpresaResposta, EmpresaAtualizar
-from backend.auth.security import obter_usuario_atual, obter_usuario_admin
-import openpyxl
-from io import BytesIO
+from starlette.background import BackgroundTask
+from typing import List, Literal, Optional
 from datetime import datetime
+import asyncio
+import base64
+import json
+import os
+import shutil
+import tempfile
+from backend.database import SessionLocal, get_db, get_async_db, get_read_async_db, fabrica_leitura_async
+from backend.models import Empresa, ImportacaoEmpresas
+from backend.schemas.empresas import (
+    EmpresaCriar, EmpresaResposta, EmpresaAtualizar, EmpresaItemLista, EmpresaBuscaItem, EmpresaSugestao,
+    ImportacaoEmpresasResposta
+)
+from backend.auth.security import Identidade, obter_identidade, obter_identidade_admin
+from backend.utils.busca_empresas import busca_indexada, consultas_busca, filtrar_empresas
+from backend.utils.cache import CacheTTL
+from backend.utils.executores import executar_cpu
+from backend.utils.exportar_empresas import gerar_csv_empresas, gerar_xlsx_empresas
+from backend.utils.importar_empresas import caminho_importacao, digitos_cnpj, importar_planilha_empresas
+from backend.utils.sugestoes_empresas import avisar_alteracao, indice_sugestoes
 
 router = APIRouter(prefix="/api/empresas", tags=["Empresas"])
 
+# Contagens com filtro reaproveitadas pela listagem com total estimado
+CONTAGEM_TTL = float(os.getenv("EMPRESAS_CONTAGEM_TTL", "60"))
+cache_contagens = CacheTTL(tamanho_maximo=512, ttl_segundos=CONTAGEM_TTL, nome="contagem_empresas")
+
 @router.post("/", response_model=EmpresaResposta)
 def criar_empresa(
     empresa: EmpresaCriar,
     db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_admin)
+    usuario: Identidade = Depends(obter_identidade_admin)
 ):
-    if empresa.cnpj:
-        db_empresa = db.query(Empresa).filter(Empresa.cnpj == empresa.cnpj).first()
+    digitos = digitos_cnpj(empresa.cnpj)
+    if digitos:
+        db_empresa = db.query(Empresa.id).filter(Empresa.cnpj_digits == digitos).first()
         if db_empresa:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -28,11 +51,45 @@ def criar_empresa(
     nova_empresa = Empresa(**empresa.model_dump())
     db.add(nova_empresa)
     db.commit()
+    cache_contagens.limpar()
+    avisar_alteracao()
     db.refresh(nova_empresa)
     return nova_empresa
 
+def _codificar_cursor(empresa: str, empresa_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([empresa, empresa_id]).encode()).decode().rstrip("=")
+
+def _decodificar_cursor(cursor: str) -> tuple:
+    try:
+        empresa, empresa_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(empresa, str) or not isinstance(empresa_id, int):
+            raise ValueError
+        return empresa, empresa_id
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor inválido")
+
+async def _contar_empresas(db: AsyncSession, query, filtros: tuple, exata: bool) -> tuple:
+    """
+    (total, estimado). Sem filtros a estimativa vem do reltuples do ANALYZE;
+    com filtros, do COUNT exato guardado por CONTAGEM_TTL segundos para a
+    mesma combinação de filtros, assim as páginas seguintes não contam de novo.
+    """
+    contar = select(func.count()).select_from(query.subquery())
+    if exata:
+        return await db.scalar(contar), False
+    if not any(filtros):
+        estimativa = await db.scalar(text("SELECT reltuples::bigint FROM pg_class WHERE oid = 'empresas'::regclass"))
+        # -1 (ou 0) enquanto a tabela nunca passou por ANALYZE
+        if estimativa and estimativa > 0:
+            return estimativa, True
+    total = cache_contagens.obter(filtros)
+    if total is None:
+        total = await db.scalar(contar)
+        cache_contagens.definir(filtros, total)
+    return total, True
+
 @router.get("/")
-def listar_empresas(
+async def listar_empresas(
     page: int = Query(1, ge=1, description="Número da página"),
     page_size: int = Query(20, ge=1, le=100, description="Items por página"),
     nome: Optional[str] = None,
@@ -40,46 +97,146 @@ def listar_empresas(
     municipio: Optional[str] = None,
     er: Optional[str] = None,
     carteira: Optional[str] = None,
-    db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    cursor: Optional[str] = Query(None, description="next_cursor da página anterior; vazio para a primeira página"),
+    contagem: Optional[Literal["exata", "estimada"]] = Query(
+        None, description="Padrão: exata na paginação por página, estimada na por cursor"
+    ),
+    db: AsyncSession = Depends(get_read_async_db),
+    usuario: Identidade = Depends(obter_identidade)
 ):
-    query = db.query(Empresa)
-    
-    if nome:
-        query = query.filter(Empresa.empresa.ilike(f"%{nome}%"))
-    if cnpj:
-        query = query.filter(Empresa.cnpj.ilike(f"%{cnpj}%"))
-    if municipio:
-        query = query.filter(Empresa.municipio.ilike(f"%{municipio}%"))
-    if er:
-        query = query.filter(Empresa.er == er)
-    if carteira:
-        query = query.filter(Empresa.carteira == carteira)
-    
-    total_count = query.count()
-    total_pages = (total_count + page_size - 1) // page_size
-    
-    skip = (page - 1) * page_size
-    empresas = query.offset(skip).limit(page_size).all()
-    
-    from backend.schemas.empresas import EmpresaResposta
-    items_safe = [EmpresaResposta.model_validate(e) for e in empresas]
-    
+    """
+    Duas formas de paginar, sempre em ordem de (empresa, id):
+    - `page`/`page_size`: OFFSET, com EmpresaResposta completa e total exato;
+    - `cursor` (vazio na primeira página, depois o `next_cursor` recebido):
+      keyset pelo índice ix_empresas_empresa_id, custo igual em qualquer
+      profundidade, só as colunas da listagem e total estimado.
+    """
+    filtros = (nome, cnpj, municipio, er, carteira)
+
+    if cursor is None:
+        query = filtrar_empresas(select(Empresa), *filtros)
+        total_count, estimado = await _contar_empresas(db, query, filtros, contagem != "estimada")
+        total_pages = (total_count + page_size - 1) // page_size
+
+        skip = (page - 1) * page_size
+        empresas = (await db.execute(
+            query.order_by(Empresa.empresa, Empresa.id).offset(skip).limit(page_size)
+        )).scalars().all()
+
+        items_safe = [EmpresaResposta.model_validate(e) for e in empresas]
+
+        return {
+            "items": items_safe,
+            "total_count": total_count,
+            "total_estimado": estimado,
+            "page": page,
+            "page_size": page_size,
+            "total_pages": total_pages
+        }
+
+    colunas = [getattr(Empresa, campo) for campo in EmpresaItemLista.model_fields]
+    query = filtrar_empresas(select(*colunas), *filtros)
+    total_count, estimado = await _contar_empresas(db, query, filtros, contagem == "exata")
+
+    pagina = query
+    if cursor:
+        pagina = pagina.where(tuple_(Empresa.empresa, Empresa.id) > tuple_(*_decodificar_cursor(cursor)))
+    # Uma linha a mais só para saber se existe próxima página
+    linhas = (await db.execute(
+        pagina.order_by(Empresa.empresa, Empresa.id).limit(page_size + 1)
+    )).all()
+    proxima = len(linhas) > page_size
+    linhas = linhas[:page_size]
+
     return {
-        "items": items_safe,
+        "items": [EmpresaItemLista.model_validate(linha._mapping) for linha in linhas],
+        "next_cursor": _codificar_cursor(linhas[-1].empresa, linhas[-1].id) if proxima else None,
         "total_count": total_count,
-        "page": page,
-        "page_size": page_size,
-        "total_pages": total_pages
+        "total_estimado": estimado,
+        "page_size": page_size
     }
 
+@router.get("/busca", response_model=List[EmpresaBuscaItem])
+async def buscar_empresas(
+    q: str = Query(..., min_length=2, max_length=100, description="Nome, sigla ou CNPJ (com ou sem pontuação)"),
+    municipio: Optional[str] = Query(None, max_length=100),
+    limite: int = Query(20, ge=1, le=50),
+    db: AsyncSession = Depends(get_read_async_db),
+    usuario: Identidade = Depends(obter_identidade)
+):
+    """Busca sem acento e tolerante a erros de digitação, ordenada por relevância"""
+    linhas = await _buscar(db, q.strip(), municipio, limite)
+    return [EmpresaBuscaItem.model_validate(linha._mapping) for linha in linhas]
+
+async def _buscar(db: AsyncSession, termo: str, municipio: Optional[str], limite: int) -> list:
+    indexada = await busca_indexada(db)
+    linhas = []
+    # Camadas em ordem de relevância; as mais caras só rodam se faltar resultado
+    for query in consultas_busca(termo, municipio, limite, indexada):
+        linhas += (await db.execute(query)).all()[:limite - len(linhas)]
+        if len(linhas) >= limite:
+            break
+    return linhas
+
+@router.get("/sugestoes", response_model=List[EmpresaSugestao])
+async def sugerir_empresas(
+    q: str = Query(..., min_length=2, max_length=100, description="Começo do nome, de uma palavra do nome, da sigla ou do CNPJ"),
+    limite: int = Query(10, ge=1, le=20),
+    db: AsyncSession = Depends(get_read_async_db),
+    usuario: Identidade = Depends(obter_identidade)
+):
+    """Autocomplete servido do índice em memória do worker; vai ao banco só antes da primeira carga"""
+    if indice_sugestoes.pronto:
+        return indice_sugestoes.sugerir(q.strip(), limite)
+    return [EmpresaSugestao.model_validate(linha._mapping) for linha in await _buscar(db, q.strip(), None, limite)]
+
+@router.get("/exportar")
+async def exportar_empresas(
+    request: Request,
+    formato: Literal["csv", "xlsx"] = "csv",
+    nome: Optional[str] = None,
+    cnpj: Optional[str] = None,
+    municipio: Optional[str] = None,
+    er: Optional[str] = None,
+    carteira: Optional[str] = None,
+    usuario: Identidade = Depends(obter_identidade_admin)
+):
+    """
+    Carteira inteira (ou filtrada como na listagem) em CSV, enviado enquanto
+    a consulta roda, ou XLSX, montado no pool de processos e enviado pronto.
+    """
+    filtros = (nome, cnpj, municipio, er, carteira)
+    filename = f"empresas_{datetime.now().strftime('%Y%m%d_%H%M')}.{formato}"
+    
+    if formato == "csv":
+        return StreamingResponse(
+            gerar_csv_empresas(fabrica_leitura_async(request), filtros),
+            media_type="text/csv",
+            headers={"Content-Disposition": f"attachment; filename={filename}"}
+        )
+    
+    descritor, caminho = tempfile.mkstemp(suffix=".xlsx")
+    os.close(descritor)
+    try:
+        # openpyxl só é importado nos processos do pool
+        await executar_cpu(gerar_xlsx_empresas, filtros, caminho)
+    except Exception:
+        os.remove(caminho)
+        raise
+    return FileResponse(
+        caminho,
+        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        filename=filename,
+        background=BackgroundTask(os.remove, caminho)
+    )
+
 @router.get("/{empresa_id}", response_model=EmpresaResposta)
-def obter_empresa(
+async def obter_empresa(
     empresa_id: int,
-    db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    db: AsyncSession = Depends(get_async_db),
+    usuario: Identidade = Depends(obter_identidade)
 ):
-    empresa = db.query(Empresa).filter(Empresa.id == empresa_id).first()
+    empresa = await db.get(Empresa, empresa_id)
     if not empresa:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -87,11 +244,28 @@ def obter_empresa(
         )
     return empresa
 
+@router.get("/{empresa_id}/mesma-raiz", response_model=List[EmpresaItemLista])
+async def listar_empresas_mesma_raiz(
+    empresa_id: int,
+    db: AsyncSession = Depends(get_read_async_db),
+    usuario: Identidade = Depends(obter_identidade)
+):
+    """Matriz e filiais: as outras empresas com a mesma raiz de CNPJ (8 primeiros dígitos), em ordem de CNPJ"""
+    raiz = await db.scalar(select(Empresa.cnpj_raiz).where(Empresa.id == empresa_id))
+    if raiz is None:
+        return []
+    linhas = (await db.execute(
+        select(
+            Empresa.id, Empresa.empresa, Empresa.sigla, Empresa.cnpj, Empresa.municipio, Empresa.er, Empresa.carteira
+        ).where(Empresa.cnpj_raiz == raiz, Empresa.id != empresa_id).order_by(Empresa.cnpj_digits, Empresa.id)
+    )).all()
+    return [EmpresaItemLista.model_validate(linha._mapping) for linha in linhas]
+
 @router.get("/{empresa_id}/ultimo-contato")
 def obter_ultimo_contato(
     empresa_id: int,
     db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    usuario: Identidade = Depends(obter_identidade)
 ):
     from backend.models.prospeccoes import Prospeccao
     
@@ -133,7 +307,7 @@ def atualizar_empresa(
     empresa_id: int,
     empresa_atualizada: EmpresaAtualizar,
     db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_admin)
+    usuario: Identidade = Depends(obter_identidade_admin)
 ):
     empresa = db.query(Empresa).filter(Empresa.id == empresa_id).first()
     if not empresa:
@@ -142,10 +316,20 @@ def atualizar_empresa(
             detail="Empresa não encontrada"
         )
     
-    for key, value in empresa_atualizada.model_dump(exclude_unset=True).items():
+    dados = empresa_atualizada.model_dump(exclude_unset=True)
+    digitos = digitos_cnpj(dados.get("cnpj"))
+    if digitos and db.query(Empresa.id).filter(Empresa.cnpj_digits == digitos, Empresa.id != empresa_id).first():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Empresa com este CNPJ já cadastrada"
+        )
+    
+    for key, value in dados.items():
         setattr(empresa, key, value)
     
     db.commit()
+    cache_contagens.limpar()
+    avisar_alteracao()
     db.refresh(empresa)
     return empresa
 
@@ -153,7 +337,7 @@ def atualizar_empresa(
 def deletar_empresa(
     empresa_id: int,
     db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_admin)
+    usuario: Identidade = Depends(obter_identidade_admin)
 ):
     empresa = db.query(Empresa).filter(Empresa.id == empresa_id).first()
     if not empresa:
@@ -164,102 +348,121 @@ def deletar_empresa(
     
     db.delete(empresa)
     db.commit()
+    cache_contagens.limpar()
+    avisar_alteracao(removidas=[empresa_id])
     return {"detail": "Empresa deletada com sucesso"}
 
-@router.post("/upload-excel")
+# Importações em segundo plano deste worker; a referência impede que a
+# tarefa seja coletada antes de terminar
+_importacoes_em_andamento = set()
+
+def _salvar_upload(arquivo: UploadFile, importacao_id: int) -> str:
+    """
+    Copia o upload em blocos para PASTA_IMPORTACOES/<id>, que o pool de
+    processos consegue abrir e o startup apaga se a importação for interrompida
+    """
+    caminho = caminho_importacao(importacao_id, os.path.splitext(arquivo.filename)[1])
+    with open(caminho, "wb") as destino:
+        shutil.copyfileobj(arquivo.file, destino, 1024 * 1024)
+    return caminho
+
+def _registrar_importacao(db: Session, arquivo: str, usuario_id: int) -> int:
+    agora = datetime.utcnow()
+    importacao = ImportacaoEmpresas(
+        arquivo=arquivo, usuario_id=usuario_id, status="pendente", atualizar_existentes=False,
+        iniciado_em=agora, atualizado_em=agora
+    )
+    db.add(importacao)
+    db.commit()
+    return importacao.id
+
+def _falhar_importacao(db: Session, importacao_id: int, erro: str):
+    """Marca como erro, sem sobrescrever uma importação que já terminou"""
+    agora = datetime.utcnow()
+    db.query(ImportacaoEmpresas).filter(
+        ImportacaoEmpresas.id == importacao_id,
+        ImportacaoEmpresas.status.in_(("pendente", "processando"))
+    ).update(
+        {"status": "erro", "erro": erro[:2000], "atualizado_em": agora, "concluido_em": agora},
+        synchronize_session=False
+    )
+    db.commit()
+
+def _falhar_importacao_em_segundo_plano(importacao_id: int, erro: str):
+    db = SessionLocal()
+    try:
+        _falhar_importacao(db, importacao_id, erro)
+    finally:
+        db.close()
+
+async def _executar_importacao(caminho: str, importacao_id: int):
+    try:
+        resultado = await executar_cpu(importar_planilha_empresas, caminho, False, importacao_id)
+        print(f"📥 Importação {importacao_id}: {resultado['criadas']} empresas criadas, "
+              f"{resultado['ignoradas']} ignoradas em {resultado['segundos']} s")
+    except Exception as e:
+        # O processo do pool pode ter morrido antes de gravar o próprio erro
+        erro = e.detail if isinstance(e, HTTPException) else str(e)
+        print(f"❌ Importação {importacao_id} falhou: {erro}")
+        try:
+            await run_in_threadpool(_falhar_importacao_em_segundo_plano, importacao_id, erro or type(e).__name__)
+        except Exception as falha:
+            print(f"❌ Não foi possível marcar a importação {importacao_id} como erro: {falha}")
+    finally:
+        os.remove(caminho)
+        cache_contagens.limpar()
+        await run_in_threadpool(avisar_alteracao)
+
+@router.post("/upload-excel", status_code=status.HTTP_202_ACCEPTED)
 async def upload_excel(
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_admin)
+    usuario: Identidade = Depends(obter_identidade_admin)
 ):
+    """
+    Salva a planilha e devolve na hora o id da importação, que roda em
+    segundo plano no pool de processos; o progresso sai em
+    GET /api/empresas/importacoes/{id}. Se o worker reiniciar no meio, a
+    importação termina com status "erro" e a planilha precisa ser enviada
+    de novo (as empresas já gravadas são ignoradas na segunda vez).
+    Enquanto roda, a importação ocupa um dos CPU_PROCESSOS processos do
+    pool (backend/utils/executores.py) que também geram as exportações em
+    Excel.
+    """
     if not file.filename.endswith(('.xlsx', '.xls')):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Arquivo deve ser Excel (.xlsx ou .xls)"
         )
     
+    # Registrada antes de salvar: a limpeza do startup só mantém planilhas
+    # de importações pendentes/processando
+    importacao_id = await run_in_threadpool(_registrar_importacao, db, file.filename, usuario.id)
     try:
-        contents = await file.read()
-        wb = openpyxl.load_workbook(BytesIO(contents))
-        ws = wb.active
-        
-        empresas_criadas = 0
-        empresas_atualizadas = 0
-        empresas_ignoradas = 0
-        cnpjs_processados = set()
-        
-        for row in ws.iter_rows(min_row=2, values_only=True):
-            if not row[0]:
-                continue
-            
-            empresa_nome = str(row[0]) if row[0] else None
-            cnpj = str(row[1]) if row[1] else None
-            
-            if not cnpj or cnpj in cnpjs_processados:
-                empresas_ignoradas += 1
-                continue
-                
-            cnpjs_processados.add(cnpj)
-            
-            sigla = str(row[3]) if len(row) > 3 and row[3] else None
-            porte = str(row[4]) if len(row) > 4 and row[4] else None
-            er = str(row[5]) if len(row) > 5 and row[5] else None
-            carteira = str(row[6]) if len(row) > 6 and row[6] else None
-            endereco = str(row[7]) if len(row) > 7 and row[7] else None
-            bairro = str(row[8]) if len(row) > 8 and row[8] else None
-            municipio = str(row[10]) if len(row) > 10 and row[10] else None
-            estado = str(row[11]) if len(row) > 11 and row[11] else None
-            pais = str(row[12]) if len(row) > 12 and row[12] else None
-            area = str(row[13]) if len(row) > 13 and row[13] else None
-            cnae_principal = str(row[14]) if len(row) > 14 and row[14] else None
-            descricao_cnae = str(row[15]) if len(row) > 15 and row[15] else None
-            tipo_empresa = str(row[16]) if len(row) > 16 and row[16] else None
-            
-            try:
-                numero_funcionarios = int(row[18]) if len(row) > 18 and row[18] and isinstance(row[18], (int, float)) else None
-            except (ValueError, TypeError):
-                numero_funcionarios = None
-                
-            observacao = str(row[19]) if len(row) > 19 and row[19] else None
-            
-            empresa_existente = db.query(Empresa).filter(Empresa.cnpj == cnpj).first()
-            
-            if empresa_existente:
-                empresas_ignoradas += 1
-            else:
-                nova_empresa = Empresa(
-                    empresa=empresa_nome,
-                    cnpj=cnpj,
-                    sigla=sigla,
-                    porte=porte,
-                    er=er,
-                    carteira=carteira,
-                    endereco=endereco,
-                    bairro=bairro,
-                    municipio=municipio,
-                    estado=estado,
-                    pais=pais,
-                    area=area,
-                    cnae_principal=cnae_principal,
-                    descricao_cnae=descricao_cnae,
-                    tipo_empresa=tipo_empresa,
-                    numero_funcionarios=numero_funcionarios,
-                    observacao=observacao
-                )
-                db.add(nova_empresa)
-                empresas_criadas += 1
-        
-        db.commit()
-        
-        return {
-            "message": "Upload concluído com sucesso",
-            "empresas_criadas": empresas_criadas,
-            "empresas_ignoradas": empresas_ignoradas,
-            "total_processadas": empresas_criadas + empresas_ignoradas
-        }
-        
+        caminho = await run_in_threadpool(_salvar_upload, file, importacao_id)
     except Exception as e:
+        await run_in_threadpool(_falhar_importacao, db, importacao_id, str(e))
+        raise
+    tarefa = asyncio.create_task(_executar_importacao(caminho, importacao_id))
+    _importacoes_em_andamento.add(tarefa)
+    tarefa.add_done_callback(_importacoes_em_andamento.discard)
+    
+    return {
+        "message": "Importação iniciada",
+        "importacao_id": importacao_id,
+        "status": "pendente"
+    }
+
+@router.get("/importacoes/{importacao_id}", response_model=ImportacaoEmpresasResposta)
+async def obter_importacao(
+    importacao_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    usuario: Identidade = Depends(obter_identidade_admin)
+):
+    importacao = await db.get(ImportacaoEmpresas, importacao_id)
+    if not importacao:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Erro ao processar arquivo: {str(e)}"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Importação não encontrada"
         )
+    return importacao
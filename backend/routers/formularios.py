@@ -1,39 +1,45 @@
 from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import HTMLResponse, StreamingResponse
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm import Session, joinedload, selectinload
 from sqlalchemy import func
 from typing import List, Optional
 from datetime import datetime
 from io import BytesIO
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
-from openpyxl.utils import get_column_letter
-from backend.database import get_db
+from fastapi.concurrency import run_in_threadpool
+from backend.database import get_db, get_read_db
 from backend.models.formularios import Formulario, Pergunta, OpcaoResposta, FormularioEnvio, Resposta
 from backend.models.empresas import Empresa
 from backend.models.usuarios import Usuario
 from backend.schemas import formularios as schemas
 from backend.auth.security import obter_usuario_atual as get_current_user
+from backend.utils.executores import executar_cpu
 
 router = APIRouter(prefix="/api/formularios", tags=["formularios"])
 
 @router.get("/", response_model=List[schemas.FormularioResumo])
-async def listar_formularios(
+def listar_formularios(
     db: Session = Depends(get_db),
     current_user: Usuario = Depends(get_current_user)
 ):
     """Lista todos os formulários com resumo de envios e respostas"""
-    formularios = db.query(Formulario).options(
-        joinedload(Formulario.perguntas),
-        joinedload(Formulario.envios)
-    ).all()
+    formularios = db.query(Formulario).all()
+    
+    # Contagens agrupadas em vez de carregar todos os envios e contar respostas por formulário
+    perguntas_por_form = dict(
+        db.query(Pergunta.formulario_id, func.count(Pergunta.id)).group_by(Pergunta.formulario_id)
+    )
+    envios_por_form = {
+        formulario_id: (envios, respostas)
+        for formulario_id, envios, respostas in db.query(
+            FormularioEnvio.formulario_id,
+            func.count(FormularioEnvio.id),
+            func.count(FormularioEnvio.id).filter(FormularioEnvio.respondido == True)
+        ).group_by(FormularioEnvio.formulario_id)
+    }
     
     resultado = []
     for form in formularios:
-        total_respostas = db.query(FormularioEnvio).filter(
-            FormularioEnvio.formulario_id == form.id,
-            FormularioEnvio.respondido == True
-        ).count()
+        total_envios, total_respostas = envios_por_form.get(form.id, (0, 0))
         
         resultado.append(schemas.FormularioResumo(
             id=form.id,
@@ -42,15 +48,15 @@ async def listar_formularios(
             tipo=form.tipo,
             ativo=form.ativo,
             data_criacao=form.data_criacao,
-            total_perguntas=len(form.perguntas),
-            total_envios=len(form.envios),
+            total_perguntas=perguntas_por_form.get(form.id, 0),
+            total_envios=total_envios,
             total_respostas=total_respostas
         ))
     
     return resultado
 
 @router.get("/{formulario_id}", response_model=schemas.Formulario)
-async def obter_formulario(
+def obter_formulario(
     formulario_id: int,
     db: Session = Depends(get_db),
     current_user: Usuario = Depends(get_current_user)
@@ -66,7 +72,7 @@ async def obter_formulario(
     return formulario
 
 @router.post("/", response_model=schemas.Formulario)
-async def criar_formulario(
+def criar_formulario(
     formulario_data: schemas.FormularioCreate,
     db: Session = Depends(get_db),
     current_user: Usuario = Depends(get_current_user)
@@ -112,7 +118,7 @@ async def criar_formulario(
     ).filter(Formulario.id == formulario.id).first()
 
 @router.put("/{formulario_id}", response_model=schemas.Formulario)
-async def atualizar_formulario(
+def atualizar_formulario(
     formulario_id: int,
     formulario_data: schemas.FormularioUpdate,
     db: Session = Depends(get_db),
@@ -138,7 +144,7 @@ async def atualizar_formulario(
     ).filter(Formulario.id == formulario.id).first()
 
 @router.delete("/{formulario_id}")
-async def excluir_formulario(
+def excluir_formulario(
     formulario_id: int,
     db: Session = Depends(get_db),
     current_user: Usuario = Depends(get_current_user)
@@ -154,7 +160,7 @@ async def excluir_formulario(
     return {"message": "Formulário excluído com sucesso"}
 
 @router.post("/{formulario_id}/perguntas", response_model=schemas.Pergunta)
-async def adicionar_pergunta(
+def adicionar_pergunta(
     formulario_id: int,
     pergunta_data: schemas.PerguntaCreate,
     db: Session = Depends(get_db),
@@ -198,7 +204,7 @@ async def adicionar_pergunta(
     ).filter(Pergunta.id == pergunta.id).first()
 
 @router.delete("/perguntas/{pergunta_id}")
-async def excluir_pergunta(
+def excluir_pergunta(
     pergunta_id: int,
     db: Session = Depends(get_db),
     current_user: Usuario = Depends(get_current_user)
@@ -214,7 +220,7 @@ async def excluir_pergunta(
     return {"message": "Pergunta excluída com sucesso"}
 
 @router.post("/enviar", response_model=schemas.FormularioEnvio)
-async def enviar_formulario(
+def enviar_formulario(
     envio_data: schemas.FormularioEnvioCreate,
     db: Session = Depends(get_db),
     current_user: Usuario = Depends(get_current_user)
@@ -241,15 +247,16 @@ async def enviar_formulario(
     return envio
 
 @router.get("/envios/", response_model=List[schemas.FormularioEnvioDetalhado])
-async def listar_envios(
+def listar_envios(
     formulario_id: Optional[int] = None,
     respondido: Optional[bool] = None,
     db: Session = Depends(get_db),
     current_user: Usuario = Depends(get_current_user)
 ):
     """Lista todos os envios de formulários"""
+    # O schema inclui o formulário com perguntas e opções: carrega tudo de uma vez, não por envio
     query = db.query(FormularioEnvio).options(
-        joinedload(FormularioEnvio.formulario),
+        joinedload(FormularioEnvio.formulario).selectinload(Formulario.perguntas).selectinload(Pergunta.opcoes),
         joinedload(FormularioEnvio.empresa)
     )
     
@@ -273,13 +280,13 @@ async def listar_envios(
             data_envio=envio.data_envio,
             data_resposta=envio.data_resposta,
             formulario=envio.formulario,
-            empresa_nome=envio.empresa.razao_social if envio.empresa else None
+            empresa_nome=envio.empresa.empresa if envio.empresa else None
         ))
     
     return resultado
 
 @router.get("/envios/{envio_id}/respostas", response_model=schemas.EnvioComRespostas)
-async def obter_respostas_envio(
+def obter_respostas_envio(
     envio_id: int,
     db: Session = Depends(get_db),
     current_user: Usuario = Depends(get_current_user)
@@ -288,7 +295,7 @@ async def obter_respostas_envio(
     envio = db.query(FormularioEnvio).options(
         joinedload(FormularioEnvio.formulario),
         joinedload(FormularioEnvio.empresa),
-        joinedload(FormularioEnvio.respostas).joinedload(Resposta.pergunta)
+        joinedload(FormularioEnvio.respostas).joinedload(Resposta.pergunta).joinedload(Pergunta.opcoes)
     ).filter(FormularioEnvio.id == envio_id).first()
     
     if not envio:
@@ -298,10 +305,7 @@ async def obter_respostas_envio(
     for resp in envio.respostas:
         opcao_texto = None
         if resp.valor_numerico is not None:
-            opcao = db.query(OpcaoResposta).filter(
-                OpcaoResposta.pergunta_id == resp.pergunta_id,
-                OpcaoResposta.valor == resp.valor_numerico
-            ).first()
+            opcao = next((o for o in resp.pergunta.opcoes if o.valor == resp.valor_numerico), None)
             if opcao:
                 opcao_texto = opcao.texto
         
@@ -325,13 +329,13 @@ async def obter_respostas_envio(
         data_resposta=envio.data_resposta,
         respostas=respostas_vis,
         formulario_titulo=envio.formulario.titulo if envio.formulario else None,
-        empresa_nome=envio.empresa.razao_social if envio.empresa else None
+        empresa_nome=envio.empresa.empresa if envio.empresa else None
     )
 
 @router.get("/{formulario_id}/estatisticas", response_model=schemas.EstatisticasFormulario)
-async def obter_estatisticas(
+def obter_estatisticas(
     formulario_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: Usuario = Depends(get_current_user)
 ):
     """Obtém estatísticas de um formulário"""
@@ -352,12 +356,15 @@ async def obter_estatisticas(
     
     media_por_pergunta = {}
     perguntas = db.query(Pergunta).filter(Pergunta.formulario_id == formulario_id).all()
+    medias = dict(
+        db.query(Resposta.pergunta_id, func.avg(Resposta.valor_numerico)).filter(
+            Resposta.pergunta_id.in_([p.id for p in perguntas if p.tipo == "escala"]),
+            Resposta.valor_numerico.isnot(None)
+        ).group_by(Resposta.pergunta_id)
+    )
     for pergunta in perguntas:
         if pergunta.tipo == "escala":
-            media = db.query(func.avg(Resposta.valor_numerico)).filter(
-                Resposta.pergunta_id == pergunta.id,
-                Resposta.valor_numerico.isnot(None)
-            ).scalar()
+            media = medias.get(pergunta.id)
             if media is not None:
                 media_por_pergunta[pergunta.id] = {
                     "texto": pergunta.texto[:50] + "..." if len(pergunta.texto) > 50 else pergunta.texto,
@@ -373,19 +380,14 @@ async def obter_estatisticas(
         media_por_pergunta=media_por_pergunta
     )
 
-@router.get("/{formulario_id}/exportar-excel")
-async def exportar_estatisticas_excel(
-    formulario_id: int,
-    db: Session = Depends(get_db),
-    current_user: Usuario = Depends(get_current_user)
-):
-    """Exporta as estatísticas e respostas de um formulário para Excel"""
+def _coletar_dados_exportacao(db: Session, formulario_id: int) -> Optional[dict]:
+    """Busca tudo o que o relatório precisa e devolve em tipos simples, para a planilha ser montada fora do worker"""
     formulario = db.query(Formulario).options(
         joinedload(Formulario.perguntas).joinedload(Pergunta.opcoes)
     ).filter(Formulario.id == formulario_id).first()
     
     if not formulario:
-        raise HTTPException(status_code=404, detail="Formulário não encontrado")
+        return None
     
     envios = db.query(FormularioEnvio).options(
         joinedload(FormularioEnvio.empresa),
@@ -395,172 +397,95 @@ async def exportar_estatisticas_excel(
         FormularioEnvio.respondido == True
     ).all()
     
-    wb = Workbook()
-    
-    ws_resumo = wb.active
-    ws_resumo.title = "Resumo"
-    
-    header_fill = PatternFill(start_color="4F46E5", end_color="4F46E5", fill_type="solid")
-    header_font = Font(bold=True, color="FFFFFF")
-    border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
-    )
-    
-    ws_resumo['A1'] = "Relatório de Estatísticas"
-    ws_resumo['A1'].font = Font(bold=True, size=16)
-    ws_resumo.merge_cells('A1:D1')
-    
-    ws_resumo['A3'] = "Formulário:"
-    ws_resumo['B3'] = formulario.titulo
-    ws_resumo['A4'] = "Data de Exportação:"
-    ws_resumo['B4'] = datetime.now().strftime("%d/%m/%Y %H:%M")
-    
     total_envios = db.query(FormularioEnvio).filter(
         FormularioEnvio.formulario_id == formulario_id
     ).count()
-    total_respostas = len(envios)
-    taxa = (total_respostas / total_envios * 100) if total_envios > 0 else 0
-    
-    ws_resumo['A6'] = "Total de Envios:"
-    ws_resumo['B6'] = total_envios
-    ws_resumo['A7'] = "Total de Respostas:"
-    ws_resumo['B7'] = total_respostas
-    ws_resumo['A8'] = "Taxa de Resposta:"
-    ws_resumo['B8'] = f"{round(taxa, 1)}%"
-    
-    ws_resumo['A10'] = "Média por Pergunta"
-    ws_resumo['A10'].font = Font(bold=True, size=12)
-    
-    row = 11
-    headers = ["Pergunta", "Categoria", "Média", "Qtd Respostas"]
-    for col, header in enumerate(headers, 1):
-        cell = ws_resumo.cell(row=row, column=col, value=header)
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.border = border
-        cell.alignment = Alignment(horizontal='center')
-    
-    row += 1
+    
     perguntas = sorted(formulario.perguntas, key=lambda p: p.ordem)
-    for pergunta in perguntas:
-        if pergunta.tipo == "escala":
-            media = db.query(func.avg(Resposta.valor_numerico)).filter(
-                Resposta.pergunta_id == pergunta.id,
-                Resposta.valor_numerico.isnot(None)
-            ).scalar()
-            qtd = db.query(Resposta).filter(
-                Resposta.pergunta_id == pergunta.id,
+    ids_escala = [p.id for p in perguntas if p.tipo == "escala"]
+    
+    # Uma consulta agrupada por pergunta/valor no lugar de uma por opção
+    contagens = {}
+    if ids_escala:
+        contagens = {
+            (pergunta_id, valor): quantidade
+            for pergunta_id, valor, quantidade in db.query(
+                Resposta.pergunta_id, Resposta.valor_numerico, func.count(Resposta.id)
+            ).filter(
+                Resposta.pergunta_id.in_(ids_escala),
                 Resposta.valor_numerico.isnot(None)
-            ).count()
-            
-            ws_resumo.cell(row=row, column=1, value=pergunta.texto).border = border
-            ws_resumo.cell(row=row, column=2, value=pergunta.categoria or "-").border = border
-            ws_resumo.cell(row=row, column=3, value=round(float(media), 2) if media else 0).border = border
-            ws_resumo.cell(row=row, column=4, value=qtd).border = border
-            row += 1
-    
-    for col in range(1, 5):
-        ws_resumo.column_dimensions[get_column_letter(col)].width = 40 if col == 1 else 20
-    
-    ws_respostas = wb.create_sheet("Respostas Detalhadas")
+            ).group_by(Resposta.pergunta_id, Resposta.valor_numerico)
+        }
     
-    headers = ["Destinatário", "Email", "Empresa", "Data Resposta"]
+    dados_perguntas = []
     for pergunta in perguntas:
-        headers.append(pergunta.texto[:50] + "..." if len(pergunta.texto) > 50 else pergunta.texto)
-    
-    for col, header in enumerate(headers, 1):
-        cell = ws_respostas.cell(row=1, column=col, value=header)
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.border = border
-        cell.alignment = Alignment(horizontal='center', wrap_text=True)
+        item = {
+            "id": pergunta.id,
+            "texto": pergunta.texto,
+            "categoria": pergunta.categoria,
+            "tipo": pergunta.tipo
+        }
+        if pergunta.tipo == "escala":
+            por_valor = {valor: qtd for (pid, valor), qtd in contagens.items() if pid == pergunta.id}
+            quantidade = sum(por_valor.values())
+            item["quantidade"] = quantidade
+            item["media"] = sum(valor * qtd for valor, qtd in por_valor.items()) / quantidade if quantidade else None
+            item["opcoes"] = [
+                {"valor": opcao.valor, "texto": opcao.texto, "quantidade": por_valor.get(opcao.valor, 0)}
+                for opcao in sorted(pergunta.opcoes, key=lambda o: o.valor or 0)
+            ]
+        dados_perguntas.append(item)
     
-    row = 2
+    dados_envios = []
     for envio in envios:
-        ws_respostas.cell(row=row, column=1, value=envio.nome_destinatario or "Anônimo").border = border
-        ws_respostas.cell(row=row, column=2, value=envio.email_destinatario or "-").border = border
-        ws_respostas.cell(row=row, column=3, value=envio.empresa.razao_social if envio.empresa else "-").border = border
-        ws_respostas.cell(row=row, column=4, value=envio.data_resposta.strftime("%d/%m/%Y %H:%M") if envio.data_resposta else "-").border = border
-        
-        respostas_dict = {r.pergunta_id: r for r in envio.respostas}
-        col = 5
-        for pergunta in perguntas:
-            resposta = respostas_dict.get(pergunta.id)
-            if resposta:
-                if resposta.valor_numerico is not None:
-                    valor = resposta.valor_numerico
-                elif resposta.valor_texto:
-                    valor = resposta.valor_texto
-                else:
-                    valor = "-"
-            else:
-                valor = "-"
-            ws_respostas.cell(row=row, column=col, value=valor).border = border
-            col += 1
-        row += 1
-    
-    for col in range(1, len(headers) + 1):
-        ws_respostas.column_dimensions[get_column_letter(col)].width = 20
-    
-    ws_respostas.row_dimensions[1].height = 40
-    
-    ws_dist = wb.create_sheet("Distribuição Respostas")
-    
-    row = 1
-    for pergunta in perguntas:
-        if pergunta.tipo == "escala":
-            ws_dist.cell(row=row, column=1, value=pergunta.texto).font = Font(bold=True)
-            ws_dist.merge_cells(start_row=row, start_column=1, end_row=row, end_column=6)
-            row += 1
-            
-            headers = ["Valor", "Descrição", "Quantidade", "Percentual"]
-            for col, header in enumerate(headers, 1):
-                cell = ws_dist.cell(row=row, column=col, value=header)
-                cell.fill = header_fill
-                cell.font = header_font
-                cell.border = border
-            row += 1
-            
-            total_respostas_pergunta = db.query(Resposta).filter(
-                Resposta.pergunta_id == pergunta.id,
-                Resposta.valor_numerico.isnot(None)
-            ).count()
-            
-            for opcao in sorted(pergunta.opcoes, key=lambda o: o.valor or 0):
-                count = db.query(Resposta).filter(
-                    Resposta.pergunta_id == pergunta.id,
-                    Resposta.valor_numerico == opcao.valor
-                ).count()
-                pct = (count / total_respostas_pergunta * 100) if total_respostas_pergunta > 0 else 0
-                
-                ws_dist.cell(row=row, column=1, value=opcao.valor).border = border
-                ws_dist.cell(row=row, column=2, value=opcao.texto).border = border
-                ws_dist.cell(row=row, column=3, value=count).border = border
-                ws_dist.cell(row=row, column=4, value=f"{round(pct, 1)}%").border = border
-                row += 1
-            
-            row += 1
+        respostas = {}
+        for resposta in envio.respostas:
+            if resposta.valor_numerico is not None:
+                respostas[resposta.pergunta_id] = resposta.valor_numerico
+            elif resposta.valor_texto:
+                respostas[resposta.pergunta_id] = resposta.valor_texto
+        dados_envios.append({
+            "destinatario": envio.nome_destinatario or "Anônimo",
+            "email": envio.email_destinatario or "-",
+            "empresa": envio.empresa.empresa if envio.empresa else "-",
+            "data_resposta": envio.data_resposta.strftime("%d/%m/%Y %H:%M") if envio.data_resposta else "-",
+            "respostas": respostas
+        })
     
-    for col in [1, 2, 3, 4]:
-        ws_dist.column_dimensions[get_column_letter(col)].width = 25 if col == 2 else 15
+    return {
+        "titulo": formulario.titulo,
+        "data_exportacao": datetime.now().strftime("%d/%m/%Y %H:%M"),
+        "total_envios": total_envios,
+        "perguntas": dados_perguntas,
+        "envios": dados_envios
+    }
+
+@router.get("/{formulario_id}/exportar-excel")
+async def exportar_estatisticas_excel(
+    formulario_id: int,
+    db: Session = Depends(get_read_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """Exporta as estatísticas e respostas de um formulário para Excel"""
+    dados = await run_in_threadpool(_coletar_dados_exportacao, db, formulario_id)
+    
+    if not dados:
+        raise HTTPException(status_code=404, detail="Formulário não encontrado")
     
-    output = BytesIO()
-    wb.save(output)
-    output.seek(0)
+    # openpyxl só é importado na primeira exportação (e nos processos do pool)
+    from backend.utils.planilhas import gerar_excel_estatisticas
+    conteudo = await executar_cpu(gerar_excel_estatisticas, dados)
     
-    filename = f"estatisticas_{formulario.titulo.replace(' ', '_')[:30]}_{datetime.now().strftime('%Y%m%d')}.xlsx"
+    filename = f"estatisticas_{dados['titulo'].replace(' ', '_')[:30]}_{datetime.now().strftime('%Y%m%d')}.xlsx"
     
     return StreamingResponse(
-        output,
+        BytesIO(conteudo),
         media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
         headers={"Content-Disposition": f"attachment; filename={filename}"}
     )
 
 @router.post("/seed-lideranca")
-async def criar_formulario_lideranca(
+def criar_formulario_lideranca(
     db: Session = Depends(get_db),
     current_user: Usuario = Depends(get_current_user)
 ):
@@ -664,7 +589,7 @@ async def criar_formulario_lideranca(
 router_public = APIRouter(prefix="/formulario", tags=["formulario_publico"])
 
 @router_public.get("/responder/{codigo}")
-async def pagina_responder_formulario(
+def pagina_responder_formulario(
     codigo: str,
     request: Request,
     db: Session = Depends(get_db)
@@ -703,7 +628,7 @@ async def pagina_responder_formulario(
     })
 
 @router_public.post("/responder/{codigo}")
-async def submeter_respostas(
+def submeter_respostas(
     codigo: str,
     respostas_data: schemas.FormularioRespostaSubmit,
     db: Session = Depends(get_db)
@@ -740,7 +665,7 @@ async def submeter_respostas(
     return {"message": "Respostas enviadas com sucesso!"}
 
 @router_public.get("/api/{codigo}")
-async def obter_formulario_publico(
+def obter_formulario_publico(
     codigo: str,
     db: Session = Depends(get_db)
 ):
@@ -1,10 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import or_, and_, func, desc
+import asyncio
+import os
+from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import joinedload
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import or_, and_, func, select, update
 from typing import List, Optional
 from datetime import datetime, timedelta
-from backend.database import get_db
-from backend.models.mensagens import Mensagem, StatusUsuario, GrupoChat, MembroGrupo, MensagemGrupo, LeituraGrupo
+from backend.database import get_async_db, SessionLocal
+from backend.models.mensagens import Mensagem, ResumoConversa, GrupoChat, MembroGrupo, MensagemGrupo, LeituraGrupo
 from backend.models import Usuario
 from backend.schemas.mensagens import (
     MensagemCriar, MensagemResposta, ConversaResumo, UsuarioSimples, UsuarioStatus,
@@ -12,15 +16,22 @@ from backend.schemas.mensagens import (
     GrupoResposta, MensagemGrupoCriar, MensagemGrupoResposta, MembroGrupoSimples,
     BuscaMensagens
 )
-from backend.auth.security import obter_usuario_atual
+from backend.auth.security import Identidade, decodificar_token, obter_identidade, obter_identidade_por_token
 from backend.utils.storage import save_upload_file, format_file_size
+from backend.utils.tempo_real import gerenciador_conexoes
+from backend.utils.presenca import presenca
+from backend.utils import conversas
 
 router = APIRouter(prefix="/api/mensagens", tags=["Mensagens"])
+router_ws = APIRouter(tags=["Mensagens"])
+
+# Prazo para o cliente mandar o token na primeira mensagem do WebSocket
+WS_AUTENTICACAO_SEGUNDOS = float(os.getenv("WS_AUTENTICACAO_SEGUNDOS", "10"))
 
 @router.post("/upload")
 async def upload_arquivo(
     file: UploadFile = File(...),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    usuario: Identidade = Depends(obter_identidade)
 ):
     try:
         resultado = await save_upload_file(file)
@@ -31,47 +42,72 @@ async def upload_arquivo(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao fazer upload: {str(e)}")
 
-def atualizar_status_usuario(db: Session, usuario_id: int, online: bool = True):
-    status = db.query(StatusUsuario).filter(StatusUsuario.usuario_id == usuario_id).first()
-    if not status:
-        status = StatusUsuario(usuario_id=usuario_id, online=online, ultima_atividade=datetime.utcnow())
-        db.add(status)
-    else:
-        status.online = online
-        status.ultima_atividade = datetime.utcnow()
-    db.commit()
-    return status
+# Os endpoints do chat (os mais chamados do sistema, por causa do polling)
+# usam a sessão async; os utilitários síncronos de backend/utils/conversas
+# rodam na mesma transação via db.run_sync
 
-def get_usuario_status(db: Session, usuario_id: int) -> dict:
-    status = db.query(StatusUsuario).filter(StatusUsuario.usuario_id == usuario_id).first()
-    if status:
-        tempo_limite = datetime.utcnow() - timedelta(minutes=5)
-        online = status.ultima_atividade > tempo_limite if status.ultima_atividade else False
-        return {
-            "online": online,
-            "ultima_atividade": status.ultima_atividade,
-            "digitando": status.digitando_para is not None and status.digitando_desde and (datetime.utcnow() - status.digitando_desde).seconds < 10
-        }
-    return {"online": False, "ultima_atividade": None, "digitando": False}
+def _com_participantes(consulta):
+    return consulta.options(
+        joinedload(Mensagem.remetente),
+        joinedload(Mensagem.destinatario),
+        joinedload(Mensagem.resposta_para).joinedload(Mensagem.remetente)
+    )
+
+def _entre(usuario_a: int, usuario_b: int):
+    return or_(
+        and_(Mensagem.remetente_id == usuario_a, Mensagem.destinatario_id == usuario_b),
+        and_(Mensagem.remetente_id == usuario_b, Mensagem.destinatario_id == usuario_a)
+    )
+
+def consulta_conversas(usuario_id: int):
+    """Resumos das conversas do usuário com os dados do outro participante"""
+    return select(ResumoConversa, Usuario).join(
+        Usuario, Usuario.id == ResumoConversa.outro_usuario_id
+    ).where(
+        ResumoConversa.usuario_id == usuario_id
+    ).order_by(ResumoConversa.data_ultima_mensagem.desc())
+
+async def marcar_conversa_como_lida(db: AsyncSession, leitor_id: int, remetente_id: int) -> int:
+    """Marca como lidas as mensagens recebidas de remetente_id e avisa o remetente"""
+    data_leitura = datetime.utcnow()
+    resultado = await db.execute(
+        update(Mensagem).where(
+            Mensagem.remetente_id == remetente_id,
+            Mensagem.destinatario_id == leitor_id,
+            Mensagem.lida == False
+        ).values(lida=True, data_leitura=data_leitura, status="lida"),
+        execution_options={"synchronize_session": False}
+    )
+    atualizadas = resultado.rowcount
+    await db.run_sync(conversas.zerar_nao_lidas, leitor_id, remetente_id)
+    await db.commit()
+    
+    if atualizadas:
+        await gerenciador_conexoes.notificar_async(
+            [remetente_id, leitor_id],
+            "mensagens_lidas",
+            {"leitor_id": leitor_id, "remetente_id": remetente_id, "data_leitura": data_leitura}
+        )
+    
+    return atualizadas
 
 @router.post("/", response_model=MensagemResposta)
-def enviar_mensagem(
+async def enviar_mensagem(
     mensagem: MensagemCriar,
-    db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    db: AsyncSession = Depends(get_async_db),
+    usuario: Identidade = Depends(obter_identidade)
 ):
-    atualizar_status_usuario(db, usuario.id)
+    presenca.registrar_atividade(usuario.id)
     
-    destinatario = db.query(Usuario).filter(Usuario.id == mensagem.destinatario_id).first()
+    destinatario = await db.get(Usuario, mensagem.destinatario_id)
     if not destinatario:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Destinatario nao encontrado"
         )
     
-    resposta_para = None
     if mensagem.resposta_para_id:
-        resposta_para = db.query(Mensagem).filter(Mensagem.id == mensagem.resposta_para_id).first()
+        resposta_para = await db.get(Mensagem, mensagem.resposta_para_id)
         if not resposta_para:
             raise HTTPException(status_code=404, detail="Mensagem de resposta nao encontrada")
     
@@ -89,101 +125,81 @@ def enviar_mensagem(
     )
     
     db.add(nova_mensagem)
-    db.commit()
-    db.refresh(nova_mensagem)
-    
-    mensagem_completa = db.query(Mensagem).options(
-        joinedload(Mensagem.remetente),
-        joinedload(Mensagem.destinatario),
-        joinedload(Mensagem.resposta_para).joinedload(Mensagem.remetente)
-    ).filter(Mensagem.id == nova_mensagem.id).first()
+    await db.flush()
+    await db.run_sync(conversas.registrar_mensagem, nova_mensagem)
+    await db.commit()
+    
+    mensagem_completa = (await db.execute(
+        _com_participantes(select(Mensagem))
+        .where(Mensagem.id == nova_mensagem.id)
+        .execution_options(populate_existing=True)
+    )).scalars().first()
+    
+    await gerenciador_conexoes.notificar_async(
+        [usuario.id, mensagem.destinatario_id],
+        "nova_mensagem",
+        MensagemResposta.model_validate(mensagem_completa)
+    )
     
     return mensagem_completa
 
 @router.get("/conversas", response_model=List[ConversaResumo])
-def listar_conversas(
-    db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+async def listar_conversas(
+    db: AsyncSession = Depends(get_async_db),
+    usuario: Identidade = Depends(obter_identidade)
 ):
-    atualizar_status_usuario(db, usuario.id)
+    presenca.registrar_atividade(usuario.id)
     
-    todas_mensagens = db.query(Mensagem).options(
-        joinedload(Mensagem.remetente),
-        joinedload(Mensagem.destinatario)
-    ).filter(
-        and_(
-            Mensagem.deletada == False,
-            or_(
-                Mensagem.remetente_id == usuario.id,
-                Mensagem.destinatario_id == usuario.id
-            )
-        )
-    ).order_by(Mensagem.data_envio.desc()).all()
-    
-    conversas_dict = {}
+    resumos = (await db.execute(consulta_conversas(usuario.id))).all()
     
-    for msg in todas_mensagens:
-        outro_usuario_id = msg.destinatario_id if msg.remetente_id == usuario.id else msg.remetente_id
+    conversas_lista = []
+    for resumo, outro_usuario in resumos:
+        status_info = presenca.status(outro_usuario.id)
         
-        if outro_usuario_id not in conversas_dict:
-            outro_usuario = msg.destinatario if msg.remetente_id == usuario.id else msg.remetente
-            
-            nao_lidas = db.query(Mensagem).filter(
-                and_(
-                    Mensagem.remetente_id == outro_usuario_id,
-                    Mensagem.destinatario_id == usuario.id,
-                    Mensagem.lida == False,
-                    Mensagem.deletada == False
-                )
-            ).count()
-            
-            status_info = get_usuario_status(db, outro_usuario_id)
-            
-            usuario_status = UsuarioStatus(
-                id=outro_usuario.id,
-                nome=outro_usuario.nome,
-                email=outro_usuario.email,
-                foto_url=outro_usuario.foto_url,
-                online=status_info["online"],
-                ultima_atividade=status_info["ultima_atividade"],
-                digitando=status_info["digitando"]
-            )
-            
-            conversas_dict[outro_usuario_id] = ConversaResumo(
-                usuario=usuario_status,
-                ultima_mensagem=msg.conteudo if not msg.deletada else "Mensagem apagada",
-                ultima_mensagem_tipo=msg.tipo,
-                data_ultima_mensagem=msg.data_envio,
-                mensagens_nao_lidas=nao_lidas,
-                ultima_mensagem_minha=msg.remetente_id == usuario.id
-            )
+        usuario_status = UsuarioStatus(
+            id=outro_usuario.id,
+            nome=outro_usuario.nome,
+            email=outro_usuario.email,
+            foto_url=outro_usuario.foto_url,
+            online=status_info["online"],
+            ultima_atividade=status_info["ultima_atividade"],
+            digitando=status_info["digitando"]
+        )
+        
+        conversas_lista.append(ConversaResumo(
+            usuario=usuario_status,
+            ultima_mensagem=resumo.ultima_mensagem,
+            ultima_mensagem_tipo=resumo.ultima_mensagem_tipo,
+            data_ultima_mensagem=resumo.data_ultima_mensagem,
+            mensagens_nao_lidas=resumo.nao_lidas,
+            ultima_mensagem_minha=resumo.ultima_mensagem_minha
+        ))
     
-    conversas = list(conversas_dict.values())
-    return sorted(conversas, key=lambda x: x.data_ultima_mensagem or datetime.min, reverse=True)
+    return conversas_lista
 
 @router.get("/usuarios-disponiveis", response_model=List[UsuarioStatus])
-def listar_usuarios_disponiveis(
+async def listar_usuarios_disponiveis(
     busca: Optional[str] = None,
-    db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    db: AsyncSession = Depends(get_async_db),
+    usuario: Identidade = Depends(obter_identidade)
 ):
-    atualizar_status_usuario(db, usuario.id)
+    presenca.registrar_atividade(usuario.id)
     
-    query = db.query(Usuario).filter(Usuario.id != usuario.id)
+    query = select(Usuario).where(Usuario.id != usuario.id)
     
     if busca:
-        query = query.filter(
+        query = query.where(
             or_(
                 Usuario.nome.ilike(f"%{busca}%"),
                 Usuario.email.ilike(f"%{busca}%")
             )
         )
     
-    usuarios = query.order_by(Usuario.nome).all()
+    usuarios = (await db.execute(query.order_by(Usuario.nome))).scalars().all()
     
     resultado = []
     for u in usuarios:
-        status_info = get_usuario_status(db, u.id)
+        status_info = presenca.status(u.id)
         resultado.append(UsuarioStatus(
             id=u.id,
             nome=u.nome,
@@ -197,58 +213,42 @@ def listar_usuarios_disponiveis(
     return sorted(resultado, key=lambda x: (not x.online, x.nome.lower()))
 
 @router.get("/conversa/{usuario_id}", response_model=List[MensagemResposta])
-def obter_conversa(
+async def obter_conversa(
     usuario_id: int,
     limite: int = Query(50, ge=1, le=200),
     antes_de: Optional[int] = None,
-    db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    db: AsyncSession = Depends(get_async_db),
+    usuario: Identidade = Depends(obter_identidade)
 ):
-    atualizar_status_usuario(db, usuario.id)
+    presenca.registrar_atividade(usuario.id)
     
-    query = db.query(Mensagem).options(
-        joinedload(Mensagem.remetente),
-        joinedload(Mensagem.destinatario),
-        joinedload(Mensagem.resposta_para).joinedload(Mensagem.remetente)
-    ).filter(
-        or_(
-            and_(Mensagem.remetente_id == usuario.id, Mensagem.destinatario_id == usuario_id),
-            and_(Mensagem.remetente_id == usuario_id, Mensagem.destinatario_id == usuario.id)
-        )
-    )
+    query = _com_participantes(select(Mensagem)).where(_entre(usuario.id, usuario_id))
     
     if antes_de:
-        query = query.filter(Mensagem.id < antes_de)
+        query = query.where(Mensagem.id < antes_de)
     
-    mensagens = query.order_by(Mensagem.data_envio.desc()).limit(limite).all()
+    mensagens = (await db.execute(
+        query.order_by(Mensagem.data_envio.desc()).limit(limite)
+    )).unique().scalars().all()
     mensagens = list(reversed(mensagens))
     
-    db.query(Mensagem).filter(
-        and_(
-            Mensagem.remetente_id == usuario_id,
-            Mensagem.destinatario_id == usuario.id,
-            Mensagem.lida == False
-        )
-    ).update({
-        Mensagem.lida: True, 
-        Mensagem.data_leitura: datetime.utcnow(),
-        Mensagem.status: "lida"
-    })
-    db.commit()
+    await marcar_conversa_como_lida(db, usuario.id, usuario_id)
     
     return mensagens
 
 @router.put("/{mensagem_id}", response_model=MensagemResposta)
-def editar_mensagem(
+async def editar_mensagem(
     mensagem_id: int,
     dados: MensagemEditar,
-    db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    db: AsyncSession = Depends(get_async_db),
+    usuario: Identidade = Depends(obter_identidade)
 ):
-    mensagem = db.query(Mensagem).filter(
-        Mensagem.id == mensagem_id,
-        Mensagem.remetente_id == usuario.id
-    ).first()
+    mensagem = (await db.execute(
+        select(Mensagem).where(
+            Mensagem.id == mensagem_id,
+            Mensagem.remetente_id == usuario.id
+        )
+    )).scalars().first()
     
     if not mensagem:
         raise HTTPException(status_code=404, detail="Mensagem nao encontrada")
@@ -263,48 +263,68 @@ def editar_mensagem(
     mensagem.conteudo = dados.conteudo
     mensagem.editada = True
     mensagem.data_edicao = datetime.utcnow()
-    db.commit()
-    
-    mensagem_completa = db.query(Mensagem).options(
-        joinedload(Mensagem.remetente),
-        joinedload(Mensagem.destinatario)
-    ).filter(Mensagem.id == mensagem_id).first()
+    await db.flush()
+    await db.run_sync(conversas.recalcular_conversa, mensagem.remetente_id, mensagem.destinatario_id)
+    await db.commit()
+    
+    mensagem_completa = (await db.execute(
+        _com_participantes(select(Mensagem))
+        .where(Mensagem.id == mensagem_id)
+        .execution_options(populate_existing=True)
+    )).scalars().first()
+    
+    await gerenciador_conexoes.notificar_async(
+        [mensagem_completa.remetente_id, mensagem_completa.destinatario_id],
+        "mensagem_editada",
+        MensagemResposta.model_validate(mensagem_completa)
+    )
     
     return mensagem_completa
 
 @router.delete("/{mensagem_id}")
-def deletar_mensagem(
+async def deletar_mensagem(
     mensagem_id: int,
-    db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    db: AsyncSession = Depends(get_async_db),
+    usuario: Identidade = Depends(obter_identidade)
 ):
-    mensagem = db.query(Mensagem).filter(
-        Mensagem.id == mensagem_id,
-        Mensagem.remetente_id == usuario.id
-    ).first()
+    mensagem = (await db.execute(
+        select(Mensagem).where(
+            Mensagem.id == mensagem_id,
+            Mensagem.remetente_id == usuario.id
+        )
+    )).scalars().first()
     
     if not mensagem:
         raise HTTPException(status_code=404, detail="Mensagem nao encontrada")
     
     mensagem.deletada = True
     mensagem.conteudo = "Mensagem apagada"
-    db.commit()
+    await db.flush()
+    await db.run_sync(conversas.recalcular_conversa, mensagem.remetente_id, mensagem.destinatario_id)
+    await db.commit()
+    
+    await gerenciador_conexoes.notificar_async(
+        [mensagem.remetente_id, mensagem.destinatario_id],
+        "mensagem_apagada",
+        {"id": mensagem.id, "remetente_id": mensagem.remetente_id, "destinatario_id": mensagem.destinatario_id}
+    )
     
     return {"message": "Mensagem apagada com sucesso"}
 
 @router.post("/{mensagem_id}/reacao")
-def adicionar_reacao(
+async def adicionar_reacao(
     mensagem_id: int,
     reacao: MensagemReacao,
-    db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    db: AsyncSession = Depends(get_async_db),
+    usuario: Identidade = Depends(obter_identidade)
 ):
-    mensagem = db.query(Mensagem).filter(Mensagem.id == mensagem_id).first()
+    mensagem = await db.get(Mensagem, mensagem_id)
     
     if not mensagem:
         raise HTTPException(status_code=404, detail="Mensagem nao encontrada")
     
-    reacoes = mensagem.reacoes or {}
+    # Cópia: a coluna JSON só é marcada como alterada quando recebe outro objeto
+    reacoes = {emoji: list(ids) for emoji, ids in (mensagem.reacoes or {}).items()}
     emoji = reacao.emoji
     
     if emoji not in reacoes:
@@ -318,60 +338,39 @@ def adicionar_reacao(
         reacoes[emoji].append(usuario.id)
     
     mensagem.reacoes = reacoes
-    db.commit()
+    await db.commit()
+    
+    await gerenciador_conexoes.notificar_async(
+        [mensagem.remetente_id, mensagem.destinatario_id],
+        "reacao",
+        {"mensagem_id": mensagem.id, "reacoes": reacoes}
+    )
     
     return {"reacoes": reacoes}
 
 @router.post("/digitando")
 def atualizar_digitando(
     status_digitando: StatusDigitando,
-    db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    usuario: Identidade = Depends(obter_identidade)
 ):
-    status = db.query(StatusUsuario).filter(StatusUsuario.usuario_id == usuario.id).first()
-    
-    if not status:
-        status = StatusUsuario(
-            usuario_id=usuario.id,
-            online=True,
-            ultima_atividade=datetime.utcnow()
-        )
-        db.add(status)
-    
-    if status_digitando.digitando:
-        status.digitando_para = status_digitando.destinatario_id
-        status.digitando_desde = datetime.utcnow()
-    else:
-        status.digitando_para = None
-        status.digitando_desde = None
-    
-    status.ultima_atividade = datetime.utcnow()
-    db.commit()
-    
+    presenca.registrar_digitando(usuario.id, status_digitando.destinatario_id, status_digitando.digitando)
     return {"status": "ok"}
 
 @router.get("/status/{usuario_id}")
-def verificar_status_usuario(
+async def verificar_status_usuario(
     usuario_id: int,
-    db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    db: AsyncSession = Depends(get_async_db),
+    usuario: Identidade = Depends(obter_identidade)
 ):
-    atualizar_status_usuario(db, usuario.id)
+    presenca.registrar_atividade(usuario.id)
     
-    outro_usuario = db.query(Usuario).filter(Usuario.id == usuario_id).first()
+    outro_usuario = await db.get(Usuario, usuario_id)
     if not outro_usuario:
         raise HTTPException(status_code=404, detail="Usuario nao encontrado")
     
-    status_info = get_usuario_status(db, usuario_id)
+    status_info = presenca.status(usuario_id)
     
-    status_digitando = db.query(StatusUsuario).filter(
-        StatusUsuario.usuario_id == usuario_id,
-        StatusUsuario.digitando_para == usuario.id
-    ).first()
-    
-    digitando = False
-    if status_digitando and status_digitando.digitando_desde:
-        digitando = (datetime.utcnow() - status_digitando.digitando_desde).seconds < 10
+    digitando = presenca.esta_digitando_para(usuario_id, usuario.id)
     
     return {
         "online": status_info["online"],
@@ -380,32 +379,34 @@ def verificar_status_usuario(
     }
 
 @router.get("/nao-lidas/contagem")
-def contar_nao_lidas(
-    db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+async def contar_nao_lidas(
+    db: AsyncSession = Depends(get_async_db),
+    usuario: Identidade = Depends(obter_identidade)
 ):
-    atualizar_status_usuario(db, usuario.id)
+    presenca.registrar_atividade(usuario.id)
     
-    count = db.query(Mensagem).filter(
-        and_(
+    count = await db.scalar(
+        select(func.count(Mensagem.id)).where(
             Mensagem.destinatario_id == usuario.id,
             Mensagem.lida == False,
             Mensagem.deletada == False
         )
-    ).count()
+    )
     
     return {"count": count}
 
 @router.put("/{mensagem_id}/marcar-lida")
-def marcar_como_lida(
+async def marcar_como_lida(
     mensagem_id: int,
-    db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    db: AsyncSession = Depends(get_async_db),
+    usuario: Identidade = Depends(obter_identidade)
 ):
-    mensagem = db.query(Mensagem).filter(
-        Mensagem.id == mensagem_id,
-        Mensagem.destinatario_id == usuario.id
-    ).first()
+    mensagem = (await db.execute(
+        select(Mensagem).where(
+            Mensagem.id == mensagem_id,
+            Mensagem.destinatario_id == usuario.id
+        )
+    )).scalars().first()
     
     if not mensagem:
         raise HTTPException(
@@ -416,92 +417,72 @@ def marcar_como_lida(
     mensagem.lida = True
     mensagem.data_leitura = datetime.utcnow()
     mensagem.status = "lida"
-    db.commit()
+    await db.flush()
+    await db.run_sync(conversas.recalcular_conversa, mensagem.remetente_id, usuario.id)
+    await db.commit()
+    
+    await gerenciador_conexoes.notificar_async(
+        [mensagem.remetente_id, usuario.id],
+        "mensagens_lidas",
+        {"leitor_id": usuario.id, "remetente_id": mensagem.remetente_id, "data_leitura": mensagem.data_leitura, "mensagem_id": mensagem.id}
+    )
     
     return {"message": "Mensagem marcada como lida"}
 
 @router.post("/buscar", response_model=List[MensagemResposta])
-def buscar_mensagens(
+async def buscar_mensagens(
     busca: BuscaMensagens,
-    db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    db: AsyncSession = Depends(get_async_db),
+    usuario: Identidade = Depends(obter_identidade)
 ):
-    query = db.query(Mensagem).options(
+    query = select(Mensagem).options(
         joinedload(Mensagem.remetente),
         joinedload(Mensagem.destinatario)
-    ).filter(
-        and_(
-            Mensagem.deletada == False,
-            Mensagem.conteudo.ilike(f"%{busca.termo}%"),
-            or_(
-                Mensagem.remetente_id == usuario.id,
-                Mensagem.destinatario_id == usuario.id
-            )
+    ).where(
+        Mensagem.deletada == False,
+        Mensagem.conteudo.ilike(f"%{busca.termo}%"),
+        or_(
+            Mensagem.remetente_id == usuario.id,
+            Mensagem.destinatario_id == usuario.id
         )
     )
     
     if busca.usuario_id:
-        query = query.filter(
-            or_(
-                and_(Mensagem.remetente_id == usuario.id, Mensagem.destinatario_id == busca.usuario_id),
-                and_(Mensagem.remetente_id == busca.usuario_id, Mensagem.destinatario_id == usuario.id)
-            )
-        )
+        query = query.where(_entre(usuario.id, busca.usuario_id))
     
     if busca.data_inicio:
-        query = query.filter(Mensagem.data_envio >= busca.data_inicio)
+        query = query.where(Mensagem.data_envio >= busca.data_inicio)
     
     if busca.data_fim:
-        query = query.filter(Mensagem.data_envio <= busca.data_fim)
+        query = query.where(Mensagem.data_envio <= busca.data_fim)
     
-    mensagens = query.order_by(Mensagem.data_envio.desc()).limit(100).all()
+    mensagens = (await db.execute(
+        query.order_by(Mensagem.data_envio.desc()).limit(100)
+    )).scalars().all()
     
     return mensagens
 
 @router.get("/novas/{usuario_id}")
-def verificar_novas_mensagens(
+async def verificar_novas_mensagens(
     usuario_id: int,
     ultima_id: int = Query(0),
-    db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    db: AsyncSession = Depends(get_async_db),
+    usuario: Identidade = Depends(obter_identidade)
 ):
-    atualizar_status_usuario(db, usuario.id)
-    
-    novas = db.query(Mensagem).options(
-        joinedload(Mensagem.remetente),
-        joinedload(Mensagem.destinatario),
-        joinedload(Mensagem.resposta_para).joinedload(Mensagem.remetente)
-    ).filter(
-        Mensagem.id > ultima_id,
-        or_(
-            and_(Mensagem.remetente_id == usuario.id, Mensagem.destinatario_id == usuario_id),
-            and_(Mensagem.remetente_id == usuario_id, Mensagem.destinatario_id == usuario.id)
-        )
-    ).order_by(Mensagem.data_envio.asc()).all()
+    presenca.registrar_atividade(usuario.id)
     
-    db.query(Mensagem).filter(
-        and_(
-            Mensagem.remetente_id == usuario_id,
-            Mensagem.destinatario_id == usuario.id,
-            Mensagem.lida == False
-        )
-    ).update({
-        Mensagem.lida: True, 
-        Mensagem.data_leitura: datetime.utcnow(),
-        Mensagem.status: "lida"
-    })
-    db.commit()
+    novas = (await db.execute(
+        _com_participantes(select(Mensagem)).where(
+            Mensagem.id > ultima_id,
+            _entre(usuario.id, usuario_id)
+        ).order_by(Mensagem.data_envio.asc())
+    )).unique().scalars().all()
     
-    status_info = get_usuario_status(db, usuario_id)
+    await marcar_conversa_como_lida(db, usuario.id, usuario_id)
     
-    status_digitando = db.query(StatusUsuario).filter(
-        StatusUsuario.usuario_id == usuario_id,
-        StatusUsuario.digitando_para == usuario.id
-    ).first()
+    status_info = presenca.status(usuario_id)
     
-    digitando = False
-    if status_digitando and status_digitando.digitando_desde:
-        digitando = (datetime.utcnow() - status_digitando.digitando_desde).seconds < 10
+    digitando = presenca.esta_digitando_para(usuario_id, usuario.id)
     
     return {
         "mensagens": [MensagemResposta.model_validate(m) for m in novas],
@@ -514,8 +495,100 @@ def verificar_novas_mensagens(
 
 @router.post("/heartbeat")
 def heartbeat(
-    db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    usuario: Identidade = Depends(obter_identidade)
 ):
-    atualizar_status_usuario(db, usuario.id, True)
+    presenca.registrar_atividade(usuario.id)
     return {"status": "ok", "timestamp": datetime.utcnow()}
+
+def _autenticar_websocket(token: str) -> Optional[dict]:
+    payload = decodificar_token(token)
+    if payload is None:
+        return None
+    db = SessionLocal()
+    try:
+        identidade = obter_identidade_por_token(token, db)
+        if identidade is None:
+            return None
+        presenca.registrar_atividade(identidade.id)
+        # Claims que o gerenciador confere contra expiração e revogação
+        credenciais = {campo: payload[campo] for campo in ("jti", "ver", "exp") if campo in payload}
+        return {"id": identidade.id, "admin": identidade.admin, "credenciais": credenciais}
+    finally:
+        db.close()
+
+async def _receber_autenticacao(websocket: WebSocket, usuario_id: Optional[int] = None) -> Optional[dict]:
+    """Lê {"tipo": "autenticar", "token": ...} e valida o token (do mesmo usuário, numa renovação)"""
+    try:
+        evento = await asyncio.wait_for(websocket.receive_json(), WS_AUTENTICACAO_SEGUNDOS)
+    except (asyncio.TimeoutError, KeyError, ValueError):
+        return None
+    return await _validar_autenticacao(evento, usuario_id)
+
+async def _validar_autenticacao(evento, usuario_id: Optional[int] = None) -> Optional[dict]:
+    token = evento.get("token") if isinstance(evento, dict) and evento.get("tipo") == "autenticar" else None
+    if not isinstance(token, str):
+        return None
+    dados_usuario = await run_in_threadpool(_autenticar_websocket, token)
+    if dados_usuario is None or (usuario_id is not None and dados_usuario["id"] != usuario_id):
+        return None
+    return dados_usuario
+
+@router_ws.websocket("/ws/mensagens")
+async def websocket_mensagens(websocket: WebSocket):
+    """
+    Canal em tempo real do chat. O token não vai na URL (que acaba em logs
+    de proxy e no histórico): a primeira mensagem do cliente tem que ser
+    {"tipo": "autenticar", "token": "<jwt>"}, em até WS_AUTENTICACAO_SEGUNDOS,
+    e o servidor responde {"tipo": "autenticado"}. Depois disso o servidor
+    envia eventos (nova_mensagem, mensagens_lidas, reacao, mensagem_editada,
+    mensagem_apagada, digitando, notificacao, pipeline) e o cliente pode enviar
+    {"tipo": "digitando", "destinatario_id": X, "digitando": true}
+    ou {"tipo": "ping"}. O polling de /novas continua como fallback.
+
+    A conexão vale enquanto o token valer: é fechada com 1008 quando ele
+    expira ou é revogado. Para continuar conectado, o cliente manda outro
+    "autenticar" com o token renovado antes da expiração.
+    """
+    await websocket.accept()
+    try:
+        dados_usuario = await _receber_autenticacao(websocket)
+    except WebSocketDisconnect:
+        return
+    if dados_usuario is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    credenciais = dados_usuario["credenciais"]
+    await websocket.send_json({"tipo": "autenticado", "dados": {"expira_em": credenciais.get("exp")}})
+    
+    usuario_id = dados_usuario["id"]
+    gerenciador_conexoes.conectar(usuario_id, websocket, credenciais, admin=dados_usuario["admin"])
+    try:
+        while True:
+            evento = await websocket.receive_json()
+            tipo = evento.get("tipo") if isinstance(evento, dict) else None
+            
+            if tipo == "autenticar":
+                renovado = await _validar_autenticacao(evento, usuario_id)
+                if renovado is None:
+                    await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+                    break
+                gerenciador_conexoes.renovar(websocket, renovado["credenciais"])
+                await websocket.send_json({
+                    "tipo": "autenticado", "dados": {"expira_em": renovado["credenciais"].get("exp")}
+                })
+            elif tipo == "ping":
+                presenca.registrar_atividade(usuario_id)
+                await websocket.send_json({"tipo": "pong", "dados": {}})
+            elif tipo == "digitando" and evento.get("destinatario_id"):
+                await run_in_threadpool(
+                    presenca.registrar_digitando,
+                    usuario_id,
+                    int(evento["destinatario_id"]),
+                    bool(evento.get("digitando"))
+                )
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        print(f"Erro no WebSocket de mensagens: {e}")
+    finally:
+        gerenciador_conexoes.desconectar(usuario_id, websocket)
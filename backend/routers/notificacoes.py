@@ -1,19 +1,44 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 from typing import List
-from backend.database import get_db
-from backend.models import Usuario
+from backend.database import get_async_db
 from backend.models.notificacoes import Notificacao
 from backend.schemas.notificacoes import NotificacaoCriar, NotificacaoResposta, NotificacaoAtualizar
-from backend.auth.security import obter_usuario_atual
+from backend.auth.security import Identidade, obter_identidade
+from backend.eventos import barramento
 
 router = APIRouter(prefix="/api/notificacoes", tags=["Notificações"])
 
+def _visiveis_para(usuario_id: int):
+    return (Notificacao.usuario_destino_id == usuario_id) | (Notificacao.usuario_destino_id == None)
+
+async def publicar_notificacao(notificacao: Notificacao):
+    await barramento.publicar_async("notificacoes", {
+        "id": notificacao.id,
+        "tipo": notificacao.tipo,
+        "titulo": notificacao.titulo,
+        "mensagem": notificacao.mensagem,
+        "usuario_origem_id": notificacao.usuario_origem_id,
+        "usuario_destino_id": notificacao.usuario_destino_id,
+        "link": notificacao.link,
+        "data_criacao": notificacao.data_criacao
+    })
+
+async def _carregar(db: AsyncSession, notificacao_id: int) -> Notificacao:
+    return (await db.execute(
+        select(Notificacao)
+        .options(joinedload(Notificacao.usuario_origem))
+        .where(Notificacao.id == notificacao_id)
+        .execution_options(populate_existing=True)
+    )).scalars().first()
+
 @router.post("/", response_model=NotificacaoResposta)
-def criar_notificacao(
+async def criar_notificacao(
     notificacao: NotificacaoCriar,
-    db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    db: AsyncSession = Depends(get_async_db),
+    usuario: Identidade = Depends(obter_identidade)
 ):
     if notificacao.usuario_origem_id != usuario.id:
         raise HTTPException(
@@ -29,39 +54,36 @@ def criar_notificacao(
     
     nova_notificacao = Notificacao(**notificacao.model_dump())
     db.add(nova_notificacao)
-    db.commit()
-    db.refresh(nova_notificacao)
+    await db.commit()
+    nova_notificacao = await _carregar(db, nova_notificacao.id)
+    
+    await publicar_notificacao(nova_notificacao)
     return nova_notificacao
 
 @router.get("/", response_model=List[NotificacaoResposta])
-def listar_notificacoes(
+async def listar_notificacoes(
     apenas_nao_lidas: bool = False,
-    db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    db: AsyncSession = Depends(get_async_db),
+    usuario: Identidade = Depends(obter_identidade)
 ):
-    query = db.query(Notificacao).options(
+    query = select(Notificacao).options(
         joinedload(Notificacao.usuario_origem)
-    )
-    
-    query = query.filter(
-        (Notificacao.usuario_destino_id == usuario.id) | 
-        (Notificacao.usuario_destino_id == None)
-    )
+    ).where(_visiveis_para(usuario.id))
     
     if apenas_nao_lidas:
-        query = query.filter(Notificacao.lida == False)
+        query = query.where(Notificacao.lida == False)
     
-    notificacoes = query.order_by(Notificacao.data_criacao.desc()).all()
+    notificacoes = (await db.execute(query.order_by(Notificacao.data_criacao.desc()))).scalars().all()
     return notificacoes
 
 @router.put("/{notificacao_id}", response_model=NotificacaoResposta)
-def atualizar_notificacao(
+async def atualizar_notificacao(
     notificacao_id: int,
     notificacao_atualizada: NotificacaoAtualizar,
-    db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    db: AsyncSession = Depends(get_async_db),
+    usuario: Identidade = Depends(obter_identidade)
 ):
-    notificacao = db.query(Notificacao).filter(Notificacao.id == notificacao_id).first()
+    notificacao = await db.get(Notificacao, notificacao_id)
     if not notificacao:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -77,38 +99,33 @@ def atualizar_notificacao(
     for key, value in notificacao_atualizada.model_dump(exclude_unset=True).items():
         setattr(notificacao, key, value)
     
-    db.commit()
-    db.refresh(notificacao)
-    return notificacao
+    await db.commit()
+    return await _carregar(db, notificacao_id)
 
 @router.put("/marcar-todas-lidas")
-def marcar_todas_lidas(
-    db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+async def marcar_todas_lidas(
+    db: AsyncSession = Depends(get_async_db),
+    usuario: Identidade = Depends(obter_identidade)
 ):
-    query = db.query(Notificacao)
-    
-    query = query.filter(
-        (Notificacao.usuario_destino_id == usuario.id) | 
-        (Notificacao.usuario_destino_id == None)
+    await db.execute(
+        update(Notificacao)
+        .where(_visiveis_para(usuario.id), Notificacao.lida == False)
+        .values(lida=True),
+        execution_options={"synchronize_session": False}
     )
-    
-    query.filter(Notificacao.lida == False).update({Notificacao.lida: True})
-    db.commit()
+    await db.commit()
     
     return {"message": "Todas as notificações foram marcadas como lidas"}
 
 @router.get("/nao-lidas/contagem")
-def contar_nao_lidas(
-    db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+async def contar_nao_lidas(
+    db: AsyncSession = Depends(get_async_db),
+    usuario: Identidade = Depends(obter_identidade)
 ):
-    query = db.query(Notificacao).filter(Notificacao.lida == False)
-    
-    query = query.filter(
-        (Notificacao.usuario_destino_id == usuario.id) | 
-        (Notificacao.usuario_destino_id == None)
+    count = await db.scalar(
+        select(func.count(Notificacao.id)).where(
+            Notificacao.lida == False,
+            _visiveis_para(usuario.id)
+        )
     )
-    
-    count = query.count()
     return {"count": count}
@@ -7,10 +7,10 @@ import os
 import shutil
 import json
 
-from backend.database import get_db
+from backend.database import get_db, get_read_db
 from backend.models import (
     Stage, CompanyPipeline, CompanyStageHistory, Note, Attachment, Activity,
-    Usuario, Empresa
+    Empresa
 )
 from backend.schemas.pipeline import (
     StageCriar, StageAtualizar, StageResposta,
@@ -19,7 +19,8 @@ from backend.schemas.pipeline import (
     NoteCriar, NoteAtualizar, NoteResposta,
     AttachmentResposta, ActivityResposta, PipelineStats
 )
-from backend.auth.security import obter_usuario_atual, obter_usuario_admin
+from backend.auth.security import Identidade, obter_identidade, obter_identidade_admin
+from backend.eventos import barramento
 
 router = APIRouter(prefix="/api/pipeline", tags=["Pipeline Kanban"])
 
@@ -29,7 +30,7 @@ router = APIRouter(prefix="/api/pipeline", tags=["Pipeline Kanban"])
 def criar_stage(
     stage: StageCriar,
     db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_admin)
+    usuario: Identidade = Depends(obter_identidade_admin)
 ):
     """Criar novo estágio do pipeline"""
     novo_stage = Stage(**stage.model_dump())
@@ -49,7 +50,7 @@ def criar_stage(
 def listar_stages(
     apenas_ativos: bool = True,
     db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    usuario: Identidade = Depends(obter_identidade)
 ):
     """Listar todos os estágios"""
     query = db.query(Stage).order_by(Stage.ordem)
@@ -62,7 +63,7 @@ def atualizar_stage(
     stage_id: int,
     stage_data: StageAtualizar,
     db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_admin)
+    usuario: Identidade = Depends(obter_identidade_admin)
 ):
     """Atualizar estágio"""
     stage = db.query(Stage).filter(Stage.id == stage_id).first()
@@ -80,7 +81,7 @@ def atualizar_stage(
 def deletar_stage(
     stage_id: int,
     db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_admin)
+    usuario: Identidade = Depends(obter_identidade_admin)
 ):
     """Desativar estágio (soft delete)"""
     stage = db.query(Stage).filter(Stage.id == stage_id).first()
@@ -109,7 +110,7 @@ def deletar_stage(
 def adicionar_empresa_pipeline(
     company: CompanyPipelineCriar,
     db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    usuario: Identidade = Depends(obter_identidade)
 ):
     """Adicionar empresa ao pipeline"""
     # Verificar se empresa existe
@@ -162,6 +163,15 @@ def adicionar_empresa_pipeline(
     
     db.commit()
     
+    barramento.publicar("pipeline", {
+        "tipo": "criacao",
+        "company_pipeline_id": nova_entrada.id,
+        "empresa_id": nova_entrada.empresa_id,
+        "consultor_id": nova_entrada.consultor_id,
+        "stage_novo_id": nova_entrada.stage_id,
+        "usuario_id": usuario.id
+    })
+    
     # Carregar com relacionamentos
     return db.query(CompanyPipeline).options(
         joinedload(CompanyPipeline.empresa),
@@ -176,7 +186,7 @@ def listar_empresas_pipeline(
     consultor_id: Optional[int] = None,
     apenas_ativas: bool = True,
     db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    usuario: Identidade = Depends(obter_identidade)
 ):
     """Listar empresas no pipeline"""
     query = db.query(CompanyPipeline).options(
@@ -208,7 +218,7 @@ def listar_empresas_pipeline(
 def obter_empresa_pipeline(
     company_pipeline_id: int,
     db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    usuario: Identidade = Depends(obter_identidade)
 ):
     """Obter detalhes de uma empresa no pipeline"""
     company = db.query(CompanyPipeline).options(
@@ -231,7 +241,7 @@ def atualizar_empresa_pipeline(
     company_pipeline_id: int,
     company_data: CompanyPipelineAtualizar,
     db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    usuario: Identidade = Depends(obter_identidade)
 ):
     """Atualizar empresa no pipeline"""
     # Verificar permissão primeiro
@@ -259,7 +269,7 @@ def mover_empresa_stage(
     company_pipeline_id: int,
     movimento: MoverStageRequest,
     db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    usuario: Identidade = Depends(obter_identidade)
 ):
     """Mover empresa para outro estágio"""
     # Verificar permissão primeiro
@@ -296,6 +306,16 @@ def mover_empresa_stage(
     
     db.commit()
     
+    barramento.publicar("pipeline", {
+        "tipo": "movimentacao",
+        "company_pipeline_id": company_pipeline_id,
+        "empresa_id": company.empresa_id,
+        "consultor_id": company.consultor_id,
+        "stage_anterior_id": stage_anterior_id,
+        "stage_novo_id": movimento.novo_stage_id,
+        "usuario_id": usuario.id
+    })
+    
     return db.query(CompanyPipeline).options(
         joinedload(CompanyPipeline.empresa),
         joinedload(CompanyPipeline.stage),
@@ -308,7 +328,7 @@ def mover_empresa_stage(
 def obter_historico(
     company_pipeline_id: int,
     db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    usuario: Identidade = Depends(obter_identidade)
 ):
     """Obter histórico de movimentações"""
     # Verificar permissão
@@ -328,7 +348,7 @@ def obter_historico(
 def criar_nota(
     nota: NoteCriar,
     db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    usuario: Identidade = Depends(obter_identidade)
 ):
     """Criar nota"""
     # Verificar permissão
@@ -353,7 +373,7 @@ def criar_nota(
 def listar_notas(
     company_pipeline_id: int,
     db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    usuario: Identidade = Depends(obter_identidade)
 ):
     """Listar notas de uma empresa"""
     # Verificar permissão
@@ -370,7 +390,7 @@ def atualizar_nota(
     note_id: int,
     nota_data: NoteAtualizar,
     db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    usuario: Identidade = Depends(obter_identidade)
 ):
     """Atualizar nota"""
     nota = db.query(Note).filter(Note.id == note_id).first()
@@ -392,7 +412,7 @@ def atualizar_nota(
 def deletar_nota(
     note_id: int,
     db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    usuario: Identidade = Depends(obter_identidade)
 ):
     """Deletar nota"""
     nota = db.query(Note).filter(Note.id == note_id).first()
@@ -413,8 +433,8 @@ def deletar_nota(
 def obter_estatisticas(
     linha: Optional[str] = None,
     consultor_id: Optional[int] = None,
-    db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    db: Session = Depends(get_read_db),
+    usuario: Identidade = Depends(obter_identidade)
 ):
     """Obter estatísticas do pipeline"""
     query = db.query(CompanyPipeline).filter(CompanyPipeline.ativo == True)
@@ -435,12 +455,16 @@ def obter_estatisticas(
         func.sum(CompanyPipeline.valor_estimado)
     ).scalar() or 0.0
     
-    # Empresas por estágio
+    # Empresas por estágio (uma consulta agrupada para todos os estágios)
+    contagem_por_stage = dict(
+        query.with_entities(CompanyPipeline.stage_id, func.count(CompanyPipeline.id))
+        .group_by(CompanyPipeline.stage_id)
+        .all()
+    )
     empresas_por_stage = {}
     stages = db.query(Stage).filter(Stage.ativo == True).all()
     for stage in stages:
-        count = query.filter(CompanyPipeline.stage_id == stage.id).count()
-        empresas_por_stage[stage.nome] = count
+        empresas_por_stage[stage.nome] = contagem_por_stage.get(stage.id, 0)
     
     # Empresas paradas (mais de 7 dias no mesmo estágio)
     data_limite = datetime.utcnow() - timedelta(days=7)
@@ -463,7 +487,7 @@ def listar_atividades(
     usuario_id: Optional[int] = None,
     limit: int = 50,
     db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    usuario: Identidade = Depends(obter_identidade)
 ):
     """Listar atividades do sistema"""
     query = db.query(Activity).options(
@@ -487,7 +511,7 @@ def listar_atividades(
 
 def verificar_permissao_company_pipeline(
     company_pipeline_id: int,
-    usuario: Usuario,
+    usuario: Identidade,
     db: Session
 ) -> CompanyPipeline:
     """Verifica se o usuário tem permissão para acessar a empresa no pipeline"""
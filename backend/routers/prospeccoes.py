@@ -6,11 +6,7 @@ from backend.database import get_db
 from backend.models import Prospeccao, Usuario, Empresa, Agendamento, ProspeccaoHistorico
 from backend.models.agendamentos import StatusAgendamento
 from backend.schemas.prospeccoes import ProspeccaoCriar, ProspeccaoResposta, ProspeccaoAtualizar, ProspeccaoComHistorico, ProspeccaoHistoricoResposta
-from backend.auth.security import obter_usuario_atual, obter_usuario_admin
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib import colors
+from backend.auth.security import Identidade, obter_identidade, obter_identidade_admin
 from io import BytesIO
 from datetime import datetime, timedelta
 
@@ -73,7 +69,7 @@ def registrar_historico(db: Session, prospeccao_id: int, usuario_id: int, tipo:
 def criar_prospeccao(
     prospeccao: ProspeccaoCriar,
     db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    usuario: Identidade = Depends(obter_identidade)
 ):
     empresa = db.query(Empresa).filter(Empresa.id == prospeccao.empresa_id).first()
     if not empresa:
@@ -117,7 +113,7 @@ def listar_prospeccoes(
     limit: int = 100,
     empresa_id: int = None,
     db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    usuario: Identidade = Depends(obter_identidade)
 ):
     query = db.query(Prospeccao).options(
         joinedload(Prospeccao.empresa),
@@ -137,7 +133,7 @@ def listar_prospeccoes(
 def obter_prospeccao(
     prospeccao_id: int,
     db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    usuario: Identidade = Depends(obter_identidade)
 ):
     prospeccao = db.query(Prospeccao).options(
         joinedload(Prospeccao.empresa),
@@ -161,7 +157,7 @@ def obter_prospeccao(
 def obter_historico_prospeccao(
     prospeccao_id: int,
     db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    usuario: Identidade = Depends(obter_identidade)
 ):
     """Retorna o histórico de alterações de uma prospecção"""
     prospeccao = db.query(Prospeccao).filter(Prospeccao.id == prospeccao_id).first()
@@ -189,7 +185,7 @@ def obter_historico_prospeccao(
 def obter_prospeccao_com_historico(
     prospeccao_id: int,
     db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    usuario: Identidade = Depends(obter_identidade)
 ):
     """Retorna a prospecção com todo seu histórico de alterações"""
     prospeccao = db.query(Prospeccao).options(
@@ -217,7 +213,7 @@ def atualizar_prospeccao(
     prospeccao_id: int,
     dados: ProspeccaoAtualizar,
     db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    usuario: Identidade = Depends(obter_identidade)
 ):
     """Atualiza uma prospecção existente e registra as alterações no histórico"""
     prospeccao = db.query(Prospeccao).options(
@@ -287,7 +283,7 @@ def criar_prospeccao_com_agendamento(
     agendar_proxima: bool = False,
     data_proxima_ligacao: str = None,
     db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    usuario: Identidade = Depends(obter_identidade)
 ):
     empresa = db.query(Empresa).filter(Empresa.id == prospeccao.empresa_id).first()
     if not empresa:
@@ -361,7 +357,7 @@ def criar_prospeccao_com_agendamento(
 def exportar_prospeccao_pdf(
     prospeccao_id: int,
     db: Session = Depends(get_db),
-    usuario: Usuario = Depends(obter_usuario_atual)
+    usuario: Identidade = Depends(obter_identidade)
 ):
     prospeccao = db.query(Prospeccao).filter(Prospeccao.id == prospeccao_id).first()
     if not prospeccao:
@@ -376,6 +372,12 @@ def exportar_prospeccao_pdf(
             detail="Você não tem permissão para acessar esta prospecção"
         )
     
+    # reportlab só é carregado no primeiro PDF, não no boot de todo worker
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+
     buffer = BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=A4)
     elements = []
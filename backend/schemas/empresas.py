@@ -60,3 +60,47 @@ class EmpresaResposta(EmpresaBase):
 
     class Config:
         from_attributes = True
+
+class EmpresaItemLista(BaseModel):
+    """Colunas da tabela de empresas.html (listagem por cursor)"""
+    id: int
+    empresa: str
+    sigla: Optional[str] = None
+    cnpj: Optional[str] = None
+    municipio: Optional[str] = None
+    er: Optional[str] = None
+    carteira: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+class EmpresaBuscaItem(EmpresaItemLista):
+    estado: Optional[str] = None
+    relevancia: float
+
+class EmpresaSugestao(BaseModel):
+    """Item do autocomplete (/api/empresas/sugestoes)"""
+    id: int
+    empresa: str
+    sigla: Optional[str] = None
+    cnpj: Optional[str] = None
+    municipio: Optional[str] = None
+    estado: Optional[str] = None
+
+class ImportacaoEmpresasResposta(BaseModel):
+    """Progresso de uma importação de planilha (/api/empresas/importacoes/{id})"""
+    id: int
+    arquivo: Optional[str] = None
+    status: str
+    linhas_lidas: int
+    total_estimado: Optional[int] = None
+    criadas: int
+    atualizadas: int
+    ignoradas: int
+    erro: Optional[str] = None
+    iniciado_em: Optional[datetime] = None
+    atualizado_em: Optional[datetime] = None
+    concluido_em: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
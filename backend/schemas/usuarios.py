@@ -54,5 +54,17 @@ class UsuarioLogin(BaseModel):
 
 class Token(BaseModel):
     access_token: str
+    refresh_token: Optional[str] = None
     token_type: str
     usuario: UsuarioResposta
+
+class TokenRenovar(BaseModel):
+    refresh_token: str
+
+class TokenPar(BaseModel):
+    access_token: str
+    refresh_token: str
+    token_type: str
+
+class Logout(BaseModel):
+    refresh_token: Optional[str] = None
@@ -0,0 +1,227 @@
+"""
+Backfills de dados: correções em massa fora do startup e do deploy.
+
+Cada backfill é um UPDATE set-based registrado aqui com nome e versão. O
+executor percorre a tabela por faixas de id (keyset, --lote linhas por
+vez), roda o UPDATE da faixa e grava o último id na tabela `backfills` na
+mesma transação. Interrompido, continua de onde parou; concluído, não roda
+de novo até a versão mudar (mudar a versão recomeça do id 0). Cada
+backfill roda sob um advisory lock próprio, então duas execuções
+simultâneas não disputam as mesmas linhas.
+
+O SQL recebe :inicio e :fim (faixa `id > :inicio AND id <= :fim`) e precisa
+ser idempotente: uma faixa pode rodar de novo se o processo cair entre o
+UPDATE e o commit.
+
+Nada disso roda nos workers nem no preparar_banco, que só avisa dos
+pendentes. Depois do deploy:
+
+    python -m backend.utils.backfills                 # todos os pendentes
+    python -m backend.utils.backfills --status
+    python -m backend.utils.backfills prospeccoes_codigo --lote 5000 --pausa 0.2
+    python -m backend.utils.backfills prospeccoes_codigo --reiniciar
+
+O progresso também aparece em /api/admin/backfills. Assim como o
+preparar_banco, use o DATABASE_URL direto do Postgres (sem PgBouncer).
+"""
+import argparse
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+
+from backend.database import engine
+
+BACKFILL_LOTE = 10000
+# Classe dos advisory locks de backfill (a chave é o hash do nome)
+CLASSE_BLOQUEIO = 103_0019
+
+
+class Backfill:
+    def __init__(self, nome: str, versao: int, tabela: str, sql: str, descricao: str,
+                 lote: int = BACKFILL_LOTE):
+        self.nome = nome
+        self.versao = versao
+        self.tabela = tabela
+        self.sql = text(sql)
+        self.descricao = descricao
+        self.lote = lote
+
+
+BACKFILLS: Dict[str, Backfill] = {}
+
+
+def registrar(backfill: Backfill) -> Backfill:
+    BACKFILLS[backfill.nome] = backfill
+    return backfill
+
+
+# O código gerado no banco usa o id: determinístico (faixa repetida gera o
+# mesmo valor) e único. O "L" antes do id nunca aparece nos sufixos
+# hexadecimais de gerar_codigo_prospeccao, então não colide com os códigos
+# criados pelo app.
+registrar(Backfill(
+    nome="prospeccoes_codigo",
+    versao=1,
+    tabela="prospeccoes",
+    descricao="Código PROSP-AAAAMMDD-L<id> para prospecções sem código",
+    sql="""
+        UPDATE prospeccoes
+        SET codigo = 'PROSP-' || to_char(COALESCE(data_criacao, now()), 'YYYYMMDD')
+            || '-L' || upper(lpad(to_hex(id), 4, '0'))
+        WHERE id > :inicio AND id <= :fim AND (codigo IS NULL OR codigo = '')
+    """
+))
+
+
+def estado_backfills(conn) -> List[dict]:
+    """Registrados x tabela backfills, para o CLI e o endpoint de admin"""
+    existe = conn.execute(text("SELECT to_regclass('backfills') IS NOT NULL")).scalar()
+    linhas = {}
+    if existe:
+        linhas = {linha.nome: linha for linha in conn.execute(text("SELECT * FROM backfills"))}
+    estados = []
+    for backfill in BACKFILLS.values():
+        linha = linhas.get(backfill.nome)
+        atual = linha is not None and linha.versao == backfill.versao
+        estados.append({
+            "nome": backfill.nome,
+            "versao": backfill.versao,
+            "descricao": backfill.descricao,
+            "concluido": atual and linha.concluido_em is not None,
+            "ultimo_id": linha.ultimo_id if atual else 0,
+            "linhas": linha.linhas if atual else 0,
+            "iniciado_em": linha.iniciado_em if atual else None,
+            "atualizado_em": linha.atualizado_em if atual else None,
+            "concluido_em": linha.concluido_em if atual else None
+        })
+    return estados
+
+
+def pendentes(conn) -> List[str]:
+    return [estado["nome"] for estado in estado_backfills(conn) if not estado["concluido"]]
+
+
+def marcar_concluidos(conn):
+    """Banco criado do zero pelos models: não há dados legados a corrigir"""
+    agora = datetime.utcnow()
+    for backfill in BACKFILLS.values():
+        conn.execute(text("""
+            INSERT INTO backfills (nome, versao, ultimo_id, linhas, iniciado_em, atualizado_em, concluido_em)
+            VALUES (:nome, :versao, 0, 0, :agora, :agora, :agora)
+            ON CONFLICT (nome) DO NOTHING
+        """), {"nome": backfill.nome, "versao": backfill.versao, "agora": agora})
+
+
+def _inicio(conn, backfill: Backfill, reiniciar: bool) -> Optional[int]:
+    """Último id já processado, ou None se esta versão já foi concluída"""
+    linha = conn.execute(
+        text("SELECT versao, ultimo_id, concluido_em FROM backfills WHERE nome = :nome"),
+        {"nome": backfill.nome}
+    ).first()
+    if linha is not None and linha.versao == backfill.versao and not reiniciar:
+        return None if linha.concluido_em is not None else linha.ultimo_id
+    conn.execute(text("""
+        INSERT INTO backfills (nome, versao, ultimo_id, linhas, iniciado_em, atualizado_em, concluido_em)
+        VALUES (:nome, :versao, 0, 0, :agora, :agora, NULL)
+        ON CONFLICT (nome) DO UPDATE SET
+            versao = EXCLUDED.versao, ultimo_id = 0, linhas = 0,
+            iniciado_em = EXCLUDED.iniciado_em, atualizado_em = EXCLUDED.atualizado_em, concluido_em = NULL
+    """), {"nome": backfill.nome, "versao": backfill.versao, "agora": datetime.utcnow()})
+    return 0
+
+
+def executar(backfill: Backfill, lote: Optional[int] = None, pausa: float = 0, reiniciar: bool = False) -> bool:
+    """Roda o backfill até o fim. False se outra execução já está com ele."""
+    lote = lote or backfill.lote
+    with engine.connect() as bloqueio:
+        bloqueio.execution_options(isolation_level="AUTOCOMMIT")
+        if not bloqueio.execute(
+            text("SELECT pg_try_advisory_lock(:classe, hashtext(:nome))"),
+            {"classe": CLASSE_BLOQUEIO, "nome": backfill.nome}
+        ).scalar():
+            print(f"⏳ {backfill.nome}: outra execução em andamento, pulando")
+            return False
+        try:
+            with engine.begin() as conn:
+                inicio = _inicio(conn, backfill, reiniciar)
+            if inicio is None:
+                print(f"✓ {backfill.nome} v{backfill.versao} já concluído")
+                return True
+
+            with engine.connect() as conn:
+                maximo = conn.execute(text(f"SELECT max(id) FROM {backfill.tabela}")).scalar() or 0
+            print(f"🔄 {backfill.nome} v{backfill.versao}: {backfill.descricao} (id {inicio} → {maximo})")
+            comeco = time.perf_counter()
+            total = 0
+            while True:
+                with engine.begin() as conn:
+                    fim = conn.execute(text(f"""
+                        SELECT max(id) FROM (
+                            SELECT id FROM {backfill.tabela} WHERE id > :inicio ORDER BY id LIMIT :lote
+                        ) AS faixa
+                    """), {"inicio": inicio, "lote": lote}).scalar()
+                    agora = datetime.utcnow()
+                    if fim is None:
+                        conn.execute(
+                            text("UPDATE backfills SET atualizado_em = :agora, concluido_em = :agora WHERE nome = :nome"),
+                            {"nome": backfill.nome, "agora": agora}
+                        )
+                        break
+                    alteradas = conn.execute(backfill.sql, {"inicio": inicio, "fim": fim}).rowcount
+                    conn.execute(text("""
+                        UPDATE backfills SET ultimo_id = :fim, linhas = linhas + :alteradas, atualizado_em = :agora
+                        WHERE nome = :nome
+                    """), {"nome": backfill.nome, "fim": fim, "alteradas": alteradas, "agora": agora})
+                total += alteradas
+                inicio = fim
+                decorrido = time.perf_counter() - comeco
+                progresso = min(fim / maximo * 100, 100) if maximo else 100
+                print(f"   {backfill.nome}: id {fim}/{maximo} ({progresso:.0f}%), {total} linhas alteradas, {decorrido:.1f} s")
+                if pausa:
+                    time.sleep(pausa)
+            print(f"✅ {backfill.nome} concluído: {total} linhas em {time.perf_counter() - comeco:.1f} s")
+            return True
+        finally:
+            bloqueio.execute(
+                text("SELECT pg_advisory_unlock(:classe, hashtext(:nome))"),
+                {"classe": CLASSE_BLOQUEIO, "nome": backfill.nome}
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("nomes", nargs="*", help="backfills a rodar (padrão: todos os pendentes)")
+    parser.add_argument("--status", action="store_true", help="só mostra o progresso")
+    parser.add_argument("--lote", type=int, help=f"linhas por faixa (padrão {BACKFILL_LOTE})")
+    parser.add_argument("--pausa", type=float, default=0, help="segundos entre faixas, para aliviar o primário")
+    parser.add_argument("--reiniciar", action="store_true", help="recomeça do id 0 mesmo se já concluído")
+    args = parser.parse_args()
+
+    if engine is None:
+        print("❌ DATABASE_URL não configurada")
+        sys.exit(1)
+    desconhecidos = [nome for nome in args.nomes if nome not in BACKFILLS]
+    if desconhecidos:
+        print(f"❌ Backfills desconhecidos: {', '.join(desconhecidos)} (registrados: {', '.join(BACKFILLS)})")
+        sys.exit(1)
+
+    with engine.connect() as conn:
+        estados = estado_backfills(conn)
+    if args.status:
+        for estado in estados:
+            situacao = "concluído" if estado["concluido"] else f"pendente, último id {estado['ultimo_id']}"
+            print(f"{estado['nome']} v{estado['versao']}: {situacao}, {estado['linhas']} linhas — {estado['descricao']}")
+        return
+
+    nomes = args.nomes or [estado["nome"] for estado in estados if not estado["concluido"]]
+    if not nomes:
+        print("✓ Nenhum backfill pendente")
+    for nome in nomes:
+        executar(BACKFILLS[nome], lote=args.lote, pausa=args.pausa, reiniciar=args.reiniciar)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+Busca de empresas por nome, sigla, CNPJ e município (/api/empresas/busca).
+
+A migração f4b6d8e0a2c3 cria colunas geradas com o texto sem acento e em
+minúsculas: nome_busca (nome + sigla, COLLATE "C") e municipio_busca, com
+índices de trigramas (pg_trgm) e um btree em (nome_busca, id). O Postgres
+mantém as colunas em todo INSERT/UPDATE; "sao" encontra "São" sem chamar
+unaccent por linha.
+
+O ranking é feito em camadas, da mais relevante para a menos, cada uma uma
+consulta que exclui as linhas das anteriores. O chamador roda as camadas em
+ordem e para quando completa o limite, então um termo comum ("construtora")
+é respondido pela primeira e as mais caras nem rodam:
+
+1. prefixo: o nome começa com o termo (faixa no btree, em ordem alfabética);
+2. palavras: todas as palavras do termo aparecem no nome ou na sigla (GIN).
+   Ordenar todas as que casam custaria uma leitura por linha numa palavra
+   comum; vêm as primeiras encontradas, em ordem alfabética;
+3. aproximada: cada palavra é parecida com alguma do nome (operador `<%`,
+   tolera erros de digitação como "contrutora"). Um erro numa palavra
+   comum casa com dezenas de milhares de linhas, então só as primeiras
+   CANDIDATOS_APROXIMADOS são ordenadas por word_similarity.
+
+Termos só com dígitos e pontuação são tratados como CNPJ e comparados com
+a coluna gerada cnpj_digits (migração c8e0a2b4d6f7), também em duas
+camadas: prefixo (faixa no btree, em ordem de CNPJ, matriz antes das
+filiais) e o termo em qualquer posição (índice de trigramas).
+
+Sem as extensões (migração pulada, Postgres sem contrib) a busca cai num
+ILIKE simples, sem índice e sensível a acentos, e avisa uma vez por worker.
+
+filtrar_empresas aplica os filtros da listagem (/api/empresas/), usados
+também pela exportação.
+"""
+import re
+import unicodedata
+from typing import List, Optional
+
+from sqlalchemy import Text, and_, case, func, literal, literal_column, not_, or_, select, text
+
+from backend.models import Empresa
+
+# Linhas da camada aproximada que entram na ordenação por similaridade
+CANDIDATOS_APROXIMADOS = 50
+
+RELEVANCIA_PREFIXO = 1.0
+RELEVANCIA_PALAVRAS = 0.75
+RELEVANCIA_CNPJ_TRECHO = 0.5
+# A camada aproximada vale este peso vezes a word_similarity (0,6 a 1)
+PESO_APROXIMADA = 0.5
+
+NOME_BUSCA = literal_column("empresas.nome_busca", Text)
+MUNICIPIO_BUSCA = literal_column("empresas.municipio_busca", Text)
+
+_indexada: Optional[bool] = None
+
+
+async def busca_indexada(db) -> bool:
+    """Colunas de busca criadas pela migração, verificado uma vez por worker"""
+    global _indexada
+    if _indexada is None:
+        _indexada = bool(await db.scalar(text("""
+            SELECT EXISTS (
+                SELECT 1 FROM pg_attribute
+                WHERE attrelid = 'empresas'::regclass AND attname = 'nome_busca' AND NOT attisdropped
+            )
+        """)))
+        if not _indexada:
+            print("⚠️ pg_trgm/unaccent ausentes: /api/empresas/busca usando ILIKE sem índice")
+    return _indexada
+
+
+def _escapar_like(termo: str) -> str:
+    return termo.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def normalizar(termo: str) -> str:
+    """Minúsculas, sem acento e com espaços simples, como as colunas de busca"""
+    decomposto = unicodedata.normalize("NFKD", termo)
+    sem_acento = "".join(c for c in decomposto if not unicodedata.combining(c))
+    return " ".join(sem_acento.lower().split())
+
+
+def termo_cnpj(termo: str) -> Optional[str]:
+    """Dígitos do termo quando ele parece um CNPJ (ou pedaço de um)"""
+    digitos = re.sub(r"\D", "", termo)
+    if len(digitos) >= 3 and not re.search(r"[^\d\s./-]", termo):
+        return digitos
+    return None
+
+
+def _colunas(relevancia):
+    return [
+        Empresa.id, Empresa.empresa, Empresa.sigla, Empresa.cnpj, Empresa.municipio, Empresa.estado,
+        relevancia.label("relevancia")
+    ]
+
+
+def _candidatos(condicao, municipio: Optional[str], limite: int):
+    """
+    Primeiras `limite` linhas que passam na condição, sem ORDER BY: o bitmap
+    scan do GIN para assim que acha o suficiente em vez de ler todas.
+    """
+    return _filtrar_municipio(
+        select(
+            Empresa.id, Empresa.empresa, Empresa.sigla, Empresa.cnpj, Empresa.municipio, Empresa.estado,
+            NOME_BUSCA.label("nome_busca")
+        ).where(condicao),
+        municipio, True
+    ).limit(limite).subquery()
+
+
+def _sucessor(prefixo: str) -> str:
+    """
+    Fim da faixa [prefixo, sucessor) no btree: é o LIKE 'prefixo%' em
+    COLLATE "C", mas continua usando o índice num plano genérico de
+    prepared statement
+    """
+    return prefixo[:-1] + chr(ord(prefixo[-1]) + 1)
+
+
+def consultas_busca(termo: str, municipio: Optional[str], limite: int, indexada: bool) -> List:
+    """
+    SELECTs da busca em ordem de relevância, cada um com até `limite`
+    linhas. O chamador roda em ordem e para quando juntar `limite`.
+    """
+    digitos = termo_cnpj(termo)
+    if digitos:
+        prefixo = and_(Empresa.cnpj_digits >= digitos, Empresa.cnpj_digits < _sucessor(digitos))
+        camada_prefixo = _filtrar_municipio(
+            select(*_colunas(literal(RELEVANCIA_PREFIXO))).where(prefixo), municipio, indexada
+        ).order_by(Empresa.cnpj_digits, Empresa.id).limit(limite)
+        camada_trecho = _filtrar_municipio(
+            select(*_colunas(literal(RELEVANCIA_CNPJ_TRECHO))).where(
+                Empresa.cnpj_digits.like(f"%{digitos}%"), not_(prefixo)
+            ), municipio, indexada
+        ).order_by(Empresa.empresa, Empresa.id).limit(limite)
+        return [camada_prefixo, camada_trecho]
+
+    if not indexada:
+        padrao = _escapar_like(termo)
+        relevancia = case((Empresa.empresa.ilike(f"{padrao}%", escape="\\"), 1.0), else_=0.5)
+        query = _filtrar_municipio(select(*_colunas(relevancia)).where(or_(
+            Empresa.empresa.ilike(f"%{padrao}%", escape="\\"),
+            Empresa.sigla.ilike(f"{padrao}%", escape="\\")
+        )), municipio, indexada)
+        return [query.order_by(relevancia.desc(), Empresa.empresa, Empresa.id).limit(limite)]
+
+    alvo = normalizar(termo)
+    if not alvo:
+        return []
+    palavras = alvo.split()
+    prefixo = and_(NOME_BUSCA >= alvo, NOME_BUSCA < _sucessor(alvo))
+    todas_palavras = and_(*[NOME_BUSCA.like(f"%{_escapar_like(p)}%", escape="\\") for p in palavras])
+    parecidas = and_(*[literal(p, Text).op("<%")(NOME_BUSCA) for p in palavras])
+
+    camada_prefixo = _filtrar_municipio(
+        select(*_colunas(literal(RELEVANCIA_PREFIXO))).where(prefixo), municipio, indexada
+    ).order_by(NOME_BUSCA, Empresa.id).limit(limite)
+
+    # Todas as linhas desta camada valem o mesmo: as primeiras encontradas,
+    # em ordem alfabética
+    palavras_achadas = _candidatos(and_(todas_palavras, not_(prefixo)), municipio, limite)
+    camada_palavras = select(
+        *[coluna for coluna in palavras_achadas.c if coluna.name != "nome_busca"],
+        literal(RELEVANCIA_PALAVRAS).label("relevancia")
+    ).order_by(palavras_achadas.c.nome_busca, palavras_achadas.c.id)
+
+    aproximadas = _candidatos(
+        and_(parecidas, not_(todas_palavras), not_(prefixo)), municipio, CANDIDATOS_APROXIMADOS
+    )
+    similaridade = func.word_similarity(alvo, aproximadas.c.nome_busca)
+    camada_aproximada = select(
+        *[coluna for coluna in aproximadas.c if coluna.name != "nome_busca"],
+        (similaridade * PESO_APROXIMADA).label("relevancia")
+    ).order_by(similaridade.desc(), aproximadas.c.empresa, aproximadas.c.id).limit(limite)
+
+    return [camada_prefixo, camada_palavras, camada_aproximada]
+
+
+def _filtrar_municipio(query, municipio: Optional[str], indexada: bool):
+    if not municipio:
+        return query
+    if indexada:
+        return query.where(MUNICIPIO_BUSCA.like(f"%{_escapar_like(normalizar(municipio))}%", escape="\\"))
+    return query.where(Empresa.municipio.ilike(f"%{_escapar_like(municipio)}%", escape="\\"))
+
+
+def filtrar_empresas(query, nome, cnpj, municipio, er, carteira):
+    if nome:
+        query = query.where(Empresa.empresa.ilike(f"%{nome}%"))
+    if cnpj:
+        # CNPJ completo: igualdade no btree de cnpj_digits; pedaço: trigramas
+        digitos = re.sub(r"\D", "", cnpj)
+        if len(digitos) == 14:
+            query = query.where(Empresa.cnpj_digits == digitos)
+        elif digitos:
+            query = query.where(Empresa.cnpj_digits.like(f"%{digitos}%"))
+        else:
+            query = query.where(Empresa.cnpj.ilike(f"%{cnpj}%"))
+    if municipio:
+        query = query.where(Empresa.municipio.ilike(f"%{municipio}%"))
+    if er:
+        query = query.where(Empresa.er == er)
+    if carteira:
+        query = query.where(Empresa.carteira == carteira)
+    return query
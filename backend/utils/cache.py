@@ -0,0 +1,73 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+caches_registrados: Dict[str, "CacheTTL"] = {}
+
+
+class CacheTTL:
+    """
+    Cache LRU limitado com expiração por tempo, seguro para uso a partir do
+    threadpool (endpoints sync). Cada worker tem a sua própria instância;
+    invalidações entre workers passam pelo barramento de eventos.
+    Caches criados com `nome` aparecem no /metrics (backend/metricas.py).
+    """
+
+    def __init__(self, tamanho_maximo: int, ttl_segundos: float, nome: Optional[str] = None):
+        self.nome = nome
+        self.tamanho_maximo = tamanho_maximo
+        self.ttl_segundos = ttl_segundos
+        self.itens: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+        if nome:
+            caches_registrados[nome] = self
+
+    def obter(self, chave: Hashable) -> Optional[Any]:
+        agora = time.monotonic()
+        with self.lock:
+            item = self.itens.get(chave)
+            if item is None or item[0] < agora:
+                if item is not None:
+                    del self.itens[chave]
+                self.falhas += 1
+                return None
+            self.itens.move_to_end(chave)
+            self.acertos += 1
+            return item[1]
+
+    def definir(self, chave: Hashable, valor: Any):
+        with self.lock:
+            self.itens[chave] = (time.monotonic() + self.ttl_segundos, valor)
+            self.itens.move_to_end(chave)
+            while len(self.itens) > self.tamanho_maximo:
+                self.itens.popitem(last=False)
+
+    def remover(self, chave: Hashable):
+        with self.lock:
+            self.itens.pop(chave, None)
+
+    def remover_se(self, predicado: Callable[[Any], bool]) -> int:
+        with self.lock:
+            chaves = [chave for chave, (_, valor) in self.itens.items() if predicado(valor)]
+            for chave in chaves:
+                del self.itens[chave]
+            return len(chaves)
+
+    def limpar(self):
+        with self.lock:
+            self.itens.clear()
+
+    def estatisticas(self) -> dict:
+        total = self.acertos + self.falhas
+        return {
+            "tamanho": len(self.itens),
+            "tamanho_maximo": self.tamanho_maximo,
+            "ttl_segundos": self.ttl_segundos,
+            "acertos": self.acertos,
+            "falhas": self.falhas,
+            "taxa_acerto": round(self.acertos / total, 4) if total else 0.0
+        }
@@ -0,0 +1,238 @@
+"""
+Log de consultas lentas e limite de tempo por papel.
+
+Toda consulta (engine síncrono e asyncpg) que passa de CONSULTAS_LENTAS_MS
+(padrão 500) entra num buffer circular de CONSULTAS_LENTAS_MAXIMO itens
+(padrão 100) por worker, com o SQL, os parâmetros (valores longos cortados,
+senhas e tokens mascarados) e a rota de origem. Com
+CONSULTAS_LENTAS_EXPLAIN=true os SELECTs lentos também guardam o
+`EXPLAIN (ANALYZE, BUFFERS)`; isso executa a consulta de novo, então fica
+desligado por padrão. SELECTs que chamam funções fora de uma lista sem
+efeitos colaterais (pg_notify, pg_advisory_lock, set_config...) ganham só o
+EXPLAIN, sem executar; consultas fora de transação (AUTOCOMMIT) não são
+explicadas, porque o savepoint que protege a transação não existe ali. Consultas canceladas pelo statement_timeout entram no
+mesmo buffer, marcadas com erro. O buffer aparece em
+/api/admin/consultas-lentas.
+
+Limite de tempo: só as transações de sessão abertas dentro de uma
+requisição recebem um `SET LOCAL statement_timeout`, com
+STATEMENT_TIMEOUT_MS (padrão 30000) ou o limite do papel do token (claim
+`tipo`) em STATEMENT_TIMEOUT_<PAPEL>_MS; admin tem 120000 por padrão, para
+os relatórios e exportações. Fora de requisições (CLIs de manutenção,
+tarefas em segundo plano) vale o padrão do servidor. Com DB_PGBOUNCER=true a
+conexão não leva parâmetros de inicialização, então timezone também é
+definido em toda transação de sessão.
+"""
+import os
+import re
+import threading
+import time
+from collections import deque
+from typing import List, Optional
+
+from jose import JWTError, jwt
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from backend.auth.security import ALGORITHM, SECRET_KEY
+from backend.database import DB_PGBOUNCER, STATEMENT_TIMEOUT_MS
+from backend.metricas import nome_rota
+from backend.models import TipoUsuario
+from backend.utils.contador_consultas import estatisticas_atuais
+
+CONSULTAS_LENTAS_MS = float(os.getenv("CONSULTAS_LENTAS_MS", "500"))
+CONSULTAS_LENTAS_EXPLAIN = os.getenv("CONSULTAS_LENTAS_EXPLAIN") == "true"
+CONSULTAS_LENTAS_MAXIMO = int(os.getenv("CONSULTAS_LENTAS_MAXIMO", "100"))
+
+_PADRAO_PAPEIS = {TipoUsuario.admin: 120000}
+TEMPOS_LIMITE_PAPEIS = {
+    tipo.value: int(os.getenv(f"STATEMENT_TIMEOUT_{tipo.name.upper()}_MS", _PADRAO_PAPEIS.get(tipo, STATEMENT_TIMEOUT_MS)))
+    for tipo in TipoUsuario
+}
+
+_CAMPOS_SENSIVEIS = ("senha", "password", "token", "hash", "secret")
+TAMANHO_MAXIMO_VALOR = 200
+TIMEOUT_SQLSTATE = "57014"
+
+# Palavras seguidas de "(" que não são chamadas de função, e funções que
+# podem rodar de novo sob EXPLAIN ANALYZE sem efeito colateral
+_CHAMADA = re.compile(r"\b([a-z_][a-z0-9_]*)\s*\(", re.IGNORECASE)
+_SEM_EFEITOS = {
+    "select", "from", "join", "in", "exists", "any", "all", "values", "as", "over", "filter", "cast",
+    "and", "or", "not", "on", "using", "where", "when", "then", "else", "lateral", "distinct", "with",
+    "count", "sum", "avg", "min", "max", "coalesce", "nullif", "greatest", "least", "lower", "upper",
+    "length", "left", "right", "lpad", "rpad", "trim", "btrim", "ltrim", "rtrim", "substring", "substr",
+    "regexp_replace", "concat", "concat_ws", "abs", "round", "floor", "ceil", "date_trunc", "extract",
+    "now", "to_char", "array_agg", "string_agg", "json_agg", "jsonb_agg", "json_build_object",
+    "jsonb_build_object", "row_number", "rank", "dense_rank", "unnest", "similarity",
+    "word_similarity", "f_unaccent", "unaccent", "varchar", "char", "numeric", "decimal", "timestamp",
+}
+
+
+class RegistroConsultasLentas:
+    def __init__(self, maximo: int = CONSULTAS_LENTAS_MAXIMO):
+        self.itens = deque(maxlen=maximo)
+        self.lock = threading.Lock()
+
+    def registrar(self, item: dict):
+        with self.lock:
+            self.itens.append(item)
+
+    def listar(self) -> List[dict]:
+        with self.lock:
+            return list(reversed(self.itens))
+
+
+registro_consultas_lentas = RegistroConsultasLentas()
+
+
+def _valor(nome, valor):
+    if isinstance(nome, str) and any(campo in nome.lower() for campo in _CAMPOS_SENSIVEIS):
+        return "***"
+    if valor is None or isinstance(valor, (bool, int, float)):
+        return valor
+    texto = str(valor)
+    return texto if len(texto) <= TAMANHO_MAXIMO_VALOR else texto[:TAMANHO_MAXIMO_VALOR] + "…"
+
+
+def _parametros(parameters, executemany: bool):
+    if executemany:
+        return {"lotes": len(parameters), "primeiros": [_parametros(p, False) for p in list(parameters)[:3]]}
+    if isinstance(parameters, dict):
+        return {nome: _valor(nome, valor) for nome, valor in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [_valor(None, valor) for valor in parameters]
+    return parameters
+
+
+def _origem() -> dict:
+    estatisticas = estatisticas_atuais()
+    scope = estatisticas.scope if estatisticas else None
+    if scope is None:
+        return {"metodo": None, "rota": "fora de requisição"}
+    return {"metodo": scope["method"], "rota": nome_rota(scope)}
+
+
+def _pode_reexecutar(statement: str) -> bool:
+    """Só SELECTs sem chamadas a funções com efeito colateral rodam de novo sob ANALYZE"""
+    return all(nome.lower() in _SEM_EFEITOS for nome in _CHAMADA.findall(statement))
+
+
+def _explicar(conn, statement: str, parameters) -> str:
+    """
+    EXPLAIN num cursor cru (não conta como consulta da requisição). O
+    savepoint evita que uma falha aqui aborte a transação do endpoint.
+    """
+    opcoes = "(ANALYZE, BUFFERS)" if _pode_reexecutar(statement) else "(COSTS)"
+    cursor = conn.connection.cursor()
+    com_savepoint = False
+    try:
+        cursor.execute("SAVEPOINT explicar_consulta_lenta")
+        com_savepoint = True
+        cursor.execute(f"EXPLAIN {opcoes} {statement}", parameters)
+        plano = "\n".join(linha[0] for linha in cursor.fetchall())
+        cursor.execute("RELEASE SAVEPOINT explicar_consulta_lenta")
+        return plano
+    except Exception as e:
+        if com_savepoint:
+            try:
+                cursor.execute("ROLLBACK TO SAVEPOINT explicar_consulta_lenta")
+                cursor.execute("RELEASE SAVEPOINT explicar_consulta_lenta")
+            except Exception:
+                pass
+        return f"EXPLAIN falhou: {e}"
+    finally:
+        cursor.close()
+
+
+def _registrar(statement: str, parameters, executemany: bool, duracao: float,
+               plano: Optional[str] = None, erro: Optional[str] = None):
+    origem = _origem()
+    registro_consultas_lentas.registrar({
+        "em": time.time(),
+        "duracao_ms": round(duracao * 1000, 1),
+        **origem,
+        "sql": statement,
+        "parametros": _parametros(parameters, executemany),
+        "plano": plano,
+        "erro": erro
+    })
+    motivo = f" ({erro})" if erro else ""
+    print(f"🐌 Consulta lenta{motivo}: {duracao * 1000:.0f} ms em {origem['rota']}: {' '.join(statement.split())[:300]}")
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _antes(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("lentas_inicio", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _depois(conn, cursor, statement, parameters, context, executemany):
+    inicios = conn.info.get("lentas_inicio")
+    if not inicios:
+        return
+    duracao = time.perf_counter() - inicios.pop()
+    if duracao * 1000 < CONSULTAS_LENTAS_MS:
+        return
+    plano = None
+    if (
+        CONSULTAS_LENTAS_EXPLAIN and not executemany
+        and conn.dialect.name == "postgresql"
+        and statement.lstrip().upper().startswith("SELECT")
+        and conn.in_transaction()
+        and not getattr(conn.connection.dbapi_connection, "autocommit", False)
+    ):
+        plano = _explicar(conn, statement, parameters)
+    _registrar(statement, parameters, executemany, duracao, plano=plano)
+
+
+@event.listens_for(Engine, "handle_error")
+def _erro(contexto):
+    inicios = contexto.connection.info.get("lentas_inicio") if contexto.connection is not None else None
+    if not inicios:
+        return
+    duracao = time.perf_counter() - inicios.pop()
+    original = contexto.original_exception
+    sqlstate = getattr(original, "pgcode", None) or getattr(original, "sqlstate", None)
+    if sqlstate == TIMEOUT_SQLSTATE and contexto.statement:
+        executemany = contexto.execution_context is not None and contexto.execution_context.executemany
+        _registrar(contexto.statement, contexto.parameters, executemany, duracao, erro="statement_timeout")
+
+
+def papel_da_requisicao(scope: dict) -> Optional[str]:
+    """Claim `tipo` do access token, guardada em request.state na primeira consulta"""
+    estado = scope.setdefault("state", {})
+    if "papel" not in estado:
+        autorizacao = dict(scope.get("headers") or []).get(b"authorization", b"").decode()
+        papel = None
+        if autorizacao.lower().startswith("bearer "):
+            try:
+                papel = jwt.decode(autorizacao[7:], SECRET_KEY, algorithms=[ALGORITHM]).get("tipo")
+            except JWTError:
+                pass
+        estado["papel"] = papel
+    return estado["papel"]
+
+
+@event.listens_for(Session, "after_begin")
+def _aplicar_tempo_limite(session, transacao, conexao):
+    if conexao.dialect.name != "postgresql":
+        return
+    estatisticas = estatisticas_atuais()
+    if estatisticas is not None and estatisticas.scope is not None:
+        limite = TEMPOS_LIMITE_PAPEIS.get(papel_da_requisicao(estatisticas.scope), STATEMENT_TIMEOUT_MS)
+        if DB_PGBOUNCER:
+            # A conexão do servidor é compartilhada: parâmetros só valem dentro da transação
+            sql = f"SELECT set_config('statement_timeout', '{int(limite)}', true), set_config('timezone', 'UTC', true)"
+        else:
+            sql = f"SET LOCAL statement_timeout = {int(limite)}"
+    elif DB_PGBOUNCER:
+        sql = "SELECT set_config('timezone', 'UTC', true)"
+    else:
+        return
+    cursor = conexao.connection.cursor()
+    try:
+        cursor.execute(sql)
+    finally:
+        cursor.close()
@@ -0,0 +1,158 @@
+"""
+Contador de consultas SQL por requisição.
+
+Eventos do SQLAlchemy registrados na classe Engine (vale para o engine
+síncrono e para o asyncpg) somam, para a requisição atual, o número de
+consultas, o tempo total no banco e quantas vezes cada formato de SQL se
+repetiu. A requisição atual vem de uma ContextVar preenchida pelo
+MiddlewareContadorConsultas; ela chega aos endpoints def porque o
+threadpool do Starlette copia o contexto.
+
+O resultado vai no header Server-Timing (visível no DevTools) e, com
+CONSULTAS_DEBUG=true, em uma linha de log por requisição. Formatos
+repetidos CONSULTAS_LIMITE_REPETICAO vezes ou mais (padrão 5) são
+apontados como suspeita de N+1.
+
+Para testes: verificar_orcamento(resposta, maximo) lê o header de uma
+resposta do TestClient; orcamento_consultas(maximo) mede um bloco de código
+executado na mesma thread.
+"""
+import os
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+CONSULTAS_DEBUG = os.getenv("CONSULTAS_DEBUG") == "true"
+CONSULTAS_LIMITE_REPETICAO = int(os.getenv("CONSULTAS_LIMITE_REPETICAO", "5"))
+
+_LISTA_PARAMETROS = re.compile(r"\((?:\s*(?:%\(\w+\)s|\$\d+|\?)\s*,?)+\)")
+_ESPACOS = re.compile(r"\s+")
+_SERVER_TIMING = re.compile(r'db;desc="(\d+) consultas"')
+
+
+class EstatisticasConsultas:
+    def __init__(self, scope: Optional[dict] = None):
+        self.scope = scope
+        self.total = 0
+        self.tempo = 0.0
+        self.formatos: Counter = Counter()
+
+    def registrar(self, sql: str, duracao: float):
+        self.total += 1
+        self.tempo += duracao
+        self.formatos[formato_sql(sql)] += 1
+
+    def repetidas(self, limite: int = CONSULTAS_LIMITE_REPETICAO) -> List[Tuple[str, int]]:
+        return [(sql, vezes) for sql, vezes in self.formatos.most_common() if vezes >= limite]
+
+    def server_timing(self) -> str:
+        return f'db;desc="{self.total} consultas";dur={self.tempo * 1000:.1f}'
+
+
+_atual: ContextVar[Optional[EstatisticasConsultas]] = ContextVar("consultas_requisicao", default=None)
+
+
+def formato_sql(sql: str) -> str:
+    """SQL normalizado: listas de IN com qualquer tamanho viram o mesmo formato"""
+    return _LISTA_PARAMETROS.sub("(?)", _ESPACOS.sub(" ", sql).strip())
+
+
+def estatisticas_atuais() -> Optional[EstatisticasConsultas]:
+    return _atual.get()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _antes(conn, cursor, statement, parameters, context, executemany):
+    if _atual.get() is not None:
+        conn.info.setdefault("consultas_inicio", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _depois(conn, cursor, statement, parameters, context, executemany):
+    estatisticas = _atual.get()
+    inicios = conn.info.get("consultas_inicio")
+    if estatisticas is not None and inicios:
+        estatisticas.registrar(statement, time.perf_counter() - inicios.pop())
+
+
+@event.listens_for(Engine, "handle_error")
+def _erro(contexto):
+    inicios = contexto.connection.info.get("consultas_inicio") if contexto.connection is not None else None
+    if inicios:
+        inicios.pop()
+
+
+def _registrar_log(scope: dict, estatisticas: EstatisticasConsultas):
+    print(
+        f"🧮 {scope.get('method')} {scope.get('path')}: {estatisticas.total} consultas, "
+        f"{estatisticas.tempo * 1000:.1f} ms no banco"
+    )
+    for sql, vezes in estatisticas.repetidas():
+        print(f"⚠️ Possível N+1 ({vezes}x): {sql[:300]}")
+
+
+class MiddlewareContadorConsultas:
+    """Abre as estatísticas da requisição e escreve o Server-Timing na resposta"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        estatisticas = EstatisticasConsultas(scope)
+        token = _atual.set(estatisticas)
+
+        async def enviar(mensagem):
+            if mensagem["type"] == "http.response.start":
+                mensagem.setdefault("headers", [])
+                mensagem["headers"] = list(mensagem["headers"]) + [
+                    (b"server-timing", estatisticas.server_timing().encode())
+                ]
+            await send(mensagem)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            _atual.reset(token)
+            if CONSULTAS_DEBUG and estatisticas.total:
+                _registrar_log(scope, estatisticas)
+
+
+def consultas_da_resposta(resposta) -> int:
+    """Número de consultas informado no Server-Timing de uma resposta"""
+    encontrado = _SERVER_TIMING.search(resposta.headers.get("server-timing", ""))
+    if not encontrado:
+        raise AssertionError("Resposta sem Server-Timing: MiddlewareContadorConsultas não está ativo")
+    return int(encontrado.group(1))
+
+
+def verificar_orcamento(resposta, maximo: int):
+    """Falha (AssertionError) se a requisição fez mais consultas que o orçamento"""
+    total = consultas_da_resposta(resposta)
+    if total > maximo:
+        raise AssertionError(
+            f"{resposta.request.method} {resposta.request.url.path} fez {total} consultas (orçamento: {maximo})"
+        )
+
+
+@contextmanager
+def orcamento_consultas(maximo: int):
+    """Mede as consultas de um bloco síncrono e falha se passar de `maximo`"""
+    estatisticas = EstatisticasConsultas()
+    token = _atual.set(estatisticas)
+    try:
+        yield estatisticas
+    finally:
+        _atual.reset(token)
+    if estatisticas.total > maximo:
+        repetidas = "; ".join(f"{vezes}x {sql[:120]}" for sql, vezes in estatisticas.repetidas(2))
+        raise AssertionError(f"{estatisticas.total} consultas (orçamento: {maximo}). Repetidas: {repetidas or '-'}")
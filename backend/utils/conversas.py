@@ -0,0 +1,185 @@
+"""
+Manutenção da tabela conversas_resumo (uma linha por usuário e por pessoa
+com quem ele conversa), usada por GET /api/mensagens/conversas.
+
+Backfill/reconstrução completa:
+    python -m backend.utils.conversas
+    python -m backend.utils.conversas --usuario 12
+"""
+import argparse
+import time
+from typing import Optional
+
+from sqlalchemy import and_, case, func, or_, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from backend.models.mensagens import Mensagem, ResumoConversa
+
+TAMANHO_TRECHO = 200
+
+SQL_RECONSTRUIR = """
+    INSERT INTO conversas_resumo (
+        usuario_id, outro_usuario_id, ultima_mensagem_id, ultima_mensagem,
+        ultima_mensagem_tipo, ultima_mensagem_minha, data_ultima_mensagem, nao_lidas
+    )
+    SELECT usuario_id, outro_usuario_id, id, LEFT(conteudo, :tamanho_trecho),
+           tipo, remetente_id = usuario_id, data_envio, nao_lidas
+    FROM (
+        SELECT lados.usuario_id, lados.outro_usuario_id, m.id, m.conteudo, m.tipo,
+               m.remetente_id, m.data_envio,
+               ROW_NUMBER() OVER (
+                   PARTITION BY lados.usuario_id, lados.outro_usuario_id
+                   ORDER BY m.data_envio DESC, m.id DESC
+               ) AS posicao,
+               COUNT(*) FILTER (
+                   WHERE m.destinatario_id = lados.usuario_id AND NOT m.lida
+               ) OVER (PARTITION BY lados.usuario_id, lados.outro_usuario_id) AS nao_lidas
+        FROM mensagens m
+        JOIN (
+            SELECT id, remetente_id AS usuario_id, destinatario_id AS outro_usuario_id FROM mensagens
+            UNION ALL
+            SELECT id, destinatario_id, remetente_id FROM mensagens WHERE remetente_id <> destinatario_id
+        ) lados ON lados.id = m.id
+        WHERE NOT m.deletada
+          AND (CAST(:usuario_id AS INTEGER) IS NULL OR lados.usuario_id = :usuario_id)
+    ) ultimas
+    WHERE posicao = 1
+"""
+
+
+def _trecho(conteudo: Optional[str]) -> Optional[str]:
+    if conteudo is None:
+        return None
+    return conteudo[:TAMANHO_TRECHO]
+
+
+def _lados(usuario_a: int, usuario_b: int):
+    if usuario_a == usuario_b:
+        return [(usuario_a, usuario_b)]
+    return [(usuario_a, usuario_b), (usuario_b, usuario_a)]
+
+
+def registrar_mensagem(db: Session, mensagem: Mensagem):
+    """
+    Atualiza o resumo dos dois participantes após o envio de uma mensagem.
+    Deve ser chamado depois do flush (mensagem.id preenchido) e antes do commit.
+    """
+    valores = []
+    for usuario_id, outro_usuario_id in _lados(mensagem.remetente_id, mensagem.destinatario_id):
+        valores.append({
+            "usuario_id": usuario_id,
+            "outro_usuario_id": outro_usuario_id,
+            "ultima_mensagem_id": mensagem.id,
+            "ultima_mensagem": _trecho(mensagem.conteudo),
+            "ultima_mensagem_tipo": mensagem.tipo,
+            "ultima_mensagem_minha": usuario_id == mensagem.remetente_id,
+            "data_ultima_mensagem": mensagem.data_envio,
+            "nao_lidas": 1 if usuario_id == mensagem.destinatario_id else 0
+        })
+
+    stmt = insert(ResumoConversa).values(valores)
+    excluded = stmt.excluded
+    # Dois envios simultâneos na mesma conversa podem ser gravados fora de
+    # ordem: a última mensagem só é substituída por uma mais nova
+    mais_nova = excluded.ultima_mensagem_id > func.coalesce(ResumoConversa.ultima_mensagem_id, 0)
+
+    def _se_mais_nova(coluna):
+        return case((mais_nova, getattr(excluded, coluna)), else_=getattr(ResumoConversa, coluna))
+
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ResumoConversa.usuario_id, ResumoConversa.outro_usuario_id],
+        set_={
+            "ultima_mensagem_id": _se_mais_nova("ultima_mensagem_id"),
+            "ultima_mensagem": _se_mais_nova("ultima_mensagem"),
+            "ultima_mensagem_tipo": _se_mais_nova("ultima_mensagem_tipo"),
+            "ultima_mensagem_minha": _se_mais_nova("ultima_mensagem_minha"),
+            "data_ultima_mensagem": _se_mais_nova("data_ultima_mensagem"),
+            "nao_lidas": ResumoConversa.nao_lidas + excluded.nao_lidas
+        }
+    )
+    db.execute(stmt)
+
+
+def zerar_nao_lidas(db: Session, leitor_id: int, remetente_id: int):
+    """Chamado quando o leitor marca como lidas todas as mensagens do remetente"""
+    db.query(ResumoConversa).filter(
+        ResumoConversa.usuario_id == leitor_id,
+        ResumoConversa.outro_usuario_id == remetente_id
+    ).update({ResumoConversa.nao_lidas: 0}, synchronize_session=False)
+
+
+def recalcular_conversa(db: Session, usuario_a: int, usuario_b: int):
+    """
+    Recalcula o resumo da conversa entre dois usuários a partir da tabela
+    mensagens. Usado em edições, exclusões e leituras individuais, que são
+    raras e podem mudar a última mensagem ou a contagem de não lidas.
+    """
+    for usuario_id, outro_usuario_id in _lados(usuario_a, usuario_b):
+        ultima = db.query(Mensagem).filter(
+            Mensagem.deletada == False,
+            or_(
+                and_(Mensagem.remetente_id == usuario_id, Mensagem.destinatario_id == outro_usuario_id),
+                and_(Mensagem.remetente_id == outro_usuario_id, Mensagem.destinatario_id == usuario_id)
+            )
+        ).order_by(Mensagem.data_envio.desc(), Mensagem.id.desc()).first()
+
+        if ultima is None:
+            db.query(ResumoConversa).filter(
+                ResumoConversa.usuario_id == usuario_id,
+                ResumoConversa.outro_usuario_id == outro_usuario_id
+            ).delete(synchronize_session=False)
+            continue
+
+        nao_lidas = db.query(func.count(Mensagem.id)).filter(
+            Mensagem.remetente_id == outro_usuario_id,
+            Mensagem.destinatario_id == usuario_id,
+            Mensagem.lida == False,
+            Mensagem.deletada == False
+        ).scalar()
+
+        valores = {
+            "usuario_id": usuario_id,
+            "outro_usuario_id": outro_usuario_id,
+            "ultima_mensagem_id": ultima.id,
+            "ultima_mensagem": _trecho(ultima.conteudo),
+            "ultima_mensagem_tipo": ultima.tipo,
+            "ultima_mensagem_minha": ultima.remetente_id == usuario_id,
+            "data_ultima_mensagem": ultima.data_envio,
+            "nao_lidas": nao_lidas
+        }
+        stmt = insert(ResumoConversa).values(valores)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ResumoConversa.usuario_id, ResumoConversa.outro_usuario_id],
+            set_={chave: valor for chave, valor in valores.items() if chave not in ("usuario_id", "outro_usuario_id")}
+        )
+        db.execute(stmt)
+
+
+def reconstruir_resumos(db: Session, usuario_id: Optional[int] = None) -> int:
+    """Reconstrói conversas_resumo (inteira ou de um usuário) em uma transação"""
+    filtro = "" if usuario_id is None else " WHERE usuario_id = :usuario_id"
+    db.execute(text(f"DELETE FROM conversas_resumo{filtro}"), {"usuario_id": usuario_id})
+    resultado = db.execute(text(SQL_RECONSTRUIR), {"usuario_id": usuario_id, "tamanho_trecho": TAMANHO_TRECHO})
+    db.commit()
+    return resultado.rowcount
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconstrói a tabela conversas_resumo a partir de mensagens")
+    parser.add_argument("--usuario", type=int, default=None, help="reconstrói apenas as conversas deste usuário")
+    args = parser.parse_args()
+
+    from backend.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        inicio = time.perf_counter()
+        total = reconstruir_resumos(db, args.usuario)
+        print(f"✅ {total} resumos de conversa gravados em {time.perf_counter() - inicio:.2f}s")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
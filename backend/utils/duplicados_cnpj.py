@@ -0,0 +1,67 @@
+"""
+Relatório de empresas duplicadas por CNPJ.
+
+O índice único de empresas é sobre cnpj como foi digitado, então bancos
+antigos podem ter a mesma empresa duas vezes com pontuações diferentes
+("33000167000101" e "33.000.167/0001-01") ou com os zeros à esquerda
+comidos pelo Excel. A coluna gerada cnpj_digits (migração c8e0a2b4d6f7)
+junta essas grafias; aqui se listam os grupos com mais de uma empresa para
+revisão manual (nada é apagado nem mesclado).
+
+    python -m backend.utils.duplicados_cnpj
+    python -m backend.utils.duplicados_cnpj --limite 50
+
+Também em /api/admin/empresas/cnpj-duplicados.
+"""
+import argparse
+import sys
+from typing import List, Optional
+
+from sqlalchemy import text
+
+from backend.database import engine
+
+
+def duplicados_cnpj(conn, limite: Optional[int] = None) -> List[dict]:
+    """Grupos de empresas com o mesmo cnpj_digits, os maiores primeiro"""
+    linhas = conn.execute(text("""
+        SELECT cnpj_digits, count(*) AS quantidade,
+               json_agg(json_build_object(
+                   'id', id, 'empresa', empresa, 'cnpj', cnpj, 'data_cadastro', data_cadastro
+               ) ORDER BY id) AS empresas
+        FROM empresas
+        WHERE cnpj_digits IN (
+            SELECT cnpj_digits FROM empresas
+            WHERE cnpj_digits IS NOT NULL
+            GROUP BY cnpj_digits HAVING count(*) > 1
+        )
+        GROUP BY cnpj_digits
+        ORDER BY count(*) DESC, cnpj_digits
+        LIMIT :limite
+    """), {"limite": limite}).mappings().all()
+    return [dict(linha) for linha in linhas]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--limite", type=int, help="grupos mostrados (padrão: todos)")
+    args = parser.parse_args()
+
+    if engine is None:
+        print("❌ DATABASE_URL não configurada")
+        sys.exit(1)
+
+    with engine.connect() as conn:
+        grupos = duplicados_cnpj(conn, args.limite)
+    if not grupos:
+        print("✓ Nenhum CNPJ duplicado")
+        return
+    for grupo in grupos:
+        print(f"{grupo['cnpj_digits']}: {grupo['quantidade']} empresas")
+        for empresa in grupo["empresas"]:
+            print(f"    #{empresa['id']} {empresa['empresa']} ({empresa['cnpj']}), cadastrada em {empresa['data_cadastro']}")
+    print(f"⚠️ {len(grupos)} CNPJs com mais de uma empresa")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Pool de processos para trabalho de CPU (openpyxl, reportlab) chamado a
+partir de endpoints async.
+
+Trabalho de banco síncrono vai para o threadpool (run_in_threadpool ou
+endpoint def); o que é CPU puro vai para cá, para não segurar o GIL do
+worker enquanto outras requisições esperam. As funções enviadas precisam
+ser de nível de módulo e receber/devolver dados simples (dict, list, bytes),
+porque atravessam a fronteira do processo via pickle.
+
+CPU_PROCESSOS define o número de processos (padrão: núcleos da máquina, no
+mínimo 2). Uma importação de planilha ocupa um processo por minutos; com um
+só, toda exportação em Excel do worker esperaria ela terminar. Os processos
+são criados sob demanda, então o segundo só existe quando há trabalho em
+paralelo.
+
+Se um processo do pool morre (OOM numa planilha grande, SIGKILL), o
+ProcessPoolExecutor fica quebrado para sempre; aqui ele é descartado e o
+próximo uso cria outro. A tarefa que estava rodando não é repetida (pode
+ter sido ela a matar o processo): a chamada recebe 503.
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Callable, Optional
+
+from fastapi import HTTPException, status
+
+CPU_PROCESSOS = int(os.getenv("CPU_PROCESSOS", str(max(2, os.cpu_count() or 1))))
+
+_executor: Optional[ProcessPoolExecutor] = None
+_lock = threading.Lock()
+
+
+def obter_executor_cpu() -> ProcessPoolExecutor:
+    """Cria o pool na primeira chamada; workers que nunca exportam nada não pagam o custo"""
+    global _executor
+    with _lock:
+        if _executor is None:
+            # spawn: o worker do uvicorn já tem threads e conexões abertas,
+            # que não podem ser herdadas por fork
+            _executor = ProcessPoolExecutor(
+                max_workers=CPU_PROCESSOS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _executor
+
+
+def _descartar_executor(executor: ProcessPoolExecutor):
+    """Tira um pool quebrado de uso; outro é criado na próxima chamada"""
+    global _executor
+    with _lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def executar_cpu(funcao: Callable, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    tarefa = partial(funcao, *args, **kwargs)
+    executor = obter_executor_cpu()
+    try:
+        futuro = loop.run_in_executor(executor, tarefa)
+    except BrokenProcessPool:
+        # Quebrou enquanto estava ocioso: a tarefa nem chegou a ser enviada
+        print("⚠️ Pool de processos quebrado; criando outro")
+        _descartar_executor(executor)
+        executor = obter_executor_cpu()
+        futuro = loop.run_in_executor(executor, tarefa)
+    try:
+        return await futuro
+    except BrokenProcessPool:
+        print(f"❌ Processo do pool morreu durante {getattr(funcao, '__name__', funcao)}; pool descartado")
+        _descartar_executor(executor)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="O processamento foi interrompido; tente novamente",
+            headers={"Retry-After": "2"},
+        )
+
+
+def encerrar_executor_cpu():
+    global _executor
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
@@ -0,0 +1,108 @@
+"""
+Exportação da carteira de empresas (/api/empresas/exportar), com os mesmos
+filtros da listagem e na ordem dela, (empresa, id).
+
+CSV: gerado no worker a partir de um cursor no servidor (stream com
+yield_per), EXPORTACAO_LOTE linhas por vez. O cabeçalho sai antes da
+consulta e cada lote é enviado assim que chega, então a memória fica em um
+lote qualquer que seja o tamanho da carteira. Separador ";" e BOM UTF-8,
+que o Excel em português abre direto.
+
+XLSX: o .xlsx é um zip com o índice no fim, então só pode ser enviado
+depois de pronto. A planilha é montada no pool de processos em modo
+write_only (o openpyxl grava cada linha num arquivo temporário em vez de
+guardá-la), lendo do primário com cursor no servidor; o router envia o
+arquivo em blocos e o apaga depois.
+"""
+import csv
+import io
+import os
+from datetime import datetime
+from typing import AsyncIterator, List
+
+from sqlalchemy import select
+
+from backend.database import engine
+from backend.models import Empresa
+from backend.utils.busca_empresas import filtrar_empresas
+
+EXPORTACAO_LOTE = int(os.getenv("EMPRESAS_EXPORTACAO_LOTE", "2000"))
+
+# (coluna, título)
+COLUNAS_EXPORTACAO = [
+    ("id", "ID"),
+    ("empresa", "Empresa"),
+    ("sigla", "Sigla"),
+    ("cnpj", "CNPJ"),
+    ("porte", "Porte"),
+    ("er", "ER"),
+    ("carteira", "Carteira"),
+    ("endereco", "Endereço"),
+    ("bairro", "Bairro"),
+    ("zona", "Zona"),
+    ("municipio", "Município"),
+    ("estado", "Estado"),
+    ("pais", "País"),
+    ("area", "Área"),
+    ("cnae_principal", "CNAE Principal"),
+    ("descricao_cnae", "Descrição CNAE"),
+    ("tipo_empresa", "Tipo Empresa"),
+    ("numero_funcionarios", "Nº Funcionários"),
+    ("observacao", "Observação"),
+    ("nome_contato", "Contato"),
+    ("cargo_contato", "Cargo Contato"),
+    ("telefone_contato", "Telefone Contato"),
+    ("email_contato", "Email Contato"),
+    ("data_cadastro", "Data Cadastro"),
+    ("data_atualizacao", "Data Atualização"),
+]
+TITULOS = [titulo for _, titulo in COLUNAS_EXPORTACAO]
+
+
+def consulta_exportacao(filtros: tuple):
+    colunas = [getattr(Empresa, coluna) for coluna, _ in COLUNAS_EXPORTACAO]
+    return filtrar_empresas(select(*colunas), *filtros).order_by(Empresa.empresa, Empresa.id)
+
+
+def _valores(linha) -> list:
+    return [valor.strftime("%Y-%m-%d %H:%M:%S") if isinstance(valor, datetime) else valor for valor in linha]
+
+
+def _csv(linhas: List[list]) -> bytes:
+    saida = io.StringIO()
+    csv.writer(saida, delimiter=";").writerows(linhas)
+    return saida.getvalue().encode("utf-8")
+
+
+async def gerar_csv_empresas(fabrica, filtros: tuple) -> AsyncIterator[bytes]:
+    """
+    Corpo do StreamingResponse. Abre a própria sessão: a da dependência já
+    estaria fechada quando o corpo começa a ser enviado.
+    """
+    yield "\ufeff".encode("utf-8") + _csv([TITULOS])
+    async with fabrica() as db:
+        resultado = await db.stream(consulta_exportacao(filtros).execution_options(yield_per=EXPORTACAO_LOTE))
+        async for lote in resultado.partitions():
+            yield _csv([_valores(linha) for linha in lote])
+
+
+def gerar_xlsx_empresas(filtros: tuple, caminho: str) -> int:
+    """Grava a planilha em `caminho` e devolve o número de empresas (pool de processos)"""
+    from openpyxl import Workbook
+    from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Empresas")
+    ws.append(TITULOS)
+    total = 0
+    with engine.connect() as conn:
+        resultado = conn.execution_options(stream_results=True, yield_per=EXPORTACAO_LOTE).execute(
+            consulta_exportacao(filtros)
+        )
+        for linha in resultado:
+            # Caracteres de controle não são aceitos no XML da planilha
+            ws.append([ILLEGAL_CHARACTERS_RE.sub("", valor) if isinstance(valor, str) else valor for valor in linha])
+            total += 1
+    wb.save(caminho)
+    return total
+
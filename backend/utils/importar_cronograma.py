@@ -3,18 +3,8 @@ from sqlalchemy.orm import Session
 from backend.database import SessionLocal
 from backend.models import CronogramaProjeto, Usuario, Empresa
 from backend.models.cronograma import StatusProjeto
+from backend.utils.importar_empresas import digitos_cnpj, normalizar_cnpj
 from datetime import datetime
-import re
-
-
-def normalizar_cnpj(cnpj):
-    if not cnpj:
-        return None
-    cnpj_str = str(cnpj).strip()
-    cnpj_limpo = re.sub(r'[^\d]', '', cnpj_str)
-    if len(cnpj_limpo) == 14:
-        return f"{cnpj_limpo[:2]}.{cnpj_limpo[2:5]}.{cnpj_limpo[5:8]}/{cnpj_limpo[8:12]}-{cnpj_limpo[12:]}"
-    return cnpj_str
 
 
 def importar_cronograma_planilha(caminho_planilha: str, db: Session = None):
@@ -76,8 +66,8 @@ def importar_cronograma_planilha(caminho_planilha: str, db: Session = None):
                     data_termino = data_termino.date()
                 
                 empresa_id = None
-                if cnpj:
-                    empresa = db.query(Empresa).filter(Empresa.cnpj == cnpj).first()
+                if digitos_cnpj(cnpj):
+                    empresa = db.query(Empresa).filter(Empresa.cnpj_digits == digitos_cnpj(cnpj)).first()
                     if empresa:
                         empresa_id = empresa.id
                 
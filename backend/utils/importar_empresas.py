@@ -0,0 +1,293 @@
+"""
+Importação de empresas de planilha Excel, em streaming.
+
+Usada pelo upload em /api/empresas/upload-excel, que roda a importação em
+segundo plano no pool de processos, e pelo script backend/utils/load_empresas.py.
+
+- a planilha é lida com openpyxl em modo read_only, linha a linha, sem
+  montar o arquivo inteiro em memória;
+- o CNPJ é normalizado: com 14 dígitos vira XX.XXX.XXX/XXXX-XX, e células
+  numéricas recuperam os zeros à esquerda que o Excel come;
+- os CNPJs já cadastrados são lidos uma vez (cnpj_digits -> valor gravado),
+  então uma linha casa com a empresa existente mesmo se a pontuação for outra;
+- as linhas vão para o banco em lotes de IMPORTACAO_LOTE, cada lote um
+  INSERT ... ON CONFLICT (cnpj): DO NOTHING no upload (existentes são
+  ignoradas) ou DO UPDATE no script (existentes são atualizadas).
+
+Cada lote é gravado numa thread enquanto o próximo é lido, numa transação
+que também grava o progresso em importacoes_empresas
+(GET /api/empresas/importacoes/{id}). Se a importação falhar no meio, os
+lotes anteriores ficam gravados; rodar de novo com a mesma planilha é
+seguro.
+
+O upload roda como tarefa do worker, com a planilha em
+PASTA_IMPORTACOES/<id>.<extensão>. Se o worker reiniciar no meio (deploy,
+queda, timeout do gunicorn), a importação não continua sozinha: no startup
+de cada worker, encerrar_importacoes_interrompidas marca como erro as
+pendentes/processando sem progresso há IMPORTACAO_ABANDONADA_MINUTOS e
+apaga as planilhas que sobraram. A planilha precisa ser enviada de novo.
+"""
+import glob
+import os
+import re
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import literal_column, select, text
+from sqlalchemy.dialects.postgresql import insert
+
+from backend.database import engine
+from backend.models import Empresa
+
+IMPORTACAO_LOTE = int(os.getenv("IMPORTACAO_LOTE", "1000"))
+PASTA_IMPORTACOES = os.getenv("IMPORTACAO_PASTA", os.path.join(tempfile.gettempdir(), "nucleo-importacoes"))
+# O progresso é gravado a cada lote; parada há mais que isso, o worker morreu
+IMPORTACAO_ABANDONADA_MINUTOS = float(os.getenv("IMPORTACAO_ABANDONADA_MINUTOS", "10"))
+ERRO_INTERROMPIDA = "Importação interrompida (o servidor reiniciou); envie a planilha de novo"
+
+# Campo -> coluna da planilha (a partir de 0). Empresa na 0, CNPJ na 1 e
+# número de funcionários na 18 são tratados à parte.
+COLUNAS_EMPRESAS = {
+    "sigla": 3,
+    "porte": 4,
+    "er": 5,
+    "carteira": 6,
+    "endereco": 7,
+    "bairro": 8,
+    "municipio": 10,
+    "estado": 11,
+    "pais": 12,
+    "area": 13,
+    "cnae_principal": 14,
+    "descricao_cnae": 15,
+    "tipo_empresa": 16,
+    "observacao": 19,
+}
+COLUNA_FUNCIONARIOS = 18
+
+# Colunas que o DO UPDATE sobrescreve nas empresas existentes
+CAMPOS_ATUALIZADOS = ["empresa", *COLUNAS_EMPRESAS, "numero_funcionarios", "data_atualizacao"]
+
+
+def normalizar_cnpj(valor) -> Optional[str]:
+    """
+    CNPJ como é gravado. Números com mais de 11 dígitos (CPFs têm 11) são
+    completados com zeros à esquerda até 14.
+    """
+    if valor is None or isinstance(valor, bool):
+        return None
+    if isinstance(valor, (int, float)):
+        valor = str(int(valor))
+        if len(valor) > 11:
+            valor = valor.zfill(14)
+    texto = str(valor).strip()
+    digitos = re.sub(r"\D", "", texto)
+    if len(digitos) == 14:
+        return f"{digitos[:2]}.{digitos[2:5]}.{digitos[5:8]}/{digitos[8:12]}-{digitos[12:]}"
+    return texto or None
+
+
+def digitos_cnpj(valor: Optional[str]) -> Optional[str]:
+    """
+    O valor da coluna gerada empresas.cnpj_digits para `valor`: só os
+    dígitos, com 12 ou 13 completados até 14 (ver CNPJ_DIGITOS_SQL).
+    """
+    digitos = re.sub(r"\D", "", valor or "")
+    if len(digitos) in (12, 13):
+        return digitos.zfill(14)
+    return digitos or None
+
+
+def _ler_linha(row) -> dict:
+    linha = {"empresa": str(row[0]), "cnpj": normalizar_cnpj(row[1] if len(row) > 1 else None)}
+    for campo, indice in COLUNAS_EMPRESAS.items():
+        linha[campo] = str(row[indice]) if len(row) > indice and row[indice] else None
+    funcionarios = row[COLUNA_FUNCIONARIOS] if len(row) > COLUNA_FUNCIONARIOS else None
+    try:
+        linha["numero_funcionarios"] = int(funcionarios) if funcionarios and isinstance(funcionarios, (int, float)) else None
+    except (ValueError, OverflowError):
+        linha["numero_funcionarios"] = None
+    return linha
+
+
+def _cnpjs_cadastrados() -> Dict[str, str]:
+    """cnpj_digits -> CNPJ como está gravado, de todas as empresas com CNPJ"""
+    existentes = {}
+    with engine.connect() as conn:
+        resultado = conn.execution_options(stream_results=True, yield_per=10000).execute(
+            select(Empresa.cnpj_digits, Empresa.cnpj).where(Empresa.cnpj_digits.isnot(None))
+        )
+        for digitos, cnpj in resultado:
+            existentes.setdefault(digitos, cnpj)
+    return existentes
+
+
+def _gravar_lote(conn, lote: List[dict], atualizar: bool) -> tuple:
+    """(criadas, atualizadas) do lote; as que não voltam no RETURNING bateram no DO NOTHING"""
+    comando = insert(Empresa.__table__)
+    if atualizar:
+        comando = comando.on_conflict_do_update(
+            index_elements=[Empresa.cnpj],
+            set_={campo: comando.excluded[campo] for campo in CAMPOS_ATUALIZADOS}
+        )
+    else:
+        comando = comando.on_conflict_do_nothing(index_elements=[Empresa.cnpj])
+    # Executemany: o SQLAlchemy compila o comando uma vez (fica no cache) e
+    # manda o lote num único INSERT de várias linhas (insertmanyvalues).
+    # xmax = 0: a versão da linha foi criada por este INSERT, não por um UPDATE
+    inseridas = conn.execute(comando.returning(literal_column("xmax = 0")), lote).scalars().all()
+    criadas = sum(1 for inserida in inseridas if inserida)
+    return criadas, len(inseridas) - criadas
+
+
+def _registrar_progresso(conn, importacao_id: Optional[int], progresso: dict, **extras):
+    if importacao_id is None:
+        return
+    valores = {**progresso, **extras, "id": importacao_id, "agora": datetime.utcnow()}
+    atribuicoes = ", ".join(f"{campo} = :{campo}" for campo in {**progresso, **extras})
+    conn.execute(
+        text(f"UPDATE importacoes_empresas SET {atribuicoes}, atualizado_em = :agora WHERE id = :id"),
+        valores
+    )
+
+
+def caminho_importacao(importacao_id: int, extensao: str) -> str:
+    os.makedirs(PASTA_IMPORTACOES, exist_ok=True)
+    return os.path.join(PASTA_IMPORTACOES, f"{importacao_id}{extensao}")
+
+
+def encerrar_importacoes_interrompidas() -> int:
+    """
+    Marca como erro as importações paradas (worker reiniciado no meio) e
+    apaga as planilhas deste host que não pertencem a nenhuma em andamento.
+    Devolve quantas foram encerradas.
+    """
+    limite = datetime.utcnow() - timedelta(minutes=IMPORTACAO_ABANDONADA_MINUTOS)
+    with engine.begin() as conn:
+        encerradas = conn.execute(text("""
+            UPDATE importacoes_empresas
+            SET status = 'erro', erro = :erro, concluido_em = :agora, atualizado_em = :agora
+            WHERE status IN ('pendente', 'processando') AND atualizado_em < :limite
+            RETURNING id
+        """), {"erro": ERRO_INTERROMPIDA, "agora": datetime.utcnow(), "limite": limite}).scalars().all()
+        em_andamento = set(conn.execute(text(
+            "SELECT id FROM importacoes_empresas WHERE status IN ('pendente', 'processando')"
+        )).scalars())
+    for caminho in glob.glob(os.path.join(PASTA_IMPORTACOES, "*")):
+        nome = os.path.splitext(os.path.basename(caminho))[0]
+        if not nome.isdigit() or int(nome) not in em_andamento:
+            try:
+                os.remove(caminho)
+            except OSError:
+                pass
+    if encerradas:
+        print(f"⚠️ {len(encerradas)} importação(ões) de empresas interrompida(s) marcada(s) como erro")
+    return len(encerradas)
+
+
+def importar_planilha_empresas(
+    caminho: str,
+    atualizar: bool = False,
+    importacao_id: Optional[int] = None,
+    lote: Optional[int] = None,
+    ao_progredir: Optional[Callable[[dict], None]] = None
+) -> dict:
+    """
+    Importa a planilha em `caminho` e devolve as contagens. Linhas sem nome
+    são puladas; sem CNPJ, com CNPJ repetido no arquivo ou, sem `atualizar`,
+    já cadastrado contam como ignoradas. Roda no pool de processos: recebe
+    e devolve só tipos simples.
+    """
+    from openpyxl import load_workbook
+
+    lote = lote or IMPORTACAO_LOTE
+    # Só a thread de gravação mexe em `banco`; a leitura conta as suas e
+    # passa o valor junto com cada lote
+    banco = {"criadas": 0, "atualizadas": 0, "ignoradas": 0}
+    leitura = {"linhas_lidas": 0, "ignoradas": 0}
+    total_estimado = None
+
+    def progresso(linhas_lidas: int, ignoradas: int) -> dict:
+        return {
+            "linhas_lidas": linhas_lidas, "criadas": banco["criadas"], "atualizadas": banco["atualizadas"],
+            "ignoradas": ignoradas + banco["ignoradas"]
+        }
+
+    def gravar(linhas: List[dict], linhas_lidas: int, ignoradas: int):
+        agora = datetime.utcnow()
+        for linha in linhas:
+            linha["data_cadastro"] = linha["data_atualizacao"] = agora
+        with engine.begin() as conn:
+            criadas, atualizadas = _gravar_lote(conn, linhas, atualizar)
+            banco["criadas"] += criadas
+            banco["atualizadas"] += atualizadas
+            banco["ignoradas"] += len(linhas) - criadas - atualizadas
+            _registrar_progresso(conn, importacao_id, progresso(linhas_lidas, ignoradas))
+        if ao_progredir:
+            ao_progredir(dict(progresso(linhas_lidas, ignoradas), total_estimado=total_estimado))
+
+    comeco = time.perf_counter()
+    try:
+        wb = load_workbook(caminho, read_only=True, data_only=True)
+        # Um lote é gravado enquanto o próximo é lido: o parse do XML e a
+        # espera pelo Postgres se sobrepõem. No máximo um lote em voo.
+        gravacao = ThreadPoolExecutor(max_workers=1)
+        em_voo = None
+        try:
+            ws = wb.active
+            total_estimado = ws.max_row - 1 if ws.max_row else None
+            with engine.begin() as conn:
+                _registrar_progresso(
+                    conn, importacao_id, progresso(0, 0), status="processando", total_estimado=total_estimado
+                )
+
+            existentes = _cnpjs_cadastrados()
+            vistos = set()
+            pendentes: List[dict] = []
+
+            def enviar():
+                nonlocal em_voo, pendentes
+                if em_voo is not None:
+                    em_voo.result()
+                em_voo = gravacao.submit(gravar, pendentes, leitura["linhas_lidas"], leitura["ignoradas"])
+                pendentes = []
+
+            for row in ws.iter_rows(min_row=2, values_only=True):
+                if not row or not row[0]:
+                    continue
+                leitura["linhas_lidas"] += 1
+                linha = _ler_linha(row)
+                digitos = digitos_cnpj(linha["cnpj"])
+                if not digitos or digitos in vistos:
+                    leitura["ignoradas"] += 1
+                    continue
+                vistos.add(digitos)
+                # Existente: usa o CNPJ como está gravado para o ON CONFLICT casar
+                linha["cnpj"] = existentes.get(digitos, linha["cnpj"])
+                pendentes.append(linha)
+                if len(pendentes) >= lote:
+                    enviar()
+            if pendentes:
+                enviar()
+            if em_voo is not None:
+                em_voo.result()
+        finally:
+            gravacao.shutdown(wait=True)
+            wb.close()
+
+        with engine.begin() as conn:
+            _registrar_progresso(
+                conn, importacao_id, progresso(**leitura), status="concluida", concluido_em=datetime.utcnow()
+            )
+    except Exception as e:
+        with engine.begin() as conn:
+            _registrar_progresso(
+                conn, importacao_id, progresso(**leitura), status="erro", erro=str(e)[:2000],
+                concluido_em=datetime.utcnow()
+            )
+        raise
+
+    return dict(progresso(**leitura), segundos=round(time.perf_counter() - comeco, 1))
@@ -0,0 +1,122 @@
+"""
+Monitor de atraso do event loop (diagnóstico; ligado com MONITOR_LOOP=true).
+
+Uma corrotina de batimento acorda a cada INTERVALO e mede quanto atrasou;
+uma thread de vigia percebe quando o batimento parou por mais de
+MONITOR_LOOP_LIMITE_MS e, enquanto o loop ainda está preso, captura a pilha
+da thread do loop e a task em execução. Quando o loop volta, o batimento
+registra a duração total junto com a rota (via MiddlewareMonitorLoop) e a
+pilha capturada, apontando o código síncrono que travou o worker.
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+MONITOR_LOOP = os.getenv("MONITOR_LOOP") == "true"
+MONITOR_LOOP_LIMITE_MS = float(os.getenv("MONITOR_LOOP_LIMITE_MS", "100"))
+INTERVALO = 0.02
+
+
+class MonitorLoop:
+    def __init__(self, limite_ms: float = MONITOR_LOOP_LIMITE_MS):
+        self.limite = limite_ms / 1000
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.thread_loop: Optional[int] = None
+        self.batimento = time.monotonic()
+        self.captura: Optional[tuple] = None
+        self.escopos = {}
+        self.task_batimento: Optional[asyncio.Task] = None
+        self.parar_vigia = threading.Event()
+        self.bloqueios = 0
+
+    async def iniciar(self):
+        self.loop = asyncio.get_running_loop()
+        self.thread_loop = threading.get_ident()
+        self.batimento = time.monotonic()
+        self.parar_vigia.clear()
+        self.task_batimento = asyncio.create_task(self._bater())
+        threading.Thread(target=self._vigiar, name="monitor-loop", daemon=True).start()
+        print(f"🩺 Monitor do event loop ativo (limite {self.limite * 1000:.0f} ms)")
+
+    async def parar(self):
+        self.parar_vigia.set()
+        if self.task_batimento:
+            self.task_batimento.cancel()
+            self.task_batimento = None
+
+    def registrar_escopo(self, task: asyncio.Task, scope: dict):
+        self.escopos[task] = scope
+
+    def remover_escopo(self, task: asyncio.Task):
+        self.escopos.pop(task, None)
+
+    async def _bater(self):
+        while True:
+            inicio = time.monotonic()
+            await asyncio.sleep(INTERVALO)
+            self.batimento = time.monotonic()
+            atraso = self.batimento - inicio - INTERVALO
+            if atraso > self.limite:
+                self.bloqueios += 1
+                self._registrar(atraso)
+
+    def _vigiar(self):
+        while not self.parar_vigia.wait(INTERVALO):
+            if self.captura is None and time.monotonic() - self.batimento > INTERVALO + self.limite:
+                self.captura = self._capturar()
+
+    def _capturar(self) -> tuple:
+        """Roda na thread de vigia com o loop ainda bloqueado"""
+        frame = sys._current_frames().get(self.thread_loop)
+        pilha = traceback.format_list(traceback.extract_stack(frame)[-8:]) if frame else []
+        try:
+            task = asyncio.current_task(self.loop)
+        except RuntimeError:
+            task = None
+        return self._descrever_rota(task), pilha
+
+    def _descrever_rota(self, task: Optional[asyncio.Task]) -> str:
+        scope = self.escopos.get(task) if task else None
+        if scope is None:
+            return "fora de requisição"
+        rota = scope.get("route")
+        caminho = getattr(rota, "path", None) or scope.get("path")
+        endpoint = scope.get("endpoint")
+        nome = f" ({endpoint.__module__}.{endpoint.__name__})" if endpoint else ""
+        return f"{scope.get('method', scope['type'].upper())} {caminho}{nome}"
+
+    def _registrar(self, atraso: float):
+        rota, pilha = self.captura or ("não capturada (bloqueio mais curto que a vigia)", [])
+        self.captura = None
+        print(f"🐢 Event loop bloqueado por {atraso * 1000:.0f} ms em {rota}")
+        if pilha:
+            print("".join(pilha).rstrip())
+
+
+monitor_loop = MonitorLoop()
+
+
+class MiddlewareMonitorLoop:
+    """
+    Associa a task de cada requisição ao seu scope, para o monitor saber a
+    rota que travou o loop. Precisa ser o middleware mais interno: os
+    BaseHTTPMiddleware de fora executam o resto da pilha em outra task.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+        task = asyncio.current_task()
+        monitor_loop.registrar_escopo(task, scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            monitor_loop.remover_escopo(task)
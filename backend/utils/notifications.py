@@ -1,6 +1,7 @@
 from sqlalchemy.orm import Session
 from backend.models.notificacoes import Notificacao, TipoNotificacao
 from backend.models import Usuario
+from backend.eventos import barramento
 
 def criar_notificacao_sistema(
     db: Session,
@@ -17,26 +18,29 @@ def criar_notificacao_sistema(
     Caso contrário, cria uma notificação geral (destino None).
     """
     if notificar_admins:
-        admins = db.query(Usuario).filter(Usuario.tipo == "admin").all()
-        for admin in admins:
-            notificacao = Notificacao(
-                tipo=tipo,
-                titulo=titulo,
-                mensagem=mensagem,
-                usuario_origem_id=usuario_origem_id,
-                usuario_destino_id=admin.id,
-                link=link
-            )
-            db.add(notificacao)
+        destinos = [admin.id for admin in db.query(Usuario.id).filter(Usuario.tipo == "admin").all()]
     else:
+        destinos = [None]
+    
+    for destino_id in destinos:
         notificacao = Notificacao(
             tipo=tipo,
             titulo=titulo,
             mensagem=mensagem,
             usuario_origem_id=usuario_origem_id,
-            usuario_destino_id=None,
+            usuario_destino_id=destino_id,
             link=link
         )
         db.add(notificacao)
     
     db.commit()
+    
+    for destino_id in destinos:
+        barramento.publicar("notificacoes", {
+            "tipo": tipo,
+            "titulo": titulo,
+            "mensagem": mensagem,
+            "usuario_origem_id": usuario_origem_id,
+            "usuario_destino_id": destino_id,
+            "link": link
+        })
@@ -0,0 +1,260 @@
+"""
+Diagnóstico de requisições lentas em produção.
+
+Perfil sob demanda: um admin envia o header `X-Perfil: 1` (ou `?perfil=1`)
+e a requisição roda sob um amostrador de pilhas. A cada PERFIL_INTERVALO_MS
+(padrão 5) uma thread lê as pilhas com sys._current_frames() e conta as que
+pertencem à requisição: na thread do event loop, quando a task atual é a da
+requisição; nas threads do threadpool, quando a pilha passa pelo endpoint
+(endpoints def). O resultado é gravado em formato "collapsed stacks"
+(uma linha `func;func;func contagem`), que flamegraph.pl, inferno e
+speedscope.app abrem direto. Os arquivos ficam em PERFIS_DIR (padrão
+/tmp/nucleo-perfis, compartilhado entre os workers do container), limitados
+aos PERFIS_MAXIMO mais recentes, e o id volta no header X-Perfil-Id.
+
+Requisições lentas: para cada rota cada worker guarda as
+LENTAS_POR_ROTA (padrão 10) requisições mais lentas da última
+LENTAS_JANELA_SEGUNDOS (padrão 3600), com status e número de consultas.
+
+As duas coisas aparecem em /api/admin/perfis e /api/admin/requisicoes-lentas.
+"""
+import asyncio
+import heapq
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs
+
+from fastapi.concurrency import run_in_threadpool
+
+from backend.auth.security import decodificar_token
+from backend.metricas import nome_rota
+from backend.utils.contador_consultas import estatisticas_atuais
+
+PERFIL_INTERVALO_MS = float(os.getenv("PERFIL_INTERVALO_MS", "5"))
+PERFIS_DIR = Path(os.getenv("PERFIS_DIR", "/tmp/nucleo-perfis"))
+PERFIS_MAXIMO = int(os.getenv("PERFIS_MAXIMO", "50"))
+LENTAS_POR_ROTA = int(os.getenv("LENTAS_POR_ROTA", "10"))
+LENTAS_JANELA_SEGUNDOS = float(os.getenv("LENTAS_JANELA_SEGUNDOS", "3600"))
+
+PROFUNDIDADE_MAXIMA = 128
+
+
+def _nome_quadro(frame) -> str:
+    codigo = frame.f_code
+    arquivo = codigo.co_filename
+    for marcador in ("/site-packages/", "/package/", "/app/"):
+        if marcador in arquivo:
+            arquivo = arquivo.split(marcador, 1)[1]
+            break
+    return f"{codigo.co_name} ({arquivo}:{codigo.co_firstlineno})"
+
+
+def _pilha(frame) -> List:
+    quadros = []
+    while frame is not None and len(quadros) < PROFUNDIDADE_MAXIMA:
+        quadros.append(frame)
+        frame = frame.f_back
+    quadros.reverse()
+    return quadros
+
+
+class AmostradorRequisicao:
+    """Amostra as pilhas de uma única requisição enquanto ela roda"""
+
+    def __init__(self, scope: dict, task: asyncio.Task):
+        self.scope = scope
+        self.task = task
+        self.loop = asyncio.get_running_loop()
+        self.thread_loop = threading.get_ident()
+        self.amostras: Counter = Counter()
+        self.total = 0
+        self.parar_evento = threading.Event()
+        self.thread = threading.Thread(target=self._executar, name="perfilador", daemon=True)
+
+    def iniciar(self):
+        self.thread.start()
+
+    def parar(self):
+        self.parar_evento.set()
+        self.thread.join()
+
+    def _executar(self):
+        intervalo = PERFIL_INTERVALO_MS / 1000
+        proprio = threading.get_ident()
+        while not self.parar_evento.wait(intervalo):
+            endpoint = self.scope.get("endpoint")
+            codigo_endpoint = getattr(endpoint, "__code__", None)
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == proprio:
+                    continue
+                if thread_id == self.thread_loop:
+                    try:
+                        if asyncio.current_task(self.loop) is not self.task:
+                            continue
+                    except RuntimeError:
+                        continue
+                    quadros = _pilha(frame)
+                else:
+                    quadros = _pilha(frame)
+                    if codigo_endpoint is None or not any(q.f_code is codigo_endpoint for q in quadros):
+                        continue
+                self.amostras[";".join(_nome_quadro(q) for q in quadros)] += 1
+                self.total += 1
+
+    def colapsado(self) -> str:
+        return "\n".join(f"{pilha} {contagem}" for pilha, contagem in self.amostras.most_common()) + "\n"
+
+
+def gravar_perfil(amostrador: AmostradorRequisicao, rota: str, duracao: float, status: int) -> str:
+    PERFIS_DIR.mkdir(parents=True, exist_ok=True)
+    perfil_id = f"{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    (PERFIS_DIR / f"{perfil_id}.txt").write_text(amostrador.colapsado())
+    (PERFIS_DIR / f"{perfil_id}.json").write_text(json.dumps({
+        "id": perfil_id,
+        "metodo": amostrador.scope["method"],
+        "rota": rota,
+        "path": amostrador.scope["path"],
+        "status": status,
+        "duracao_ms": round(duracao * 1000, 1),
+        "amostras": amostrador.total,
+        "intervalo_ms": PERFIL_INTERVALO_MS,
+        "pid": os.getpid(),
+        "criado_em": time.time()
+    }))
+
+    antigos = sorted(PERFIS_DIR.glob("*.json"))[:-PERFIS_MAXIMO]
+    for meta in antigos:
+        meta.unlink(missing_ok=True)
+        meta.with_suffix(".txt").unlink(missing_ok=True)
+    return perfil_id
+
+
+def listar_perfis() -> List[dict]:
+    if not PERFIS_DIR.exists():
+        return []
+    return [json.loads(meta.read_text()) for meta in sorted(PERFIS_DIR.glob("*.json"), reverse=True)]
+
+
+def ler_perfil(perfil_id: str) -> Optional[str]:
+    arquivo = PERFIS_DIR / f"{perfil_id}.txt"
+    # O id vira nome de arquivo: nada de caminhos vindos da URL
+    if arquivo.parent != PERFIS_DIR or not arquivo.exists():
+        return None
+    return arquivo.read_text()
+
+
+class RegistroLentas:
+    """As N requisições mais lentas por rota dentro da janela, neste worker"""
+
+    def __init__(self, por_rota: int = LENTAS_POR_ROTA, janela: float = LENTAS_JANELA_SEGUNDOS):
+        self.por_rota = por_rota
+        self.janela = janela
+        self.rotas: Dict[str, list] = {}
+        self.sequencia = itertools.count()
+        self.lock = threading.Lock()
+
+    def registrar(self, rota: str, duracao: float, dados: dict):
+        agora = time.time()
+        with self.lock:
+            heap = self.rotas.setdefault(rota, [])
+            validos = [item for item in heap if item[1] >= agora - self.janela]
+            if len(validos) != len(heap):
+                heap[:] = validos
+                heapq.heapify(heap)
+            # O contador desempata durações iguais sem comparar os dicts
+            item = (duracao, agora, next(self.sequencia), dados)
+            if len(heap) < self.por_rota:
+                heapq.heappush(heap, item)
+            elif duracao > heap[0][0]:
+                heapq.heapreplace(heap, item)
+
+    def listar(self) -> Dict[str, List[dict]]:
+        limite = time.time() - self.janela
+        with self.lock:
+            return {
+                rota: [
+                    {**dados, "duracao_ms": round(duracao * 1000, 1), "em": instante}
+                    for duracao, instante, _, dados in sorted(heap, reverse=True)
+                    if instante >= limite
+                ]
+                for rota, heap in sorted(self.rotas.items())
+            }
+
+
+requisicoes_lentas = RegistroLentas()
+
+
+def _perfil_pedido(scope: dict) -> bool:
+    headers = dict(scope.get("headers") or [])
+    if headers.get(b"x-perfil") == b"1":
+        return True
+    return parse_qs(scope.get("query_string", b"").decode()).get("perfil") == ["1"]
+
+
+def _token_admin(scope: dict) -> bool:
+    """Mesma regra de obter_identidade_admin, a partir das claims do token"""
+    autorizacao = dict(scope.get("headers") or []).get(b"authorization", b"").decode()
+    if not autorizacao.lower().startswith("bearer "):
+        return False
+    payload = decodificar_token(autorizacao[7:])
+    return payload is not None and payload.get("tipo") == "admin"
+
+
+class MiddlewarePerfilador:
+    """
+    Registra a duração de toda requisição e amostra as pedidas por admins.
+    Precisa ficar mais interno que os BaseHTTPMiddleware, para rodar na
+    mesma task do endpoint.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        amostrador = None
+        # decodificar_token pode recarregar a lista de revogação do banco
+        if _perfil_pedido(scope) and await run_in_threadpool(_token_admin, scope):
+            amostrador = AmostradorRequisicao(scope, asyncio.current_task())
+
+        status = 500
+        perfil_id = None
+        inicio = time.perf_counter()
+
+        async def enviar(mensagem):
+            nonlocal status, perfil_id
+            if mensagem["type"] == "http.response.start":
+                status = mensagem["status"]
+                if amostrador is not None:
+                    amostrador.parar()
+                    perfil_id = await run_in_threadpool(
+                        gravar_perfil, amostrador, nome_rota(scope), time.perf_counter() - inicio, status
+                    )
+                    mensagem["headers"] = list(mensagem.get("headers", [])) + [(b"x-perfil-id", perfil_id.encode())]
+            await send(mensagem)
+
+        if amostrador is not None:
+            amostrador.iniciar()
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            if amostrador is not None and perfil_id is None:
+                amostrador.parar()
+            estatisticas = estatisticas_atuais()
+            requisicoes_lentas.registrar(nome_rota(scope), time.perf_counter() - inicio, {
+                "metodo": scope["method"],
+                "path": scope["path"],
+                "status": status,
+                "consultas": estatisticas.total if estatisticas else None
+            })
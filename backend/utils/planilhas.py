@@ -0,0 +1,148 @@
+"""
+Geração de planilhas Excel sem acesso ao banco.
+
+As funções daqui rodam no pool de processos (backend.utils.executores):
+recebem e devolvem apenas tipos simples, e o router fica responsável por
+buscar os dados antes e gravar o resultado depois.
+"""
+from io import BytesIO
+
+from openpyxl import Workbook
+from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+from openpyxl.utils import get_column_letter
+
+
+def gerar_excel_estatisticas(dados: dict) -> bytes:
+    """
+    Monta o relatório de estatísticas de um formulário. `dados` vem de
+    formularios._coletar_dados_exportacao.
+    """
+    wb = Workbook()
+
+    ws_resumo = wb.active
+    ws_resumo.title = "Resumo"
+
+    header_fill = PatternFill(start_color="4F46E5", end_color="4F46E5", fill_type="solid")
+    header_font = Font(bold=True, color="FFFFFF")
+    border = Border(
+        left=Side(style='thin'),
+        right=Side(style='thin'),
+        top=Side(style='thin'),
+        bottom=Side(style='thin')
+    )
+
+    ws_resumo['A1'] = "Relatório de Estatísticas"
+    ws_resumo['A1'].font = Font(bold=True, size=16)
+    ws_resumo.merge_cells('A1:D1')
+
+    ws_resumo['A3'] = "Formulário:"
+    ws_resumo['B3'] = dados["titulo"]
+    ws_resumo['A4'] = "Data de Exportação:"
+    ws_resumo['B4'] = dados["data_exportacao"]
+
+    total_envios = dados["total_envios"]
+    total_respostas = len(dados["envios"])
+    taxa = (total_respostas / total_envios * 100) if total_envios > 0 else 0
+
+    ws_resumo['A6'] = "Total de Envios:"
+    ws_resumo['B6'] = total_envios
+    ws_resumo['A7'] = "Total de Respostas:"
+    ws_resumo['B7'] = total_respostas
+    ws_resumo['A8'] = "Taxa de Resposta:"
+    ws_resumo['B8'] = f"{round(taxa, 1)}%"
+
+    ws_resumo['A10'] = "Média por Pergunta"
+    ws_resumo['A10'].font = Font(bold=True, size=12)
+
+    row = 11
+    headers = ["Pergunta", "Categoria", "Média", "Qtd Respostas"]
+    for col, header in enumerate(headers, 1):
+        cell = ws_resumo.cell(row=row, column=col, value=header)
+        cell.fill = header_fill
+        cell.font = header_font
+        cell.border = border
+        cell.alignment = Alignment(horizontal='center')
+
+    row += 1
+    perguntas = dados["perguntas"]
+    for pergunta in perguntas:
+        if pergunta["tipo"] == "escala":
+            media = pergunta["media"]
+            ws_resumo.cell(row=row, column=1, value=pergunta["texto"]).border = border
+            ws_resumo.cell(row=row, column=2, value=pergunta["categoria"] or "-").border = border
+            ws_resumo.cell(row=row, column=3, value=round(media, 2) if media else 0).border = border
+            ws_resumo.cell(row=row, column=4, value=pergunta["quantidade"]).border = border
+            row += 1
+
+    for col in range(1, 5):
+        ws_resumo.column_dimensions[get_column_letter(col)].width = 40 if col == 1 else 20
+
+    ws_respostas = wb.create_sheet("Respostas Detalhadas")
+
+    headers = ["Destinatário", "Email", "Empresa", "Data Resposta"]
+    for pergunta in perguntas:
+        texto = pergunta["texto"]
+        headers.append(texto[:50] + "..." if len(texto) > 50 else texto)
+
+    for col, header in enumerate(headers, 1):
+        cell = ws_respostas.cell(row=1, column=col, value=header)
+        cell.fill = header_fill
+        cell.font = header_font
+        cell.border = border
+        cell.alignment = Alignment(horizontal='center', wrap_text=True)
+
+    row = 2
+    for envio in dados["envios"]:
+        ws_respostas.cell(row=row, column=1, value=envio["destinatario"]).border = border
+        ws_respostas.cell(row=row, column=2, value=envio["email"]).border = border
+        ws_respostas.cell(row=row, column=3, value=envio["empresa"]).border = border
+        ws_respostas.cell(row=row, column=4, value=envio["data_resposta"]).border = border
+
+        col = 5
+        for pergunta in perguntas:
+            valor = envio["respostas"].get(pergunta["id"], "-")
+            ws_respostas.cell(row=row, column=col, value=valor).border = border
+            col += 1
+        row += 1
+
+    for col in range(1, len(headers) + 1):
+        ws_respostas.column_dimensions[get_column_letter(col)].width = 20
+
+    ws_respostas.row_dimensions[1].height = 40
+
+    ws_dist = wb.create_sheet("Distribuição Respostas")
+
+    row = 1
+    for pergunta in perguntas:
+        if pergunta["tipo"] == "escala":
+            ws_dist.cell(row=row, column=1, value=pergunta["texto"]).font = Font(bold=True)
+            ws_dist.merge_cells(start_row=row, start_column=1, end_row=row, end_column=6)
+            row += 1
+
+            headers = ["Valor", "Descrição", "Quantidade", "Percentual"]
+            for col, header in enumerate(headers, 1):
+                cell = ws_dist.cell(row=row, column=col, value=header)
+                cell.fill = header_fill
+                cell.font = header_font
+                cell.border = border
+            row += 1
+
+            total_respostas_pergunta = pergunta["quantidade"]
+            for opcao in pergunta["opcoes"]:
+                count = opcao["quantidade"]
+                pct = (count / total_respostas_pergunta * 100) if total_respostas_pergunta > 0 else 0
+
+                ws_dist.cell(row=row, column=1, value=opcao["valor"]).border = border
+                ws_dist.cell(row=row, column=2, value=opcao["texto"]).border = border
+                ws_dist.cell(row=row, column=3, value=count).border = border
+                ws_dist.cell(row=row, column=4, value=f"{round(pct, 1)}%").border = border
+                row += 1
+
+            row += 1
+
+    for col in [1, 2, 3, 4]:
+        ws_dist.column_dimensions[get_column_letter(col)].width = 25 if col == 2 else 15
+
+    output = BytesIO()
+    wb.save(output)
+    return output.getvalue()
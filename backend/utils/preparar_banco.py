@@ -0,0 +1,349 @@
+"""
+Preparação do banco em um único processo: migrações e dados iniciais.
+
+Roda uma vez por deploy, antes de subir os workers (docker-entrypoint.sh,
+Procfile, start.sh):
+
+    python -m backend.utils.preparar_banco
+
+Tudo acontece sob um advisory lock do Postgres: várias réplicas subindo
+juntas esperam a primeira terminar e depois só confirmam que não há nada a
+fazer. Etapas:
+1. bancos sem a tabela alembic_version: os criados por create_all são
+   carimbados na última revisão anterior aos campos de contato, e os vazios
+   são criados pelos models e carimbados nessa mesma revisão;
+2. `alembic upgrade head`;
+3. create_all e colunas/tabelas legadas que as migrações não cobrem;
+4. seeds (admin, consultores, empresas, estágios, pipeline, prospecções).
+
+Correções de dados em massa (p.ex. códigos das prospecções que não têm)
+são backfills, rodados à parte com `python -m backend.utils.backfills`;
+aqui só se avisa dos pendentes.
+
+Os workers não fazem nada disso no startup: só comparam a revisão do banco
+com o head das migrações (verificar_migracoes) e avisam se estiver
+atrasada. Com PgBouncer em transaction pooling o advisory lock não se
+mantém entre transações; rode este comando com o DATABASE_URL direto do
+Postgres.
+"""
+import re
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+
+from sqlalchemy import text
+
+from backend.database import Base, SessionLocal, engine
+from backend.utils.backfills import marcar_concluidos, pendentes
+from backend.utils.seed import (
+    criar_consultores_padrao, criar_empresas_padrao, criar_prospeccoes_padrao, criar_stages_padrao,
+    criar_usuario_admin_padrao, popular_pipeline
+)
+
+RAIZ = Path(__file__).resolve().parents[2]
+ALEMBIC_INI = RAIZ / "alembic.ini"
+VERSOES = RAIZ / "alembic" / "versions"
+
+# Chave arbitrária, fixa: todas as instâncias disputam o mesmo lock
+CHAVE_BLOQUEIO = 103_0017
+# Última revisão anterior aos campos de contato (bancos criados por create_all)
+REVISAO_LEGADA = "f80b2b33a570"
+
+_REVISAO = re.compile(r"^revision\s*(?::[^=]*)?=\s*['\"]([^'\"]+)['\"]", re.MULTILINE)
+_REVISAO_ANTERIOR = re.compile(r"^down_revision\s*(?::[^=]*)?=\s*(.+)$", re.MULTILINE)
+_ID = re.compile(r"['\"]([^'\"]+)['\"]")
+
+
+def heads_migracoes() -> set:
+    """
+    Heads das migrações lidos direto dos arquivos. O ScriptDirectory do
+    Alembic importa cada migração e leva mais de um segundo, caro demais
+    para o boot de cada worker; o CLI confere que os dois concordam.
+    """
+    revisoes, anteriores = set(), set()
+    for arquivo in VERSOES.glob("*.py"):
+        conteudo = arquivo.read_text()
+        revisao = _REVISAO.search(conteudo)
+        if not revisao:
+            continue
+        revisoes.add(revisao.group(1))
+        anterior = _REVISAO_ANTERIOR.search(conteudo)
+        if anterior:
+            anteriores.update(_ID.findall(anterior.group(1)))
+    return revisoes - anteriores
+
+
+def revisao_do_banco(conn) -> set:
+    existe = conn.execute(text("SELECT to_regclass('alembic_version') IS NOT NULL")).scalar()
+    if not existe:
+        return set()
+    return {linha[0] for linha in conn.execute(text("SELECT version_num FROM alembic_version"))}
+
+
+def verificar_migracoes() -> dict:
+    """Estado das migrações para o startup dos workers e o /health"""
+    esperado = heads_migracoes()
+    with engine.connect() as conn:
+        atual = revisao_do_banco(conn)
+    return {"atualizado": atual == esperado, "banco": sorted(atual), "head": sorted(esperado)}
+
+
+@contextmanager
+def bloqueio_preparacao():
+    with engine.connect() as conn:
+        conn.execution_options(isolation_level="AUTOCOMMIT")
+        if not conn.execute(text("SELECT pg_try_advisory_lock(:chave)"), {"chave": CHAVE_BLOQUEIO}).scalar():
+            print("⏳ Outra instância está preparando o banco; aguardando...")
+            # A espera dura o que durarem as migrações da outra instância
+            # (índices CONCURRENTLY, reescrita de tabelas): sem o
+            # statement_timeout da conexão, que cancelaria o lock no meio
+            conn.execute(text("SET statement_timeout = 0"))
+            try:
+                conn.execute(text("SELECT pg_advisory_lock(:chave)"), {"chave": CHAVE_BLOQUEIO})
+            finally:
+                conn.execute(text("RESET statement_timeout"))
+        try:
+            yield
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:chave)"), {"chave": CHAVE_BLOQUEIO})
+
+
+def _alembic_config():
+    from alembic.config import Config
+    return Config(str(ALEMBIC_INI))
+
+
+def carimbar_banco_sem_alembic():
+    """
+    Banco sem alembic_version. Criado por create_all em versões antigas:
+    carimba na revisão legada e as migrações seguintes completam o schema.
+    Vazio: cria tudo pelos models e segue o mesmo caminho (a migração inicial
+    não roda num banco vazio: cria o enum tipousuario duas vezes). As
+    migrações seguintes são idempotentes e criam o que os models não
+    expressam, como extensões e índices de expressão.
+    """
+    from alembic import command
+
+    with engine.connect() as conn:
+        if revisao_do_banco(conn):
+            return
+        tabelas = conn.execute(text("""
+            SELECT COUNT(*) FROM information_schema.tables
+            WHERE table_name IN ('empresas', 'usuarios', 'prospeccoes', 'agendamentos')
+        """)).scalar()
+    if tabelas >= 4:
+        print(f"🔖 Banco com {tabelas} tabelas principais sem Alembic: carimbando em {REVISAO_LEGADA}")
+        command.stamp(_alembic_config(), REVISAO_LEGADA)
+    elif tabelas == 0:
+        print(f"🆕 Banco vazio: criando tabelas pelos models e carimbando em {REVISAO_LEGADA}")
+        Base.metadata.create_all(bind=engine)
+        command.stamp(_alembic_config(), REVISAO_LEGADA)
+        with engine.begin() as conn:
+            marcar_concluidos(conn)
+    else:
+        print(f"⚠️ Banco parcial ({tabelas} tabelas principais): tentando migrar do zero")
+
+
+def migrar():
+    from alembic import command
+    from alembic.script import ScriptDirectory
+
+    config = _alembic_config()
+    heads = set(ScriptDirectory.from_config(config).get_heads())
+    if heads != heads_migracoes():
+        raise RuntimeError(f"heads_migracoes() divergiu do Alembic: {sorted(heads_migracoes())} != {sorted(heads)}")
+    command.upgrade(config, "head")
+    print("✅ Migrações aplicadas")
+
+
+def adicionar_colunas_faltantes_empresas():
+    """Adiciona colunas faltantes à tabela empresas se não existirem"""
+    if engine is None:
+        return
+    
+    colunas_necessarias = {
+        'nome_contato': 'VARCHAR(200)',
+        'cargo_contato': 'VARCHAR(200)',
+        'telefone_contato': 'VARCHAR(50)',
+        'email_contato': 'VARCHAR(200)',
+    }
+    
+    with engine.connect() as conn:
+        result = conn.execute(text("""
+            SELECT column_name 
+            FROM information_schema.columns 
+            WHERE table_name = 'empresas'
+        """))
+        colunas_existentes = {row[0] for row in result.fetchall()}
+        
+        for coluna, tipo in colunas_necessarias.items():
+            if coluna not in colunas_existentes:
+                print(f"🔄 Adicionando coluna '{coluna}' à tabela empresas...")
+                try:
+                    conn.execute(text(f"""
+                        ALTER TABLE empresas 
+                        ADD COLUMN {coluna} {tipo}
+                    """))
+                    conn.commit()
+                    print(f"✅ Coluna '{coluna}' adicionada com sucesso à empresas")
+                except Exception as e:
+                    print(f"⚠️ Erro ao adicionar coluna '{coluna}' à empresas: {e}")
+
+
+def criar_tabela_prospeccoes_historico():
+    """Cria a tabela prospeccoes_historico se não existir"""
+    if engine is None:
+        return
+    
+    with engine.connect() as conn:
+        result = conn.execute(text("""
+            SELECT table_name FROM information_schema.tables 
+            WHERE table_name = 'prospeccoes_historico'
+        """))
+        if not result.fetchone():
+            print("🔄 Criando tabela prospeccoes_historico...")
+            try:
+                conn.execute(text("""
+                    CREATE TABLE IF NOT EXISTS prospeccoes_historico (
+                        id SERIAL PRIMARY KEY,
+                        prospeccao_id INTEGER NOT NULL REFERENCES prospeccoes(id),
+                        usuario_id INTEGER NOT NULL REFERENCES usuarios(id),
+                        data_alteracao TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                        tipo_alteracao VARCHAR(50) NOT NULL,
+                        campo_alterado VARCHAR(100),
+                        valor_anterior TEXT,
+                        valor_novo TEXT,
+                        descricao TEXT
+                    )
+                """))
+                conn.commit()
+                print("✅ Tabela prospeccoes_historico criada com sucesso")
+            except Exception as e:
+                print(f"⚠️ Erro ao criar tabela prospeccoes_historico: {e}")
+
+
+def adicionar_colunas_faltantes_prospeccoes():
+    """Adiciona colunas faltantes à tabela prospeccoes se não existirem"""
+    if engine is None:
+        return
+    
+    colunas_necessarias = {
+        'codigo': 'VARCHAR(50)',
+        'data_atualizacao': 'TIMESTAMP',
+        'porte': 'VARCHAR(50)',
+        'lr': 'VARCHAR(50)',
+        'id_externo': 'VARCHAR(100)',
+        'cfr': 'VARCHAR(50)',
+        'tipo_producao': 'VARCHAR(200)',
+        'data_prospeccao': 'DATE',
+        'follow_up': 'DATE',
+        'nome_contato': 'VARCHAR(200)',
+        'cargo': 'VARCHAR(200)',
+        'celular': 'VARCHAR(50)',
+        'telefone': 'VARCHAR(50)',
+        'telefone_contato': 'VARCHAR(50)',
+        'email_contato': 'VARCHAR(200)',
+        'cargo_contato': 'VARCHAR(200)',
+        'cnpj': 'VARCHAR(50)',
+        'status_prospeccao': 'VARCHAR(100)',
+        'responsavel': 'VARCHAR(200)',
+        'opcoes': 'TEXT',
+        'retorno': 'TEXT',
+        'observacoes_prospeccao': 'TEXT',
+        'interesse_treinamento': 'BOOLEAN DEFAULT FALSE',
+        'interesse_consultoria': 'BOOLEAN DEFAULT FALSE',
+        'interesse_certificacao': 'BOOLEAN DEFAULT FALSE',
+        'interesse_eventos': 'BOOLEAN DEFAULT FALSE',
+        'interesse_produtos': 'BOOLEAN DEFAULT FALSE',
+        'interesse_seguranca': 'BOOLEAN DEFAULT FALSE',
+        'interesse_meio_ambiente': 'BOOLEAN DEFAULT FALSE',
+        'outros_interesses': 'TEXT',
+        'potencial_negocio': 'VARCHAR(50)',
+        'status_follow_up': 'VARCHAR(100)',
+        'proxima_prospeccao_data': 'DATE',
+    }
+    
+    with engine.connect() as conn:
+        result = conn.execute(text("""
+            SELECT column_name 
+            FROM information_schema.columns 
+            WHERE table_name = 'prospeccoes'
+        """))
+        colunas_existentes = {row[0] for row in result.fetchall()}
+        
+        for coluna, tipo in colunas_necessarias.items():
+            if coluna not in colunas_existentes:
+                print(f"🔄 Adicionando coluna '{coluna}' à tabela prospeccoes...")
+                try:
+                    conn.execute(text(f"""
+                        ALTER TABLE prospeccoes 
+                        ADD COLUMN {coluna} {tipo}
+                    """))
+                    conn.commit()
+                    print(f"✅ Coluna '{coluna}' adicionada com sucesso")
+                except Exception as e:
+                    print(f"⚠️ Erro ao adicionar coluna '{coluna}': {e}")
+        
+        if 'codigo' not in colunas_existentes:
+            print("🔄 Criando índice único para coluna 'codigo'...")
+            try:
+                conn.execute(text("""
+                    CREATE UNIQUE INDEX IF NOT EXISTS ix_prospeccoes_codigo 
+                    ON prospeccoes (codigo) WHERE codigo IS NOT NULL
+                """))
+                conn.commit()
+                print("✅ Índice criado com sucesso")
+            except Exception as e:
+                print(f"⚠️ Erro ao criar índice: {e}")
+
+
+def semear():
+    db = SessionLocal()
+    try:
+        print("🔄 Iniciando seed de dados...")
+        for etapa in (
+            criar_usuario_admin_padrao, criar_consultores_padrao, criar_empresas_padrao, criar_stages_padrao,
+            popular_pipeline, criar_prospeccoes_padrao
+        ):
+            try:
+                etapa(db)
+            except Exception as e:
+                db.rollback()
+                print(f"⚠️ Erro em {etapa.__name__}: {e}")
+        print("✅ Seed de dados concluído")
+    finally:
+        db.close()
+
+
+def preparar_banco():
+    with bloqueio_preparacao():
+        carimbar_banco_sem_alembic()
+        migrar()
+
+        Base.metadata.create_all(bind=engine)
+        for etapa in (
+            adicionar_colunas_faltantes_empresas, adicionar_colunas_faltantes_prospeccoes,
+            criar_tabela_prospeccoes_historico
+        ):
+            try:
+                etapa()
+            except Exception as e:
+                print(f"⚠️ Erro em {etapa.__name__}: {e}")
+
+        semear()
+
+    with engine.connect() as conn:
+        faltando = pendentes(conn)
+    if faltando:
+        print(f"⚠️ Backfills pendentes: {', '.join(faltando)}. Rode python -m backend.utils.backfills")
+
+
+def main():
+    if engine is None:
+        print("❌ DATABASE_URL não configurada")
+        sys.exit(1)
+    preparar_banco()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+import asyncio
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+
+from backend.database import SessionLocal
+from backend.eventos import barramento
+from backend.models import Usuario
+from backend.models.mensagens import StatusUsuario
+from backend.utils.tempo_real import gerenciador_conexoes
+
+INTERVALO_GRAVACAO = int(os.getenv("PRESENCA_INTERVALO_GRAVACAO", "30"))
+TEMPO_ONLINE = timedelta(minutes=5)
+TEMPO_DIGITANDO = timedelta(seconds=10)
+
+
+class ServicoPresenca:
+    """
+    Presença dos usuários do chat (última atividade e "digitando") mantida
+    em memória em cada worker.
+
+    - registrar_atividade é O(1) e não acessa o banco;
+    - a cada INTERVALO_GRAVACAO segundos as atividades acumuladas são
+      publicadas no barramento (para os outros workers) e gravadas de uma
+      vez em status_usuarios;
+    - "digitando" é efêmero: é publicado imediatamente e nunca gravado.
+    """
+
+    def __init__(self):
+        self.ultima_atividade: Dict[int, datetime] = {}
+        self.digitando: Dict[int, Tuple[int, datetime]] = {}
+        self.pendentes: Dict[int, datetime] = {}
+        self.lock = threading.Lock()
+        self.tarefa: Optional[asyncio.Task] = None
+
+    # ===================== ESCRITA =====================
+
+    def registrar_atividade(self, usuario_id: int):
+        agora = datetime.utcnow()
+        with self.lock:
+            self.ultima_atividade[usuario_id] = agora
+            self.pendentes[usuario_id] = agora
+
+    def registrar_digitando(self, usuario_id: int, destinatario_id: int, digitando: bool):
+        self.registrar_atividade(usuario_id)
+        barramento.publicar("presenca", {
+            "tipo": "digitando",
+            "usuario_id": usuario_id,
+            "destinatario_id": destinatario_id,
+            "digitando": digitando,
+            "desde": datetime.utcnow()
+        })
+
+    # ===================== LEITURA =====================
+
+    def status(self, usuario_id: int) -> dict:
+        agora = datetime.utcnow()
+        ultima_atividade = self.ultima_atividade.get(usuario_id)
+        digitando = self.digitando.get(usuario_id)
+        return {
+            "online": ultima_atividade is not None and ultima_atividade > agora - TEMPO_ONLINE,
+            "ultima_atividade": ultima_atividade,
+            "digitando": digitando is not None and digitando[1] > agora - TEMPO_DIGITANDO
+        }
+
+    def esta_digitando_para(self, usuario_id: int, destinatario_id: int) -> bool:
+        digitando = self.digitando.get(usuario_id)
+        if digitando is None:
+            return False
+        para, desde = digitando
+        return para == destinatario_id and desde > datetime.utcnow() - TEMPO_DIGITANDO
+
+    # ===================== SINCRONIZAÇÃO =====================
+
+    def _ao_receber_evento(self, evento: dict):
+        if evento.get("tipo") == "atividades":
+            for usuario_id, quando in evento.get("atividades", {}).items():
+                self._mesclar_atividade(int(usuario_id), datetime.fromisoformat(quando))
+        elif evento.get("tipo") == "digitando":
+            usuario_id = evento["usuario_id"]
+            destinatario_id = evento["destinatario_id"]
+            if evento.get("digitando"):
+                self.digitando[usuario_id] = (destinatario_id, datetime.fromisoformat(evento["desde"]))
+            else:
+                self.digitando.pop(usuario_id, None)
+            gerenciador_conexoes.entregar_local(
+                [destinatario_id],
+                "digitando",
+                {"usuario_id": usuario_id, "digitando": bool(evento.get("digitando"))}
+            )
+
+    def _mesclar_atividade(self, usuario_id: int, quando: datetime):
+        with self.lock:
+            atual = self.ultima_atividade.get(usuario_id)
+            if atual is None or quando > atual:
+                self.ultima_atividade[usuario_id] = quando
+
+    def _carregar_do_banco(self):
+        db = SessionLocal()
+        try:
+            for usuario_id, ultima_atividade in db.query(StatusUsuario.usuario_id, StatusUsuario.ultima_atividade).all():
+                if ultima_atividade:
+                    self._mesclar_atividade(usuario_id, ultima_atividade)
+        finally:
+            db.close()
+
+    def _gravar_no_banco(self, atividades: Dict[int, datetime]):
+        db = SessionLocal()
+        try:
+            # Usuários excluídos desde a última gravação violariam a FK
+            existentes = {
+                usuario_id for (usuario_id,) in
+                db.query(Usuario.id).filter(Usuario.id.in_(list(atividades.keys())))
+            }
+            if not existentes:
+                return
+            stmt = insert(StatusUsuario).values([
+                {"usuario_id": usuario_id, "online": True, "ultima_atividade": quando}
+                for usuario_id, quando in atividades.items()
+                if usuario_id in existentes
+            ])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[StatusUsuario.usuario_id],
+                set_={
+                    "online": True,
+                    "ultima_atividade": func.greatest(StatusUsuario.ultima_atividade, stmt.excluded.ultima_atividade)
+                }
+            )
+            db.execute(stmt)
+            db.commit()
+        finally:
+            db.close()
+
+    def descarregar(self):
+        """Publica e grava as atividades acumuladas desde a última gravação"""
+        with self.lock:
+            atividades, self.pendentes = self.pendentes, {}
+        if not atividades:
+            return
+
+        barramento.publicar("presenca", {
+            "tipo": "atividades",
+            "atividades": {str(usuario_id): quando for usuario_id, quando in atividades.items()}
+        })
+        try:
+            self._gravar_no_banco(atividades)
+        except Exception as e:
+            print(f"⚠️ Erro ao gravar presença: {e}")
+
+    async def _ciclo(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(INTERVALO_GRAVACAO)
+            await loop.run_in_executor(None, self.descarregar)
+
+    async def iniciar(self):
+        barramento.assinar("presenca", self._ao_receber_evento)
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(None, self._carregar_do_banco)
+        except Exception as e:
+            print(f"⚠️ Erro ao carregar presença do banco: {e}")
+        self.tarefa = asyncio.create_task(self._ciclo())
+
+    async def parar(self):
+        if self.tarefa:
+            self.tarefa.cancel()
+            self.tarefa = None
+        barramento.cancelar_assinatura("presenca", self._ao_receber_evento)
+        await asyncio.get_running_loop().run_in_executor(None, self.descarregar)
+
+
+presenca = ServicoPresenca()
@@ -0,0 +1,135 @@
+"""
+Monitor de atraso das réplicas de leitura e cookie de escrita recente.
+
+Cada worker consulta as réplicas a cada REPLICA_INTERVALO segundos (padrão
+2). O atraso é zero quando a réplica já aplicou o WAL até a posição atual
+do primário (pg_current_wal_lsn lido no mesmo ciclo), e senão é o tempo
+desde a última transação aplicada. Réplicas acima de REPLICA_ATRASO_MAXIMO,
+sem o WAL receiver em streaming (desconectada do primário: aplicou tudo o
+que recebeu, mas não recebe mais nada) ou que não respondem dentro do
+tempo limite, incluindo a conexão, saem da leitura até a próxima medição
+boa. Os valores vão para o /metrics (db_replica_atraso_segundos,
+db_replica_disponivel).
+
+MiddlewareEscritaRecente marca com um cookie os clientes que acabaram de
+escrever (POST/PUT/PATCH/DELETE com sucesso). Por REPLICA_JANELA_ESCRITA
+segundos as leituras desse cliente vão ao primário, em qualquer worker.
+"""
+import asyncio
+import os
+import time
+from typing import Optional
+
+from sqlalchemy import text
+
+from backend.database import (
+    COOKIE_ESCRITA, REPLICA_ATRASO_MAXIMO, REPLICA_JANELA_ESCRITA, Replica, async_engine, replicas
+)
+from backend.metricas import REPLICA_ATRASO, REPLICA_DISPONIVEL
+
+REPLICA_INTERVALO = float(os.getenv("REPLICA_INTERVALO", "2"))
+
+SQL_POSICAO_PRIMARIO = text("SELECT pg_current_wal_lsn()::text")
+
+# NULL: WAL receiver parado. Sem pg_read_all_stats o status vem nulo para o
+# papel da aplicação; aí vale só a linha existir (o pid é sempre visível) e
+# a comparação com a posição do primário. Sem essa posição (primário não
+# respondeu), compara com o último WAL recebido.
+SQL_ATRASO = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN NOT EXISTS (
+            SELECT 1 FROM pg_stat_wal_receiver WHERE COALESCE(status, 'streaming') = 'streaming'
+        ) THEN NULL
+        WHEN pg_last_wal_replay_lsn() >= COALESCE(CAST(CAST(:posicao_primario AS text) AS pg_lsn), pg_last_wal_receive_lsn()) THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+METODOS_ESCRITA = {"POST", "PUT", "PATCH", "DELETE"}
+
+
+class MonitorReplicas:
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+
+    async def iniciar(self):
+        if replicas:
+            self.task = asyncio.create_task(self._executar())
+
+    async def parar(self):
+        if self.task:
+            self.task.cancel()
+            self.task = None
+        for replica in replicas:
+            await replica.async_engine.dispose()
+
+    async def _executar(self):
+        while True:
+            posicao = await self.posicao_primario()
+            await asyncio.gather(*(self.verificar(replica, posicao) for replica in replicas))
+            await asyncio.sleep(REPLICA_INTERVALO)
+
+    async def posicao_primario(self) -> Optional[str]:
+        """LSN atual do primário, ou None se não respondeu a tempo"""
+        async def consultar():
+            async with async_engine.connect() as conexao:
+                return await conexao.scalar(SQL_POSICAO_PRIMARIO)
+        try:
+            return await asyncio.wait_for(consultar(), REPLICA_INTERVALO * 5)
+        except Exception as e:
+            print(f"⚠️ Posição do WAL do primário indisponível: {e}")
+            return None
+
+    async def verificar(self, replica: Replica, posicao_primario: Optional[str] = None):
+        async def consultar():
+            # A conexão entra no tempo limite: um host que descarta pacotes
+            # prenderia o gather e manteria o último estado da réplica
+            async with replica.async_engine.connect() as conexao:
+                return await conexao.scalar(SQL_ATRASO, {"posicao_primario": posicao_primario})
+        try:
+            atraso = await asyncio.wait_for(consultar(), REPLICA_INTERVALO * 5)
+            if atraso is None:
+                motivo = "WAL receiver sem streaming"
+            else:
+                atraso = float(atraso)
+                motivo = f"atraso de {atraso:.1f} s" if atraso > REPLICA_ATRASO_MAXIMO else None
+        except Exception as e:
+            atraso = None
+            motivo = f"erro: {e!r}"
+
+        disponivel = motivo is None
+        if disponivel != replica.disponivel:
+            if disponivel:
+                print(f"📚 Réplica {replica.nome} recebendo leituras")
+            else:
+                print(f"⚠️ Réplica {replica.nome} fora da leitura ({motivo})")
+        replica.atraso = atraso
+        replica.disponivel = disponivel
+        REPLICA_DISPONIVEL.labels(replica.nome).set(1 if disponivel else 0)
+        if atraso is not None:
+            REPLICA_ATRASO.labels(replica.nome).set(atraso)
+
+
+monitor_replicas = MonitorReplicas()
+
+
+class MiddlewareEscritaRecente:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in METODOS_ESCRITA:
+            await self.app(scope, receive, send)
+            return
+
+        async def enviar(mensagem):
+            if mensagem["type"] == "http.response.start" and mensagem["status"] < 400:
+                cookie = (
+                    f"{COOKIE_ESCRITA}={time.time():.3f}; Max-Age={int(REPLICA_JANELA_ESCRITA)}; "
+                    "Path=/; HttpOnly; SameSite=Lax"
+                )
+                mensagem["headers"] = list(mensagem.get("headers", [])) + [(b"set-cookie", cookie.encode())]
+            await send(mensagem)
+
+        await self.app(scope, receive, enviar)
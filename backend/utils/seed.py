@@ -133,7 +133,7 @@ def criar_empresas_padrao(db: Session):
     
     empresas_criadas = 0
     for empresa_data in empresas_padrao:
-        empresa_existente = db.query(Empresa).filter(Empresa.cnpj == empresa_data["cnpj"]).first()
+        empresa_existente = db.query(Empresa).filter(Empresa.cnpj_digits == empresa_data["cnpj"]).first()
         
         if not empresa_existente:
             nova_empresa = Empresa(**empresa_data)
@@ -181,11 +181,11 @@ def popular_pipeline(db: Session):
         print(f"✓ Pipeline já possui dados")
         return
     
-    petrobras = db.query(Empresa).filter(Empresa.cnpj == "33000167000101").first()
-    vale = db.query(Empresa).filter(Empresa.cnpj == "33592510000154").first()
-    bb = db.query(Empresa).filter(Empresa.cnpj == "00000000000191").first()
-    bradesco = db.query(Empresa).filter(Empresa.cnpj == "60746948000112").first()
-    ambev = db.query(Empresa).filter(Empresa.cnpj == "07526557000100").first()
+    petrobras = db.query(Empresa).filter(Empresa.cnpj_digits == "33000167000101").first()
+    vale = db.query(Empresa).filter(Empresa.cnpj_digits == "33592510000154").first()
+    bb = db.query(Empresa).filter(Empresa.cnpj_digits == "00000000000191").first()
+    bradesco = db.query(Empresa).filter(Empresa.cnpj_digits == "60746948000112").first()
+    ambev = db.query(Empresa).filter(Empresa.cnpj_digits == "07526557000100").first()
     
     stage_prospeccao = db.query(Stage).filter(Stage.nome == "Prospecção").first()
     stage_proposta = db.query(Stage).filter(Stage.nome == "Proposta Enviada").first()
@@ -327,11 +327,11 @@ def criar_prospeccoes_padrao(db: Session):
         print(f"✓ Prospecções já existem no banco")
         return
     
-    petrobras = db.query(Empresa).filter(Empresa.cnpj == "33000167000101").first()
-    vale = db.query(Empresa).filter(Empresa.cnpj == "33592510000154").first()
-    bb = db.query(Empresa).filter(Empresa.cnpj == "00000000000191").first()
-    bradesco = db.query(Empresa).filter(Empresa.cnpj == "60746948000112").first()
-    ambev = db.query(Empresa).filter(Empresa.cnpj == "07526557000100").first()
+    petrobras = db.query(Empresa).filter(Empresa.cnpj_digits == "33000167000101").first()
+    vale = db.query(Empresa).filter(Empresa.cnpj_digits == "33592510000154").first()
+    bb = db.query(Empresa).filter(Empresa.cnpj_digits == "00000000000191").first()
+    bradesco = db.query(Empresa).filter(Empresa.cnpj_digits == "60746948000112").first()
+    ambev = db.query(Empresa).filter(Empresa.cnpj_digits == "07526557000100").first()
     
     gabriel = db.query(Usuario).filter(Usuario.email == "gabriel@nucleo.com").first()
     lucas = db.query(Usuario).filter(Usuario.email == "lucas@nucleo.com").first()
@@ -1,10 +1,10 @@
 import os
 import uuid
-import magic
 from datetime import datetime
 from pathlib import Path
 from typing import Optional, Tuple
 from fastapi import UploadFile, HTTPException
+from fastapi.concurrency import run_in_threadpool
 
 UPLOAD_DIR = Path("static/uploads")
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
@@ -52,6 +52,8 @@ def get_file_type(content_type: str) -> str:
 
 def detect_mime_type(content: bytes) -> str:
     try:
+        # Carrega a libmagic só no primeiro upload
+        import magic
         mime = magic.Magic(mime=True)
         detected = mime.from_buffer(content[:2048])
         return detected or "application/octet-stream"
@@ -89,11 +91,7 @@ def validate_file_content(content: bytes, original_filename: str) -> Tuple[bool,
     
     return True, "", detected_mime
 
-async def save_upload_file(file: UploadFile) -> dict:
-    content = await file.read()
-    file_size = len(content)
-    original_filename = file.filename or "arquivo"
-    
+def _gravar_upload(content: bytes, original_filename: str) -> dict:
     is_valid, error_msg, detected_mime = validate_file_content(content, original_filename)
     if not is_valid:
         raise HTTPException(status_code=400, detail=error_msg)
@@ -117,11 +115,16 @@ async def save_upload_file(file: UploadFile) -> dict:
     return {
         "url": relative_url,
         "nome": original_filename,
-        "tamanho": file_size,
+        "tamanho": len(content),
         "tipo": get_file_type(detected_mime),
         "content_type": detected_mime
     }
 
+async def save_upload_file(file: UploadFile) -> dict:
+    content = await file.read()
+    # libmagic e escrita em disco bloqueiam: rodam no threadpool
+    return await run_in_threadpool(_gravar_upload, content, file.filename or "arquivo")
+
 def delete_file(file_url: str) -> bool:
     try:
         if file_url.startswith("/"):
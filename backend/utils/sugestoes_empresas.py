@@ -0,0 +1,291 @@
+"""
+Índice em memória do autocomplete de empresas (/api/empresas/sugestoes).
+
+Cada worker guarda id, nome, sigla, CNPJ, município e estado de todas as
+empresas e três listas ordenadas de chaves "texto\\0id":
+
+- inicios: nome e sigla normalizados (sem acento, minúsculas);
+- palavras: o nome a partir de cada palavra seguinte ("jorge construcoes
+  ltda" para "São Jorge Construções Ltda"), menos as palavras de
+  PALAVRAS_IGNORADAS;
+- cnpjs: os dígitos do CNPJ, como a coluna cnpj_digits.
+
+Uma sugestão é um bisect na lista mais o avanço enquanto a chave começa com
+o termo: os nomes que começam com o termo vêm primeiro, em ordem
+alfabética, depois os que têm uma palavra começando com ele. Não acessa o
+banco. As chaves são cortadas em TAMANHO_CHAVE caracteres para limitar a
+memória; termos maiores são comparados até esse tamanho.
+
+Atualização: a carga completa roda no startup e a cada SUGESTOES_RECARGA
+segundos (padrão 900). Entre elas, a cada SUGESTOES_INTERVALO segundos
+(padrão 5) o worker lê as empresas com data_atualizacao recente (índice
+ix_empresas_data_atualizacao); a janela volta MARGEM_ATUALIZACAO para trás
+porque o data_atualizacao é gravado antes do commit. Os endpoints que
+alteram empresas avisam pelo barramento: os workers releem na hora, e as
+exclusões saem do índice sem esperar a recarga. Exclusões feitas fora do
+app só somem na próxima recarga completa.
+
+O índice ocupa cerca de 0,6 KB por empresa em cada worker. Acima de
+SUGESTOES_MAXIMO_EMPRESAS (padrão 100000) ele não é montado e o endpoint
+consulta o banco (mesmas camadas da /api/empresas/busca), como antes da
+primeira carga. SUGESTOES_INDICE=false desliga o índice.
+"""
+import asyncio
+import os
+import threading
+import time
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, select, text, tuple_
+
+from backend.database import SessionLocal
+from backend.eventos import barramento
+from backend.models import Empresa
+from backend.utils.busca_empresas import normalizar, termo_cnpj
+from backend.utils.importar_empresas import digitos_cnpj
+
+SUGESTOES_INDICE = os.getenv("SUGESTOES_INDICE", "true") == "true"
+SUGESTOES_INTERVALO = float(os.getenv("SUGESTOES_INTERVALO", "5"))
+SUGESTOES_RECARGA = float(os.getenv("SUGESTOES_RECARGA", "900"))
+SUGESTOES_MAXIMO_EMPRESAS = int(os.getenv("SUGESTOES_MAXIMO_EMPRESAS", "100000"))
+
+MARGEM_ATUALIZACAO = timedelta(seconds=60)
+TAMANHO_CHAVE = 32
+# Mais empresas alteradas depois da última lida que isso (importação de
+# planilha): recarga completa. Também o tamanho das páginas da leitura
+# incremental.
+LIMITE_INCREMENTAL = 500
+PALAVRAS_IGNORADAS = {"de", "da", "do", "das", "dos", "e", "ltda", "me", "epp", "eireli", "s.a.", "s/a", "sa"}
+
+SEPARADOR = "\0"
+
+# (id, empresa, sigla, cnpj, municipio, estado)
+Linha = Tuple[int, str, Optional[str], Optional[str], Optional[str], Optional[str]]
+
+
+def chaves_empresa(linha: Linha) -> Tuple[List[str], List[str], List[str]]:
+    """Chaves de uma empresa nas listas inicios, palavras e cnpjs"""
+    empresa_id, empresa, sigla, cnpj = linha[:4]
+    sufixo = f"{SEPARADOR}{empresa_id}"
+    nome = normalizar(empresa or "")
+    inicios = {nome[:TAMANHO_CHAVE] + sufixo}
+    if sigla and normalizar(sigla):
+        inicios.add(normalizar(sigla)[:TAMANHO_CHAVE] + sufixo)
+    palavras = set()
+    posicao = nome.find(" ")
+    while posicao != -1:
+        resto = nome[posicao + 1:]
+        if resto.split(" ", 1)[0] not in PALAVRAS_IGNORADAS:
+            palavras.add(resto[:TAMANHO_CHAVE] + sufixo)
+        posicao = nome.find(" ", posicao + 1)
+    digitos = digitos_cnpj(cnpj)
+    return list(inicios), list(palavras - inicios), [digitos + sufixo] if digitos else []
+
+
+class IndiceSugestoes:
+    def __init__(self):
+        self.registros: Dict[int, tuple] = {}
+        self.inicios: List[str] = []
+        self.palavras: List[str] = []
+        self.cnpjs: List[str] = []
+        self.marca: Optional[datetime] = None
+        self.pronto = False
+        self.carregado_em = 0.0
+        self.lock = threading.Lock()
+        self.tarefa: Optional[asyncio.Task] = None
+        self.acordar: Optional[asyncio.Event] = None
+
+    # ===================== CONSULTA =====================
+
+    def sugerir(self, termo: str, limite: int = 10) -> List[dict]:
+        digitos = termo_cnpj(termo)
+        if digitos:
+            prefixo, listas = digitos, (self.cnpjs,)
+        else:
+            prefixo, listas = normalizar(termo)[:TAMANHO_CHAVE], (self.inicios, self.palavras)
+        if not prefixo:
+            return []
+
+        vistos, sugestoes = set(), []
+        with self.lock:
+            for lista in listas:
+                posicao = bisect_left(lista, prefixo)
+                while posicao < len(lista) and len(sugestoes) < limite:
+                    chave = lista[posicao]
+                    if not chave.startswith(prefixo):
+                        break
+                    empresa_id = int(chave[chave.rindex(SEPARADOR) + 1:])
+                    if empresa_id not in vistos:
+                        vistos.add(empresa_id)
+                        empresa, sigla, cnpj, municipio, estado = self.registros[empresa_id]
+                        sugestoes.append({
+                            "id": empresa_id, "empresa": empresa, "sigla": sigla, "cnpj": cnpj,
+                            "municipio": municipio, "estado": estado
+                        })
+                    posicao += 1
+        return sugestoes
+
+    # ===================== ESCRITA =====================
+
+    def construir(self, linhas: Iterable[Linha]):
+        """Monta as listas do zero e troca de uma vez as que estão em uso"""
+        registros, inicios, palavras, cnpjs = {}, [], [], []
+        for linha in linhas:
+            registros[linha[0]] = tuple(linha[1:6])
+            chaves = chaves_empresa(linha)
+            inicios += chaves[0]
+            palavras += chaves[1]
+            cnpjs += chaves[2]
+        inicios.sort()
+        palavras.sort()
+        cnpjs.sort()
+        with self.lock:
+            self.registros, self.inicios, self.palavras, self.cnpjs = registros, inicios, palavras, cnpjs
+            self.pronto = True
+
+    def _remover_chaves(self, empresa_id: int):
+        anterior = self.registros.pop(empresa_id, None)
+        if anterior is None:
+            return
+        for lista, chaves in zip((self.inicios, self.palavras, self.cnpjs), chaves_empresa((empresa_id, *anterior))):
+            for chave in chaves:
+                posicao = bisect_left(lista, chave)
+                if posicao < len(lista) and lista[posicao] == chave:
+                    del lista[posicao]
+
+    def aplicar(self, linha: Linha):
+        """Insere ou atualiza uma empresa; o lock fica preso só por ela"""
+        with self.lock:
+            if self.registros.get(linha[0]) == tuple(linha[1:6]):
+                return
+            self._remover_chaves(linha[0])
+            self.registros[linha[0]] = tuple(linha[1:6])
+            for lista, chaves in zip((self.inicios, self.palavras, self.cnpjs), chaves_empresa(linha)):
+                for chave in chaves:
+                    insort(lista, chave)
+
+    def remover(self, empresa_id: int):
+        with self.lock:
+            self._remover_chaves(empresa_id)
+
+    # ===================== SINCRONIZAÇÃO =====================
+
+    def carregar(self):
+        """Carga completa (thread do executor)"""
+        db = SessionLocal()
+        try:
+            estimativa = db.execute(text("SELECT reltuples::bigint FROM pg_class WHERE oid = 'empresas'::regclass")).scalar()
+            if estimativa and estimativa > SUGESTOES_MAXIMO_EMPRESAS:
+                if self.pronto or not self.carregado_em:
+                    print(f"⚠️ ~{estimativa} empresas: acima de SUGESTOES_MAXIMO_EMPRESAS, sugestões vão ao banco")
+                with self.lock:
+                    self.pronto = False
+                    self.registros, self.inicios, self.palavras, self.cnpjs = {}, [], [], []
+                self.carregado_em = time.monotonic()
+                return
+            inicio = time.perf_counter()
+            linhas = db.execute(select(
+                Empresa.id, Empresa.empresa, Empresa.sigla, Empresa.cnpj, Empresa.municipio, Empresa.estado,
+                Empresa.data_atualizacao
+            )).all()
+        finally:
+            db.close()
+        self.construir(linhas)
+        self.marca = max((linha.data_atualizacao for linha in linhas if linha.data_atualizacao), default=None)
+        self.carregado_em = time.monotonic()
+        print(f"📇 Índice de sugestões: {len(linhas)} empresas em {(time.perf_counter() - inicio) * 1000:.0f} ms")
+
+    def atualizar(self):
+        """Aplica as empresas alteradas desde a última leitura (thread do executor)"""
+        if time.monotonic() - self.carregado_em > SUGESTOES_RECARGA:
+            self.carregar()
+            return
+        if not self.pronto:
+            return
+        db = SessionLocal()
+        try:
+            # Só as alteradas depois da marca contam para a recarga: a margem
+            # relida logo depois de uma importação não deve disparar outra
+            novas = Empresa.data_atualizacao > self.marca if self.marca else Empresa.data_atualizacao.isnot(None)
+            quantidade = db.execute(select(func.count()).select_from(
+                select(Empresa.id).where(novas).limit(LIMITE_INCREMENTAL + 1).subquery()
+            )).scalar()
+            if quantidade > LIMITE_INCREMENTAL:
+                recarregar = True
+            else:
+                recarregar = False
+                # Relê a margem (transações que gravaram antes da marca mas
+                # fizeram commit depois) em páginas por (data_atualizacao, id)
+                query = select(
+                    Empresa.id, Empresa.empresa, Empresa.sigla, Empresa.cnpj, Empresa.municipio, Empresa.estado,
+                    Empresa.data_atualizacao
+                ).where(Empresa.data_atualizacao.isnot(None)).order_by(
+                    Empresa.data_atualizacao, Empresa.id
+                ).limit(LIMITE_INCREMENTAL)
+                if self.marca is not None:
+                    query = query.where(Empresa.data_atualizacao > self.marca - MARGEM_ATUALIZACAO)
+                ultima = None
+                while True:
+                    pagina = db.execute(
+                        query if ultima is None else query.where(tuple_(Empresa.data_atualizacao, Empresa.id) > ultima)
+                    ).all()
+                    for linha in pagina:
+                        self.aplicar(linha)
+                    if pagina:
+                        ultima = (pagina[-1].data_atualizacao, pagina[-1].id)
+                        self.marca = max(self.marca or ultima[0], ultima[0])
+                    if len(pagina) < LIMITE_INCREMENTAL:
+                        break
+        finally:
+            db.close()
+        if recarregar:
+            self.carregar()
+
+    def _ao_receber_evento(self, dados: dict):
+        for empresa_id in dados.get("removidas") or []:
+            self.remover(empresa_id)
+        if self.acordar is not None:
+            self.acordar.set()
+
+    async def _ciclo(self):
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(None, self.carregar)
+        except Exception as e:
+            print(f"⚠️ Erro ao carregar índice de sugestões: {e}")
+        while True:
+            try:
+                await asyncio.wait_for(self.acordar.wait(), SUGESTOES_INTERVALO)
+            except asyncio.TimeoutError:
+                pass
+            self.acordar.clear()
+            try:
+                await loop.run_in_executor(None, self.atualizar)
+            except Exception as e:
+                print(f"⚠️ Erro ao atualizar índice de sugestões: {e}")
+
+    async def iniciar(self):
+        if not SUGESTOES_INDICE or SessionLocal is None:
+            return
+        self.acordar = asyncio.Event()
+        barramento.assinar("empresas", self._ao_receber_evento)
+        self.tarefa = asyncio.create_task(self._ciclo())
+
+    async def parar(self):
+        if self.tarefa:
+            self.tarefa.cancel()
+            self.tarefa = None
+        barramento.cancelar_assinatura("empresas", self._ao_receber_evento)
+
+
+def avisar_alteracao(removidas: Iterable[int] = ()):
+    """
+    Chamar depois do commit que cria, altera ou exclui empresas: os workers
+    releem as alteradas na hora e tiram as excluídas do índice.
+    """
+    barramento.publicar("empresas", {"removidas": list(removidas)})
+
+
+indice_sugestoes = IndiceSugestoes()
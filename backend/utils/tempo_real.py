@@ -0,0 +1,160 @@
+import asyncio
+import time
+from typing import Dict, Iterable, Set
+from fastapi import WebSocket, status
+from backend.auth.revogacao import registro_revogacao
+from backend.eventos import barramento
+
+
+class GerenciadorConexoes:
+    """
+    Mantém as conexões WebSocket abertas neste worker, agrupadas por usuário.
+    Um mesmo usuário pode ter várias abas abertas, por isso cada usuário
+    tem um conjunto de conexões.
+
+    Os eventos passam pelo barramento (backend.eventos), de modo que um
+    evento gerado em um worker chega aos usuários conectados em qualquer
+    outro worker ou réplica.
+
+    Cada conexão guarda exp, jti e ver do token com que se autenticou e é
+    fechada (1008) quando ele expira, quando o jti é revogado (logout) ou
+    quando a versão dos tokens do usuário muda (troca de senha, exclusão).
+    O cliente renova a conexão mandando outro "autenticar" antes de expirar.
+    """
+
+    def __init__(self):
+        self.conexoes: Dict[int, Set[WebSocket]] = {}
+        self.admins: Set[int] = set()
+        self.credenciais: Dict[WebSocket, dict] = {}
+        self.expiracoes: Dict[WebSocket, asyncio.TimerHandle] = {}
+
+    def conectar(self, usuario_id: int, websocket: WebSocket, credenciais: dict, admin: bool = False):
+        """Registra um WebSocket já aceito e autenticado (roda no event loop)"""
+        self.conexoes.setdefault(usuario_id, set()).add(websocket)
+        if admin:
+            self.admins.add(usuario_id)
+        self.renovar(websocket, credenciais)
+
+    def renovar(self, websocket: WebSocket, credenciais: dict):
+        """Troca o token da conexão (claims id, jti, ver e exp) e reprograma a expiração"""
+        self.credenciais[websocket] = credenciais
+        anterior = self.expiracoes.pop(websocket, None)
+        if anterior is not None:
+            anterior.cancel()
+        if credenciais.get("exp"):
+            espera = max(0.0, credenciais["exp"] - time.time())
+            self.expiracoes[websocket] = asyncio.get_running_loop().call_later(
+                espera, self._encerrar, websocket, "token expirado"
+            )
+
+    def _encerrar(self, websocket: WebSocket, motivo: str):
+        if self.credenciais.pop(websocket, None) is None:
+            return
+        expiracao = self.expiracoes.pop(websocket, None)
+        if expiracao is not None:
+            expiracao.cancel()
+        asyncio.ensure_future(self._fechar(websocket, motivo))
+
+    async def _fechar(self, websocket: WebSocket, motivo: str):
+        try:
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=motivo)
+        except Exception:
+            pass
+
+    def desconectar(self, usuario_id: int, websocket: WebSocket):
+        self.credenciais.pop(websocket, None)
+        expiracao = self.expiracoes.pop(websocket, None)
+        if expiracao is not None:
+            expiracao.cancel()
+        conexoes_usuario = self.conexoes.get(usuario_id)
+        if not conexoes_usuario:
+            return
+        conexoes_usuario.discard(websocket)
+        if not conexoes_usuario:
+            del self.conexoes[usuario_id]
+            self.admins.discard(usuario_id)
+
+    def esta_conectado(self, usuario_id: int) -> bool:
+        return usuario_id in self.conexoes
+
+    async def enviar(self, usuario_id: int, evento: dict):
+        for websocket in list(self.conexoes.get(usuario_id, ())):
+            try:
+                await websocket.send_json(evento)
+            except Exception:
+                self.desconectar(usuario_id, websocket)
+
+    def entregar_local(self, usuarios_ids: Iterable[int], tipo: str, dados):
+        """Envia o evento aos usuários conectados a este worker (roda no event loop)"""
+        evento = {"tipo": tipo, "dados": dados}
+        for usuario_id in set(usuarios_ids):
+            if usuario_id in self.conexoes:
+                asyncio.ensure_future(self.enviar(usuario_id, evento))
+
+    def notificar(self, usuarios_ids: Iterable[int], tipo: str, dados):
+        """
+        Publica um evento de chat para os usuários informados.
+        Pode ser chamado tanto de endpoints async quanto de endpoints sync
+        (que rodam no threadpool).
+        """
+        barramento.publicar("chat", {
+            "usuarios": sorted(set(usuarios_ids)),
+            "tipo": tipo,
+            "dados": dados
+        })
+
+    async def notificar_async(self, usuarios_ids: Iterable[int], tipo: str, dados):
+        """Versão de notificar para endpoints async (não bloqueia o event loop)"""
+        await barramento.publicar_async("chat", {
+            "usuarios": sorted(set(usuarios_ids)),
+            "tipo": tipo,
+            "dados": dados
+        })
+
+    def _ao_receber_chat(self, evento: dict):
+        dados = evento.get("dados") or {}
+        if evento.get("truncado"):
+            dados["truncado"] = True
+        self.entregar_local(evento.get("usuarios", []), evento.get("tipo"), dados)
+
+    def _ao_receber_notificacao(self, evento: dict):
+        destino_id = evento.get("usuario_destino_id")
+        destinos = [destino_id] if destino_id else list(self.conexoes.keys())
+        self.entregar_local(destinos, "notificacao", evento)
+
+    def _ao_receber_pipeline(self, evento: dict):
+        destinos = set(self.admins)
+        if evento.get("consultor_id"):
+            destinos.add(evento["consultor_id"])
+        self.entregar_local(destinos, "pipeline", evento)
+
+    def _ao_revogar_token(self, evento: dict):
+        for websocket, credenciais in list(self.credenciais.items()):
+            if credenciais.get("jti") == evento.get("jti"):
+                self._encerrar(websocket, "token revogado")
+
+    def _ao_alterar_usuario(self, evento: dict):
+        usuario_id = evento.get("usuario_id")
+        if usuario_id in self.conexoes:
+            asyncio.ensure_future(self._verificar_versao(usuario_id))
+
+    async def _verificar_versao(self, usuario_id: int):
+        """Fecha as conexões do usuário autenticadas com uma versão de token que não vale mais"""
+        versao = await asyncio.get_running_loop().run_in_executor(
+            None, registro_revogacao.versao_atual, usuario_id
+        )
+        for websocket in list(self.conexoes.get(usuario_id, ())):
+            credenciais = self.credenciais.get(websocket)
+            if credenciais is not None and "ver" in credenciais and credenciais["ver"] != versao:
+                self._encerrar(websocket, "token revogado")
+
+    def registrar_assinaturas(self):
+        barramento.assinar("chat", self._ao_receber_chat)
+        barramento.assinar("notificacoes", self._ao_receber_notificacao)
+        barramento.assinar("pipeline", self._ao_receber_pipeline)
+        barramento.assinar("tokens", self._ao_revogar_token)
+        barramento.assinar("usuarios", self._ao_alterar_usuario)
+
+
+gerenciador_conexoes = GerenciadorConexoes()
+gerenciador_conexoes.registrar_assinaturas()
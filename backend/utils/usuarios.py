@@ -0,0 +1,21 @@
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session
+
+from backend.models import Usuario
+
+
+def inserir_usuario(db: Session, novo_usuario: Usuario) -> Usuario:
+    """
+    Grava um usuário novo (senha já com hash), recusando email duplicado.
+    Síncrono: os endpoints async chamam via run_in_threadpool depois de
+    calcular o hash no executor de senhas.
+    """
+    if db.query(Usuario).filter(Usuario.email == novo_usuario.email).first():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email já cadastrado"
+        )
+    db.add(novo_usuario)
+    db.commit()
+    db.refresh(novo_usuario)
+    return novo_usuario
@@ -0,0 +1,61 @@
+"""
+Configuração do gunicorn carregada pelo docker-entrypoint.sh e pelo Procfile.
+
+Prepara o modo multiprocesso do prometheus_client: os workers gravam as
+métricas em PROMETHEUS_MULTIPROC_DIR e o /metrics de qualquer worker soma
+todos eles (backend/metricas.py). O diretório é limpo a cada início para não
+misturar números de execuções anteriores.
+
+Com GUNICORN_PRELOAD=true o app é importado uma vez no master e os workers
+nascem por fork, compartilhando essas páginas copy-on-write: o boot de cada
+worker cai para o startup do app e a memória do import é dividida entre
+eles. O master não abre conexões, mas os pools dos engines são descartados
+no fork por garantia. Com preload, `kill -HUP` reinicia os workers sem
+reimportar o código; para deploy de código novo reinicie o master.
+"""
+import gc
+import os
+import shutil
+import sys
+import time
+
+diretorio_metricas = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/nucleo-metricas")
+# Com preload as métricas são criadas no import do master, antes do on_starting
+os.makedirs(diretorio_metricas, exist_ok=True)
+
+preload_app = os.getenv("GUNICORN_PRELOAD", "false") == "true"
+
+
+def on_starting(server):
+    shutil.rmtree(diretorio_metricas, ignore_errors=True)
+    os.makedirs(diretorio_metricas, exist_ok=True)
+
+
+def when_ready(server):
+    if server.cfg.preload_app:
+        # Objetos do import ficam fora do GC: as coletas nos workers não
+        # tocam nessas páginas e elas continuam compartilhadas
+        gc.collect()
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    aplicacao = sys.modules.get("main")
+    if aplicacao is None:
+        return
+    # boot_ms do /health passa a contar do fork, não do import no master
+    aplicacao.INICIO_BOOT = time.perf_counter()
+    from backend.database import async_engine, engine, replicas
+    engines = [engine, async_engine.sync_engine if async_engine is not None else None]
+    for replica in replicas:
+        engines += [replica.engine, replica.async_engine.sync_engine]
+    for motor in engines:
+        if motor is not None:
+            # close=False: conexões herdadas do master não são fechadas pelo filho
+            motor.dispose(close=False)
+
+
+def child_exit(server, worker):
+    # Gauges "livesum" do worker que saiu deixam de contar
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -1,180 +1,36 @@
+import time
+
+# Início do boot do worker, antes dos imports pesados (reportado no /health)
+INICIO_BOOT = time.perf_counter()
+
+import os
 from fastapi import FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
-from backend.database import SessionLocal, Base, engine
+from backend.database import engine, async_engine, replicas
 from backend.models import Usuario, Empresa, Prospeccao, Agendamento, AtribuicaoEmpresa, Notificacao, Mensagem
 from backend.routers import auth, empresas, prospeccoes, agendamentos, admin, atribuicoes, consultores, dashboard, cnpj, notificacoes, mensagens, cronograma, pipeline
 from backend.routers.formularios import router as formularios_router, router_public as formularios_public_router
-from backend.utils.seed import criar_usuario_admin_padrao, criar_empresas_padrao, criar_consultores_padrao, criar_stages_padrao, popular_pipeline, criar_prospeccoes_padrao
-from backend.utils.seed_cronograma import seed_cronograma
-from backend.models.prospeccoes import gerar_codigo_prospeccao
+from backend.eventos import barramento
+from backend.utils.presenca import presenca
+from backend.utils.executores import encerrar_executor_cpu
+from backend.utils.monitor_loop import MONITOR_LOOP, MiddlewareMonitorLoop, monitor_loop
+from backend.utils.contador_consultas import MiddlewareContadorConsultas
+from backend.metricas import CONTENT_TYPE_LATEST, MiddlewareMetricas, amostrador_metricas, gerar_metricas
+from backend.utils.perfilador import MiddlewarePerfilador
+from backend.utils.replicas import MiddlewareEscritaRecente, monitor_replicas
+from backend.utils.sugestoes_empresas import indice_sugestoes
+from backend.utils.importar_empresas import encerrar_importacoes_interrompidas
+from backend.utils.preparar_banco import verificar_migracoes
 
 app = FastAPI(title="Núcleo 1.03", version="1.0.0")
 
-def adicionar_colunas_faltantes_empresas():
-    """Adiciona colunas faltantes à tabela empresas se não existirem"""
-    from sqlalchemy import text
-    
-    if engine is None:
-        return
-    
-    colunas_necessarias = {
-        'nome_contato': 'VARCHAR(200)',
-        'cargo_contato': 'VARCHAR(200)',
-        'telefone_contato': 'VARCHAR(50)',
-        'email_contato': 'VARCHAR(200)',
-    }
-    
-    with engine.connect() as conn:
-        result = conn.execute(text("""
-            SELECT column_name 
-            FROM information_schema.columns 
-            WHERE table_name = 'empresas'
-        """))
-        colunas_existentes = {row[0] for row in result.fetchall()}
-        
-        for coluna, tipo in colunas_necessarias.items():
-            if coluna not in colunas_existentes:
-                print(f"🔄 Adicionando coluna '{coluna}' à tabela empresas...")
-                try:
-                    conn.execute(text(f"""
-                        ALTER TABLE empresas 
-                        ADD COLUMN {coluna} {tipo}
-                    """))
-                    conn.commit()
-                    print(f"✅ Coluna '{coluna}' adicionada com sucesso à empresas")
-                except Exception as e:
-                    print(f"⚠️ Erro ao adicionar coluna '{coluna}' à empresas: {e}")
-
-def criar_tabela_prospeccoes_historico():
-    """Cria a tabela prospeccoes_historico se não existir"""
-    from sqlalchemy import text
-    
-    if engine is None:
-        return
-    
-    with engine.connect() as conn:
-        result = conn.execute(text("""
-            SELECT table_name FROM information_schema.tables 
-            WHERE table_name = 'prospeccoes_historico'
-        """))
-        if not result.fetchone():
-            print("🔄 Criando tabela prospeccoes_historico...")
-            try:
-                conn.execute(text("""
-                    CREATE TABLE IF NOT EXISTS prospeccoes_historico (
-                        id SERIAL PRIMARY KEY,
-                        prospeccao_id INTEGER NOT NULL REFERENCES prospeccoes(id),
-                        usuario_id INTEGER NOT NULL REFERENCES usuarios(id),
-                        data_alteracao TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-                        tipo_alteracao VARCHAR(50) NOT NULL,
-                        campo_alterado VARCHAR(100),
-                        valor_anterior TEXT,
-                        valor_novo TEXT,
-                        descricao TEXT
-                    )
-                """))
-                conn.commit()
-                print("✅ Tabela prospeccoes_historico criada com sucesso")
-            except Exception as e:
-                print(f"⚠️ Erro ao criar tabela prospeccoes_historico: {e}")
-
-def adicionar_colunas_faltantes_prospeccoes():
-    """Adiciona colunas faltantes à tabela prospeccoes se não existirem"""
-    from sqlalchemy import text
-    
-    if engine is None:
-        return
-    
-    colunas_necessarias = {
-        'codigo': 'VARCHAR(50)',
-        'data_atualizacao': 'TIMESTAMP',
-        'porte': 'VARCHAR(50)',
-        'lr': 'VARCHAR(50)',
-        'id_externo': 'VARCHAR(100)',
-        'cfr': 'VARCHAR(50)',
-        'tipo_producao': 'VARCHAR(200)',
-        'data_prospeccao': 'DATE',
-        'follow_up': 'DATE',
-        'nome_contato': 'VARCHAR(200)',
-        'cargo': 'VARCHAR(200)',
-        'celular': 'VARCHAR(50)',
-        'telefone': 'VARCHAR(50)',
-        'telefone_contato': 'VARCHAR(50)',
-        'email_contato': 'VARCHAR(200)',
-        'cargo_contato': 'VARCHAR(200)',
-        'cnpj': 'VARCHAR(50)',
-        'status_prospeccao': 'VARCHAR(100)',
-        'responsavel': 'VARCHAR(200)',
-        'opcoes': 'TEXT',
-        'retorno': 'TEXT',
-        'observacoes_prospeccao': 'TEXT',
-        'interesse_treinamento': 'BOOLEAN DEFAULT FALSE',
-        'interesse_consultoria': 'BOOLEAN DEFAULT FALSE',
-        'interesse_certificacao': 'BOOLEAN DEFAULT FALSE',
-        'interesse_eventos': 'BOOLEAN DEFAULT FALSE',
-        'interesse_produtos': 'BOOLEAN DEFAULT FALSE',
-        'interesse_seguranca': 'BOOLEAN DEFAULT FALSE',
-        'interesse_meio_ambiente': 'BOOLEAN DEFAULT FALSE',
-        'outros_interesses': 'TEXT',
-        'potencial_negocio': 'VARCHAR(50)',
-        'status_follow_up': 'VARCHAR(100)',
-        'proxima_prospeccao_data': 'DATE',
-    }
-    
-    with engine.connect() as conn:
-        result = conn.execute(text("""
-            SELECT column_name 
-            FROM information_schema.columns 
-            WHERE table_name = 'prospeccoes'
-        """))
-        colunas_existentes = {row[0] for row in result.fetchall()}
-        
-        for coluna, tipo in colunas_necessarias.items():
-            if coluna not in colunas_existentes:
-                print(f"🔄 Adicionando coluna '{coluna}' à tabela prospeccoes...")
-                try:
-                    conn.execute(text(f"""
-                        ALTER TABLE prospeccoes 
-                        ADD COLUMN {coluna} {tipo}
-                    """))
-                    conn.commit()
-                    print(f"✅ Coluna '{coluna}' adicionada com sucesso")
-                except Exception as e:
-                    print(f"⚠️ Erro ao adicionar coluna '{coluna}': {e}")
-        
-        if 'codigo' not in colunas_existentes:
-            print("🔄 Criando índice único para coluna 'codigo'...")
-            try:
-                conn.execute(text("""
-                    CREATE UNIQUE INDEX IF NOT EXISTS ix_prospeccoes_codigo 
-                    ON prospeccoes (codigo) WHERE codigo IS NOT NULL
-                """))
-                conn.commit()
-                print("✅ Índice criado com sucesso")
-            except Exception as e:
-                print(f"⚠️ Erro ao criar índice: {e}")
-
-def atualizar_prospeccoes_sem_codigo(db):
-    """Atualiza prospecções que não possuem código único"""
-    from sqlalchemy import text
-    
-    result = db.execute(text("""
-        SELECT id FROM prospeccoes WHERE codigo IS NULL OR codigo = ''
-    """))
-    ids_sem_codigo = [row[0] for row in result.fetchall()]
-    
-    if ids_sem_codigo:
-        print(f"🔄 Atualizando {len(ids_sem_codigo)} prospecções sem código...")
-        for pid in ids_sem_codigo:
-            novo_codigo = gerar_codigo_prospeccao()
-            db.execute(text("""
-                UPDATE prospeccoes SET codigo = :codigo WHERE id = :id
-            """), {"codigo": novo_codigo, "id": pid})
-        db.commit()
-        print(f"✅ {len(ids_sem_codigo)} prospecções atualizadas com código único")
+# Preenchidos no fim do startup
+boot_ms = None
+estado_migracoes = None
 
 @app.get("/health")
 async def health_check():
@@ -183,7 +39,10 @@ async def health_check():
         content={
             "status": "healthy", 
             "app": "Nucleo 1.03",
-            "version": "1.0.0"
+            "version": "1.0.0",
+            "pid": os.getpid(),
+            "boot_ms": boot_ms,
+            "migracoes": estado_migracoes
         }, 
         status_code=200,
         headers={"Cache-Control": "no-cache"}
@@ -194,92 +53,76 @@ async def healthz():
     """Alternative health check endpoint for Kubernetes/Railway compatibility"""
     return {"status": "ok"}
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    """Métricas Prometheus de todos os workers; não consulta o banco"""
+    token = os.getenv("METRICAS_TOKEN")
+    if token and request.headers.get("authorization") != f"Bearer {token}":
+        return Response(status_code=401)
+    return Response(gerar_metricas(), headers={"Content-Type": CONTENT_TYPE_LATEST})
+
 @app.on_event("startup")
-async def startup_event():
-    """Cria tabelas se necessário e executa seed de dados iniciais"""
-    import os
-    
-    # Skip if running via Docker (entrypoint already handled this)
-    if os.getenv("SKIP_STARTUP_SEED") == "true":
-        print("✅ Startup seed skipped (handled by entrypoint)")
-        return
-    
-    if engine is None:
-        print("⚠️ DATABASE_URL não configurada - pulando inicialização do banco")
-        return
-    
+async def iniciar_barramento_eventos():
+    """Abre a conexão LISTEN do barramento de eventos e inicia a presença do chat"""
     try:
-        print("🔄 Verificando banco de dados...")
-        Base.metadata.create_all(bind=engine)
-        print("✅ Tabelas verificadas/criadas")
+        await barramento.iniciar()
     except Exception as e:
-        print(f"⚠️ Erro ao verificar tabelas: {e}")
-    
-    try:
-        adicionar_colunas_faltantes_empresas()
-    except Exception as e:
-        print(f"⚠️ Erro ao adicionar colunas faltantes em empresas: {e}")
-    
-    try:
-        adicionar_colunas_faltantes_prospeccoes()
-    except Exception as e:
-        print(f"⚠️ Erro ao adicionar colunas faltantes em prospeccoes: {e}")
-    
-    try:
-        criar_tabela_prospeccoes_historico()
-    except Exception as e:
-        print(f"⚠️ Erro ao criar tabela prospeccoes_historico: {e}")
-    
-    db = SessionLocal()
-    try:
-        print("🔄 Iniciando seed de dados...")
-        try:
-            criar_usuario_admin_padrao(db)
-        except Exception as e:
-            print(f"⚠️ Erro ao criar usuário admin (pode já existir): {e}")
-        
-        try:
-            criar_consultores_padrao(db)
-        except Exception as e:
-            print(f"⚠️ Erro ao criar consultores (podem já existir): {e}")
-        
-        try:
-            criar_empresas_padrao(db)
-        except Exception as e:
-            print(f"⚠️ Erro ao criar empresas (podem já existir): {e}")
-        
-        try:
-            criar_stages_padrao(db)
-        except Exception as e:
-            print(f"⚠️ Erro ao criar stages (podem já existir): {e}")
-        
-        try:
-            popular_pipeline(db)
-        except Exception as e:
-            print(f"⚠️ Erro ao popular pipeline: {e}")
-        
+        print(f"⚠️ Erro ao iniciar barramento de eventos: {e}")
+    await presenca.iniciar()
+    await amostrador_metricas.iniciar()
+    await monitor_replicas.iniciar()
+    await indice_sugestoes.iniciar()
+    if MONITOR_LOOP:
+        await monitor_loop.iniciar()
+
+@app.on_event("shutdown")
+async def parar_barramento_eventos():
+    await monitor_loop.parar()
+    await amostrador_metricas.parar()
+    await monitor_replicas.parar()
+    await indice_sugestoes.parar()
+    await presenca.parar()
+    await barramento.parar()
+    if async_engine is not None:
+        await async_engine.dispose()
+    encerrar_executor_cpu()
+
+@app.on_event("startup")
+async def verificar_banco():
+    """
+    Só confere a revisão do banco contra o head das migrações; schema e
+    seed ficam no `python -m backend.utils.preparar_banco`, rodado uma vez
+    por deploy. Também encerra as importações de planilha que um worker
+    reiniciado deixou pela metade. Último handler de startup: marca o
+    worker como pronto.
+    """
+    global estado_migracoes, boot_ms
+    if engine is None:
+        print("⚠️ DATABASE_URL não configurada - pulando verificação do banco")
+    else:
         try:
-            criar_prospeccoes_padrao(db)
+            estado_migracoes = await run_in_threadpool(verificar_migracoes)
+            if not estado_migracoes["atualizado"]:
+                print(
+                    f"⚠️ Banco na revisão {estado_migracoes['banco'] or 'nenhuma'}, migrações em "
+                    f"{estado_migracoes['head']}: rode python -m backend.utils.preparar_banco"
+                )
         except Exception as e:
-            print(f"⚠️ Erro ao criar prospecções padrão: {e}")
-        
+            print(f"⚠️ Erro ao verificar migrações: {e}")
         try:
-            atualizar_prospeccoes_sem_codigo(db)
+            await run_in_threadpool(encerrar_importacoes_interrompidas)
         except Exception as e:
-            print(f"⚠️ Erro ao atualizar prospecções sem código: {e}")
-        
-        # Cronograma seed disabled during startup (too slow)
-        # You can import cronograma manually via the UI if needed
-        # try:
-        #     seed_cronograma(db)
-        # except Exception as e:
-        #     print(f"⚠️ Erro ao importar cronograma: {e}")
-        
-        print("✅ Seed de dados concluído")
-    except Exception as e:
-        print(f"❌ Erro geral no startup: {e}")
-    finally:
-        db.close()
+            print(f"⚠️ Erro ao encerrar importações interrompidas: {e}")
+    boot_ms = round((time.perf_counter() - INICIO_BOOT) * 1000, 1)
+    print(f"🚀 Worker {os.getpid()} pronto em {boot_ms} ms")
+
+if MONITOR_LOOP:
+    # Registrado primeiro para ficar mais interno e rodar na task do endpoint
+    app.add_middleware(MiddlewareMonitorLoop)
+# Também precisa rodar na task do endpoint para amostrar endpoints async
+app.add_middleware(MiddlewarePerfilador)
+if replicas:
+    app.add_middleware(MiddlewareEscritaRecente)
 
 app.add_middleware(
     CORSMiddleware,
@@ -301,6 +144,8 @@ class NoCacheMiddleware(BaseHTTPMiddleware):
         return response
 
 app.add_middleware(NoCacheMiddleware)
+app.add_middleware(MiddlewareContadorConsultas)
+app.add_middleware(MiddlewareMetricas)
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
@@ -316,6 +161,7 @@ app.include_router(dashboard.router)
 app.include_router(cnpj.router)
 app.include_router(notificacoes.router)
 app.include_router(mensagens.router)
+app.include_router(mensagens.router_ws)
 app.include_router(cronograma.router)
 app.include_router(pipeline.router)
 app.include_router(formularios_router)
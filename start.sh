@@ -17,6 +17,11 @@ else
     echo "DATABASE_URL: configurada"
 fi
 
+# Migrações e seed uma vez, antes do servidor (os workers só conferem a revisão)
+if [ -n "$DATABASE_URL" ]; then
+    python -m backend.utils.preparar_banco || echo "AVISO: falha ao preparar o banco"
+fi
+
 # Definir porta - Railway define automaticamente via variável PORT
 export PORT="${PORT:-8000}"
 echo "PORT: $PORT"
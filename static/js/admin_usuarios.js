@@ -191,12 +191,6 @@ document.getElementById('addUserForm').addEventListener('submit', async (e) => {
     }
 });
 
-function logout() {
-    localStorage.removeItem('token');
-    localStorage.removeItem('usuario');
-    window.location.href = '/';
-}
-
 document.getElementById('editUserForm').addEventListener('submit', async (e) => {
     e.preventDefault();
     hideError('editUserError');
@@ -12,13 +12,79 @@ function getAuthHeaders() {
 
 function setToken(token) {
     localStorage.setItem('token', token);
+    agendarRenovacaoToken();
+}
+
+function getRefreshToken() {
+    return localStorage.getItem('refresh_token');
+}
+
+function setRefreshToken(token) {
+    if (token) {
+        localStorage.setItem('refresh_token', token);
+    }
 }
 
 function removeToken() {
     localStorage.removeItem('token');
+    localStorage.removeItem('refresh_token');
     localStorage.removeItem('usuario');
 }
 
+function obterExpiracaoToken(token) {
+    try {
+        const payload = JSON.parse(atob(token.split('.')[1].replace(/-/g, '+').replace(/_/g, '/')));
+        return payload.exp ? payload.exp * 1000 : null;
+    } catch (error) {
+        return null;
+    }
+}
+
+let renovacaoEmAndamento = null;
+let timerRenovacaoToken = null;
+
+// Troca o refresh token por um novo par. Chamadas simultâneas compartilham a mesma requisição.
+function renovarToken() {
+    const refreshToken = getRefreshToken();
+    if (!refreshToken) return Promise.resolve(false);
+    
+    if (!renovacaoEmAndamento) {
+        renovacaoEmAndamento = fetch('/api/auth/refresh', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ refresh_token: refreshToken })
+        }).then(async (response) => {
+            if (!response.ok) return false;
+            const data = await response.json();
+            setRefreshToken(data.refresh_token);
+            setToken(data.access_token);
+            return true;
+        }).catch(() => false).finally(() => {
+            renovacaoEmAndamento = null;
+        });
+    }
+    return renovacaoEmAndamento;
+}
+
+// O access token dura poucos minutos: renova um pouco antes de expirar,
+// assim as chamadas fetch diretas das páginas continuam funcionando
+function agendarRenovacaoToken() {
+    clearTimeout(timerRenovacaoToken);
+    const token = getToken();
+    if (!token || !getRefreshToken()) return;
+    
+    const expiraEm = obterExpiracaoToken(token);
+    if (!expiraEm) return;
+    
+    const espera = Math.max(0, expiraEm - Date.now() - 60000);
+    timerRenovacaoToken = setTimeout(async () => {
+        const renovado = await renovarToken();
+        if (!renovado && obterExpiracaoToken(getToken() || '') <= Date.now()) {
+            logout();
+        }
+    }, espera);
+}
+
 function setUsuario(usuario) {
     localStorage.setItem('usuario', JSON.stringify(usuario));
 }
@@ -61,11 +127,24 @@ function atualizarSidebar() {
 }
 
 function logout() {
+    const token = getToken();
+    const refreshToken = getRefreshToken();
+    if (token || refreshToken) {
+        fetch('/api/auth/logout', {
+            method: 'POST',
+            keepalive: true,
+            headers: {
+                'Content-Type': 'application/json',
+                'Authorization': token ? `Bearer ${token}` : ''
+            },
+            body: JSON.stringify({ refresh_token: refreshToken })
+        }).catch(() => {});
+    }
     removeToken();
     window.location.href = '/';
 }
 
-async function apiRequest(url, options = {}) {
+async function apiRequest(url, options = {}, tentarRenovar = true) {
     const token = getToken();
     const headers = {
         'Content-Type': 'application/json',
@@ -82,6 +161,10 @@ async function apiRequest(url, options = {}) {
             headers
         });
         
+        if (response.status === 401 && tentarRenovar && await renovarToken()) {
+            return apiRequest(url, options, false);
+        }
+        
         if (response.status === 401) {
             console.error('Erro 401: Token inválido ou expirado');
             logout();
@@ -161,7 +244,15 @@ if (window.location.pathname !== '/' && !getToken()) {
 
 document.addEventListener('DOMContentLoaded', function() {
     if (getToken()) {
+        agendarRenovacaoToken();
         atualizarSidebar();
         iniciarVerificacaoMensagens();
     }
 });
+
+// Timers ficam congelados em abas em segundo plano: ao voltar, confere o token
+document.addEventListener('visibilitychange', function() {
+    if (document.visibilityState === 'visible' && getToken()) {
+        agendarRenovacaoToken();
+    }
+});
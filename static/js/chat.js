@@ -14,6 +14,13 @@ let typingTimeout = null;
 let pollingInterval = null;
 let heartbeatInterval = null;
 
+let socketChat = null;
+let wsConectado = false;
+let wsTentativas = 0;
+let wsToken = null;
+let wsTimerReautenticacao = null;
+let digitandoTimeout = null;
+
 let anexoAtual = null;
 let uploadEmProgresso = false;
 
@@ -221,7 +228,9 @@ async function abrirConversa(usuarioId) {
         
         renderizarConversas(document.getElementById('buscarConversa').value);
         
-        pollingInterval = setInterval(() => verificarNovasMensagens(), 2000);
+        if (!wsConectado) {
+            pollingInterval = setInterval(() => verificarNovasMensagens(), 2000);
+        }
         
         await carregarConversas();
         
@@ -542,34 +551,202 @@ async function handleTyping() {
     
     if (!typingActive) {
         typingActive = true;
-        try {
-            await apiRequest('/api/mensagens/digitando', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({
-                    digitando: true,
-                    destinatario_id: conversaAtual.id
-                })
-            });
-        } catch (e) {}
+        await enviarStatusDigitando(true);
     }
     
     clearTimeout(typingTimeout);
     typingTimeout = setTimeout(async () => {
         typingActive = false;
-        try {
-            await apiRequest('/api/mensagens/digitando', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({
-                    digitando: false,
-                    destinatario_id: conversaAtual.id
-                })
-            });
-        } catch (e) {}
+        await enviarStatusDigitando(false);
     }, 3000);
 }
 
+async function enviarStatusDigitando(digitando) {
+    if (!conversaAtual) return;
+    
+    if (wsConectado) {
+        socketChat.send(JSON.stringify({
+            tipo: 'digitando',
+            destinatario_id: conversaAtual.id,
+            digitando: digitando
+        }));
+        return;
+    }
+    
+    try {
+        await apiRequest('/api/mensagens/digitando', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+                digitando: digitando,
+                destinatario_id: conversaAtual.id
+            })
+        });
+    } catch (e) {}
+}
+
+function conectarWebSocket() {
+    const token = getToken();
+    if (!token || !window.WebSocket) return;
+    
+    const protocolo = window.location.protocol === 'https:' ? 'wss' : 'ws';
+    socketChat = new WebSocket(`${protocolo}://${window.location.host}/ws/mensagens`);
+    
+    // O token vai na primeira mensagem, nunca na URL
+    socketChat.onopen = () => {
+        wsToken = getToken();
+        socketChat.send(JSON.stringify({ tipo: 'autenticar', token: wsToken }));
+    };
+    
+    socketChat.onmessage = (event) => {
+        try {
+            const evento = JSON.parse(event.data);
+            if (evento.tipo === 'autenticado') {
+                agendarReautenticacaoWebSocket((evento.dados || {}).expira_em);
+                if (wsConectado) return;
+                wsConectado = true;
+                wsTentativas = 0;
+                if (pollingInterval) {
+                    clearInterval(pollingInterval);
+                    pollingInterval = null;
+                }
+                if (conversaAtual) {
+                    verificarNovasMensagens();
+                }
+                return;
+            }
+            processarEventoChat(evento);
+        } catch (e) {
+            console.error('Erro ao processar evento do chat:', e);
+        }
+    };
+    
+    socketChat.onclose = () => {
+        wsConectado = false;
+        socketChat = null;
+        clearTimeout(wsTimerReautenticacao);
+        
+        // Fallback para polling enquanto reconecta
+        if (conversaAtual && !pollingInterval) {
+            pollingInterval = setInterval(() => verificarNovasMensagens(), 2000);
+        }
+        
+        wsTentativas++;
+        const espera = Math.min(30000, 1000 * Math.pow(2, wsTentativas));
+        setTimeout(conectarWebSocket, espera);
+    };
+}
+
+// O servidor fecha a conexão quando o token expira: auth.js renova o token
+// 60 s antes, e a conexão passa a usar o novo logo depois
+function agendarReautenticacaoWebSocket(expiraEm) {
+    clearTimeout(wsTimerReautenticacao);
+    if (!expiraEm) return;
+    
+    const espera = Math.max(0, expiraEm * 1000 - Date.now() - 30000);
+    wsTimerReautenticacao = setTimeout(function reautenticar() {
+        if (!socketChat || socketChat.readyState !== WebSocket.OPEN) return;
+        const token = getToken();
+        if (!token || token === wsToken) {
+            // Ainda não renovado: confere de novo em instantes
+            wsTimerReautenticacao = setTimeout(reautenticar, 5000);
+            return;
+        }
+        wsToken = token;
+        socketChat.send(JSON.stringify({ tipo: 'autenticar', token }));
+    }, espera);
+}
+
+function processarEventoChat(evento) {
+    const dados = evento.dados || {};
+    
+    switch (evento.tipo) {
+        case 'nova_mensagem':
+            receberNovaMensagem(dados);
+            break;
+        case 'mensagens_lidas':
+            if (conversaAtual && dados.leitor_id === conversaAtual.id) {
+                mensagensCarregadas.forEach(m => {
+                    if (m.remetente_id === usuario.id && m.destinatario_id === dados.leitor_id) {
+                        m.lida = true;
+                        m.status = 'lida';
+                    }
+                });
+                exibirMensagens(mensagensCarregadas);
+            }
+            break;
+        case 'mensagem_editada':
+            substituirMensagem(dados);
+            break;
+        case 'mensagem_apagada': {
+            const msg = mensagensCarregadas.find(m => m.id === dados.id);
+            if (msg) {
+                msg.deletada = true;
+                msg.conteudo = 'Mensagem apagada';
+                exibirMensagens(mensagensCarregadas);
+            }
+            carregarConversas();
+            break;
+        }
+        case 'reacao': {
+            const msg = mensagensCarregadas.find(m => m.id === dados.mensagem_id);
+            if (msg) {
+                msg.reacoes = dados.reacoes;
+                exibirMensagens(mensagensCarregadas);
+            }
+            break;
+        }
+        case 'digitando':
+            if (conversaAtual && dados.usuario_id === conversaAtual.id) {
+                const digitandoEl = document.getElementById('digitandoIndicator');
+                clearTimeout(digitandoTimeout);
+                if (dados.digitando) {
+                    digitandoEl.classList.remove('hidden');
+                    digitandoTimeout = setTimeout(() => digitandoEl.classList.add('hidden'), 10000);
+                } else {
+                    digitandoEl.classList.add('hidden');
+                }
+            }
+            break;
+    }
+}
+
+async function receberNovaMensagem(msg) {
+    // Mensagens muito grandes chegam sem o conteudo; busca pelo endpoint normal
+    if (msg.truncado) {
+        await verificarNovasMensagens();
+        await carregarConversas();
+        return;
+    }
+    
+    const outroId = msg.remetente_id === usuario.id ? msg.destinatario_id : msg.remetente_id;
+    
+    if (conversaAtual && outroId === conversaAtual.id) {
+        if (!mensagensCarregadas.find(m => m.id === msg.id)) {
+            mensagensCarregadas.push(msg);
+            adicionarMensagemAoChat(msg);
+        }
+        ultimaMensagemId = Math.max(ultimaMensagemId, msg.id);
+        
+        if (msg.remetente_id === conversaAtual.id) {
+            document.getElementById('digitandoIndicator').classList.add('hidden');
+            try {
+                await apiRequest(`/api/mensagens/${msg.id}/marcar-lida`, { method: 'PUT' });
+            } catch (e) {}
+        }
+    }
+    
+    await carregarConversas();
+}
+
+function substituirMensagem(msgAtualizada) {
+    const indice = mensagensCarregadas.findIndex(m => m.id === msgAtualizada.id);
+    if (indice === -1) return;
+    
+    mensagensCarregadas[indice] = { ...mensagensCarregadas[indice], ...msgAtualizada };
+    exibirMensagens(mensagensCarregadas);
+}
+
 function responderMensagemPor(msgId) {
     const msg = mensagensCarregadas.find(m => m.id === msgId);
     if (!msg) return;
@@ -1006,7 +1183,16 @@ async function init() {
     heartbeatInterval = setInterval(sendHeartbeat, 30000);
     sendHeartbeat();
     
-    setInterval(carregarConversas, 10000);
+    conectarWebSocket();
+    
+    // Com o WebSocket ativo a lista so precisa de refresh ocasional (status online)
+    let ciclosConversas = 0;
+    setInterval(() => {
+        ciclosConversas++;
+        if (!wsConectado || ciclosConversas % 6 === 0) {
+            carregarConversas();
+        }
+    }, 10000);
 }
 
 init();
@@ -418,6 +418,12 @@ async function salvarPerfilCompleto() {
         });
         
         if (response && response.ok) {
+            const data = await response.json();
+            // Troca de email ou senha invalida os tokens atuais; a API devolve um novo par
+            if (data.access_token) {
+                setRefreshToken(data.refresh_token);
+                setToken(data.access_token);
+            }
             fecharModalEditarPerfil();
             carregarPerfilConsultor();
             alert('Perfil atualizado com sucesso!');
@@ -6,32 +6,43 @@ const usuario = getUsuario();
 if (usuario.tipo !== 'admin') {
     document.getElementById('btnNovaEmpresa').style.display = 'none';
     document.getElementById('btnUploadExcel').style.display = 'none';
+    document.getElementById('btnExportarEmpresas').style.display = 'none';
+    document.getElementById('btnExportarEmpresasXlsx').style.display = 'none';
 }
 
 let paginaAtual = 1;
 const itensPorPagina = 20;
 let filtrosAtuais = {};
+// cursores[n - 1] abre a página n (paginação por cursor da API)
+let cursores = [''];
 
 async function carregarEmpresas(filtros = {}, pagina = 1) {
     try {
+        if (filtros !== filtrosAtuais || pagina > cursores.length) {
+            cursores = [''];
+            pagina = 1;
+        }
         paginaAtual = pagina;
         filtrosAtuais = filtros;
         
-        let url = `/api/empresas/?page=${pagina}&page_size=${itensPorPagina}`;
-        if (filtros.nome) url += `&nome=${filtros.nome}`;
-        if (filtros.cnpj) url += `&cnpj=${filtros.cnpj}`;
-        if (filtros.municipio) url += `&municipio=${filtros.municipio}`;
-        if (filtros.er) url += `&er=${filtros.er}`;
-        if (filtros.carteira) url += `&carteira=${filtros.carteira}`;
+        let url = `/api/empresas/?cursor=${encodeURIComponent(cursores[pagina - 1])}&page_size=${itensPorPagina}`;
+        if (filtros.nome) url += `&nome=${encodeURIComponent(filtros.nome)}`;
+        if (filtros.cnpj) url += `&cnpj=${encodeURIComponent(filtros.cnpj)}`;
+        if (filtros.municipio) url += `&municipio=${encodeURIComponent(filtros.municipio)}`;
+        if (filtros.er) url += `&er=${encodeURIComponent(filtros.er)}`;
+        if (filtros.carteira) url += `&carteira=${encodeURIComponent(filtros.carteira)}`;
         
         const response = await apiRequest(url);
         const data = await response.json();
+        data.page = pagina;
+        cursores = cursores.slice(0, pagina);
+        if (data.next_cursor) cursores.push(data.next_cursor);
         
         const tbody = document.getElementById('tabelaEmpresas');
         
         if (!data.items || data.items.length === 0) {
             tbody.innerHTML = '<tr><td colspan="6" class="px-6 py-8 text-center text-gray-400">Nenhuma empresa encontrada</td></tr>';
-            atualizarPaginacao({total_count: 0, page: 1, page_size: itensPorPagina, total_pages: 0});
+            atualizarPaginacao({total_count: 0, page: 1, page_size: itensPorPagina, next_cursor: null});
             return;
         }
         
@@ -77,16 +88,18 @@ function atualizarPaginacao(data) {
     
     if (!info || !controles) return;
     
-    if (data.total_count === 0) {
+    if (data.total_count === 0 && !data.items?.length) {
         info.textContent = 'Nenhuma empresa encontrada';
         controles.innerHTML = '';
         return;
     }
     
     const inicio = (data.page - 1) * data.page_size + 1;
-    const fim = Math.min(data.page * data.page_size, data.total_count);
+    const fim = inicio + data.items.length - 1;
+    // Sem filtro o total vem das estatísticas do banco: aproximado
+    const total = data.total_estimado ? `cerca de ${Math.max(data.total_count, fim)}` : data.total_count;
     
-    info.textContent = `Mostrando ${inicio} a ${fim} de ${data.total_count} empresas`;
+    info.textContent = `Mostrando ${inicio} a ${fim} de ${total} empresas`;
     
     let botoesHTML = '';
     
@@ -95,25 +108,10 @@ function atualizarPaginacao(data) {
         botoesHTML += `<button onclick="carregarEmpresas(filtrosAtuais, ${data.page - 1})" class="px-3 py-1 bg-dark-card text-gray-300 rounded hover:bg-dark-hover">Anterior</button>`;
     }
     
-    const maxBotoes = 5;
-    let inicioPagina = Math.max(1, data.page - Math.floor(maxBotoes / 2));
-    let fimPagina = Math.min(data.total_pages, inicioPagina + maxBotoes - 1);
-    
-    if (fimPagina - inicioPagina < maxBotoes - 1) {
-        inicioPagina = Math.max(1, fimPagina - maxBotoes + 1);
-    }
-    
-    for (let i = inicioPagina; i <= fimPagina; i++) {
-        if (i === data.page) {
-            botoesHTML += `<button class="px-3 py-1 bg-blue-600 text-white rounded">${i}</button>`;
-        } else {
-            botoesHTML += `<button onclick="carregarEmpresas(filtrosAtuais, ${i})" class="px-3 py-1 bg-dark-card text-gray-300 rounded hover:bg-dark-hover">${i}</button>`;
-        }
-    }
+    botoesHTML += `<button class="px-3 py-1 bg-blue-600 text-white rounded">${data.page}</button>`;
     
-    if (data.page < data.total_pages) {
+    if (data.next_cursor) {
         botoesHTML += `<button onclick="carregarEmpresas(filtrosAtuais, ${data.page + 1})" class="px-3 py-1 bg-dark-card text-gray-300 rounded hover:bg-dark-hover">Próxima</button>`;
-        botoesHTML += `<button onclick="carregarEmpresas(filtrosAtuais, ${data.total_pages})" class="px-3 py-1 bg-dark-card text-gray-300 rounded hover:bg-dark-hover">Última</button>`;
     }
     
     controles.innerHTML = botoesHTML;
@@ -198,6 +196,36 @@ document.getElementById('novaEmpresaForm').addEventListener('submit', async (e)
     }
 });
 
+async function exportarEmpresas(formato) {
+    // Mesmos filtros da listagem; o CSV começa a chegar antes da consulta terminar
+    const params = new URLSearchParams({ formato });
+    for (const campo of ['nome', 'cnpj', 'municipio', 'er', 'carteira']) {
+        if (filtrosAtuais[campo]) params.append(campo, filtrosAtuais[campo]);
+    }
+    
+    try {
+        const response = await apiRequest(`/api/empresas/exportar?${params}`);
+        if (!response.ok) {
+            const error = await response.json();
+            throw new Error(error.detail || 'Erro ao exportar');
+        }
+        
+        const blob = await response.blob();
+        const match = (response.headers.get('Content-Disposition') || '').match(/filename="?([^";]+)"?/);
+        const url = window.URL.createObjectURL(blob);
+        const a = document.createElement('a');
+        a.href = url;
+        a.download = match ? match[1] : `empresas.${formato}`;
+        document.body.appendChild(a);
+        a.click();
+        window.URL.revokeObjectURL(url);
+        a.remove();
+    } catch (error) {
+        console.error('Erro ao exportar empresas:', error);
+        alert(`Erro ao exportar: ${error.message}`);
+    }
+}
+
 function showUploadExcelModal() {
     document.getElementById('uploadExcelModal').classList.remove('hidden');
 }
@@ -236,16 +264,22 @@ document.getElementById('uploadExcelForm').addEventListener('submit', async (e)
         if (!response.ok) throw new Error(result.detail || 'Erro no upload');
         
         const resultDiv = document.getElementById('uploadResult');
+        resultDiv.className = 'bg-blue-900/30 border border-blue-500 text-blue-300 p-4 rounded';
+        resultDiv.textContent = 'Importando planilha...';
+        resultDiv.classList.remove('hidden');
+        
+        const importacao = await acompanharImportacao(result.importacao_id, resultDiv);
+        if (importacao.status === 'erro') throw new Error(importacao.erro || 'Erro na importação');
+        
         resultDiv.className = 'bg-green-900/30 border border-green-500 text-green-300 p-4 rounded';
         resultDiv.innerHTML = `
-            <p class="font-semibold mb-2">${result.message}</p>
+            <p class="font-semibold mb-2">Upload concluído com sucesso</p>
             <ul class="text-sm space-y-1">
-                <li>Empresas criadas: ${result.empresas_criadas}</li>
-                <li>Empresas ignoradas (já existentes): ${result.empresas_ignoradas}</li>
-                <li>Total processado: ${result.total_processadas}</li>
+                <li>Empresas criadas: ${importacao.criadas}</li>
+                <li>Empresas ignoradas (já existentes ou sem CNPJ): ${importacao.ignoradas}</li>
+                <li>Total processado: ${importacao.linhas_lidas}</li>
             </ul>
         `;
-        resultDiv.classList.remove('hidden');
         
         setTimeout(() => {
             hideUploadExcelModal();
@@ -260,6 +294,19 @@ document.getElementById('uploadExcelForm').addEventListener('submit', async (e)
     }
 });
 
+async function acompanharImportacao(importacaoId, resultDiv) {
+    // A importação roda em segundo plano; consulta o progresso até terminar
+    while (true) {
+        await new Promise(resolve => setTimeout(resolve, 1000));
+        const response = await apiRequest(`/api/empresas/importacoes/${importacaoId}`);
+        if (!response.ok) throw new Error('Erro ao consultar a importação');
+        const importacao = await response.json();
+        if (importacao.status === 'concluida' || importacao.status === 'erro') return importacao;
+        const total = importacao.total_estimado ? ` de ~${importacao.total_estimado}` : '';
+        resultDiv.textContent = `Importando planilha... ${importacao.linhas_lidas}${total} linhas lidas, ${importacao.criadas} empresas criadas`;
+    }
+}
+
 async function abrirDetalhesEmpresa(empresaId) {
     document.getElementById('detalhesEmpresaModal').classList.remove('hidden');
     document.getElementById('detalhesEmpresaContent').innerHTML = `
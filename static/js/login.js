@@ -13,6 +13,7 @@ document.getElementById('loginForm').addEventListener('submit', async (e) => {
         
         if (response.ok) {
             const data = await response.json();
+            setRefreshToken(data.refresh_token);
             setToken(data.access_token);
             setUsuario(data.usuario);
             window.location.href = '/dashboard';
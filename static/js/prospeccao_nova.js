@@ -669,9 +669,8 @@ if (empresaSearchInput && empresaAutocomplete && empresaIdInput) {
         
         searchTimeout = setTimeout(async () => {
             try {
-                const response = await apiRequest(`/api/empresas/?nome=${encodeURIComponent(query)}&page_size=10`);
-                const data = await response.json();
-                const empresas = data.items || [];
+                const response = await apiRequest(`/api/empresas/sugestoes?q=${encodeURIComponent(query)}&limite=10`);
+                const empresas = response.ok ? await response.json() : [];
                 
                 if (empresas.length === 0) {
                     empresaAutocomplete.innerHTML = '<div class="p-3 text-gray-400 text-sm">Nenhuma empresa encontrada</div>';
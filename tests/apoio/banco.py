@@ -0,0 +1,18 @@
+"""
+Conexão numa transação que é desfeita no final: nada do que os testes e
+benchmarks gravam fica no banco, mesmo se o processo cair no meio.
+"""
+from contextlib import contextmanager
+
+from backend.database import engine
+
+
+@contextmanager
+def transacao_desfeita():
+    conexao = engine.connect()
+    transacao = conexao.begin()
+    try:
+        yield conexao
+    finally:
+        transacao.rollback()
+        conexao.close()
@@ -0,0 +1,80 @@
+"""
+Dados e orçamentos do detector de N+1, usados por
+tests/test_orcamento_consultas.py e pelo CLI
+backend/benchmarks/orcamento_consultas.py.
+
+popular() só faz flush: os dados ficam na transação da conexão de
+tests/apoio/banco.py, e sessoes_na_conexao() faz as rotas lerem dessa mesma
+conexão, então nada é gravado no banco.
+"""
+from contextlib import contextmanager
+
+from sqlalchemy.orm import Session
+
+from backend.database import get_db, get_read_db
+from backend.models import Stage
+from backend.models.formularios import Formulario, FormularioEnvio, OpcaoResposta, Pergunta, Resposta
+
+PREFIXO = "Orcamento consultas"
+
+# Rota -> máximo de consultas com os caches de autenticação já aquecidos
+ORCAMENTOS = {
+    "/api/formularios/": 3,
+    "/api/formularios/{formulario}/estatisticas": 5,
+    "/api/formularios/envios/?formulario_id={formulario}": 3,
+    "/api/formularios/envios/{envio}/respostas": 1,
+    "/api/pipeline/stats": 5,
+    "/api/mensagens/conversas": 1,
+    "/api/mensagens/usuarios-disponiveis": 1,
+    "/api/notificacoes/": 1,
+    "/api/notificacoes/nao-lidas/contagem": 1,
+    "/api/dashboard/stats": 7,
+    "/api/empresas/?page=1&page_size=20": 2,
+    "/api/empresas/?cursor=&page_size=20": 2,
+}
+
+
+def popular(db, volume: int) -> dict:
+    formularios = []
+    for i in range(volume):
+        formulario = Formulario(titulo=f"{PREFIXO} {i}")
+        for ordem in range(3):
+            pergunta = Pergunta(texto=f"Pergunta {ordem}", tipo="escala", ordem=ordem)
+            pergunta.opcoes = [OpcaoResposta(texto=f"Opção {v}", valor=v) for v in range(1, 6)]
+            formulario.perguntas.append(pergunta)
+        formularios.append(formulario)
+    db.add_all(formularios)
+    db.flush()
+
+    alvo = formularios[0]
+    envios = []
+    for i in range(volume):
+        envio = FormularioEnvio(formulario_id=alvo.id, nome_destinatario=f"Destinatário {i}", respondido=True)
+        envio.respostas = [
+            Resposta(pergunta_id=pergunta.id, valor_numerico=1 + (i + pergunta.ordem) % 5)
+            for pergunta in alvo.perguntas
+        ]
+        envios.append(envio)
+    db.add_all(envios)
+    db.add_all([Stage(nome=f"{PREFIXO} {i}", ordem=5000 + i) for i in range(volume)])
+    db.flush()
+    return {"formulario": alvo.id, "envio": envios[0].id}
+
+
+@contextmanager
+def sessoes_na_conexao(app, conexao):
+    """As dependências de sessão síncrona da app passam a usar `conexao`"""
+    def sessao():
+        db = Session(bind=conexao)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = sessao
+    app.dependency_overrides[get_read_db] = sessao
+    try:
+        yield
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+        app.dependency_overrides.pop(get_read_db, None)
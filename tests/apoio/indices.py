@@ -0,0 +1,193 @@
+"""
+Dados e consultas da verificação de índices: popular() gera um volume
+realista (o chamador desfaz a transação no final), consultas() espelha os
+filtros dos routers com os índices aceitos e verificar() confere o EXPLAIN.
+Usados por tests/test_verificar_indices.py e pelo CLI
+backend/benchmarks/verificar_indices.py.
+"""
+from sqlalchemy import and_, func, or_, text, tuple_
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+
+from backend.models import (
+    Activity, AtribuicaoEmpresa, CompanyPipeline, Empresa, Mensagem, Notificacao,
+    Prospeccao, Resposta, ResumoConversa
+)
+
+USUARIOS = 200
+EMPRESAS = 2000
+STAGES = 6
+PERGUNTAS = 20
+
+
+def popular(db: Session, linhas: int):
+    params = {"usuarios": USUARIOS, "empresas": EMPRESAS, "linhas": linhas}
+    comandos = [
+        """INSERT INTO usuarios (nome, email, senha_hash, tipo)
+           SELECT 'Indices ' || g, 'bench-indices-' || g || '@example.com', 'x', 'consultor'
+           FROM generate_series(1, :usuarios) g""",
+        """INSERT INTO empresas (empresa, cnpj)
+           SELECT 'Empresa indices ' || g, '98.' || lpad(g::text, 6, '0') || '/0001-' || lpad((g % 97)::text, 2, '0')
+           FROM generate_series(1, :empresas) g""",
+        f"""INSERT INTO stages (nome, ordem) SELECT 'Stage indices ' || g, 1000 + g FROM generate_series(1, {STAGES}) g""",
+        """CREATE TEMP TABLE bench_u ON COMMIT DROP AS
+           SELECT row_number() OVER (ORDER BY id) AS n, id FROM usuarios WHERE email LIKE 'bench-indices-%'""",
+        """CREATE TEMP TABLE bench_e ON COMMIT DROP AS
+           SELECT row_number() OVER (ORDER BY id) AS n, id FROM empresas WHERE empresa LIKE 'Empresa indices %'""",
+        """CREATE TEMP TABLE bench_s ON COMMIT DROP AS
+           SELECT row_number() OVER (ORDER BY id) AS n, id FROM stages WHERE nome LIKE 'Stage indices %'""",
+        """INSERT INTO mensagens (remetente_id, destinatario_id, conteudo, tipo, status, data_envio, lida, editada, deletada)
+           SELECT r.id, d.id, 'mensagem ' || g, 'texto', 'enviada', now() - g * interval '1 minute',
+                  random() < 0.9, false, random() < 0.02
+           FROM generate_series(1, :linhas) g
+           JOIN bench_u r ON r.n = 1 + g % :usuarios
+           JOIN bench_u d ON d.n = 1 + (g * 7 + 3) % :usuarios""",
+        """INSERT INTO notificacoes (tipo, titulo, mensagem, usuario_origem_id, usuario_destino_id, lida, data_criacao)
+           SELECT 'PROSPECCAO_CRIADA', 'titulo', 'mensagem', o.id,
+                  CASE WHEN g % 100 = 0 THEN NULL ELSE d.id END, random() < 0.7, now() - g * interval '1 minute'
+           FROM generate_series(1, :linhas) g
+           JOIN bench_u o ON o.n = 1 + g % :usuarios
+           JOIN bench_u d ON d.n = 1 + (g * 11) % :usuarios""",
+        """INSERT INTO company_pipeline (empresa_id, stage_id, consultor_id, ativo, criado_em)
+           SELECT e.id, s.id, u.id, random() < 0.8, now()
+           FROM generate_series(1, :linhas) g
+           JOIN bench_e e ON e.n = 1 + g % :empresas
+           JOIN bench_s s ON s.n = 1 + g % """ + str(STAGES) + """
+           JOIN bench_u u ON u.n = 1 + (g * 13) % :usuarios""",
+        """INSERT INTO atribuicoes_empresas (consultor_id, empresa_id, ativa, data_atribuicao)
+           SELECT u.id, e.id, random() < 0.8, now()
+           FROM generate_series(1, :linhas) g
+           JOIN bench_e e ON e.n = 1 + g % :empresas
+           JOIN bench_u u ON u.n = 1 + (g * 17) % :usuarios""",
+        """INSERT INTO prospeccoes (codigo, empresa_id, consultor_id, data_criacao)
+           SELECT 'BENCH-IDX-' || g, e.id, u.id, now() - g * interval '1 minute'
+           FROM generate_series(1, :linhas) g
+           JOIN bench_e e ON e.n = 1 + g % :empresas
+           JOIN bench_u u ON u.n = 1 + (g * 19) % :usuarios""",
+        """INSERT INTO activities (usuario_id, empresa_id, tipo, descricao, criado_em)
+           SELECT u.id, e.id, 'edicao', 'atividade ' || g, now() - g * interval '1 minute'
+           FROM generate_series(1, :linhas) g
+           JOIN bench_e e ON e.n = 1 + g % :empresas
+           JOIN bench_u u ON u.n = 1 + (g * 23) % :usuarios""",
+        """INSERT INTO formularios (titulo) VALUES ('Formulario indices')""",
+        f"""INSERT INTO perguntas (formulario_id, texto)
+           SELECT (SELECT max(id) FROM formularios), 'Pergunta ' || g FROM generate_series(1, {PERGUNTAS}) g""",
+        """INSERT INTO formulario_envios (formulario_id) SELECT (SELECT max(id) FROM formularios) FROM generate_series(1, 100)""",
+        f"""INSERT INTO respostas (envio_id, pergunta_id, valor_numerico)
+           SELECT (SELECT max(id) FROM formulario_envios), p.id, 1 + g % 5
+           FROM generate_series(1, :linhas) g
+           JOIN (SELECT row_number() OVER (ORDER BY id) AS n, id FROM perguntas
+                 WHERE formulario_id = (SELECT max(id) FROM formularios)) p ON p.n = 1 + g % {PERGUNTAS}""",
+        """INSERT INTO conversas_resumo (usuario_id, outro_usuario_id, nao_lidas, ultima_mensagem_minha, data_ultima_mensagem)
+           SELECT a.id, b.id, 0, false, now() FROM bench_u a JOIN bench_u b ON b.n <> a.n AND b.n % 5 = a.n % 5""",
+    ]
+    for comando in comandos:
+        db.execute(text(comando), params)
+
+    for tabela in ("usuarios", "empresas", "stages", "mensagens", "notificacoes", "company_pipeline",
+                   "atribuicoes_empresas", "prospeccoes", "activities", "respostas", "conversas_resumo"):
+        db.execute(text(f"ANALYZE {tabela}"))
+
+
+def consultas(db: Session):
+    """(descrição, query, índices aceitos) espelhando os filtros dos routers"""
+    a, b = [linha[0] for linha in db.execute(text("SELECT id FROM bench_u WHERE n IN (1, 2) ORDER BY n"))]
+    empresa_id = db.execute(text("SELECT id FROM bench_e WHERE n = 1")).scalar()
+    stage_id = db.execute(text("SELECT id FROM bench_s WHERE n = 1")).scalar()
+    pergunta_id = db.execute(text(
+        "SELECT min(id) FROM perguntas WHERE formulario_id = (SELECT max(id) FROM formularios)"
+    )).scalar()
+
+    return [
+        ("mensagens.obter_conversa",
+         db.query(Mensagem).filter(or_(
+             and_(Mensagem.remetente_id == a, Mensagem.destinatario_id == b),
+             and_(Mensagem.remetente_id == b, Mensagem.destinatario_id == a)
+         )).order_by(Mensagem.data_envio.desc()).limit(50),
+         {"ix_mensagens_remetente_destinatario_data"}),
+        ("mensagens.contar_nao_lidas",
+         db.query(func.count(Mensagem.id)).filter(
+             Mensagem.destinatario_id == a, Mensagem.lida == False, Mensagem.deletada == False
+         ),
+         {"ix_mensagens_nao_lidas"}),
+        ("conversas.recalcular_conversa (não lidas do par)",
+         db.query(func.count(Mensagem.id)).filter(
+             Mensagem.remetente_id == b, Mensagem.destinatario_id == a,
+             Mensagem.lida == False, Mensagem.deletada == False
+         ),
+         {"ix_mensagens_nao_lidas"}),
+        ("mensagens.listar_conversas",
+         db.query(ResumoConversa).filter(ResumoConversa.usuario_id == a)
+         .order_by(ResumoConversa.data_ultima_mensagem.desc()),
+         {"ix_conversas_resumo_usuario_data", "uq_conversas_resumo_usuario_outro"}),
+        ("notificacoes.listar_notificacoes (não lidas)",
+         db.query(Notificacao).filter(
+             (Notificacao.usuario_destino_id == a) | (Notificacao.usuario_destino_id == None),
+             Notificacao.lida == False
+         ).order_by(Notificacao.data_criacao.desc()),
+         {"ix_notificacoes_destino_lida_data"}),
+        ("pipeline.estatisticas (consultor)",
+         db.query(func.count(CompanyPipeline.id)).filter(
+             CompanyPipeline.ativo == True, CompanyPipeline.consultor_id == a, CompanyPipeline.stage_id == stage_id
+         ),
+         {"ix_company_pipeline_consultor_stage_ativo"}),
+        ("pipeline.listar_empresas_stage (admin)",
+         db.query(CompanyPipeline).filter(CompanyPipeline.stage_id == stage_id, CompanyPipeline.ativo == True),
+         {"ix_company_pipeline_stage_ativos", "ix_company_pipeline_consultor_stage_ativo"}),
+        ("atribuicoes.listar_empresas_consultor",
+         db.query(AtribuicaoEmpresa).filter(
+             AtribuicaoEmpresa.consultor_id == a, AtribuicaoEmpresa.ativa == True
+         ),
+         {"ix_atribuicoes_empresas_consultor_ativa"}),
+        ("prospeccoes.listar_prospeccoes (consultor)",
+         db.query(Prospeccao).filter(Prospeccao.consultor_id == a)
+         .order_by(Prospeccao.data_criacao.desc()).offset(0).limit(100),
+         {"ix_prospeccoes_consultor_data"}),
+        ("empresas.obter_ultimo_contato (última prospecção)",
+         db.query(Prospeccao).filter(Prospeccao.empresa_id == empresa_id)
+         .order_by(Prospeccao.data_criacao.desc()).limit(1),
+         {"ix_prospeccoes_empresa_data"}),
+        ("empresas.listar_empresas (cursor)",
+         db.query(Empresa.id, Empresa.empresa, Empresa.cnpj)
+         .filter(tuple_(Empresa.empresa, Empresa.id) > tuple_("Empresa indices 5", 0))
+         .order_by(Empresa.empresa, Empresa.id).limit(21),
+         {"ix_empresas_empresa_id"}),
+        ("empresas.criar_empresa (CNPJ já cadastrado)",
+         db.query(Empresa.id).filter(Empresa.cnpj_digits == "98000001000101"),
+         {"ix_empresas_cnpj_digits"}),
+        ("empresas.listar_empresas_mesma_raiz",
+         db.query(Empresa.id).filter(Empresa.cnpj_raiz == "98000001").order_by(Empresa.cnpj_digits, Empresa.id),
+         {"ix_empresas_cnpj_raiz", "ix_empresas_cnpj_digits"}),
+        ("pipeline.listar_atividades (consultor)",
+         db.query(Activity).filter(Activity.usuario_id == a).order_by(Activity.criado_em.desc()).limit(50),
+         {"ix_activities_usuario_criado"}),
+        ("formularios.estatisticas (média por pergunta)",
+         db.query(func.avg(Resposta.valor_numerico)).filter(
+             Resposta.pergunta_id == pergunta_id, Resposta.valor_numerico.isnot(None)
+         ),
+         {"ix_respostas_pergunta_valor"}),
+    ]
+
+
+def _percorrer(plano, nos):
+    nos.append(plano)
+    for filho in plano.get("Plans", []):
+        _percorrer(filho, nos)
+    return nos
+
+
+def verificar(db: Session, descricao, query, indices_aceitos):
+    sql = str(query.statement.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+    plano = db.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()[0]["Plan"]
+    nos = _percorrer(plano, [])
+
+    indices_usados = {no["Index Name"] for no in nos if "Index Name" in no}
+    seq_scans = sorted({no["Relation Name"] for no in nos if no["Node Type"] == "Seq Scan"})
+
+    ok = bool(indices_usados & indices_aceitos) and not seq_scans
+    marca = "✅" if ok else "❌"
+    detalhe = ", ".join(sorted(indices_usados)) or "nenhum índice"
+    if seq_scans:
+        detalhe += f" | Seq Scan em {', '.join(seq_scans)}"
+    print(f"{marca} {descricao}: {detalhe}")
+    return ok
@@ -0,0 +1,38 @@
+"""
+Medição do `import main` num processo novo e o orçamento de inicialização,
+usados por tests/test_orcamento_inicializacao.py e pelo CLI
+backend/benchmarks/orcamento_inicializacao.py.
+"""
+import json
+import os
+import subprocess
+import sys
+
+# Carregadas sob demanda; nenhuma delas pode aparecer depois de `import main`
+MODULOS_ADIADOS = ["reportlab", "openpyxl", "magic", "httpx", "httpcore"]
+ORCAMENTO_IMPORT_MS = float(os.getenv("ORCAMENTO_IMPORT_MS", "3000"))
+ORCAMENTO_RSS_MB = float(os.getenv("ORCAMENTO_RSS_MB", "125"))
+
+MEDIR = f"""
+import json, re, sys, time
+inicio = time.perf_counter()
+import main
+duracao = time.perf_counter() - inicio
+status = open("/proc/self/status").read()
+print(json.dumps({{
+    "import_ms": duracao * 1000,
+    "rss_mb": int(re.search(r"VmRSS:\\s+(\\d+)", status).group(1)) / 1024,
+    "carregados": [m for m in {MODULOS_ADIADOS!r} if m in sys.modules]
+}}))
+"""
+
+
+def medir() -> dict:
+    resultado = subprocess.run(
+        [sys.executable, "-c", MEDIR], capture_output=True, text=True, timeout=120
+    )
+    if resultado.returncode != 0:
+        print(resultado.stderr)
+        raise RuntimeError("import main falhou")
+    # A última linha é o JSON; antes dela vêm os prints do import
+    return json.loads(resultado.stdout.strip().splitlines()[-1])
@@ -0,0 +1,10 @@
+import pytest
+
+from tests.apoio.banco import transacao_desfeita
+
+
+@pytest.fixture(scope="module")
+def conexao():
+    """Conexão numa transação desfeita no fim do módulo de testes"""
+    with transacao_desfeita() as conexao:
+        yield conexao
@@ -0,0 +1,69 @@
+"""
+Normalização de CNPJ: digitos_cnpj tem que dar o mesmo valor que a coluna
+gerada empresas.cnpj_digits (só os dígitos, 12 ou 13 completados até 14) e
+normalizar_cnpj tem que recuperar os zeros que uma célula numérica do Excel
+come. A comparação com as expressões SQL precisa de Postgres (DATABASE_URL)
+e é pulada sem ele.
+"""
+import os
+
+import pytest
+from sqlalchemy import text
+
+from backend.database import engine
+from backend.models.empresas import CNPJ_DIGITOS_SQL, CNPJ_RAIZ_SQL
+from backend.utils.importar_empresas import digitos_cnpj, normalizar_cnpj
+
+CASOS_DIGITOS = [
+    ("33.000.167/0001-01", "33000167000101"),
+    ("33000167000101", "33000167000101"),
+    (" 33 000 167 0001 01 ", "33000167000101"),
+    ("CNPJ: 33.000.167/0001-01", "33000167000101"),
+    # Zeros à esquerda perdidos numa célula numérica
+    ("4252011000110", "04252011000110"),
+    ("360305000104", "00360305000104"),
+    # CPF e números curtos ficam como estão
+    ("123.456.789-09", "12345678909"),
+    ("12345", "12345"),
+    ("", None),
+    (None, None),
+    ("n/d", None),
+    ("---", None),
+]
+
+CASOS_NORMALIZAR = [
+    (4252011000110, "04.252.011/0001-10"),
+    (360305000104, "00.360.305/0001-04"),
+    (4252011000110.0, "04.252.011/0001-10"),
+    (33000167000101, "33.000.167/0001-01"),
+    (12345678909, "12345678909"),
+    ("  33000167000101 ", "33.000.167/0001-01"),
+    ("33.000.167/0001-01", "33.000.167/0001-01"),
+    ("n/d", "n/d"),
+    ("   ", None),
+    (None, None),
+    (True, None),
+]
+
+
+@pytest.mark.parametrize("valor,esperado", CASOS_DIGITOS)
+def test_digitos_cnpj(valor, esperado):
+    assert digitos_cnpj(valor) == esperado
+
+
+@pytest.mark.parametrize("valor,esperado", CASOS_NORMALIZAR)
+def test_normalizar_cnpj(valor, esperado):
+    assert normalizar_cnpj(valor) == esperado
+
+
+@pytest.mark.skipif(not os.getenv("DATABASE_URL"), reason="DATABASE_URL não configurada")
+@pytest.mark.parametrize("valor", [valor for valor, _ in CASOS_DIGITOS])
+def test_digitos_cnpj_igual_ao_sql(valor):
+    with engine.connect() as conn:
+        digitos, raiz = conn.execute(
+            text(f"SELECT {CNPJ_DIGITOS_SQL}, {CNPJ_RAIZ_SQL} FROM (SELECT CAST(:cnpj AS varchar) AS cnpj) t"),
+            {"cnpj": valor},
+        ).one()
+    esperado = digitos_cnpj(valor)
+    assert digitos == esperado
+    assert raiz == (esperado[:8] if esperado and len(esperado) == 14 else None)
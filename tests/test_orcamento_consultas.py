@@ -0,0 +1,48 @@
+"""
+Orçamento de consultas SQL das rotas mais usadas (detector de N+1), com os
+dados e orçamentos de tests/apoio/consultas.py. Os dados ficam numa
+transação desfeita no final, lida pelas rotas pela mesma conexão. Precisa de um Postgres migrado com o usuário admin (DATABASE_URL); sem ele
+os testes são pulados.
+"""
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from backend.auth.security import criar_tokens_usuario
+from backend.models import Usuario
+from backend.utils.contador_consultas import verificar_orcamento
+from tests.apoio.consultas import ORCAMENTOS, popular, sessoes_na_conexao
+
+pytestmark = pytest.mark.skipif(not os.getenv("DATABASE_URL"), reason="DATABASE_URL não configurada")
+
+VOLUME = 20
+
+
+@pytest.fixture(scope="module")
+def cliente(conexao):
+    import main
+
+    db = Session(bind=conexao)
+    try:
+        admin = db.query(Usuario).filter(Usuario.tipo == "admin").first()
+        if admin is None:
+            pytest.skip("nenhum usuário admin no banco")
+        ids = popular(db, VOLUME)
+        headers = {"Authorization": f"Bearer {criar_tokens_usuario(admin)['access_token']}"}
+        with sessoes_na_conexao(main.app, conexao), TestClient(main.app, headers=headers) as cliente:
+            yield cliente, ids
+    finally:
+        db.close()
+
+
+@pytest.mark.parametrize("modelo,maximo", list(ORCAMENTOS.items()))
+def test_rota_dentro_do_orcamento(cliente, modelo, maximo):
+    cliente, ids = cliente
+    rota = modelo.format(**ids)
+    # A primeira chamada carrega usuário e lista de revogação nos caches
+    cliente.get(rota)
+    resposta = cliente.get(rota)
+    resposta.raise_for_status()
+    verificar_orcamento(resposta, maximo)
@@ -0,0 +1,42 @@
+"""
+Orçamento de inicialização do worker: `import main` num processo novo
+(tests/apoio/inicializacao.py) dentro do tempo e da
+memória de ORCAMENTO_IMPORT_MS/ORCAMENTO_RSS_MB, sem carregar as
+bibliotecas dos caminhos raros. Não conecta ao banco.
+"""
+import pytest
+
+from tests.apoio.inicializacao import MODULOS_ADIADOS, ORCAMENTO_IMPORT_MS, ORCAMENTO_RSS_MB, medir
+
+REPETICOES = 5
+
+
+@pytest.fixture(scope="module")
+def medicoes(monkeypatch_modulo):
+    # Os engines são criados como em produção, mas nada conecta no import
+    monkeypatch_modulo.setenv("DATABASE_URL", "postgresql://nucleo@localhost/nucleo")
+    # A primeira execução compila o bytecode que faltar e não entra na conta
+    medir()
+    return [medir() for _ in range(REPETICOES)]
+
+
+@pytest.fixture(scope="module")
+def monkeypatch_modulo():
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        yield monkeypatch
+
+
+def test_tempo_de_import(medicoes):
+    # A execução mais rápida: ruído da máquina só soma tempo
+    tempo = min(m["import_ms"] for m in medicoes)
+    assert tempo <= ORCAMENTO_IMPORT_MS, f"import main levou {tempo:.0f} ms (orçamento {ORCAMENTO_IMPORT_MS:.0f} ms)"
+
+
+def test_memoria_apos_import(medicoes):
+    rss = max(m["rss_mb"] for m in medicoes)
+    assert rss <= ORCAMENTO_RSS_MB, f"RSS de {rss:.1f} MB após o import (orçamento {ORCAMENTO_RSS_MB:.0f} MB)"
+
+
+@pytest.mark.parametrize("modulo", MODULOS_ADIADOS)
+def test_modulo_fora_do_boot(medicoes, modulo):
+    assert all(modulo not in m["carregados"] for m in medicoes), f"{modulo} importado por `import main`"
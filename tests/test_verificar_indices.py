@@ -0,0 +1,32 @@
+"""
+Regressão de índices: as consultas frequentes dos routers, com o volume de
+tests/apoio/indices.py, têm que usar o índice esperado e
+nenhum Seq Scan no EXPLAIN. Os dados são gerados numa transação desfeita no
+final. Precisa de um Postgres migrado (DATABASE_URL); sem ele o teste é
+pulado.
+"""
+import os
+
+import pytest
+from sqlalchemy.orm import Session
+
+from tests.apoio.indices import consultas, popular, verificar
+
+pytestmark = pytest.mark.skipif(not os.getenv("DATABASE_URL"), reason="DATABASE_URL não configurada")
+
+LINHAS = 50000
+
+
+@pytest.fixture(scope="module")
+def db(conexao):
+    db = Session(bind=conexao)
+    try:
+        popular(db, LINHAS)
+        yield db
+    finally:
+        db.close()
+
+
+def test_consultas_usam_indice(db):
+    falhas = [item[0] for item in consultas(db) if not verificar(db, *item)]
+    assert not falhas, f"consultas sem o índice esperado: {', '.join(falhas)}"